@@ -1,10 +1,13 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from app.core.repositories.base_repository import BaseRepository
 from app.donations.models.transaction import Transaction, TransactionType, TransactionStatus
 import os
 
+DUPLICATE_KEY_ERROR = 11000
+
 
 class TransactionRepository(BaseRepository):
     """
@@ -170,6 +173,80 @@ class TransactionRepository(BaseRepository):
         except Exception:
             return []
 
+    def insert_transactions_idempotent(self, transactions: List[Transaction]) -> int:
+        """
+        Insert transactions whose transaction_id may already exist.
+
+        Transactions with a deterministic transaction_id can be re-inserted
+        on retry; the copies rejected by the unique index are skipped.
+
+        Args:
+            transactions: Transaction instances to insert
+
+        Returns:
+            int: Number of transactions inserted
+        """
+        if self.collection is None or not transactions:
+            return 0
+
+        transactions_data = []
+        for transaction in transactions:
+            data = transaction.to_dict()
+            if data.get('_id') is None:
+                del data['_id']
+            transactions_data.append(data)
+
+        try:
+            return len(self.collection.insert_many(transactions_data, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            return e.details.get('nInserted', 0)
+
+    def find_pending_transaction_ids(self, transaction_ids: List[str]) -> List[str]:
+        """
+        Find which of the given transaction IDs are still pending.
+
+        Args:
+            transaction_ids: Transaction IDs to check
+
+        Returns:
+            List[str]: The transaction IDs whose transaction is pending
+        """
+        if self.collection is None or not transaction_ids:
+            return []
+
+        cursor = self.collection.find(
+            {"transaction_id": {"$in": transaction_ids}, "status": TransactionStatus.PENDING.value},
+            {"transaction_id": 1, "_id": 0}
+        )
+        return [doc["transaction_id"] for doc in cursor]
+
+    def complete_transactions(self, transaction_ids: List[str]) -> int:
+        """
+        Mark pending transactions as completed by transaction ID.
+
+        Args:
+            transaction_ids: Transaction IDs to complete
+
+        Returns:
+            int: Number of transactions completed
+        """
+        if self.collection is None or not transaction_ids:
+            return 0
+
+        now = self._get_current_time()
+        result = self.collection.update_many(
+            {"transaction_id": {"$in": transaction_ids}, "status": TransactionStatus.PENDING.value},
+            {"$set": {
+                "status": TransactionStatus.COMPLETED.value,
+                "processed_at": now,
+                "updated_at": now
+            }}
+        )
+        return result.modified_count
+
     def batch_update_status(self, transaction_ids: List[str],
                            new_status: str, metadata: Dict[str, Any] = None) -> int:
         """
@@ -1,9 +1,13 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from app.core.repositories.base_repository import BaseRepository
 from app.donations.models.wallet import Wallet
 import os
 
+DUPLICATE_KEY_ERROR = 11000
+
 
 class WalletRepository(BaseRepository):
     """
@@ -143,6 +147,74 @@ class WalletRepository(BaseRepository):
         )
         return result.modified_count > 0
 
+    def apply_credit_batch(self, credits: Dict[str, float], batch_id: str) -> Tuple[int, int]:
+        """
+        Credit many wallets at once, at most once per batch.
+
+        The increment adds batch_id to the wallet's pending_credit_batches
+        and only matches while it is not there, so a retry skips the
+        wallets already credited whose transactions are not yet completed.
+        Call release_credit_batch once those transactions are completed.
+        Missing wallets are created.
+
+        Args:
+            credits: Amount to add per user ID
+            batch_id: Identifier of the credit batch
+
+        Returns:
+            Tuple[int, int]: Wallets credited now, wallets credited by an earlier attempt
+        """
+        if self.collection is None or not credits:
+            return 0, 0
+
+        now = self._get_current_time()
+        operations = []
+        for user_id, amount in credits.items():
+            new_wallet = Wallet(user_id=user_id).to_dict()
+            for field_name in ('_id', 'current_balance', 'total_earned', 'version', 'updated_at'):
+                new_wallet.pop(field_name, None)
+
+            operations.append(UpdateOne(
+                {"user_id": user_id, "pending_credit_batches": {"$ne": batch_id}},
+                {
+                    "$inc": {"current_balance": amount, "total_earned": amount, "version": 1},
+                    "$set": {"updated_at": now},
+                    "$addToSet": {"pending_credit_batches": batch_id},
+                    "$setOnInsert": new_wallet
+                },
+                upsert=True
+            ))
+
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.modified_count + result.upserted_count, 0
+        except BulkWriteError as e:
+            # The upsert of a wallet that already has this batch hits the unique user_id index
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            return e.details.get('nModified', 0) + e.details.get('nUpserted', 0), len(errors)
+
+    def release_credit_batch(self, user_ids: List[str], batch_id: str) -> int:
+        """
+        Drop a credit batch from wallets whose batch transactions are completed.
+
+        Args:
+            user_ids: Users whose credit of this batch is completed
+            batch_id: Identifier of the credit batch
+
+        Returns:
+            int: Number of wallets released
+        """
+        if self.collection is None or not user_ids:
+            return 0
+
+        result = self.collection.update_many(
+            {"user_id": {"$in": user_ids}, "pending_credit_batches": batch_id},
+            {"$pull": {"pending_credit_batches": batch_id}}
+        )
+        return result.modified_count
+
     def get_wallets_with_auto_donation_enabled(self, limit: int = 100) -> List[Wallet]:
         """
         Get wallets that have auto-donation enabled and are eligible for processing.
@@ -14,6 +14,9 @@ class WalletService:
     Handles wallet operations, credit management, and auto-donation logic.
     """
 
+    # Users per insert_many / bulk_write round in award_credits_bulk
+    BULK_AWARD_CHUNK_SIZE = 5000
+
     def __init__(self):
         self.wallet_repo = WalletRepository()
         self.transaction_repo = TransactionRepository()
@@ -108,6 +111,88 @@ class WalletService:
             current_app.logger.error(f"Failed to add credits for user {user_id}: {str(e)}")
             return False, "CREDITS_ADD_ERROR", None
 
+    def award_credits_bulk(self, awards: List[Tuple[str, float, str]], batch_id: str,
+                           metadata: Dict[str, Any] = None) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Award credits to many users at once, idempotently per batch.
+
+        Each user gets one earned transaction with the deterministic ID
+        "<batch_id>:<user_id>", written with insert_many while still pending.
+        Only users whose transaction is still pending are credited, with a
+        single bulk_write that skips the wallets this batch already credited
+        before its transactions were completed. Last, those transactions are
+        completed and the wallets released. Calling it again with the same
+        batch_id after a failure finishes the batch without paying anyone
+        twice; runs of the same batch must not overlap. Auto-donation is not
+        triggered here; it is left to the auto-donation processing run.
+
+        Args:
+            awards: (user_id, amount, source) tuples; amounts for the same user are summed
+            batch_id: Identifier that makes the award idempotent (e.g. "tournament:<id>")
+            metadata: Metadata stored on every transaction
+
+        Returns:
+            Tuple[bool, str, Optional[Dict]]: Success, message, award summary
+        """
+        try:
+            credits: Dict[str, float] = {}
+            sources: Dict[str, str] = {}
+            for user_id, amount, source in awards:
+                if amount > 0:
+                    credits[user_id] = credits.get(user_id, 0.0) + amount
+                    sources.setdefault(user_id, source)
+
+            if not credits:
+                return False, "NO_CREDITS_TO_AWARD", None
+
+            credited = already_credited = 0
+            user_ids = list(credits)
+            for start in range(0, len(user_ids), self.BULK_AWARD_CHUNK_SIZE):
+                chunk = user_ids[start:start + self.BULK_AWARD_CHUNK_SIZE]
+
+                transactions = [
+                    Transaction(
+                        user_id=user_id,
+                        transaction_type=TransactionType.EARNED.value,
+                        amount=credits[user_id],
+                        source_type=sources[user_id],
+                        metadata={**(metadata or {}), 'batch_id': batch_id},
+                        transaction_id=f"{batch_id}:{user_id}"
+                    )
+                    for user_id in chunk
+                ]
+                self.transaction_repo.insert_transactions_idempotent(transactions)
+
+                pending_ids = self.transaction_repo.find_pending_transaction_ids(
+                    [transaction.transaction_id for transaction in transactions]
+                )
+                pending_users = [transaction_id[len(batch_id) + 1:] for transaction_id in pending_ids]
+
+                chunk_credited, chunk_already = self.wallet_repo.apply_credit_batch(
+                    {user_id: credits[user_id] for user_id in pending_users}, batch_id
+                )
+                self.transaction_repo.complete_transactions(pending_ids)
+                self.wallet_repo.release_credit_batch(pending_users, batch_id)
+
+                credited += chunk_credited
+                already_credited += chunk_already + len(chunk) - len(pending_users)
+
+            result_data = {
+                'batch_id': batch_id,
+                'users_credited': credited,
+                'users_already_credited': already_credited,
+                'total_amount': round(sum(credits.values()), 2)
+            }
+
+            current_app.logger.info(
+                f"Credit batch {batch_id}: credited {credited} wallets, {already_credited} already credited"
+            )
+            return True, "CREDITS_AWARDED_SUCCESS", result_data
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to award credit batch {batch_id}: {str(e)}")
+            return False, "CREDITS_AWARD_ERROR", None
+
     def process_donation(self, user_id: str, amount: float,
                         onlus_id: str, metadata: Dict[str, Any] = None) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
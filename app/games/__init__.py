@@ -25,14 +25,20 @@ def init_games_module():
     from .core.plugin_manager import plugin_manager
     from .repositories.game_repository import GameRepository
     from .repositories.game_session_repository import GameSessionRepository
+    from .challenges.repositories.matchmaking_ticket_repository import MatchmakingTicketRepository
+    from .teams.repositories.team_score_counter_repository import TeamScoreCounterRepository
     from .modes.services.mode_manager import ModeManager
 
     # Create database indexes
     try:
         game_repo = GameRepository()
         session_repo = GameSessionRepository()
+        ticket_repo = MatchmakingTicketRepository()
+        score_counter_repo = TeamScoreCounterRepository()
         game_repo.create_indexes()
         session_repo.create_indexes()
+        ticket_repo.create_indexes()
+        score_counter_repo.create_indexes()
     except Exception as e:
         print(f"Warning: Failed to create indexes: {e}")
 
@@ -1,3 +1,4 @@
+import math
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.core.utils.decorators import auth_required, admin_required
@@ -232,6 +233,10 @@ def find_opponent(current_user):
         if not game_id:
             return error_response("GAME_ID_REQUIRED")
 
+        if (isinstance(skill_range, bool) or not isinstance(skill_range, (int, float))
+                or not math.isfinite(skill_range) or skill_range < 0):
+            return error_response("INVALID_SKILL_RANGE")
+
         success, message, result = matchmaking_service.find_opponent(
             user_id, game_id, challenge_type, skill_range
         )
@@ -262,7 +267,55 @@ def quick_match(current_user):
         success, message, result = matchmaking_service.find_quick_match(user_id, game_id)
 
         if success:
-            return success_response(message, result)
+            return success_response(message, result, status_code=202)
+        else:
+            return error_response(message, result)
+
+    except Exception as e:
+        return error_response("INTERNAL_SERVER_ERROR", status_code=500)
+
+@challenges_bp.route('/matchmaking/quick-match/<ticket_id>', methods=['GET'])
+@auth_required
+def get_quick_match_ticket(current_user, ticket_id):
+    """
+    Poll a quick match ticket
+
+    Answers at once; a queued ticket gets a Retry-After header. ?wait is
+    still validated for older clients but no longer holds the request.
+    """
+    try:
+        user_id = current_user.get('id')
+        wait_seconds = float(request.args.get('wait', 0))
+        if not math.isfinite(wait_seconds) or wait_seconds < 0:
+            return error_response("INVALID_WAIT_VALUE")
+
+        success, message, data = matchmaking_service.get_quick_match_ticket(user_id, ticket_id)
+
+        if success:
+            if data.get('retry_after_seconds'):
+                body, status_code = success_response(message, data)
+                return body, status_code, {'Retry-After': str(math.ceil(data['retry_after_seconds']))}
+            return success_response(message, data)
+        else:
+            status_code = 404 if message == "MATCHMAKING_TICKET_NOT_FOUND" else 400
+            return error_response(message, status_code=status_code)
+
+    except ValueError:
+        return error_response("INVALID_WAIT_VALUE")
+    except Exception as e:
+        return error_response("INTERNAL_SERVER_ERROR", status_code=500)
+
+@challenges_bp.route('/matchmaking/quick-match/<ticket_id>', methods=['DELETE'])
+@auth_required
+def cancel_quick_match(current_user, ticket_id):
+    """Leave the quick match queue"""
+    try:
+        user_id = current_user.get('id')
+
+        success, message, data = matchmaking_service.cancel_quick_match(user_id, ticket_id)
+
+        if success:
+            return success_response(message, data)
         else:
             return error_response(message)
 
@@ -301,6 +301,46 @@ class ChallengeParticipantRepository(BaseRepository):
             "average_response_time_seconds": 0
         }
 
+    def get_users_challenge_totals(self, user_ids: List[str], days_back: int = 30) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the raw challenge counters of many users with one aggregation
+
+        Args:
+            user_ids: Users to aggregate
+            days_back: Only count participations joined in this window
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Counters keyed by user ID (users without participations are omitted)
+        """
+        if not user_ids:
+            return {}
+
+        since_date = datetime.utcnow() - timedelta(days=days_back)
+        pipeline = [
+            {
+                "$match": {
+                    "user_id": {"$in": list(user_ids)},
+                    "joined_at": {"$gte": since_date}
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$user_id",
+                    "total_challenges": {"$sum": 1},
+                    "completed_challenges": {
+                        "$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}
+                    },
+                    "won_challenges": {
+                        "$sum": {"$cond": [{"$eq": ["$final_position", 1]}, 1, 0]}
+                    },
+                    "score_total": {"$sum": "$score"},
+                    "scored_challenges": {"$sum": {"$cond": [{"$gt": ["$score", None]}, 1, 0]}}
+                }
+            }
+        ]
+
+        return {row.pop("_id"): row for row in self.collection.aggregate(pipeline)}
+
     def get_response_time_statistics(self, days_back: int = 30) -> Dict[str, Any]:
         """Get response time statistics for all users"""
         since_date = datetime.utcnow() - timedelta(days=days_back)
@@ -0,0 +1,201 @@
+from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.repositories.base_repository import BaseRepository
+
+
+class MatchmakingTicketRepository(BaseRepository):
+    """
+    Waiting queue of quick match tickets
+
+    A user holds at most one waiting ticket. The matchmaking worker reads
+    the whole queue once per tick, claims the two tickets of a pair before
+    creating their challenge, and releases them if that fails; claims
+    left behind by a crashed worker become waiting again once their lease
+    expires.
+    """
+
+    STATUS_WAITING = 'waiting'
+    STATUS_PAIRING = 'pairing'
+    STATUS_MATCHED = 'matched'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_EXPIRED = 'expired'
+
+    # Finished tickets stay readable for polling clients this long
+    RETENTION_SECONDS = 3600
+
+    QUEUE_PROJECTION = {'user_id': 1, 'game_id': 1, 'rating': 1, 'enqueued_at': 1}
+
+    def __init__(self):
+        super().__init__('matchmaking_tickets')
+
+    def create_indexes(self):
+        """Create indexes for the waiting queue and ticket cleanup"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        # One waiting ticket per user, enforced for concurrent enqueues
+        self.collection.create_index(
+            'user_id',
+            unique=True,
+            partialFilterExpression={'status': self.STATUS_WAITING}
+        )
+        self.collection.create_index([('status', 1), ('game_id', 1), ('rating', 1)])
+        self.collection.create_index([('status', 1), ('expires_at', 1)])
+        self.collection.create_index('purge_at', expireAfterSeconds=0)
+
+    def enqueue(self, user_id: str, game_id: str, rating: float,
+                ttl_seconds: float) -> Dict[str, Any]:
+        """
+        Put a user in a game's queue, or return the ticket they already hold
+
+        Args:
+            user_id: User looking for a match
+            game_id: Game to play
+            rating: User's matchmaking rating
+            ttl_seconds: Seconds before an unmatched ticket expires
+
+        Returns:
+            Dict[str, Any]: The user's waiting ticket, possibly for another game
+        """
+        now = datetime.utcnow()
+        ticket = {
+            'user_id': user_id,
+            'game_id': game_id,
+            'rating': rating,
+            'status': self.STATUS_WAITING,
+            'enqueued_at': now,
+            'expires_at': now + timedelta(seconds=ttl_seconds),
+            'purge_at': now + timedelta(seconds=ttl_seconds + self.RETENTION_SECONDS)
+        }
+
+        try:
+            ticket['_id'] = self.collection.insert_one(ticket).inserted_id
+            return ticket
+        except DuplicateKeyError:
+            existing = self.get_waiting_ticket(user_id)
+            if existing is None:
+                # The waiting ticket was matched or cancelled in between
+                return self.enqueue(user_id, game_id, rating, ttl_seconds)
+            return existing
+
+    def get_ticket(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Get a ticket by ID"""
+        return self.find_by_id(ticket_id)
+
+    def get_waiting_ticket(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the ticket a user is currently waiting with"""
+        return self.find_one({'user_id': user_id, 'status': self.STATUS_WAITING})
+
+    def cancel(self, ticket_id: str, user_id: str) -> bool:
+        """Leave the queue; only waiting tickets can be cancelled"""
+        if not ObjectId.is_valid(ticket_id):
+            return False
+        return self._finish(
+            {'_id': ObjectId(ticket_id), 'user_id': user_id, 'status': self.STATUS_WAITING},
+            self.STATUS_CANCELLED
+        )
+
+    def get_queue(self) -> List[Dict[str, Any]]:
+        """
+        Get every ticket open for pairing, projected to the pairing fields
+
+        Pairing claims whose lease expired are included again.
+        """
+        now = datetime.utcnow()
+        return list(self.collection.find(
+            {
+                '$or': [
+                    {'status': self.STATUS_WAITING, 'expires_at': {'$gt': now}},
+                    {'status': self.STATUS_PAIRING, 'locked_until': {'$lt': now}}
+                ]
+            },
+            self.QUEUE_PROJECTION
+        ))
+
+    def claim_for_pairing(self, ticket_id: ObjectId, worker_id: str,
+                          lease_seconds: float) -> bool:
+        """Atomically take a ticket out of the queue while its challenge is created"""
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {
+                '_id': ticket_id,
+                '$or': [
+                    {'status': self.STATUS_WAITING},
+                    {'status': self.STATUS_PAIRING, 'locked_until': {'$lt': now}}
+                ]
+            },
+            {'$set': {
+                'status': self.STATUS_PAIRING,
+                'worker_id': worker_id,
+                'locked_until': now + timedelta(seconds=lease_seconds)
+            }}
+        )
+        return result.modified_count > 0
+
+    def release(self, ticket_id: ObjectId, error: str = None) -> bool:
+        """Put a claimed ticket back in the queue"""
+        update = {'$set': {'status': self.STATUS_WAITING}, '$unset': {'worker_id': '', 'locked_until': ''}}
+        if error:
+            update['$set']['last_error'] = error
+
+        try:
+            result = self.collection.update_one({'_id': ticket_id, 'status': self.STATUS_PAIRING}, update)
+        except DuplicateKeyError:
+            # The user queued again while this ticket was claimed
+            return self._finish({'_id': ticket_id, 'status': self.STATUS_PAIRING}, self.STATUS_CANCELLED)
+        return result.modified_count > 0
+
+    def mark_matched(self, ticket_id: ObjectId, challenge_id: str, opponent_id: str) -> Optional[Dict[str, Any]]:
+        """Record the challenge a claimed ticket was matched into"""
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {'_id': ticket_id, 'status': self.STATUS_PAIRING},
+            {
+                '$set': {
+                    'status': self.STATUS_MATCHED,
+                    'challenge_id': challenge_id,
+                    'opponent_id': opponent_id,
+                    'matched_at': now,
+                    'purge_at': now + timedelta(seconds=self.RETENTION_SECONDS)
+                },
+                '$unset': {'worker_id': '', 'locked_until': ''}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+    def expire_tickets(self) -> int:
+        """Close waiting tickets that passed their expiry"""
+        now = datetime.utcnow()
+        result = self.collection.update_many(
+            {'status': self.STATUS_WAITING, 'expires_at': {'$lte': now}},
+            {'$set': {
+                'status': self.STATUS_EXPIRED,
+                'finished_at': now,
+                'purge_at': now + timedelta(seconds=self.RETENTION_SECONDS)
+            }}
+        )
+        return result.modified_count
+
+    def get_queue_stats(self) -> Dict[str, int]:
+        """Get waiting ticket counts by game"""
+        pipeline = [
+            {'$match': {'status': self.STATUS_WAITING}},
+            {'$group': {'_id': '$game_id', 'count': {'$sum': 1}}}
+        ]
+        return {row['_id']: row['count'] for row in self.collection.aggregate(pipeline)}
+
+    def _finish(self, filter_dict: Dict[str, Any], status: str) -> bool:
+        now = datetime.utcnow()
+        result = self.collection.update_one(filter_dict, {
+            '$set': {
+                'status': status,
+                'finished_at': now,
+                'purge_at': now + timedelta(seconds=self.RETENTION_SECONDS)
+            },
+            '$unset': {'worker_id': '', 'locked_until': ''}
+        })
+        return result.modified_count > 0
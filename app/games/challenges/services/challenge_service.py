@@ -8,6 +8,7 @@ from ..models.challenge import Challenge
 from ..models.challenge_participant import ChallengeParticipant
 from ..models.challenge_result import ChallengeResult
 from ...repositories.game_repository import GameRepository
+from .matchmaking_pool import matchmaking_pool
 
 class ChallengeService:
     """Service for managing direct challenges between players"""
@@ -352,6 +353,8 @@ class ChallengeService:
             if not success:
                 return False, "FAILED_TO_COMPLETE_PARTICIPATION", None
 
+            matchmaking_pool.record_challenge_result(user_id, score)
+
             # Add result to challenge
             self.challenge_repository.add_challenge_result(challenge_id, user_id, score, performance_data)
 
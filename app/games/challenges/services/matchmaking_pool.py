@@ -0,0 +1,275 @@
+import bisect
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class GamePlayerPool:
+    """
+    Recently active players of one game, kept sorted by rating
+
+    Ratings are held in a sorted list of (rating, user_id) keys, so an
+    opponent search is a bisect followed by a walk outwards from the
+    searcher's rating: O(log n + k) for k candidates.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[float, str]] = []
+        self.ratings: Dict[str, float] = {}
+        self.last_played: Dict[str, datetime] = {}
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def is_stale(self, ttl_seconds: float) -> bool:
+        """Check whether the pool should be rebuilt from the database"""
+        return self.built_at is None or (time.monotonic() - self.built_at) > ttl_seconds
+
+    def rebuild(self, players: Dict[str, Tuple[float, datetime]]):
+        """Replace the pool with {user_id: (rating, last_played)}"""
+        self._keys = sorted((rating, user_id) for user_id, (rating, _) in players.items())
+        self.ratings = {user_id: rating for user_id, (rating, _) in players.items()}
+        self.last_played = {user_id: last_played for user_id, (_, last_played) in players.items()}
+        self.built_at = time.monotonic()
+
+    def upsert(self, user_id: str, rating: float, last_played: Optional[datetime] = None):
+        """Insert a player or move them to a new rating"""
+        previous = self.ratings.get(user_id)
+        if previous is not None:
+            del self._keys[bisect.bisect_left(self._keys, (previous, user_id))]
+        bisect.insort(self._keys, (rating, user_id))
+        self.ratings[user_id] = rating
+
+        if last_played is not None:
+            known = self.last_played.get(user_id)
+            self.last_played[user_id] = max(known, last_played) if known else last_played
+
+    def nearest(self, rating: float, k: int, max_distance: float,
+                exclude: set, active_since: datetime) -> List[str]:
+        """
+        Get up to k players closest to a rating, closest first.
+
+        Args:
+            rating: Rating to search around
+            k: Maximum number of players
+            max_distance: Largest rating difference accepted
+            exclude: User IDs to skip
+            active_since: Skip players whose last game is older than this
+        """
+        right = bisect.bisect_left(self._keys, (rating, ""))
+        left = right - 1
+        found = []
+
+        while len(found) < k and (left >= 0 or right < len(self._keys)):
+            left_distance = rating - self._keys[left][0] if left >= 0 else math.inf
+            right_distance = self._keys[right][0] - rating if right < len(self._keys) else math.inf
+            if min(left_distance, right_distance) > max_distance:
+                break
+
+            if left_distance <= right_distance:
+                user_id = self._keys[left][1]
+                left -= 1
+            else:
+                user_id = self._keys[right][1]
+                right += 1
+
+            if user_id not in exclude and self.last_played.get(user_id, active_since) >= active_since:
+                found.append(user_id)
+
+        return found
+
+
+class MatchmakingPool:
+    """
+    Per-worker matchmaking index: one GamePlayerPool per game
+
+    A game's pool holds everyone who played it in the last ACTIVE_DAYS,
+    rated by their average challenge score over STATS_DAYS (the rating
+    get_user_challenge_stats reports). It is built with two aggregations
+    on first use and rebuilt after POOL_TTL_SECONDS; in between, ended
+    sessions and completed challenge participations recorded in this
+    worker update it in place. Win rates refresh on rebuild only, since
+    wins are decided when the whole challenge completes.
+    """
+
+    POOL_TTL_SECONDS = int(os.getenv('MATCHMAKING_POOL_TTL_SECONDS', '300'))
+    ACTIVE_DAYS = 7
+    STATS_DAYS = 30
+
+    # Users per $in batch when loading challenge counters
+    STATS_BATCH_SIZE = 1000
+
+    def __init__(self, session_repository=None, participant_repository=None):
+        """
+        Initialize MatchmakingPool
+
+        Args:
+            session_repository: Repository used to find a game's recent players
+            participant_repository: Repository used to load challenge counters
+        """
+        self._session_repository = session_repository
+        self._participant_repository = participant_repository
+        self._games: Dict[str, GamePlayerPool] = {}
+        self._user_stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def session_repository(self):
+        """Session repository, created on first use once the database is available"""
+        if self._session_repository is None:
+            from ...repositories.game_session_repository import GameSessionRepository
+            self._session_repository = GameSessionRepository()
+        return self._session_repository
+
+    @property
+    def participant_repository(self):
+        """Participant repository, created on first use once the database is available"""
+        if self._participant_repository is None:
+            from ..repositories.challenge_participant_repository import ChallengeParticipantRepository
+            self._participant_repository = ChallengeParticipantRepository()
+        return self._participant_repository
+
+    def find_opponents(self, user_id: str, game_id: str, skill_range: float = 100,
+                       limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find recently active players of a game with the closest ratings.
+
+        Args:
+            user_id: User looking for opponents
+            game_id: Game to play
+            skill_range: Largest rating difference accepted
+            limit: Maximum number of opponents
+
+        Returns:
+            List[Dict[str, Any]]: Opponents, closest rating first
+        """
+        pool = self._get_game_pool(game_id)
+        rating = self.get_user_rating(user_id)
+        active_since = datetime.utcnow() - timedelta(days=self.ACTIVE_DAYS)
+
+        with self._lock:
+            candidates = pool.nearest(rating, limit, skill_range, {user_id}, active_since)
+            opponents = [
+                self._describe(candidate, pool.ratings[candidate], rating, pool.last_played.get(candidate))
+                for candidate in candidates
+            ]
+
+        opponents.sort(key=lambda opponent: (opponent["skill_difference"], opponent["games_played"]))
+        return opponents
+
+    def get_user_rating(self, user_id: str) -> float:
+        """Get a user's matchmaking rating, from the cache while it is fresh"""
+        return self._rating(self._get_user_stats(user_id))
+
+    def record_session(self, game_id: str, user_id: str, played_at: Optional[datetime] = None):
+        """Add or refresh a player in a game's pool after a session"""
+        with self._lock:
+            pool = self._games.get(game_id)
+            if pool is None or pool.built_at is None:
+                return
+
+        stats = self._get_user_stats(user_id)
+        with self._lock:
+            pool.upsert(user_id, self._rating(stats), played_at or datetime.utcnow())
+
+    def record_challenge_result(self, user_id: str, score: Optional[float]):
+        """Apply a completed challenge participation to a user's rating in every pool"""
+        with self._lock:
+            stats = self._user_stats.get(user_id)
+            if stats is None:
+                return
+
+            # The participation was already counted in total_challenges when it was joined
+            stats["completed_challenges"] += 1
+            if score is not None:
+                stats["score_total"] += score
+                stats["scored_challenges"] += 1
+
+            rating = self._rating(stats)
+            for pool in self._games.values():
+                if user_id in pool.ratings:
+                    pool.upsert(user_id, rating)
+
+    def invalidate(self, game_id: Optional[str] = None):
+        """Drop one game's pool, or all pools and cached ratings"""
+        with self._lock:
+            if game_id is None:
+                self._games.clear()
+                self._user_stats.clear()
+            else:
+                self._games.pop(game_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool sizes per game"""
+        with self._lock:
+            return {
+                "games": {game_id: len(pool) for game_id, pool in self._games.items()},
+                "rated_users": len(self._user_stats)
+            }
+
+    def _get_game_pool(self, game_id: str) -> GamePlayerPool:
+        with self._lock:
+            pool = self._games.setdefault(game_id, GamePlayerPool())
+            if not pool.is_stale(self.POOL_TTL_SECONDS):
+                return pool
+
+        players = self.session_repository.get_recent_players_by_game(game_id, self.ACTIVE_DAYS)
+        stats = self._load_user_stats(list(players))
+
+        with self._lock:
+            pool.rebuild({
+                player_id: (self._rating(stats[player_id]), last_played)
+                for player_id, last_played in players.items()
+            })
+        return pool
+
+    def _get_user_stats(self, user_id: str) -> Dict[str, Any]:
+        with self._lock:
+            stats = self._user_stats.get(user_id)
+        if stats is not None and time.monotonic() - stats["loaded_at"] <= self.POOL_TTL_SECONDS:
+            return stats
+        return self._load_user_stats([user_id])[user_id]
+
+    def _load_user_stats(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Load challenge counters in batches and cache them (users without any get zeros)"""
+        loaded = {}
+        for start in range(0, len(user_ids), self.STATS_BATCH_SIZE):
+            batch = user_ids[start:start + self.STATS_BATCH_SIZE]
+            totals = self.participant_repository.get_users_challenge_totals(batch, self.STATS_DAYS)
+            for user_id in batch:
+                loaded[user_id] = {
+                    "total_challenges": 0, "completed_challenges": 0, "won_challenges": 0,
+                    "score_total": 0, "scored_challenges": 0,
+                    **totals.get(user_id, {}),
+                    "loaded_at": time.monotonic()
+                }
+
+        with self._lock:
+            self._user_stats.update(loaded)
+        return loaded
+
+    def _describe(self, user_id: str, rating: float, searcher_rating: float,
+                  last_played: Optional[datetime]) -> Dict[str, Any]:
+        stats = self._user_stats.get(user_id, {})
+        completed = stats.get("completed_challenges", 0)
+        return {
+            "user_id": user_id,
+            "skill_level": rating,
+            "skill_difference": abs(rating - searcher_rating),
+            "last_played": last_played.isoformat() if last_played else None,
+            "games_played": stats.get("total_challenges", 0),
+            "win_rate": (stats.get("won_challenges", 0) / completed * 100) if completed > 0 else 0
+        }
+
+    @staticmethod
+    def _rating(stats: Dict[str, Any]) -> float:
+        scored = stats.get("scored_challenges", 0)
+        return stats.get("score_total", 0) / scored if scored else 0
+
+
+# Shared by every matchmaking service in this worker
+matchmaking_pool = MatchmakingPool()
@@ -1,23 +1,32 @@
 from typing import Tuple, Optional, Dict, Any, List
 from flask import current_app
 from datetime import datetime, timedelta
+import os
 import random
 
 from ..repositories.challenge_repository import ChallengeRepository
 from ..repositories.challenge_participant_repository import ChallengeParticipantRepository
+from ..repositories.matchmaking_ticket_repository import MatchmakingTicketRepository
 from ..models.challenge import Challenge
 from ..models.challenge_participant import ChallengeParticipant
 from ...repositories.game_repository import GameRepository
 from ...repositories.game_session_repository import GameSessionRepository
+from .matchmaking_pool import matchmaking_pool
+from .matchmaking_worker import MatchmakingWorker
 
 class MatchmakingService:
     """Service for automatic matchmaking and opponent finding"""
 
+    # Seconds a quick match ticket waits for a pair before it expires
+    TICKET_TTL_SECONDS = int(os.getenv('MATCHMAKING_TICKET_TTL_SECONDS', '300'))
+
     def __init__(self):
         self.challenge_repository = ChallengeRepository()
         self.participant_repository = ChallengeParticipantRepository()
         self.game_repository = GameRepository()
         self.session_repository = GameSessionRepository()
+        self.ticket_repository = MatchmakingTicketRepository()
+        self.matchmaking_pool = matchmaking_pool
 
     def find_opponent(self, user_id: str, game_id: str, challenge_type: str = "1v1",
                      skill_range: int = 100) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
@@ -111,7 +120,11 @@ class MatchmakingService:
 
     def find_quick_match(self, user_id: str, game_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
-        Find a quick match - either join existing or create new public challenge.
+        Join the quick match queue of a game.
+
+        The matchmaking worker pairs queued players by rating on every tick
+        and creates their 1v1 challenge; poll the returned ticket with
+        get_quick_match_ticket to learn when that happened.
 
         Args:
             user_id: User ID looking for quick match
@@ -121,50 +134,80 @@ class MatchmakingService:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            # Look for public challenges that need players
-            public_challenges = self.challenge_repository.get_public_challenges(game_id, "pending", 10)
-
-            # Filter challenges that have space and aren't expired
-            available_challenges = []
-            for challenge in public_challenges:
-                if (not challenge.is_expired() and
-                    len(challenge.get_all_participant_ids()) < challenge.max_participants and
-                    not challenge.is_participant(user_id)):
-                    available_challenges.append(challenge)
-
-            if available_challenges:
-                # Join the challenge that's closest to starting
-                best_challenge = max(available_challenges,
-                                   key=lambda c: len(c.get_all_participant_ids()))
+            game = self.game_repository.get_game_by_id(game_id)
+            if not game:
+                return False, "GAME_NOT_FOUND", None
 
-                from .challenge_service import ChallengeService
-                challenge_service = ChallengeService()
-                success, message, data = challenge_service.join_public_challenge(user_id, best_challenge.challenge_id)
+            if not game.is_active:
+                return False, "GAME_NOT_ACTIVE", None
 
-                if success:
-                    return True, "QUICK_MATCH_JOINED", data
-
-            # Create new public challenge if none available
-            from .challenge_service import ChallengeService
-            challenge_service = ChallengeService()
-            success, message, data = challenge_service.create_nvn_challenge(
-                challenger_id=user_id,
-                max_participants=4,
-                game_id=game_id,
-                min_participants=2,
-                timeout_minutes=10,
-                game_config={"quick_match": True}
-            )
+            if game.max_players < 2:
+                return False, "GAME_DOES_NOT_SUPPORT_MULTIPLAYER", None
 
-            if success:
-                return True, "QUICK_MATCH_CREATED", data
+            rating = self.matchmaking_pool.get_user_rating(user_id)
+            ticket = self.ticket_repository.enqueue(user_id, game_id, rating, self.TICKET_TTL_SECONDS)
 
-            return False, "QUICK_MATCH_FAILED", None
+            if ticket["game_id"] != game_id:
+                return False, "ALREADY_IN_MATCHMAKING_QUEUE", {"ticket": self._ticket_to_api(ticket)}
+
+            return True, "QUICK_MATCH_QUEUED", {"ticket": self._ticket_to_api(ticket)}
 
         except Exception as e:
             current_app.logger.error(f"Quick match failed for user {user_id}: {str(e)}")
             return False, "QUICK_MATCH_FAILED", None
 
+    def get_quick_match_ticket(self, user_id: str, ticket_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Get the state of a quick match ticket.
+
+        Answers at once with one read; while the ticket is still queued the
+        data carries retry_after_seconds, the matchmaking tick, as the
+        delay before polling again.
+
+        Args:
+            user_id: Owner of the ticket
+            ticket_id: Ticket ID returned by find_quick_match
+
+        Returns:
+            Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
+        """
+        try:
+            ticket = self.ticket_repository.get_ticket(ticket_id)
+            if not ticket or ticket["user_id"] != user_id:
+                return False, "MATCHMAKING_TICKET_NOT_FOUND", None
+
+            queued = ticket["status"] in (self.ticket_repository.STATUS_WAITING,
+                                          self.ticket_repository.STATUS_PAIRING)
+            return True, "MATCHMAKING_TICKET_RETRIEVED", {
+                "ticket": self._ticket_to_api(ticket),
+                "retry_after_seconds": MatchmakingWorker.TICK_SECONDS if queued else None
+            }
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to get matchmaking ticket {ticket_id}: {str(e)}")
+            return False, "FAILED_TO_GET_MATCHMAKING_TICKET", None
+
+    def cancel_quick_match(self, user_id: str, ticket_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Leave the quick match queue.
+
+        Args:
+            user_id: Owner of the ticket
+            ticket_id: Ticket ID returned by find_quick_match
+
+        Returns:
+            Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
+        """
+        try:
+            if not self.ticket_repository.cancel(ticket_id, user_id):
+                return False, "MATCHMAKING_TICKET_NOT_CANCELLABLE", None
+
+            return True, "QUICK_MATCH_CANCELLED", None
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to cancel matchmaking ticket {ticket_id}: {str(e)}")
+            return False, "FAILED_TO_CANCEL_QUICK_MATCH", None
+
     def get_recommended_opponents(self, user_id: str, game_id: str, limit: int = 10) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
         Get recommended opponents for a user.
@@ -230,44 +273,30 @@ class MatchmakingService:
             return False, "FAILED_TO_GET_STATISTICS", None
 
     def _find_potential_opponents(self, user_id: str, game_id: str, skill_range: int = 100, limit: int = 10) -> List[Dict[str, Any]]:
-        """Find potential opponents based on skill level and activity"""
+        """Find the recently active players of a game closest to the user's skill level"""
         try:
-            # Get user's skill level (simplified - could be based on ELO rating)
-            user_stats = self.participant_repository.get_user_challenge_stats(user_id)
-            user_skill = user_stats.get("average_score", 0)
-
-            # Find users who have played this game recently
-            recent_sessions = self.session_repository.get_recent_sessions_by_game(game_id, days=7, limit=100)
-
-            potential_opponents = []
-            for session in recent_sessions:
-                if session.user_id == user_id:
-                    continue
-
-                # Get opponent stats
-                opponent_stats = self.participant_repository.get_user_challenge_stats(session.user_id)
-                opponent_skill = opponent_stats.get("average_score", 0)
-
-                # Check skill range
-                if abs(opponent_skill - user_skill) <= skill_range:
-                    potential_opponents.append({
-                        "user_id": session.user_id,
-                        "skill_level": opponent_skill,
-                        "skill_difference": abs(opponent_skill - user_skill),
-                        "last_played": session.created_at.isoformat(),
-                        "games_played": opponent_stats.get("total_challenges", 0),
-                        "win_rate": opponent_stats.get("win_rate", 0)
-                    })
-
-            # Sort by skill similarity and recent activity
-            potential_opponents.sort(key=lambda x: (x["skill_difference"], x["games_played"]))
-
-            return potential_opponents[:limit]
+            return self.matchmaking_pool.find_opponents(user_id, game_id, skill_range, limit)
 
         except Exception as e:
             current_app.logger.error(f"Failed to find potential opponents: {str(e)}")
             return []
 
+    def _ticket_to_api(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a matchmaking ticket to a dictionary for API responses"""
+        now = datetime.utcnow()
+        waiting = ticket["status"] == self.ticket_repository.STATUS_WAITING
+        return {
+            "ticket_id": str(ticket["_id"]),
+            "game_id": ticket["game_id"],
+            "status": ticket["status"],
+            "enqueued_at": ticket["enqueued_at"].isoformat(),
+            "expires_at": ticket["expires_at"].isoformat(),
+            "wait_seconds": ((ticket.get("matched_at") or ticket.get("finished_at") or now) - ticket["enqueued_at"]).total_seconds(),
+            "search_window": MatchmakingWorker.search_window(ticket, now) if waiting else None,
+            "challenge_id": ticket.get("challenge_id"),
+            "opponent_id": ticket.get("opponent_id")
+        }
+
     def _calculate_compatibility_score(self, user1_id: str, user2_id: str, game_id: str) -> float:
         """Calculate compatibility score between two users"""
         try:
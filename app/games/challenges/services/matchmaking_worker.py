@@ -0,0 +1,238 @@
+"""
+Matchmaking worker
+
+Runs the quick match pairing tick: reads the waiting queue filled by
+MatchmakingService.find_quick_match once per tick, pairs tickets of the
+same game whose ratings fall in each other's search window, and creates
+a 1v1 challenge for every pair.
+
+Usage:
+    python -m app.games.challenges.services.matchmaking_worker --tick-seconds 1
+"""
+
+import argparse
+import math
+import os
+import signal
+import socket
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+from ..repositories.matchmaking_ticket_repository import MatchmakingTicketRepository
+from .challenge_service import ChallengeService
+
+
+class MatchmakingWorker:
+    """
+    Pairing loop over the quick match queue
+
+    A ticket's search window starts at BASE_WINDOW rating points and
+    widens by WINDOW_GROWTH_PER_SECOND while it waits, up to MAX_WINDOW.
+    Two tickets pair when their rating difference is inside both windows;
+    the longest waiting tickets pick their opponents first. Pairs are
+    claimed atomically, so a second worker process is safe, but one is
+    enough and pairs better.
+    """
+
+    TICK_SECONDS = float(os.getenv('MATCHMAKING_TICK_SECONDS', '1.0'))
+    BASE_WINDOW = float(os.getenv('MATCHMAKING_BASE_WINDOW', '50'))
+    WINDOW_GROWTH_PER_SECOND = float(os.getenv('MATCHMAKING_WINDOW_GROWTH_PER_SECOND', '5'))
+    MAX_WINDOW = float(os.getenv('MATCHMAKING_MAX_WINDOW', '1000'))
+
+    # Seconds a claimed pair stays out of the queue before another tick may retry it
+    LEASE_SECONDS = 60
+    CHALLENGE_TIMEOUT_MINUTES = 10
+
+    def __init__(self, app, tick_seconds: float = None):
+        """
+        Initialize MatchmakingWorker
+
+        Args:
+            app: Flask application providing config, database and logger
+            tick_seconds: Seconds between pairing ticks
+        """
+        self.app = app
+        self.tick_seconds = tick_seconds or self.TICK_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stop_event = threading.Event()
+        self.stats = {'ticks': 0, 'matched': 0, 'failed': 0, 'expired': 0}
+
+        with app.app_context():
+            self.ticket_repo = MatchmakingTicketRepository()
+            self.challenge_service = ChallengeService()
+
+    @classmethod
+    def search_window(cls, ticket: Dict[str, Any], now: datetime) -> float:
+        """Rating difference a ticket accepts after waiting until now"""
+        waited = max(0.0, (now - ticket['enqueued_at']).total_seconds())
+        return min(cls.MAX_WINDOW, cls.BASE_WINDOW + cls.WINDOW_GROWTH_PER_SECOND * waited)
+
+    @classmethod
+    def pair_tickets(cls, tickets: List[Dict[str, Any]],
+                     now: datetime) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Pair the waiting tickets of one game
+
+        Tickets are sorted by rating and linked to their unpaired
+        neighbours, so each ticket walks outwards from its own rating and
+        stops at the edge of its window: O(n log n) for the sort plus the
+        candidates inside each window.
+
+        Returns:
+            List[Tuple]: (older ticket, opponent ticket) pairs
+        """
+        ordered = sorted(tickets, key=lambda ticket: (ticket['rating'], ticket['enqueued_at']))
+        count = len(ordered)
+        windows = [cls.search_window(ticket, now) for ticket in ordered]
+        previous = list(range(-1, count - 1))
+        following = list(range(1, count + 1))
+        paired = [False] * count
+        pairs = []
+
+        for index in sorted(range(count), key=lambda i: ordered[i]['enqueued_at']):
+            if paired[index]:
+                continue
+
+            rating = ordered[index]['rating']
+            left, right = previous[index], following[index]
+            match = None
+
+            while match is None:
+                left_distance = rating - ordered[left]['rating'] if left >= 0 else math.inf
+                right_distance = ordered[right]['rating'] - rating if right < count else math.inf
+                distance = min(left_distance, right_distance)
+                if distance > windows[index]:
+                    break
+
+                if left_distance <= right_distance:
+                    candidate, left = left, previous[left]
+                else:
+                    candidate, right = right, following[right]
+
+                if distance <= windows[candidate] and ordered[candidate]['user_id'] != ordered[index]['user_id']:
+                    match = candidate
+
+            if match is None:
+                continue
+
+            pairs.append((ordered[index], ordered[match]))
+            for position in (index, match):
+                paired[position] = True
+                if previous[position] >= 0:
+                    following[previous[position]] = following[position]
+                if following[position] < count:
+                    previous[following[position]] = previous[position]
+
+        return pairs
+
+    def run(self):
+        """Run pairing ticks until stopped"""
+        self.app.logger.info(f"Matchmaking worker {self.worker_id} starting, tick every {self.tick_seconds}s")
+
+        with self.app.app_context():
+            while not self._stop_event.is_set():
+                try:
+                    self.tick()
+                except Exception as e:
+                    self.app.logger.error(f"Error in matchmaking worker loop: {str(e)}")
+                self._stop_event.wait(self.tick_seconds)
+
+        self.app.logger.info(f"Matchmaking worker {self.worker_id} stopped: {self.stats}")
+
+    def stop(self, *_args):
+        """Ask the loop to exit after the current tick"""
+        self._stop_event.set()
+
+    def tick(self) -> int:
+        """
+        Expire old tickets and pair the rest of the queue once
+
+        Returns:
+            int: Number of pairs matched
+        """
+        self.stats['expired'] += self.ticket_repo.expire_tickets()
+
+        queues = defaultdict(list)
+        for ticket in self.ticket_repo.get_queue():
+            queues[ticket['game_id']].append(ticket)
+
+        now = datetime.utcnow()
+        matched = 0
+        for game_id, tickets in queues.items():
+            for ticket, opponent_ticket in self.pair_tickets(tickets, now):
+                if self._create_match(game_id, ticket, opponent_ticket):
+                    matched += 1
+
+        self.stats['ticks'] += 1
+        self.stats['matched'] += matched
+        return matched
+
+    # Private methods
+
+    def _create_match(self, game_id: str, ticket: Dict[str, Any], opponent_ticket: Dict[str, Any]) -> bool:
+        """Claim both tickets and create their challenge; returns False if the pair fell through"""
+        if not self.ticket_repo.claim_for_pairing(ticket['_id'], self.worker_id, self.LEASE_SECONDS):
+            return False
+        if not self.ticket_repo.claim_for_pairing(opponent_ticket['_id'], self.worker_id, self.LEASE_SECONDS):
+            # Cancelled or taken since the queue was read
+            self.ticket_repo.release(ticket['_id'])
+            return False
+
+        challenger_id, challenged_id = ticket['user_id'], opponent_ticket['user_id']
+        success, message, data = self.challenge_service.create_1v1_challenge(
+            challenger_id=challenger_id,
+            challenged_id=challenged_id,
+            game_id=game_id,
+            timeout_minutes=self.CHALLENGE_TIMEOUT_MINUTES,
+            game_config={"matchmaking": True, "quick_match": True}
+        )
+
+        if success:
+            challenge_id = data["challenge_id"]
+            # Both players asked for a match, so the invitation is accepted for them
+            self.challenge_service.accept_challenge_invitation(challenged_id, challenge_id)
+        elif message == "ACTIVE_CHALLENGE_EXISTS":
+            challenge_id = data["existing_challenge"]["challenge_id"]
+        else:
+            self.app.logger.warning(f"Matchmaking: failed to create challenge for {challenger_id} and {challenged_id}: {message}")
+            self.ticket_repo.release(ticket['_id'], message)
+            self.ticket_repo.release(opponent_ticket['_id'], message)
+            self.stats['failed'] += 1
+            return False
+
+        self.ticket_repo.mark_matched(ticket['_id'], challenge_id, challenged_id)
+        self.ticket_repo.mark_matched(opponent_ticket['_id'], challenge_id, challenger_id)
+        self.app.logger.info(f"Matchmaking: paired {challenger_id} with {challenged_id} in challenge {challenge_id}")
+        return True
+
+
+def main(argv=None):
+    """CLI entry point for the matchmaking worker"""
+    parser = argparse.ArgumentParser(description="Pair quick match tickets")
+    parser.add_argument('--tick-seconds', type=float, default=None,
+                        help="Seconds between pairing ticks")
+    parser.add_argument('--once', action='store_true',
+                        help="Run a single pairing tick and exit")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    worker = MatchmakingWorker(app, tick_seconds=args.tick_seconds)
+
+    if args.once:
+        with app.app_context():
+            matched = worker.tick()
+        app.logger.info(f"Matched {matched} quick match pairs")
+        return
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,6 @@ from app.core.utils.responses import success_response, error_response
 from ..services.game_service import GameService
 from ..services.game_session_service import GameSessionService
 from ..services.state_synchronizer import StateSynchronizer
-from app.social.leaderboards.integration.hooks import trigger_game_session_complete
 
 games_bp = Blueprint('games', __name__, url_prefix='/api/games')
 
@@ -280,21 +279,10 @@ def end_game_session(current_user, session_id):
         if session_data['session']['user_id'] != user_id:
             return error_response("SESSION_ACCESS_DENIED", status_code=403)
 
+        # Impact score and other consumers are updated from the session's completion event
         success, message, result = session_service.end_game_session(session_id, reason)
 
         if success:
-            # Trigger Impact Score update via hook
-            try:
-                session_data = result.get('session', {}) if result else {}
-                if session_data.get('user_id'):
-                    trigger_game_session_complete(
-                        str(session_data['user_id']),
-                        session_data
-                    )
-            except Exception as e:
-                # Log but don't fail the main operation
-                current_app.logger.warning(f"Failed to trigger impact score update: {str(e)}")
-
             return success_response(message, result)
         else:
             return error_response(message)
@@ -358,6 +346,77 @@ def validate_move(current_user, session_id):
     except Exception as e:
         return error_response("INTERNAL_SERVER_ERROR", status_code=500)
 
+@games_bp.route('/sessions/<session_id>/moves/batch', methods=['POST'])
+@auth_required
+def validate_moves(current_user, session_id):
+    """Validate and record an ordered batch of moves in a game session"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('moves'), list) or not data['moves']:
+            return error_response("MOVES_DATA_REQUIRED")
+
+        if not all(isinstance(move, dict) for move in data['moves']):
+            return error_response("INVALID_MOVE_DATA")
+
+        # First check if user owns this session
+        success, message, session_data = session_service.get_session_by_id(session_id)
+        if not success:
+            return error_response(message, status_code=404 if message == "SESSION_NOT_FOUND" else 400)
+
+        user_id = str(current_user['_id'])
+        if session_data['session']['user_id'] != user_id:
+            return error_response("SESSION_ACCESS_DENIED", status_code=403)
+
+        success, message, result = session_service.validate_moves(session_id, data['moves'])
+
+        if success:
+            return success_response(message, result)
+        else:
+            return error_response(message)
+
+    except Exception as e:
+        return error_response("INTERNAL_SERVER_ERROR", status_code=500)
+
+@games_bp.route('/sessions/<session_id>/moves', methods=['GET'])
+@auth_required
+def get_session_moves(current_user, session_id):
+    """Get a session's moves in order for replay"""
+    try:
+        try:
+            from_move = int(request.args.get('from_move', 1))
+        except ValueError:
+            return error_response("INVALID_MOVE_NUMBER")
+
+        try:
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return error_response("INVALID_LIMIT_VALUE")
+
+        if from_move < 1:
+            return error_response("INVALID_MOVE_NUMBER")
+
+        if limit < 1 or limit > 500:
+            return error_response("INVALID_LIMIT_VALUE")
+
+        # First check if user owns this session
+        success, message, session_data = session_service.get_session_by_id(session_id)
+        if not success:
+            return error_response(message, status_code=404 if message == "SESSION_NOT_FOUND" else 400)
+
+        user_id = str(current_user['_id'])
+        if session_data['session']['user_id'] != user_id:
+            return error_response("SESSION_ACCESS_DENIED", status_code=403)
+
+        success, message, result = session_service.get_session_moves(session_id, from_move, limit)
+
+        if success:
+            return success_response(message, result)
+        else:
+            return error_response(message)
+
+    except Exception as e:
+        return error_response("INTERNAL_SERVER_ERROR", status_code=500)
+
 @games_bp.route('/sessions/<session_id>/pause', methods=['PUT'])
 @auth_required
 def pause_session(current_user, session_id):
@@ -607,7 +666,7 @@ def get_active_sessions(current_user):
         all_sessions = data_active.get('sessions', []) + data_paused.get('sessions', [])
 
         # Sort by last activity
-        all_sessions.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
+        all_sessions.sort(key=lambda x: x.get('updated_at') or '', reverse=True)
 
         result = {
             "active_sessions": data_active.get('sessions', []),
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -111,6 +111,22 @@ class GamePlugin(ABC):
         """
         pass
 
+    def validate_moves(self, session_id: str, moves: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Validate an ordered batch of moves within a game session.
+
+        Plugins can override this to validate a batch in one pass; the
+        default checks each move with validate_move.
+
+        Args:
+            session_id: The ID of the active session
+            moves: The moves to validate, in order
+
+        Returns:
+            List[bool]: One verdict per move, in the same order
+        """
+        return [self.validate_move(session_id, move) for move in moves]
+
     @abstractmethod
     def get_session_state(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -138,6 +154,14 @@ class GamePlugin(ABC):
         """
         pass
 
+    def shutdown(self) -> None:
+        """
+        Release resources held by the plugin.
+
+        Called when the plugin is unregistered or replaced; the default does nothing.
+        """
+        pass
+
     def get_plugin_info(self) -> Dict[str, Any]:
         """
         Get basic information about this plugin.
@@ -10,9 +10,18 @@ from flask import current_app
 
 from .plugin_registry import plugin_registry, PluginRegistry
 from .game_plugin import GamePlugin
+from .plugin_sandbox import SandboxedPlugin
 
 class PluginManager:
-    """Manages plugin lifecycle: install, uninstall, update, discovery"""
+    """
+    Manages plugin lifecycle: install, uninstall, update, discovery
+
+    PLUGIN_EXECUTION_MODE selects where plugin code runs: "inprocess"
+    (default) imports it into the web worker, "subprocess" hosts it in a
+    pool of sandboxed worker processes (see plugin_sandbox).
+    """
+
+    EXECUTION_MODE = os.getenv('PLUGIN_EXECUTION_MODE', 'inprocess')
 
     def __init__(self, registry: PluginRegistry = None):
         self.registry = registry or plugin_registry
@@ -356,6 +365,12 @@ class PluginManager:
             # Construct module path
             module_path = f"app.games.plugins.{plugin_id}.{manifest.get('main_module', 'main')}"
 
+            if self.EXECUTION_MODE == 'subprocess':
+                return self.registry.register_plugin(plugin_id, SandboxedPlugin.for_module(module_path, plugin_id), {
+                    "module_path": module_path,
+                    "execution_mode": "subprocess"
+                })
+
             return self.registry.load_plugin_from_module(module_path, plugin_id)
 
         except Exception as e:
@@ -1,17 +1,80 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from contextlib import contextmanager
 from datetime import datetime
+import bisect
 import importlib
 import inspect
+import threading
+import time
 from flask import current_app
 
 from .game_plugin import GamePlugin
 
+class LatencyHistogram:
+    """Fixed-bucket histogram of call latencies in milliseconds"""
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms: float) -> None:
+        """Record one call duration"""
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of calls (max for the overflow bucket)"""
+        if not self.count:
+            return None
+
+        threshold = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= threshold:
+                return float(self.BUCKETS_MS[index]) if index < len(self.BUCKETS_MS) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the histogram to a dictionary for API responses"""
+        buckets = {f"le_{bound}ms": count for bound, count in zip(self.BUCKETS_MS, self.bucket_counts)}
+        buckets["overflow"] = self.bucket_counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets
+        }
+
+
 class PluginRegistry:
-    """Registry for managing game plugins"""
+    """
+    Registry for managing game plugins
+
+    Each plugin is kept as one instance, initialized when it is registered,
+    so lookups never construct or initialize plugins. The instance holds the
+    plugin's in-memory session state and is shared by every request. The
+    game -> plugin mapping is cached and dropped whenever the plugin is
+    registered again or unregistered (install, update, uninstall).
+    """
 
     def __init__(self):
         self._plugins: Dict[str, GamePlugin] = {}
         self._plugin_metadata: Dict[str, Dict[str, Any]] = {}
+        self._game_plugins: Dict[str, Optional[str]] = {}
+        self._latency: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
 
     def register_plugin(self, plugin_id: str, plugin_class: type, metadata: Dict[str, Any] = None) -> bool:
         """
@@ -39,14 +102,23 @@ class PluginRegistry:
             validation_result = plugin_instance.validate_plugin()
             if not validation_result["is_valid"]:
                 current_app.logger.error(f"Plugin {plugin_id} validation failed: {validation_result['errors']}")
+                plugin_instance.shutdown()
                 return False
 
             # Initialize plugin
             if not plugin_instance.initialize():
                 current_app.logger.error(f"Plugin {plugin_id} initialization failed")
+                plugin_instance.shutdown()
                 return False
 
-            self._plugins[plugin_id] = plugin_instance
+            with self._lock:
+                previous_instance = self._plugins.get(plugin_id)
+                self._plugins[plugin_id] = plugin_instance
+                self._latency.pop(plugin_id, None)
+                self._forget_games_of(plugin_id)
+
+            if previous_instance is not None:
+                previous_instance.shutdown()
 
             # Store metadata
             self._plugin_metadata[plugin_id] = {
@@ -81,8 +153,11 @@ class PluginRegistry:
                 current_app.logger.warning(f"Plugin {plugin_id} not found in registry")
                 return False
 
-            del self._plugins[plugin_id]
-            del self._plugin_metadata[plugin_id]
+            with self._lock:
+                plugin_instance = self._plugins.pop(plugin_id)
+                self._forget_games_of(plugin_id)
+            self._plugin_metadata.pop(plugin_id, None)
+            plugin_instance.shutdown()
 
             current_app.logger.info(f"Plugin {plugin_id} unregistered successfully")
             return True
@@ -103,6 +178,74 @@ class PluginRegistry:
         """
         return self._plugins.get(plugin_id)
 
+    def resolve_game_plugin(self, game_id: str,
+                            load_game: Callable[[str], Any]) -> Tuple[bool, Optional[str]]:
+        """
+        Get the plugin ID of a game, loading the game only on a mapping cache miss.
+
+        Args:
+            game_id: The game ID
+            load_game: Loads the game (with a plugin_id attribute) or returns None
+
+        Returns:
+            Tuple[bool, Optional[str]]: (game_found, plugin_id)
+        """
+        if game_id in self._game_plugins:
+            return True, self._game_plugins[game_id]
+
+        game = load_game(game_id)
+        if not game:
+            return False, None
+
+        plugin_id = game.plugin_id or None
+        with self._lock:
+            # Only cache mappings to registered plugins, so a later install is picked up
+            if plugin_id is None or plugin_id in self._plugins:
+                self._game_plugins[game_id] = plugin_id
+
+        return True, plugin_id
+
+    def invalidate_game(self, game_id: str) -> None:
+        """Drop the cached plugin mapping of a game (e.g. after deleting it)"""
+        with self._lock:
+            self._game_plugins.pop(game_id, None)
+
+    @contextmanager
+    def measure(self, plugin_id: str, operation: str):
+        """Record the duration of a plugin call in the plugin's latency histogram"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                histogram = self._latency.setdefault(plugin_id, {}).setdefault(operation, LatencyHistogram())
+            histogram.observe(elapsed_ms)
+
+    def get_plugin_latency(self, plugin_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get latency histograms per plugin and operation.
+
+        Args:
+            plugin_id: Optional plugin to restrict the result to
+
+        Returns:
+            Dict[str, Any]: {plugin_id: {operation: histogram}}
+        """
+        with self._lock:
+            latency = {key: dict(operations) for key, operations in self._latency.items()
+                       if plugin_id is None or key == plugin_id}
+
+        return {
+            key: {operation: histogram.to_dict() for operation, histogram in operations.items()}
+            for key, operations in latency.items()
+        }
+
+    def _forget_games_of(self, plugin_id: str) -> None:
+        """Drop cached game mappings pointing at a plugin (caller holds the lock)"""
+        for game_id in [game_id for game_id, mapped in self._game_plugins.items() if mapped == plugin_id]:
+            del self._game_plugins[game_id]
+
     def get_plugin_metadata(self, plugin_id: str) -> Optional[Dict[str, Any]]:
         """
         Get plugin metadata by ID.
@@ -226,7 +369,9 @@ class PluginRegistry:
             "active_plugins": active_plugins,
             "inactive_plugins": total_plugins - active_plugins,
             "categories": list(categories),
-            "category_count": len(categories)
+            "category_count": len(categories),
+            "cached_game_mappings": len(self._game_plugins),
+            "latency": self.get_plugin_latency()
         }
 
     def load_plugin_from_module(self, module_path: str, plugin_id: str = None) -> bool:
@@ -242,14 +387,7 @@ class PluginRegistry:
         """
         try:
             module = importlib.import_module(module_path)
-
-            # Find GamePlugin subclasses in the module
-            plugin_classes = []
-            for name, obj in inspect.getmembers(module, inspect.isclass):
-                if (issubclass(obj, GamePlugin) and
-                    obj != GamePlugin and
-                    obj.__module__ == module_path):
-                    plugin_classes.append(obj)
+            plugin_classes = self.find_plugin_classes(module)
 
             if not plugin_classes:
                 current_app.logger.error(f"No GamePlugin subclasses found in module {module_path}")
@@ -271,5 +409,14 @@ class PluginRegistry:
             return False
 
 
+    @staticmethod
+    def find_plugin_classes(module) -> List[type]:
+        """Find the GamePlugin subclasses defined in a module"""
+        return [
+            obj for name, obj in inspect.getmembers(module, inspect.isclass)
+            if issubclass(obj, GamePlugin) and obj != GamePlugin and obj.__module__ == module.__name__
+        ]
+
+
 # Global registry instance
 plugin_registry = PluginRegistry()
\ No newline at end of file
@@ -0,0 +1,574 @@
+import importlib
+import itertools
+import json
+import os
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from .game_plugin import GamePlugin, GameRules, GameSession, SessionResult
+
+
+class PluginSandboxError(Exception):
+    """Base exception for sandboxed plugin execution"""
+    pass
+
+
+class PluginCallTimeout(PluginSandboxError):
+    """A plugin call did not answer within the call timeout"""
+    pass
+
+
+class PluginWorkerCrashed(PluginSandboxError):
+    """A plugin worker process exited or closed its channel"""
+    pass
+
+
+class PluginBusy(PluginSandboxError):
+    """All call slots of a plugin stayed in use for the whole call timeout"""
+    pass
+
+
+class PluginCallError(PluginSandboxError):
+    """The plugin raised an exception while handling a call"""
+    pass
+
+
+# Frames are a 4-byte big-endian length followed by a compact JSON body
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+# Plugin methods that can be called through the channel
+PLUGIN_METHODS = (
+    "start_session", "end_session", "get_rules", "validate_move",
+    "validate_moves", "get_session_state", "update_session_state"
+)
+
+_DATACLASSES = {cls.__name__: cls for cls in (GameRules, GameSession, SessionResult)}
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if is_dataclass(value) and type(value).__name__ in _DATACLASSES:
+        return {"__type__": type(value).__name__,
+                "fields": {field.name: getattr(value, field.name) for field in fields(value)}}
+    raise TypeError(f"Cannot send {type(value).__name__} to a plugin worker")
+
+
+def _decode_value(data: Dict[str, Any]) -> Any:
+    if "__datetime__" in data and len(data) == 1:
+        return datetime.fromisoformat(data["__datetime__"])
+    if "__type__" in data and data["__type__"] in _DATACLASSES:
+        return _DATACLASSES[data["__type__"]](**data["fields"])
+    return data
+
+
+def encode_frame(payload: Dict[str, Any]) -> bytes:
+    """Encode a message as one length-prefixed frame"""
+    body = json.dumps(payload, default=_encode_value, separators=(",", ":")).encode()
+    if len(body) > MAX_FRAME_BYTES:
+        raise PluginSandboxError(f"Frame of {len(body)} bytes exceeds {MAX_FRAME_BYTES}")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def decode_frame(body: bytes) -> Dict[str, Any]:
+    """Decode the body of one frame"""
+    return json.loads(body, object_hook=_decode_value)
+
+
+def read_frame(fd: int, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Read one frame from a file descriptor.
+
+    Args:
+        fd: Readable file descriptor
+        deadline: time.monotonic() value to give up at, or None to block
+
+    Raises:
+        PluginCallTimeout: If the deadline passes first
+        PluginWorkerCrashed: If the other side closed the channel
+    """
+    (size,) = FRAME_HEADER.unpack(_read_exact(fd, FRAME_HEADER.size, deadline))
+    if size > MAX_FRAME_BYTES:
+        raise PluginWorkerCrashed(f"Frame of {size} bytes exceeds {MAX_FRAME_BYTES}")
+    return decode_frame(_read_exact(fd, size, deadline))
+
+
+def _read_exact(fd: int, size: int, deadline: Optional[float]) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise PluginCallTimeout("Plugin worker did not answer in time")
+
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            raise PluginWorkerCrashed("Plugin worker closed the channel")
+        data += chunk
+    return bytes(data)
+
+
+def write_frame(fd: int, frame: bytes, deadline: float):
+    """
+    Write one encoded frame to a non-blocking file descriptor.
+
+    Args:
+        fd: Writable file descriptor in non-blocking mode
+        frame: Frame from encode_frame
+        deadline: time.monotonic() value to give up at
+
+    Raises:
+        PluginCallTimeout: If the deadline passes before the frame is written
+        PluginWorkerCrashed: If the other side closed the channel
+    """
+    view = memoryview(frame)
+    while view:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([], [fd], [], remaining)[1]:
+            raise PluginCallTimeout("Plugin worker did not take the call in time")
+
+        try:
+            written = os.write(fd, view)
+        except BlockingIOError:
+            continue
+        except OSError as e:
+            raise PluginWorkerCrashed(f"Plugin worker is gone: {str(e)}")
+        view = view[written:]
+
+
+class PluginWorkerProcess:
+    """One long-lived subprocess hosting an initialized plugin instance"""
+
+    def __init__(self, module_path: str, memory_limit_mb: int = 0):
+        self.module_path = module_path
+        self.memory_limit_mb = memory_limit_mb
+        self.process: Optional[subprocess.Popen] = None
+        self._call_ids = itertools.count(1)
+
+    def start(self, timeout_s: float) -> Dict[str, Any]:
+        """
+        Spawn the worker and wait until the plugin is loaded and initialized.
+
+        Returns:
+            Dict[str, Any]: {"info": plugin info, "validation": validation result}
+        """
+        env = dict(os.environ)
+        env["PLUGIN_SANDBOX_MEMORY_MB"] = str(self.memory_limit_mb)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", __name__, self.module_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=os.getcwd(), env=env
+        )
+        # Calls write frames with os.write against their deadline, never through the buffer
+        os.set_blocking(self.process.stdin.fileno(), False)
+        try:
+            return self._receive(0, time.monotonic() + timeout_s)
+        except PluginSandboxError:
+            self.kill()
+            raise
+
+    def call(self, method: str, args: List[Any], timeout_s: float) -> Any:
+        """Send one call and wait for its answer; callers serialize calls per worker"""
+        call_id = next(self._call_ids)
+        deadline = time.monotonic() + timeout_s
+        write_frame(self.process.stdin.fileno(),
+                    encode_frame({"id": call_id, "method": method, "args": args}), deadline)
+
+        return self._receive(call_id, deadline)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+        if self.process is not None:
+            self.process.wait()
+
+    def stop(self, timeout_s: float = 1.0):
+        """Close the channel so the worker exits, killing it if it does not"""
+        if not self.is_alive():
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout_s)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def _receive(self, call_id: int, deadline: float) -> Any:
+        response = read_frame(self.process.stdout.fileno(), deadline)
+        if response.get("id") != call_id:
+            raise PluginWorkerCrashed(f"Plugin worker answered call {response.get('id')}, expected {call_id}")
+        if not response.get("ok"):
+            raise PluginCallError(response.get("error", "Plugin call failed"))
+        return response.get("result")
+
+
+class PluginProcessPool:
+    """
+    Pool of worker processes running one plugin
+
+    Each worker handles one call at a time. Calls for a session go to the
+    worker that started it, because plugins keep session state in memory;
+    other calls are spread round robin. A worker that times out or crashes
+    is killed and respawned in the background, and its sessions are lost
+    as they would be on a process restart; calls routed to it fail fast
+    with PluginWorkerCrashed until the new worker is ready. At most
+    max_concurrency calls wait on the pool at once; further callers give
+    up with PluginBusy.
+
+    Session affinity is forgotten AFFINITY_TTL_S after a session's last
+    call, or beyond MAX_TRACKED_SESSIONS, for sessions never ended.
+    """
+
+    WORKERS = int(os.getenv('PLUGIN_SANDBOX_WORKERS', '2'))
+    MAX_CONCURRENCY = int(os.getenv('PLUGIN_SANDBOX_MAX_CONCURRENCY', '4'))
+    CALL_TIMEOUT_MS = int(os.getenv('PLUGIN_SANDBOX_CALL_TIMEOUT_MS', '2000'))
+    START_TIMEOUT_MS = int(os.getenv('PLUGIN_SANDBOX_START_TIMEOUT_MS', '10000'))
+    MEMORY_LIMIT_MB = int(os.getenv('PLUGIN_SANDBOX_MEMORY_MB', '0'))
+    AFFINITY_TTL_S = int(os.getenv('PLUGIN_SANDBOX_AFFINITY_TTL_S', str(24 * 3600)))
+    MAX_TRACKED_SESSIONS = int(os.getenv('PLUGIN_SANDBOX_MAX_TRACKED_SESSIONS', '10000'))
+
+    def __init__(self, module_path: str, workers: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, call_timeout_ms: Optional[int] = None,
+                 memory_limit_mb: Optional[int] = None):
+        """
+        Initialize PluginProcessPool
+
+        Args:
+            module_path: Module defining the GamePlugin subclass
+            workers: Number of worker processes
+            max_concurrency: Calls allowed to wait on the pool at once
+            call_timeout_ms: Time budget of one call, including the wait for a worker
+            memory_limit_mb: Address space limit of each worker (0 for none)
+        """
+        self.module_path = module_path
+        self.workers = max(workers or self.WORKERS, 1)
+        self.call_timeout_ms = call_timeout_ms or self.CALL_TIMEOUT_MS
+        self.memory_limit_mb = self.MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self.stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'restarts': 0,
+                      'failed_restarts': 0, 'unavailable': 0, 'rejected': 0}
+
+        self._processes: List[Optional[PluginWorkerProcess]] = [None] * self.workers
+        self._process_locks = [threading.Lock() for _ in range(self.workers)]
+        self._slots = threading.BoundedSemaphore(max_concurrency or self.MAX_CONCURRENCY)
+        # Session ID -> (worker index, last call time), least recently used first
+        self._affinity: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._respawning: set = set()
+        self._stopped = False
+        self._next_worker = itertools.count()
+        self._lock = threading.Lock()
+
+    def start(self) -> Dict[str, Any]:
+        """Start all workers; returns the plugin info and validation reported by the first"""
+        hello = None
+        self._stopped = False
+        try:
+            for index in range(self.workers):
+                with self._process_locks[index]:
+                    process = PluginWorkerProcess(self.module_path, self.memory_limit_mb)
+                    worker_hello = process.start(self.START_TIMEOUT_MS / 1000)
+                    self._processes[index] = process
+                    hello = hello or worker_hello
+        except PluginSandboxError:
+            self.stop()
+            raise
+        return hello
+
+    def call(self, method: str, *args: Any, session_id: Optional[str] = None) -> Any:
+        """
+        Run a plugin method in a worker.
+
+        Args:
+            method: One of PLUGIN_METHODS
+            *args: Method arguments (JSON values, datetimes or plugin dataclasses)
+            session_id: Session the call belongs to, for worker affinity
+
+        Raises:
+            PluginBusy, PluginCallTimeout, PluginWorkerCrashed, PluginCallError
+        """
+        deadline = time.monotonic() + self.call_timeout_ms / 1000
+        if not self._slots.acquire(timeout=self.call_timeout_ms / 1000):
+            self._count('rejected')
+            raise PluginBusy(f"No free call slot for {self.module_path}")
+
+        try:
+            index = self._worker_for(session_id)
+            if not self._process_locks[index].acquire(timeout=max(deadline - time.monotonic(), 0)):
+                self._count('timeouts')
+                raise PluginCallTimeout(f"Worker {index} of {self.module_path} stayed busy")
+
+            try:
+                process = self._live_process(index)
+                if process is None:
+                    self._count('unavailable')
+                    raise PluginWorkerCrashed(f"Worker {index} of {self.module_path} is restarting")
+
+                self._count('calls')
+                try:
+                    result = process.call(method, list(args), max(deadline - time.monotonic(), 0))
+                except (PluginCallTimeout, PluginWorkerCrashed) as e:
+                    self._count('timeouts' if isinstance(e, PluginCallTimeout) else 'crashes')
+                    self._discard_process(index)
+                    self._schedule_respawn(index)
+                    raise
+            except PluginCallError:
+                self._count('errors')
+                raise
+            finally:
+                self._process_locks[index].release()
+
+            if method == "start_session" and isinstance(result, GameSession):
+                self._track_session(result.session_id, index)
+            elif method == "end_session" and session_id is not None:
+                with self._lock:
+                    self._affinity.pop(session_id, None)
+            return result
+
+        finally:
+            self._slots.release()
+
+    def stop(self):
+        """Stop all workers"""
+        self._stopped = True
+        for index in range(self.workers):
+            with self._process_locks[index]:
+                if self._processes[index] is not None:
+                    self._processes[index].stop()
+                    self._processes[index] = None
+        with self._lock:
+            self._affinity.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call counters and worker liveness"""
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "live_workers": sum(1 for process in self._processes if process is not None and process.is_alive()),
+            "tracked_sessions": len(self._affinity)
+        }
+
+    def _worker_for(self, session_id: Optional[str]) -> int:
+        if session_id is None:
+            return next(self._next_worker) % self.workers
+
+        with self._lock:
+            tracked = self._affinity.get(session_id)
+        if tracked is None:
+            return zlib.crc32(session_id.encode()) % self.workers
+
+        self._track_session(session_id, tracked[0])
+        return tracked[0]
+
+    def _track_session(self, session_id: str, index: int):
+        """Record a session's worker and forget sessions idle past the TTL"""
+        now = time.monotonic()
+        with self._lock:
+            self._affinity[session_id] = (index, now)
+            self._affinity.move_to_end(session_id)
+
+            while self._affinity:
+                oldest_id, (_, last_call) = next(iter(self._affinity.items()))
+                if len(self._affinity) <= self.MAX_TRACKED_SESSIONS and now - last_call < self.AFFINITY_TTL_S:
+                    break
+                del self._affinity[oldest_id]
+
+    def _live_process(self, index: int) -> Optional[PluginWorkerProcess]:
+        """Get a live worker, or None while it is being respawned (caller holds its lock)"""
+        process = self._processes[index]
+        if process is not None and process.is_alive():
+            return process
+
+        if process is not None:
+            self._count('crashes')
+            self._discard_process(index)
+        self._schedule_respawn(index)
+        return None
+
+    def _schedule_respawn(self, index: int):
+        """Start a replacement worker in the background unless one is already starting"""
+        with self._lock:
+            if self._stopped or index in self._respawning:
+                return
+            self._respawning.add(index)
+
+        threading.Thread(target=self._respawn, args=(index,),
+                         name=f"plugin-respawn-{index}", daemon=True).start()
+
+    def _respawn(self, index: int):
+        try:
+            process = PluginWorkerProcess(self.module_path, self.memory_limit_mb)
+            try:
+                process.start(self.START_TIMEOUT_MS / 1000)
+            except (PluginSandboxError, OSError):
+                # The next call routed to this worker schedules another attempt
+                self._count('failed_restarts')
+                return
+
+            with self._process_locks[index]:
+                if self._stopped or self._processes[index] is not None:
+                    process.stop()
+                    return
+                self._processes[index] = process
+            self._count('restarts')
+        finally:
+            with self._lock:
+                self._respawning.discard(index)
+
+    def _discard_process(self, index: int):
+        """Kill a worker and forget the sessions it held (caller holds its lock)"""
+        process = self._processes[index]
+        if process is not None:
+            process.kill()
+        self._processes[index] = None
+        with self._lock:
+            for session_id in [key for key, (worker, _) in self._affinity.items() if worker == index]:
+                del self._affinity[session_id]
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+
+class SandboxedPlugin(GamePlugin):
+    """
+    GamePlugin proxy forwarding every call to a PluginProcessPool
+
+    Use for_module() to get a class the registry can register; the
+    workers are started when the registry validates the plugin.
+    """
+
+    module_path: str = ""
+
+    @classmethod
+    def for_module(cls, module_path: str, plugin_id: str) -> type:
+        """Create a proxy class for the plugin defined in module_path"""
+        return type(f"Sandboxed_{plugin_id}", (cls,), {"module_path": module_path})
+
+    def __init__(self):
+        super().__init__()
+        self.pool = PluginProcessPool(self.module_path)
+        self._validation: Optional[Dict[str, Any]] = None
+
+    def validate_plugin(self) -> Dict[str, Any]:
+        if self._validation is None:
+            try:
+                hello = self.pool.start()
+            except PluginSandboxError as e:
+                return {"is_valid": False, "errors": [f"Plugin worker failed to start: {str(e)}"], "warnings": []}
+
+            for attribute in ("name", "version", "description", "category", "author", "credit_rate"):
+                setattr(self, attribute, hello["info"].get(attribute, getattr(self, attribute)))
+            self._validation = hello["validation"]
+        return self._validation
+
+    def initialize(self) -> bool:
+        # Workers initialize the plugin before reporting ready
+        self.is_initialized = bool(self._validation and self._validation.get("is_valid"))
+        return self.is_initialized
+
+    def start_session(self, user_id: str, session_config: Optional[Dict[str, Any]] = None) -> GameSession:
+        return self.pool.call("start_session", user_id, session_config)
+
+    def end_session(self, session_id: str, reason: str = "completed") -> SessionResult:
+        return self.pool.call("end_session", session_id, reason, session_id=session_id)
+
+    def get_rules(self) -> GameRules:
+        return self.pool.call("get_rules")
+
+    def validate_move(self, session_id: str, move: Dict[str, Any]) -> bool:
+        return self.pool.call("validate_move", session_id, move, session_id=session_id)
+
+    def validate_moves(self, session_id: str, moves: List[Dict[str, Any]]) -> List[bool]:
+        return self.pool.call("validate_moves", session_id, moves, session_id=session_id)
+
+    def get_session_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.pool.call("get_session_state", session_id, session_id=session_id)
+
+    def update_session_state(self, session_id: str, new_state: Dict[str, Any]) -> bool:
+        return self.pool.call("update_session_state", session_id, new_state, session_id=session_id)
+
+    def get_plugin_info(self) -> Dict[str, Any]:
+        return {
+            **super().get_plugin_info(),
+            "execution_mode": "subprocess",
+            "sandbox": self.pool.get_stats()
+        }
+
+    def shutdown(self):
+        self.pool.stop()
+
+
+def _apply_memory_limit():
+    limit_mb = int(os.getenv('PLUGIN_SANDBOX_MEMORY_MB', '0'))
+    if limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def serve(module_path: str) -> int:
+    """Worker entry point: load the plugin and answer calls until the channel closes"""
+    # Keep the channel on a private descriptor so plugin prints go to stderr
+    channel = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def send(payload: Dict[str, Any]):
+        channel.write(encode_frame(payload))
+        channel.flush()
+
+    try:
+        from .plugin_registry import PluginRegistry
+
+        _apply_memory_limit()
+        plugin_classes = PluginRegistry.find_plugin_classes(importlib.import_module(module_path))
+        if not plugin_classes:
+            raise PluginSandboxError(f"No GamePlugin subclasses found in module {module_path}")
+
+        plugin = plugin_classes[0]()
+        validation = plugin.validate_plugin()
+        if validation["is_valid"] and not plugin.initialize():
+            raise PluginSandboxError("Plugin initialization failed")
+        send({"id": 0, "ok": True, "result": {"info": plugin.get_plugin_info(), "validation": validation}})
+    except Exception as e:
+        send({"id": 0, "ok": False, "error": f"{type(e).__name__}: {str(e)}"})
+        return 1
+
+    while True:
+        try:
+            request = read_frame(0)
+        except PluginWorkerCrashed:
+            return 0
+
+        method = request.get("method")
+        try:
+            if method not in PLUGIN_METHODS:
+                raise PluginSandboxError(f"Unknown plugin method {method}")
+            response = {"id": request.get("id"), "ok": True,
+                        "result": getattr(plugin, method)(*request.get("args", []))}
+            payload = encode_frame(response)
+        except Exception as e:
+            payload = encode_frame({"id": request.get("id"), "ok": False,
+                                    "error": f"{type(e).__name__}: {str(e)}"})
+        channel.write(payload)
+        channel.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(serve(sys.argv[1]))
@@ -1,4 +1,5 @@
 from .game import Game
 from .game_session import GameSession
+from .session_summary import SessionSummary
 
-__all__ = ['Game', 'GameSession']
\ No newline at end of file
+__all__ = ['Game', 'GameSession', 'SessionSummary']
@@ -16,7 +16,6 @@ class GameSession:
     started_at: datetime = field(default_factory=datetime.utcnow)
     ended_at: Optional[datetime] = None
     session_config: Dict[str, Any] = field(default_factory=dict)
-    moves: List[Dict[str, Any]] = field(default_factory=list)
     achievements_unlocked: List[str] = field(default_factory=list)
     statistics: Dict[str, Any] = field(default_factory=dict)
     session_id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -27,6 +26,7 @@ class GameSession:
     paused_at: Optional[datetime] = None
     resumed_at: Optional[datetime] = None
     moves_count: int = 0
+    last_move: Optional[Dict[str, Any]] = None  # full history lives in session_moves
     device_info: Dict[str, Any] = field(default_factory=dict)
     last_sync_at: Optional[datetime] = None
     sync_version: int = 0
@@ -46,13 +46,13 @@ class GameSession:
             "started_at": self.started_at,
             "ended_at": self.ended_at,
             "session_config": self.session_config,
-            "moves": self.moves,
             "achievements_unlocked": self.achievements_unlocked,
             "statistics": self.statistics,
             "play_duration": self.play_duration,
             "paused_at": self.paused_at,
             "resumed_at": self.resumed_at,
             "moves_count": self.moves_count,
+            "last_move": self.last_move,
             "device_info": self.device_info,
             "last_sync_at": self.last_sync_at,
             "sync_version": self.sync_version,
@@ -78,7 +78,6 @@ class GameSession:
             started_at=data.get("started_at", datetime.utcnow()),
             ended_at=data.get("ended_at"),
             session_config=data.get("session_config", {}),
-            moves=data.get("moves", []),
             achievements_unlocked=data.get("achievements_unlocked", []),
             statistics=data.get("statistics", {}),
             session_id=data.get("session_id", str(uuid.uuid4())),
@@ -86,6 +85,7 @@ class GameSession:
             paused_at=data.get("paused_at"),
             resumed_at=data.get("resumed_at"),
             moves_count=data.get("moves_count", 0),
+            last_move=data.get("last_move"),
             device_info=data.get("device_info", {}),
             last_sync_at=data.get("last_sync_at"),
             sync_version=data.get("sync_version", 0),
@@ -112,7 +112,8 @@ class GameSession:
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "ended_at": self.ended_at.isoformat() if self.ended_at else None,
             "session_config": self.session_config,
-            "moves_count": self.moves_count or len(self.moves),
+            "moves_count": self.moves_count,
+            "last_move": self._move_to_api(self.last_move),
             "achievements_unlocked": self.achievements_unlocked,
             "statistics": self.statistics,
             "duration_seconds": self.get_duration_seconds(),
@@ -137,16 +138,25 @@ class GameSession:
         return int(duration.total_seconds())
 
     def add_move(self, move: Dict[str, Any]) -> None:
-        """Add a move to the session"""
-        move_with_timestamp = {
+        """Record a move in memory (persist it with GameSessionRepository.append_session_moves)"""
+        self.moves_count += 1
+        self.last_move = {
             **move,
             "timestamp": datetime.utcnow(),
-            "move_number": len(self.moves) + 1
+            "move_number": self.moves_count
         }
-        self.moves.append(move_with_timestamp)
-        self.moves_count = len(self.moves)
         self.updated_at = datetime.utcnow()
 
+    def _move_to_api(self, move: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Serialize a stored move for API responses"""
+        if not move:
+            return None
+        timestamp = move.get("timestamp")
+        return {
+            **move,
+            "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+        }
+
     def update_state(self, new_state: Dict[str, Any]) -> None:
         """Update the current game state"""
         self.current_state = new_state
@@ -301,7 +311,7 @@ class GameSession:
             "duration_seconds": self.get_duration_seconds(),
             "score": self.score,
             "credits_earned": self.credits_earned,
-            "moves_count": len(self.moves),
+            "moves_count": self.moves_count,
             "achievements_count": len(self.achievements_unlocked),
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "ended_at": self.ended_at.isoformat() if self.ended_at else None
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+class SessionSummary:
+    """
+    Read-only view of the scalar fields of a game session
+
+    Built from documents read with PROJECTION, so list and analytics
+    queries transfer and allocate only these fields instead of the full
+    session (current_state, device_info, statistics, ...).
+    """
+
+    __slots__ = ("session_id", "user_id", "game_id", "created_at", "updated_at", "play_duration",
+                 "score", "status")
+
+    PROJECTION = {
+        "_id": 0,
+        "session_id": 1,
+        "user_id": 1,
+        "game_id": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "play_duration": 1,
+        "score": 1,
+        "status": 1
+    }
+
+    def __init__(self, session_id: str, user_id: str, game_id: str, created_at: Optional[datetime],
+                 play_duration: int = 0, score: Optional[int] = None, status: str = "active",
+                 updated_at: Optional[datetime] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.game_id = game_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.play_duration = play_duration
+        self.score = score
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionSummary':
+        """Create a SessionSummary from a projected session document"""
+        return cls(
+            session_id=data.get("session_id", ""),
+            user_id=data.get("user_id", ""),
+            game_id=data.get("game_id", ""),
+            created_at=data.get("created_at"),
+            play_duration=data.get("play_duration") or 0,
+            score=data.get("score"),
+            status=data.get("status", "active"),
+            updated_at=data.get("updated_at")
+        )
+
+    def to_api_dict(self) -> Dict[str, Any]:
+        """Convert the summary to a dictionary for API responses"""
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "game_id": self.game_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "play_duration_ms": self.play_duration,
+            "score": self.score,
+            "status": self.status
+        }
+
+    def __repr__(self) -> str:
+        return f"SessionSummary(session_id={self.session_id}, user_id={self.user_id}, status={self.status})"
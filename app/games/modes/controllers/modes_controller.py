@@ -278,13 +278,10 @@ def get_scheduler_status(current_user):
 def start_scheduler(current_user):
     """Start the background scheduler (admin only)"""
     try:
-        data = request.get_json() or {}
-        check_interval = data.get('check_interval_seconds', 60)
-
-        success = scheduler.start_background_scheduler(check_interval)
+        success = scheduler.start_background_scheduler()
 
         if success:
-            return success_response("SCHEDULER_STARTED", {"check_interval_seconds": check_interval})
+            return success_response("SCHEDULER_STARTED", scheduler.get_scheduler_status())
         else:
             return error_response("SCHEDULER_ALREADY_RUNNING")
 
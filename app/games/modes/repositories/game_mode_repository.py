@@ -139,6 +139,15 @@ class GameModeRepository(BaseRepository):
         })
         return [GameMode.from_dict(data) for data in modes_data]
 
+    def get_next_expiry(self) -> Optional[datetime]:
+        """Get the earliest end date among active modes"""
+        mode_data = self.collection.find_one(
+            {"is_active": True, "end_date": {"$ne": None}},
+            {"end_date": 1},
+            sort=[("end_date", 1)]
+        )
+        return mode_data.get("end_date") if mode_data else None
+
     def cleanup_expired_modes(self) -> int:
         """Automatically deactivate expired modes"""
         now = datetime.utcnow()
@@ -1,13 +1,20 @@
+import threading
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+from pymongo import ReturnDocument
 from app.core.repositories.base_repository import BaseRepository
+from .scheduler_lease_repository import SchedulerLeaseRepository
 from ..models.mode_schedule import ModeSchedule
 
 class ModeScheduleRepository(BaseRepository):
     """Repository for mode schedule operations"""
 
+    # Set when this process changes a schedule; wakes the mode scheduler
+    schedules_changed = threading.Event()
+
     def __init__(self):
         super().__init__("mode_schedules")
+        self.lease_repository = SchedulerLeaseRepository()
 
     def create_indexes(self):
         import os
@@ -38,7 +45,14 @@ class ModeScheduleRepository(BaseRepository):
 
     def create_schedule(self, schedule: ModeSchedule) -> str:
         """Create a new mode schedule"""
-        return self.create(schedule.to_dict())
+        schedule_id = self.create(schedule.to_dict())
+        self.notify_change()
+        return schedule_id
+
+    def notify_change(self):
+        """Tell the mode scheduler, in this process or another, to reload its schedules"""
+        self.lease_repository.bump_version(SchedulerLeaseRepository.MODE_SCHEDULER)
+        self.schedules_changed.set()
 
     def get_schedule_by_id(self, schedule_id: str) -> Optional[ModeSchedule]:
         """Get a schedule by ID"""
@@ -80,6 +94,15 @@ class ModeScheduleRepository(BaseRepository):
         }, sort=[("scheduled_at", 1)])
         return [ModeSchedule.from_dict(data) for data in schedules_data]
 
+    def get_schedules_due_before(self, until: datetime) -> List[ModeSchedule]:
+        """Get pending schedules due up to a time, overdue ones included"""
+        schedules_data = self.find_many({
+            "is_executed": False,
+            "is_cancelled": False,
+            "scheduled_at": {"$lte": until}
+        }, sort=[("scheduled_at", 1)])
+        return [ModeSchedule.from_dict(data) for data in schedules_data]
+
     def get_schedules_by_mode(self, mode_name: str) -> List[ModeSchedule]:
         """Get all schedules for a specific mode"""
         schedules_data = self.find_many({"mode_name": mode_name}, sort=[("scheduled_at", 1)])
@@ -103,16 +126,62 @@ class ModeScheduleRepository(BaseRepository):
         """Get all recurring schedules"""
         return self.get_schedules_by_type("recurring")
 
+    def claim_schedule(self, schedule_id: str, holder_id: str, lease_seconds: float,
+                       due_only: bool = True) -> Optional[ModeSchedule]:
+        """
+        Claim a pending schedule for execution
+
+        Only one process can hold the claim until it expires, so a schedule
+        is never executed twice even if two schedulers see it due. Returns
+        the claimed schedule as stored, so an edit made since the caller
+        read it is what runs; None if it is claimed, done or (with
+        due_only) no longer due.
+        """
+        now = datetime.utcnow()
+        claim_filter: Dict[str, Any] = {
+            "schedule_id": schedule_id,
+            "is_executed": False,
+            "is_cancelled": False,
+            "$or": [
+                {"claimed_until": {"$exists": False}},
+                {"claimed_until": None},
+                {"claimed_until": {"$lt": now}}
+            ]
+        }
+        if due_only:
+            claim_filter["scheduled_at"] = {"$lte": now}
+
+        schedule_data = self.collection.find_one_and_update(
+            claim_filter,
+            {"$set": {
+                "claimed_by": holder_id,
+                "claimed_until": now + timedelta(seconds=lease_seconds)
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        return ModeSchedule.from_dict(schedule_data) if schedule_data else None
+
+    def release_schedule_claim(self, schedule_id: str, holder_id: str) -> bool:
+        """Release a claim without executing the schedule"""
+        result = self.collection.update_one(
+            {"schedule_id": schedule_id, "claimed_by": holder_id},
+            {"$unset": {"claimed_by": "", "claimed_until": ""}}
+        )
+        return result.modified_count > 0
+
     def execute_schedule(self, schedule_id: str) -> bool:
         """Mark a schedule as executed"""
         now = datetime.utcnow()
         result = self.collection.update_one(
             {"schedule_id": schedule_id},
-            {"$set": {
-                "is_executed": True,
-                "executed_at": now,
-                "updated_at": now
-            }}
+            {
+                "$set": {
+                    "is_executed": True,
+                    "executed_at": now,
+                    "updated_at": now
+                },
+                "$unset": {"claimed_by": "", "claimed_until": ""}
+            }
         )
         return result.modified_count > 0
 
@@ -125,6 +194,8 @@ class ModeScheduleRepository(BaseRepository):
                 "updated_at": datetime.utcnow()
             }}
         )
+        if result.modified_count > 0:
+            self.notify_change()
         return result.modified_count > 0
 
     def cancel_future_schedules_for_mode(self, mode_name: str) -> int:
@@ -142,6 +213,8 @@ class ModeScheduleRepository(BaseRepository):
                 "updated_at": now
             }}
         )
+        if result.modified_count > 0:
+            self.notify_change()
         return result.modified_count
 
     def get_schedules_created_by(self, created_by: str) -> List[ModeSchedule]:
@@ -194,6 +267,7 @@ class ModeScheduleRepository(BaseRepository):
             # Update existing schedule
             schedule._id = existing["_id"]
             self.update_by_id(str(existing["_id"]), schedule.to_dict())
+            self.notify_change()
             return str(existing["_id"])
         else:
             # Create new schedule
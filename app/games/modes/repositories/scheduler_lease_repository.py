@@ -0,0 +1,80 @@
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.repositories.base_repository import BaseRepository
+
+
+class SchedulerLeaseRepository(BaseRepository):
+    """
+    Leader leases for background schedulers
+
+    One document per scheduler names the process holding it and when the
+    lease expires; only the holder runs the scheduler, and another process
+    takes over once the holder stops renewing. The document also carries a
+    version counter that schedule writers bump, which the holder reads on
+    every renewal to notice changes made by other processes.
+    """
+
+    MODE_SCHEDULER = 'mode_scheduler'
+
+    def __init__(self):
+        super().__init__('scheduler_leases')
+
+    def create_indexes(self):
+        """Leases are looked up by their _id (the scheduler name)"""
+        pass
+
+    def acquire(self, name: str, holder_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Take or renew a lease
+
+        Args:
+            name: Scheduler name
+            holder_id: Process asking for the lease
+            lease_seconds: Seconds the lease lasts without renewal
+
+        Returns:
+            Optional[Dict[str, Any]]: The lease document if holder_id holds it now
+        """
+        now = datetime.utcnow()
+        try:
+            return self.collection.find_one_and_update(
+                {
+                    '_id': name,
+                    '$or': [
+                        {'holder_id': holder_id},
+                        {'expires_at': {'$lt': now}},
+                        {'holder_id': None}
+                    ]
+                },
+                {
+                    '$set': {'holder_id': holder_id, 'expires_at': now + timedelta(seconds=lease_seconds)},
+                    '$setOnInsert': {'acquired_at': now, 'schedule_version': 0}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by another process
+            return None
+
+    def release(self, name: str, holder_id: str) -> bool:
+        """Give up a lease so another process can take it at once"""
+        result = self.collection.update_one(
+            {'_id': name, 'holder_id': holder_id},
+            {'$set': {'holder_id': None, 'expires_at': datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    def get_lease(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get a lease document"""
+        return self.collection.find_one({'_id': name})
+
+    def bump_version(self, name: str) -> None:
+        """Record that the data a scheduler works on changed"""
+        self.collection.update_one(
+            {'_id': name},
+            {'$inc': {'schedule_version': 1}, '$setOnInsert': {'holder_id': None, 'expires_at': datetime.utcnow()}},
+            upsert=True
+        )
@@ -86,6 +86,10 @@ class ModeManager:
             if not success:
                 return False, "FAILED_TO_ACTIVATE_MODE", None
 
+            if end_date:
+                # The scheduler deactivates the mode when it ends
+                self.schedule_repository.notify_change()
+
             # Get updated mode
             updated_mode = self.mode_repository.get_mode_by_name(mode_name)
 
@@ -1,21 +1,78 @@
+"""
+Mode scheduler
+
+Executes scheduled mode activations and deactivations, deactivates modes
+when they end and cleans up old schedules once a day. Runs as its own
+process, or as a thread started with POST /api/modes/scheduler/start.
+
+Usage:
+    python -m app.games.modes.services.scheduler
+"""
+
+import argparse
+import heapq
+import itertools
+import os
+import signal
+import socket
 from typing import Tuple, Optional, Dict, Any, List
 from flask import current_app
 from datetime import datetime, timedelta
 import threading
-import time
 
 from ..repositories.mode_schedule_repository import ModeScheduleRepository
 from ..repositories.game_mode_repository import GameModeRepository
+from ..repositories.scheduler_lease_repository import SchedulerLeaseRepository
 from ..models.mode_schedule import ModeSchedule
 
 class ModeScheduler:
-    """Service for executing scheduled mode operations"""
+    """
+    Service for executing scheduled mode operations
+
+    The background loop keeps the schedules due within HORIZON_SECONDS in
+    a heap ordered by fire time, together with the next mode end date and
+    the daily cleanup, and sleeps until the earliest of them. Schedule
+    changes made in this process wake it at once; changes made by other
+    processes bump a version on the lease document, which the loop reads
+    when it renews its lease. When idle, that renewal every
+    LEASE_SECONDS / 3 is its only database call.
+
+    Only the holder of the "mode_scheduler" lease runs schedules, so any
+    number of processes can run the loop. Every schedule is also claimed
+    before it is executed, so it runs once even if a lease changes hands
+    mid-execution.
+    """
+
+    LEASE_SECONDS = float(os.getenv('MODE_SCHEDULER_LEASE_SECONDS', '30'))
+    HORIZON_SECONDS = float(os.getenv('MODE_SCHEDULER_HORIZON_SECONDS', '3600'))
+    RETRY_SECONDS = float(os.getenv('MODE_SCHEDULER_RETRY_SECONDS', '60'))
+
+    # Hour (UTC) of the daily cleanup of old schedules
+    CLEANUP_HOUR = 2
+
+    # Heap keys of the entries that are not schedules
+    EXPIRE_MODES = 'expire_modes'
+    CLEANUP_SCHEDULES = 'cleanup_schedules'
 
     def __init__(self):
         self.schedule_repository = ModeScheduleRepository()
         self.mode_repository = GameModeRepository()
+        self.lease_repository = SchedulerLeaseRepository()
+        self.worker_id = None
         self._running = False
         self._scheduler_thread = None
+        self._started_at = None
+
+        # Heap of (fire_at, sequence, key, schedule or None)
+        self._heap: List[Tuple[datetime, int, str, Optional[ModeSchedule]]] = []
+        self._sequence = itertools.count()
+        self._is_leader = False
+        self._schedule_version = None
+        self._renew_at: Optional[datetime] = None
+        self._loaded_until: Optional[datetime] = None
+        self._cleanup_at: Optional[datetime] = None
+        # Earliest retry time of heap entries that failed, by key
+        self._retry_at: Dict[str, datetime] = {}
 
     def execute_pending_schedules(self) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """Execute all pending mode schedules"""
@@ -34,20 +91,11 @@ class ModeScheduler:
             execution_results = []
 
             for schedule in pending_schedules:
-                result = self._execute_single_schedule(schedule)
+                result = self._run_schedule(schedule)
                 execution_results.append(result)
 
                 if result["success"]:
                     executed_count += 1
-                    # Mark as executed in database
-                    self.schedule_repository.execute_schedule(schedule.schedule_id)
-
-                    # Create next recurrence if needed
-                    if schedule.should_create_recurrence():
-                        next_schedule = schedule.create_next_recurrence()
-                        if next_schedule:
-                            self.schedule_repository.create_schedule(next_schedule)
-                            current_app.logger.info(f"Created next recurrence for {schedule.mode_name}")
                 else:
                     failed_count += 1
 
@@ -63,6 +111,42 @@ class ModeScheduler:
             current_app.logger.error(f"Failed to execute pending schedules: {str(e)}")
             return False, "FAILED_TO_EXECUTE_SCHEDULES", None
 
+    def _run_schedule(self, schedule: ModeSchedule, force: bool = False) -> Dict[str, Any]:
+        """Claim, execute and mark a schedule, then create its next recurrence"""
+        worker_id = self.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        claimed = self.schedule_repository.claim_schedule(
+            schedule.schedule_id, worker_id, self.RETRY_SECONDS, due_only=not force
+        )
+        if not claimed:
+            return {
+                "schedule_id": schedule.schedule_id,
+                "mode_name": schedule.mode_name,
+                "action": schedule.action,
+                "success": False,
+                "message": "SCHEDULE_NOT_CLAIMED",
+                "executed_at": None
+            }
+
+        # Run the stored schedule; the one passed in may be an outdated heap snapshot
+        schedule = claimed
+
+        result = self._execute_single_schedule(schedule)
+
+        if not result["success"]:
+            self.schedule_repository.release_schedule_claim(schedule.schedule_id, worker_id)
+            return result
+
+        self.schedule_repository.execute_schedule(schedule.schedule_id)
+
+        # Create next recurrence if needed
+        if schedule.should_create_recurrence():
+            next_schedule = schedule.create_next_recurrence()
+            if next_schedule:
+                self.schedule_repository.create_schedule(next_schedule)
+                current_app.logger.info(f"Created next recurrence for {schedule.mode_name}")
+
+        return result
+
     def _execute_single_schedule(self, schedule: ModeSchedule) -> Dict[str, Any]:
         """Execute a single schedule"""
         try:
@@ -154,22 +238,22 @@ class ModeScheduler:
             current_app.logger.error(f"Failed to deactivate mode {schedule.mode_name}: {str(e)}")
             return False
 
-    def start_background_scheduler(self, check_interval_seconds: int = 60) -> bool:
+    def start_background_scheduler(self) -> bool:
         """Start the background scheduler thread"""
-        if self._running:
+        if self.is_running():
             current_app.logger.warning("Scheduler is already running")
             return False
 
         try:
             self._running = True
             self._scheduler_thread = threading.Thread(
-                target=self._scheduler_loop,
-                args=(check_interval_seconds,),
+                target=self.run,
+                args=(current_app._get_current_object(),),
                 daemon=True
             )
             self._scheduler_thread.start()
 
-            current_app.logger.info(f"Mode scheduler started with {check_interval_seconds}s interval")
+            current_app.logger.info("Mode scheduler started")
             return True
 
         except Exception as e:
@@ -180,7 +264,7 @@ class ModeScheduler:
     def stop_background_scheduler(self) -> bool:
         """Stop the background scheduler"""
         try:
-            self._running = False
+            self.stop()
             if self._scheduler_thread and self._scheduler_thread.is_alive():
                 self._scheduler_thread.join(timeout=5)
 
@@ -191,26 +275,162 @@ class ModeScheduler:
             current_app.logger.error(f"Failed to stop scheduler: {str(e)}")
             return False
 
-    def _scheduler_loop(self, check_interval_seconds: int):
-        """Main scheduler loop running in background thread"""
-        while self._running:
-            try:
-                # Execute pending schedules
-                with current_app.app_context():
-                    self.execute_pending_schedules()
-
-                    # Cleanup expired modes
-                    self.mode_repository.cleanup_expired_modes()
+    def run(self, app):
+        """Run the scheduler loop until stopped"""
+        # Taken here, not in __init__, so forked workers get their own ID
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = True
+        self._started_at = datetime.utcnow().isoformat()
+        app.logger.info(f"Mode scheduler {self.worker_id} starting")
+
+        with app.app_context():
+            while self._running:
+                try:
+                    timeout = self.tick()
+                except Exception as e:
+                    app.logger.error(f"Error in scheduler loop: {str(e)}")
+                    # Act as leader again only after a successful renewal
+                    self._is_leader = False
+                    self._renew_at = datetime.utcnow() + timedelta(seconds=self.RETRY_SECONDS)
+                    timeout = self.RETRY_SECONDS
+
+                if self._running:
+                    self.schedule_repository.schedules_changed.wait(timeout)
+
+            self._release_lease()
+
+        app.logger.info(f"Mode scheduler {self.worker_id} stopped")
+
+    def stop(self, *_args):
+        """Ask the loop to exit"""
+        self._running = False
+        self.schedule_repository.schedules_changed.set()
+
+    def tick(self) -> float:
+        """
+        Renew the lease and fire every heap entry that is due
+
+        Returns:
+            float: Seconds until the next fire time, lease renewal or reload
+        """
+        now = datetime.utcnow()
+        changed = self.schedule_repository.schedules_changed.is_set()
+        self.schedule_repository.schedules_changed.clear()
+
+        if self._renew_at is None or now >= self._renew_at:
+            changed = self._renew_lease(now) or changed
+
+        if not self._is_leader:
+            return self._seconds_until(self._renew_at)
+
+        if changed or self._loaded_until is None or now >= self._loaded_until:
+            self._load_heap(now)
+
+        fired = False
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, schedule = heapq.heappop(self._heap)
+            self._fire(key, schedule)
+            fired = True
+
+        if fired:
+            # Executed schedules and the next mode end date change the heap
+            self.schedule_repository.schedules_changed.clear()
+            self._load_heap(datetime.utcnow())
+
+        next_at = min(self._renew_at, self._loaded_until)
+        if self._heap:
+            next_at = min(next_at, self._heap[0][0])
+        return self._seconds_until(next_at)
+
+    def _renew_lease(self, now: datetime) -> bool:
+        """Take or renew the lease; returns True if the heap must be reloaded"""
+        lease = self.lease_repository.acquire(
+            SchedulerLeaseRepository.MODE_SCHEDULER, self.worker_id, self.LEASE_SECONDS
+        )
+        self._renew_at = now + timedelta(seconds=self.LEASE_SECONDS / 3)
+
+        if lease is None:
+            if self._is_leader:
+                current_app.logger.warning(f"Mode scheduler {self.worker_id} lost the scheduler lease")
+            self._is_leader = False
+            self._heap = []
+            self._schedule_version = None
+            self._loaded_until = None
+            return False
 
-                    # Cleanup old schedules (weekly)
-                    if datetime.utcnow().hour == 2:  # Run at 2 AM
-                        self.schedule_repository.cleanup_old_schedules()
+        version = lease.get('schedule_version', 0)
+        reload = not self._is_leader or version != self._schedule_version
+        if not self._is_leader:
+            current_app.logger.info(f"Mode scheduler {self.worker_id} is now the leader")
+        self._is_leader = True
+        self._schedule_version = version
+        return reload
 
+    def _release_lease(self):
+        if self._is_leader and self.worker_id:
+            try:
+                self.lease_repository.release(SchedulerLeaseRepository.MODE_SCHEDULER, self.worker_id)
             except Exception as e:
-                current_app.logger.error(f"Error in scheduler loop: {str(e)}")
+                current_app.logger.error(f"Failed to release scheduler lease: {str(e)}")
+        self._is_leader = False
+        self._heap = []
+
+    def _load_heap(self, now: datetime):
+        """Rebuild the heap from the schedules due before the horizon"""
+        self._loaded_until = now + timedelta(seconds=self.HORIZON_SECONDS)
+        entries = [
+            (schedule.scheduled_at, schedule.schedule_id, schedule)
+            for schedule in self.schedule_repository.get_schedules_due_before(self._loaded_until)
+        ]
+
+        next_expiry = self.mode_repository.get_next_expiry()
+        if next_expiry and next_expiry <= self._loaded_until:
+            # Modes expire once their end date has passed
+            entries.append((next_expiry + timedelta(milliseconds=1), self.EXPIRE_MODES, None))
+
+        if self._cleanup_at is None:
+            self._cleanup_at = now.replace(hour=self.CLEANUP_HOUR, minute=0, second=0, microsecond=0)
+            if self._cleanup_at <= now:
+                self._cleanup_at += timedelta(days=1)
+        if self._cleanup_at <= self._loaded_until:
+            entries.append((self._cleanup_at, self.CLEANUP_SCHEDULES, None))
+
+        self._retry_at = {key: self._retry_at[key] for _, key, _ in entries if key in self._retry_at}
+        self._heap = [
+            (max(fire_at, self._retry_at.get(key, fire_at)), next(self._sequence), key, schedule)
+            for fire_at, key, schedule in entries
+        ]
+        heapq.heapify(self._heap)
+
+    def _fire(self, key: str, schedule: Optional[ModeSchedule]):
+        """Run one heap entry; a failed entry is retried after RETRY_SECONDS"""
+        try:
+            if schedule is not None:
+                result = self._run_schedule(schedule)
+                success = result["success"]
+                if not success:
+                    current_app.logger.warning(f"Schedule {key} not executed: {result['message']}")
+            elif key == self.EXPIRE_MODES:
+                expired = self.mode_repository.cleanup_expired_modes()
+                current_app.logger.info(f"Deactivated {expired} expired modes")
+                success = True
+            else:
+                deleted = self.schedule_repository.cleanup_old_schedules()
+                current_app.logger.info(f"Cleaned up {deleted} old schedules")
+                self._cleanup_at = None
+                success = True
+        except Exception as e:
+            current_app.logger.error(f"Scheduler entry {key} failed: {str(e)}")
+            success = False
+
+        if success:
+            self._retry_at.pop(key, None)
+        else:
+            self._retry_at[key] = datetime.utcnow() + timedelta(seconds=self.RETRY_SECONDS)
 
-            # Sleep for the check interval
-            time.sleep(check_interval_seconds)
+    @staticmethod
+    def _seconds_until(moment: datetime) -> float:
+        return max(0.0, (moment - datetime.utcnow()).total_seconds())
 
     def get_next_executions(self, hours_ahead: int = 24) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """Get upcoming schedule executions"""
@@ -249,18 +469,8 @@ class ModeScheduler:
             if schedule.is_executed or schedule.is_cancelled:
                 return False, "SCHEDULE_ALREADY_PROCESSED", None
 
-            # Execute the schedule
-            result = self._execute_single_schedule(schedule)
-
-            if result["success"]:
-                # Mark as executed
-                self.schedule_repository.execute_schedule(schedule_id)
-
-                # Create next recurrence if needed
-                if schedule.should_create_recurrence():
-                    next_schedule = schedule.create_next_recurrence()
-                    if next_schedule:
-                        self.schedule_repository.create_schedule(next_schedule)
+            # Execute the schedule, even before it is due
+            result = self._run_schedule(schedule, force=True)
 
             return True, "SCHEDULE_FORCE_EXECUTED", result
 
@@ -313,13 +523,54 @@ class ModeScheduler:
             return False, "CLEANUP_FAILED", None
 
     def is_running(self) -> bool:
-        """Check if the background scheduler is running"""
-        return self._running and self._scheduler_thread and self._scheduler_thread.is_alive()
+        """Check if the scheduler loop is running in this process"""
+        thread_alive = self._scheduler_thread is None or self._scheduler_thread.is_alive()
+        return bool(self._running and thread_alive)
 
     def get_scheduler_status(self) -> Dict[str, Any]:
         """Get the current status of the scheduler"""
+        lease = self.lease_repository.get_lease(SchedulerLeaseRepository.MODE_SCHEDULER) or {}
+        heap = self._heap
+        next_entry = heap[0] if heap else None
+        lease_active = bool(lease.get('holder_id')) and lease.get('expires_at') is not None \
+            and lease['expires_at'] > datetime.utcnow()
+
         return {
             "is_running": self.is_running(),
             "thread_alive": self._scheduler_thread.is_alive() if self._scheduler_thread else False,
-            "started_at": getattr(self, '_started_at', None)
-        }
\ No newline at end of file
+            "started_at": self._started_at,
+            "worker_id": self.worker_id,
+            "is_leader": self._is_leader,
+            "leader": lease.get('holder_id') if lease_active else None,
+            "lease_expires_at": lease['expires_at'].isoformat() if lease_active else None,
+            "queued_entries": len(self._heap),
+            "next_fire_at": next_entry[0].isoformat() if next_entry else None
+        }
+
+
+def main(argv=None):
+    """CLI entry point for the mode scheduler"""
+    parser = argparse.ArgumentParser(description="Run scheduled game mode changes")
+    parser.add_argument('--once', action='store_true',
+                        help="Execute the schedules that are due and exit")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        scheduler = ModeScheduler()
+
+    if args.once:
+        with app.app_context():
+            success, message, data = scheduler.execute_pending_schedules()
+        app.logger.info(f"Mode scheduler: {message} {data or ''}")
+        return
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from .game_repository import GameRepository
 from .game_session_repository import GameSessionRepository
+from .session_move_repository import SessionMoveRepository
 
-__all__ = ['GameRepository', 'GameSessionRepository']
\ No newline at end of file
+__all__ = ['GameRepository', 'GameSessionRepository', 'SessionMoveRepository']
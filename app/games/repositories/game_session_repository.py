@@ -1,15 +1,33 @@
-from typing import Optional, List, Dict, Any
-from bson import ObjectId
-from pymongo import ASCENDING, DESCENDING
+from typing import Optional, List, Dict, Any, Iterator
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
 
 from app.core.repositories.base_repository import BaseRepository
 from ..models.game_session import GameSession
+from ..models.session_summary import SessionSummary
+from .session_move_repository import SessionMoveRepository
 
 class GameSessionRepository(BaseRepository):
-    """Repository for GameSession collection operations"""
+    """
+    Repository for GameSession collection operations
+
+    Session documents keep only moves_count and last_move; the move history
+    lives in bucketed session_moves documents (see SessionMoveRepository).
+
+    Ending a session stores its completion event on the session document
+    in the same update (see finish_session), so the event exists exactly
+    when the session is ended; workers claim events from there.
+    """
+
+    EVENT_PENDING = "pending"
+    EVENT_PROCESSING = "processing"
+    EVENT_DELIVERED = "delivered"
+    EVENT_FAILED = "failed"
 
     def __init__(self):
         super().__init__("game_sessions")
+        self.move_repo = SessionMoveRepository()
 
     def create_indexes(self):
         """Create indexes for the game_sessions collection"""
@@ -24,6 +42,14 @@ class GameSessionRepository(BaseRepository):
         self.collection.create_index([("user_id", ASCENDING), ("status", ASCENDING)])
         self.collection.create_index([("started_at", DESCENDING)])
         self.collection.create_index([("ended_at", DESCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        self.collection.create_index([("game_id", ASCENDING), ("created_at", DESCENDING)])
+        self.collection.create_index(
+            [("completion_event.status", ASCENDING), ("completion_event.available_at", ASCENDING)],
+            partialFilterExpression={"completion_event": {"$exists": True}}
+        )
+
+        self.move_repo.create_indexes()
 
     def create_session(self, session: GameSession) -> Optional[str]:
         """
@@ -100,6 +126,142 @@ class GameSessionRepository(BaseRepository):
         )
         return [GameSession.from_dict(data) for data in sessions_data]
 
+    def find_user_sessions_by_date_range(self, user_id: str, start_date: datetime,
+                                         end_date: datetime) -> List[Dict[str, Any]]:
+        """
+        Get raw session documents a user created within a date range.
+
+        Args:
+            user_id: The user ID
+            start_date: Inclusive lower bound on created_at
+            end_date: Inclusive upper bound on created_at
+
+        Returns:
+            List[Dict[str, Any]]: Session documents, newest first
+        """
+        return self.find_many(
+            {
+                "user_id": user_id,
+                "created_at": {"$gte": start_date, "$lte": end_date}
+            },
+            sort=[("created_at", DESCENDING)]
+        )
+
+    def get_user_session_summaries(self, user_id: str, status: str = None,
+                                   limit: int = None, skip: int = None) -> List[SessionSummary]:
+        """
+        Get scalar summaries of a user's sessions, newest first.
+
+        Args:
+            user_id: The user ID
+            status: Optional status filter
+            limit: Maximum number of sessions to return
+            skip: Number of sessions to skip
+
+        Returns:
+            List[SessionSummary]: Session summaries
+        """
+        filter_dict = {"user_id": user_id}
+        if status:
+            filter_dict["status"] = status
+
+        return self._find_summaries(filter_dict, [("started_at", DESCENDING)], limit, skip)
+
+    def get_recent_session_summaries_by_game(self, game_id: str, days: int = 7,
+                                             limit: int = 100) -> List[SessionSummary]:
+        """
+        Get scalar summaries of a game's recent sessions, newest first.
+
+        Args:
+            game_id: The game ID
+            days: Number of days to look back
+            limit: Maximum number of sessions to return
+
+        Returns:
+            List[SessionSummary]: Session summaries
+        """
+        from datetime import timedelta
+
+        since_date = datetime.utcnow() - timedelta(days=days)
+        return self._find_summaries(
+            {
+                "game_id": game_id,
+                "created_at": {"$gte": since_date}
+            },
+            [("created_at", DESCENDING)],
+            limit
+        )
+
+    def get_recent_players_by_game(self, game_id: str, days: int = 7) -> Dict[str, datetime]:
+        """
+        Get every user who played a game recently with their last session time.
+
+        Args:
+            game_id: The game ID
+            days: Number of days to look back
+
+        Returns:
+            Dict[str, datetime]: Last session creation time keyed by user ID
+        """
+        since_date = datetime.utcnow() - timedelta(days=days)
+        pipeline = [
+            {"$match": {"game_id": game_id, "created_at": {"$gte": since_date}}},
+            {"$group": {"_id": "$user_id", "last_played": {"$max": "$created_at"}}}
+        ]
+        return {row["_id"]: row["last_played"] for row in self.collection.aggregate(pipeline)}
+
+    def _find_summaries(self, filter_dict: Dict[str, Any], sort: List[tuple],
+                        limit: int = None, skip: int = None) -> List[SessionSummary]:
+        """Run a session query projected to SessionSummary fields"""
+        cursor = self.collection.find(filter_dict, SessionSummary.PROJECTION).sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        return [SessionSummary.from_dict(data) for data in cursor]
+
+    def get_daily_activity_by_users(self, user_ids: List[str], since: datetime) -> List[Dict[str, Any]]:
+        """
+        Get per-user, per-day session totals for several users in one aggregation.
+
+        Args:
+            user_ids: The user IDs
+            since: Inclusive lower bound on created_at
+
+        Returns:
+            List[Dict[str, Any]]: Rows of {user_id, day, play_ms, sessions, games}
+        """
+        if self.collection is None or not user_ids:
+            return []
+
+        pipeline = [
+            {"$match": {
+                "user_id": {"$in": [str(user_id) for user_id in user_ids]},
+                "created_at": {"$gte": since}
+            }},
+            {"$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+                },
+                "play_ms": {"$sum": {"$ifNull": ["$play_duration", 0]}},
+                "sessions": {"$sum": 1},
+                "games": {"$addToSet": "$game_id"}
+            }}
+        ]
+
+        return [
+            {
+                "user_id": row["_id"]["user_id"],
+                "day": row["_id"]["day"],
+                "play_ms": row["play_ms"],
+                "sessions": row["sessions"],
+                "games": [str(game_id) for game_id in row["games"] if game_id]
+            }
+            for row in self.collection.aggregate(pipeline)
+        ]
+
     def get_game_sessions(self, game_id: str, status: str = None,
                          limit: int = None, skip: int = None) -> List[GameSession]:
         """
@@ -149,13 +311,20 @@ class GameSessionRepository(BaseRepository):
             return GameSession.from_dict(session_data)
         return None
 
-    def update_session(self, session_id: str, session: GameSession) -> bool:
+    def update_session(self, session_id: str, session: GameSession,
+                       expected_sync_version: Optional[int] = None) -> bool:
         """
         Update a session.
 
+        moves_count and last_move are not written: moves are recorded with
+        append_session_moves, and saving a loaded session must not roll back
+        a count advanced concurrently.
+
         Args:
             session_id: The session ID (session_id field, not document _id)
             session: Updated session instance
+            expected_sync_version: If given, only update while the stored
+                sync_version still equals it (compare-and-swap)
 
         Returns:
             bool: True if successful, False otherwise
@@ -164,8 +333,111 @@ class GameSessionRepository(BaseRepository):
         session_data.pop("_id", None)  # Remove _id
         session_data.pop("session_id", None)  # Don't update session_id
         session_data.pop("started_at", None)  # Don't update started_at
+        session_data.pop("moves_count", None)  # Owned by append_session_moves
+        session_data.pop("last_move", None)
+
+        filter_dict = {"session_id": session_id}
+        if expected_sync_version is not None:
+            filter_dict["sync_version"] = expected_sync_version
+
+        return self.update_one(filter_dict, session_data)
+
+    def update_session_fields(self, session_id: str, values: Dict[str, Any],
+                              expected_sync_version: Optional[int] = None) -> bool:
+        """
+        Write only the given top-level fields of a live session.
+
+        Sessions already completed or abandoned are not matched, so a late
+        write cannot overwrite an ended session.
+
+        Args:
+            session_id: The session ID
+            values: Field values to $set
+            expected_sync_version: If given, only update while the stored
+                sync_version still equals it (compare-and-swap)
+
+        Returns:
+            bool: True if a session matched, False otherwise
+        """
+        filter_dict = self._live_session_filter(session_id)
+        if expected_sync_version is not None:
+            filter_dict["sync_version"] = expected_sync_version
+
+        result = self.collection.update_one(filter_dict, {"$set": self._writable_fields(values)})
+        return result.matched_count > 0
+
+    def flush_session_fields(self, changes: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Persist coalesced field changes of several sessions in one unordered bulk write.
+
+        Sessions ended since the changes were buffered are skipped.
+
+        Args:
+            changes: Field values to $set, keyed by session ID
+
+        Returns:
+            int: Number of sessions written
+        """
+        operations = [
+            UpdateOne(self._live_session_filter(session_id), {"$set": self._writable_fields(values)})
+            for session_id, values in changes.items()
+            if self._writable_fields(values)
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def _live_session_filter(self, session_id: str) -> Dict[str, Any]:
+        """Match a session only while it is active or paused"""
+        return {"session_id": session_id, "status": {"$in": ["active", "paused"]}}
 
-        return self.update_one({"session_id": session_id}, session_data)
+    def _writable_fields(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop identity fields and the move counters owned by append_session_moves"""
+        protected = {"_id", "session_id", "started_at", "moves_count", "last_move"}
+        return {field: value for field, value in values.items() if field not in protected}
+
+    def apply_sync_delta(self, session_id: str, expected_sync_version: int,
+                         update: Dict[str, Any], conditions: Dict[str, Any] = None,
+                         projection: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Apply a device delta in one atomic compare-and-swap on sync_version.
+
+        The update only matches while the session is not ended and its
+        sync_version still equals the version the delta was built on; it
+        increments sync_version and stamps last_sync_at.
+
+        Args:
+            session_id: The session ID
+            expected_sync_version: Server version the device's delta is based on
+            update: MongoDB update operators for the changed paths
+            conditions: Extra field conditions that must hold (e.g. patch tests)
+            projection: Dotted paths to return besides the sync fields
+
+        Returns:
+            Optional[Dict[str, Any]]: The projected document after the update,
+            or None if no session matched
+        """
+        now = datetime.utcnow()
+        update = {key: dict(value) for key, value in update.items()}
+        update.setdefault("$set", {}).update({"last_sync_at": now, "updated_at": now})
+        update.setdefault("$inc", {})["sync_version"] = 1
+
+        filter_dict = {
+            **(conditions or {}),
+            "session_id": session_id,
+            "sync_version": expected_sync_version,
+            "status": {"$nin": ["completed", "abandoned"]}
+        }
+
+        fields = {"_id": 0, "sync_version": 1, "last_sync_at": 1}
+        fields.update({path: 1 for path in projection or []})
+
+        return self.collection.find_one_and_update(
+            filter_dict,
+            update,
+            projection=fields,
+            return_document=ReturnDocument.AFTER
+        )
 
     def update_session_state(self, session_id: str, new_state: Dict[str, Any]) -> bool:
         """
@@ -195,7 +467,7 @@ class GameSessionRepository(BaseRepository):
         update_data = {"score": new_score}
         return self.update_one({"session_id": session_id}, update_data)
 
-    def add_session_move(self, session_id: str, move: Dict[str, Any]) -> bool:
+    def add_session_move(self, session_id: str, move: Dict[str, Any]) -> Optional[int]:
         """
         Add a move to a session.
 
@@ -204,21 +476,124 @@ class GameSessionRepository(BaseRepository):
             move: The move data
 
         Returns:
-            bool: True if successful, False otherwise
+            Optional[int]: The move number if recorded, None if the session was not found
         """
-        if not ObjectId.is_valid(session_id) and not self.find_one({"session_id": session_id}):
-            return False
+        result = self.append_session_moves(session_id, [move])
+        return result["moves_count"] if result else None
 
-        move_with_timestamp = {
-            **move,
-            "timestamp": self._get_current_time(),
-        }
+    def append_session_moves(self, session_id: str,
+                             moves: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Append moves to a session's bucketed move history.
 
-        result = self.collection.update_one(
+        One update on the session increments moves_count, which allocates the
+        move numbers; the moves are then pushed to their buckets, and only
+        then is last_move published, so readers never see a last move whose
+        history is missing.
+
+        Args:
+            session_id: The session ID
+            moves: The moves, in order
+
+        Returns:
+            Optional[Dict[str, Any]]: {"moves_count", "last_move"} after the
+            append, or None if the session was not found
+        """
+        if not moves:
+            return None
+
+        now = self._get_current_time()
+        timestamped_moves = [{**move, "timestamp": now} for move in moves]
+
+        session_data = self.collection.find_one_and_update(
             {"session_id": session_id},
-            {"$push": {"moves": move_with_timestamp}}
+            {"$inc": {"moves_count": len(moves)}, "$set": {"updated_at": now}},
+            projection={"_id": 0, "moves_count": 1},
+            return_document=ReturnDocument.AFTER
         )
-        return result.modified_count > 0
+        if session_data is None:
+            return None
+
+        moves_count = session_data["moves_count"]
+        self.store_counted_moves(session_id, timestamped_moves, moves_count)
+
+        # A later append that allocated past moves_count publishes its own last move
+        self.collection.update_one(
+            {"session_id": session_id, "moves_count": moves_count},
+            {"$set": {"last_move": timestamped_moves[-1]}}
+        )
+        return {"moves_count": moves_count, "last_move": timestamped_moves[-1]}
+
+    def store_counted_moves(self, session_id: str, moves: List[Dict[str, Any]],
+                            moves_count: int) -> int:
+        """
+        Write moves already counted in the session's moves_count to their buckets.
+
+        If the write fails, the allocated range is recorded under
+        unstored_move_ranges on the session before the error is re-raised,
+        so the gap in the history stays visible.
+
+        Args:
+            session_id: The session ID
+            moves: The moves, in order, ending with the move numbered moves_count
+            moves_count: The session's moves_count after the moves were counted
+
+        Returns:
+            int: Number of moves written
+        """
+        first_move_number = moves_count - len(moves) + 1
+        try:
+            return self.move_repo.append_moves(session_id, moves, first_move_number)
+        except PyMongoError:
+            self.collection.update_one(
+                {"session_id": session_id},
+                {"$push": {"unstored_move_ranges": {"from": first_move_number, "to": moves_count,
+                                                    "at": self._get_current_time()}}}
+            )
+            raise
+
+    def iter_session_moves(self, session_id: str, from_move: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a session's moves in order for replay.
+
+        Args:
+            session_id: The session ID
+            from_move: First move number to yield (1-based)
+
+        Returns:
+            Iterator[Dict[str, Any]]: Moves with their move_number
+        """
+        return self.move_repo.iter_moves(session_id, from_move)
+
+    def migrate_embedded_moves(self) -> int:
+        """
+        Move move histories still embedded in session documents to session_moves.
+
+        Run before sessions record new moves: the embedded history is written
+        as moves 1..N, replacing any buckets the session already has.
+
+        Returns:
+            int: Number of sessions migrated
+        """
+        migrated = 0
+
+        for session_data in self.collection.find({"moves": {"$exists": True}},
+                                                 {"session_id": 1, "moves": 1}):
+            moves = session_data.get("moves") or []
+            if moves:
+                self.move_repo.delete_session_moves(session_data["session_id"])
+                self.move_repo.append_moves(session_data["session_id"], moves, 1)
+
+            self.collection.update_one(
+                {"_id": session_data["_id"]},
+                {
+                    "$set": {"moves_count": len(moves), "last_move": moves[-1] if moves else None},
+                    "$unset": {"moves": ""}
+                }
+            )
+            migrated += 1
+
+        return migrated
 
     def complete_session(self, session_id: str, final_score: int = None,
                         credits_earned: int = None, achievements: List[str] = None) -> bool:
@@ -266,6 +641,113 @@ class GameSessionRepository(BaseRepository):
         }
         return self.update_one({"session_id": session_id}, update_data)
 
+    def finish_session(self, session_id: str, status: str, values: Dict[str, Any],
+                       completion_event: Dict[str, Any]) -> Optional[GameSession]:
+        """
+        End a live session and record its completion event in one update.
+
+        Args:
+            session_id: The session ID
+            status: Final status (completed, abandoned)
+            values: Other fields to $set (final score, credits, buffered changes)
+            completion_event: Event stored under completion_event for the consumers
+
+        Returns:
+            Optional[GameSession]: The ended session, or None if it was not active or paused
+        """
+        now = self._get_current_time()
+        document = self.collection.find_one_and_update(
+            {"session_id": session_id, "status": {"$in": ["active", "paused"]}},
+            {"$set": {
+                **self._writable_fields(values),
+                "status": status,
+                "ended_at": now,
+                "updated_at": now,
+                "completion_event": {
+                    **completion_event,
+                    "status": self.EVENT_PENDING,
+                    "attempts": 0,
+                    "created_at": now,
+                    "available_at": now
+                }
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        return GameSession.from_dict(document) if document else None
+
+    def claim_completion_event(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the session with the oldest due completion event
+
+        Events whose worker lease expired (crashed worker) are claimable again.
+        """
+        now = datetime.utcnow()
+
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"completion_event.status": self.EVENT_PENDING, "completion_event.available_at": {"$lte": now}},
+                    {"completion_event.status": self.EVENT_PROCESSING, "completion_event.locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "completion_event.status": self.EVENT_PROCESSING,
+                    "completion_event.worker_id": worker_id,
+                    "completion_event.locked_until": now + timedelta(seconds=lease_seconds)
+                },
+                "$inc": {"completion_event.attempts": 1}
+            },
+            sort=[("completion_event.available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def ack_completion_consumer(self, session_id: str, consumer: str) -> bool:
+        """Record that a consumer handled a session's completion event"""
+        result = self.collection.update_one(
+            {"session_id": session_id},
+            {"$pull": {"completion_event.pending_consumers": consumer}}
+        )
+        return result.modified_count > 0
+
+    def complete_completion_event(self, session_id: str) -> bool:
+        """Mark a completion event as delivered to every consumer"""
+        result = self.collection.update_one(
+            {"session_id": session_id},
+            {
+                "$set": {"completion_event.status": self.EVENT_DELIVERED,
+                         "completion_event.delivered_at": datetime.utcnow()},
+                "$unset": {"completion_event.locked_until": ""}
+            }
+        )
+        return result.modified_count > 0
+
+    def fail_completion_event(self, document: Dict[str, Any], error: str,
+                              max_attempts: int, retry_delay_seconds: float) -> bool:
+        """
+        Release a completion event for retry, or park it once attempts run out
+
+        Returns:
+            bool: True if the event will be retried
+        """
+        event = document.get("completion_event", {})
+        retry = event.get("attempts", 0) < max_attempts
+        update = {"completion_event.status": self.EVENT_PENDING if retry else self.EVENT_FAILED,
+                  "completion_event.last_error": error}
+        if retry:
+            update["completion_event.available_at"] = datetime.utcnow() + timedelta(seconds=retry_delay_seconds)
+
+        self.collection.update_one({"session_id": document["session_id"]}, {"$set": update})
+        return retry
+
+    def get_completion_event_stats(self) -> Dict[str, int]:
+        """Get completion event counts by status"""
+        pipeline = [
+            {"$match": {"completion_event": {"$exists": True}}},
+            {"$group": {"_id": "$completion_event.status", "count": {"$sum": 1}}}
+        ]
+        return {row["_id"]: row["count"] for row in self.collection.aggregate(pipeline)}
+
     def pause_session(self, session_id: str) -> bool:
         """
         Pause a session.
@@ -300,6 +782,7 @@ class GameSessionRepository(BaseRepository):
         Returns:
             bool: True if successful, False otherwise
         """
+        self.move_repo.delete_session_moves(session_id)
         return self.delete_one({"session_id": session_id})
 
     def get_user_session_stats(self, user_id: str) -> Dict[str, Any]:
@@ -0,0 +1,108 @@
+from typing import List, Dict, Any, Iterator
+from pymongo import ASCENDING, UpdateOne
+
+from app.core.repositories.base_repository import BaseRepository
+
+
+class SessionMoveRepository(BaseRepository):
+    """
+    Repository for game session moves stored in fixed-size buckets
+
+    Collection: session_moves
+
+    Moves are appended to bucket documents keyed by (session_id, bucket),
+    each holding up to BUCKET_SIZE moves, instead of being embedded in the
+    session document. Move numbers are allocated by the session's
+    moves_count, so the bucket of a move is known before it is written and
+    appends never read the bucket first.
+    """
+
+    # Moves held by one bucket document
+    BUCKET_SIZE = 100
+
+    # Bucket documents fetched per cursor batch when replaying moves
+    READ_BATCH_SIZE = 20
+
+    def __init__(self):
+        super().__init__("session_moves")
+
+    def create_indexes(self):
+        """Create indexes for the session_moves collection"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        self.collection.create_index([("session_id", ASCENDING), ("bucket", ASCENDING)], unique=True)
+
+    def append_moves(self, session_id: str, moves: List[Dict[str, Any]],
+                     first_move_number: int) -> int:
+        """
+        Append numbered moves to their buckets in one unordered bulk write.
+
+        Args:
+            session_id: The session ID
+            moves: Moves in order, already timestamped
+            first_move_number: Number allocated to the first move (1-based)
+
+        Returns:
+            int: Number of moves written
+        """
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for offset, move in enumerate(moves):
+            move_number = first_move_number + offset
+            buckets.setdefault(self._bucket_of(move_number), []).append(
+                {**move, "move_number": move_number}
+            )
+
+        if not buckets:
+            return 0
+
+        now = self._get_current_time()
+        operations = [
+            UpdateOne(
+                {"session_id": session_id, "bucket": bucket},
+                {
+                    "$push": {"moves": {"$each": bucket_moves}},
+                    "$inc": {"count": len(bucket_moves)},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            for bucket, bucket_moves in buckets.items()
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+
+        return len(moves)
+
+    def iter_moves(self, session_id: str, from_move: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a session's moves in move order, one bucket batch at a time.
+
+        Args:
+            session_id: The session ID
+            from_move: First move number to yield (1-based)
+
+        Yields:
+            Dict[str, Any]: Moves with their move_number
+        """
+        from_move = max(from_move, 1)
+        cursor = self.collection.find(
+            {"session_id": session_id, "bucket": {"$gte": self._bucket_of(from_move)}},
+            {"_id": 0, "moves": 1}
+        ).sort("bucket", ASCENDING).batch_size(self.READ_BATCH_SIZE)
+
+        for bucket in cursor:
+            # Concurrent appends to one bucket may land out of order
+            for move in sorted(bucket.get("moves", []), key=lambda move: move["move_number"]):
+                if move["move_number"] >= from_move:
+                    yield move
+
+    def delete_session_moves(self, session_id: str) -> int:
+        """Delete all move buckets of a session"""
+        result = self.collection.delete_many({"session_id": session_id})
+        return result.deleted_count
+
+    def _bucket_of(self, move_number: int) -> int:
+        """Bucket index holding a 1-based move number"""
+        return (move_number - 1) // self.BUCKET_SIZE
@@ -1,10 +1,34 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence, Union
 from flask import current_app
 from datetime import datetime
 import math
 
+import numpy as np
+
 class UniversalScorer:
-    """Universal scoring system for normalizing scores across different games"""
+    """
+    Universal scoring system for normalizing scores across different games
+
+    The *_batch methods take arrays of scores and compute the same values as
+    their single-score counterparts with NumPy, for jobs that score whole
+    tournaments or leaderboards at once.
+    """
+
+    # Session length bands: (upper bound in minutes, time factor)
+    TIME_FACTOR_BANDS = [
+        (1, 0.5),   # Very short sessions get penalized
+        (5, 0.8),   # Short sessions
+        (15, 1.0),  # Optimal time range
+        (30, 0.9),  # Slightly longer sessions
+        (60, 0.8)   # Long sessions
+    ]
+    LONG_SESSION_TIME_FACTOR = 0.7  # Very long sessions get diminishing returns
+
+    # Game-specific adjustments; they accept a score or an array of scores
+    GAME_ADJUSTMENTS = {
+        "tetris": lambda score: np.minimum(2.0, score / 10000),  # Tetris scores can be very high
+        "snake": lambda score: np.maximum(0.5, score / 100),     # Snake scores are usually lower
+    }
 
     def __init__(self):
         # Game difficulty multipliers
@@ -119,13 +143,61 @@ class UniversalScorer:
         Returns:
             float: Percentile rank (0-100)
         """
-        if not all_scores:
-            return 50.0  # Default to 50th percentile if no data
+        return float(self.get_percentile_ranks_batch([user_score], all_scores)[0])
+
+    def normalize_scores_batch(self, game_type: str, raw_scores: Sequence[float], difficulty: str,
+                               session_time_seconds: Union[float, Sequence[float]],
+                               game_id: str = None) -> np.ndarray:
+        """
+        Normalize many raw scores of one game at once.
+
+        Args:
+            game_type: Type of game (puzzle, action, strategy, etc.)
+            raw_scores: Raw scores from the game
+            difficulty: Game difficulty level
+            session_time_seconds: Time spent playing, per score or shared
+            game_id: Optional specific game ID for game-specific adjustments
+
+        Returns:
+            np.ndarray: Normalized scores, as normalize_score computes them
+        """
+        raw_scores = np.asarray(raw_scores, dtype=np.float64)
+        try:
+            base_score = self.game_type_bases.get(game_type, 100)
+            difficulty_mult = self.difficulty_multipliers.get(difficulty, 1.0)
+            time_factor = self._calculate_time_factors(np.asarray(session_time_seconds, dtype=np.float64) / 60)
+            score_factor = np.log10(np.maximum(1, raw_scores)) / 4
+            game_adjustment = self._get_game_specific_adjustments(game_id, raw_scores)
+
+            normalized_scores = base_score * difficulty_mult * time_factor * score_factor * game_adjustment
+            return np.round(np.broadcast_to(normalized_scores, raw_scores.shape), 2)
+
+        except Exception as e:
+            current_app.logger.error(f"Batch score normalization error: {str(e)}")
+            return raw_scores / 10  # Fallback normalization
+
+    def get_percentile_ranks_batch(self, user_scores: Sequence[float],
+                                   all_scores: Sequence[float]) -> np.ndarray:
+        """
+        Calculate percentile ranks for many scores against one population.
 
-        scores_below = sum(1 for score in all_scores if score < user_score)
-        percentile = (scores_below / len(all_scores)) * 100
+        Sorts the population once and counts the scores below each user
+        score with a binary search: O((n + m) log n) instead of O(n * m).
 
-        return round(percentile, 2)
+        Args:
+            user_scores: Scores to rank
+            all_scores: All scores to compare against
+
+        Returns:
+            np.ndarray: Percentile ranks (0-100), one per user score
+        """
+        user_scores = np.asarray(user_scores, dtype=np.float64)
+        all_scores = np.asarray(all_scores, dtype=np.float64)
+        if all_scores.size == 0:
+            return np.full(user_scores.shape, 50.0)  # Default to 50th percentile if no data
+
+        scores_below = np.searchsorted(np.sort(all_scores), user_scores, side="left")
+        return np.round(scores_below / all_scores.size * 100, 2)
 
     def calculate_team_contribution(self, individual_score: float, team_size: int,
                                   difficulty_bonus: float = 1.0) -> float:
@@ -253,59 +325,71 @@ class UniversalScorer:
 
     def _calculate_time_factor(self, time_minutes: float) -> float:
         """Calculate time-based scoring factor"""
-        if time_minutes <= 1:
-            return 0.5  # Very short sessions get penalized
-        elif time_minutes <= 5:
-            return 0.8  # Short sessions
-        elif time_minutes <= 15:
-            return 1.0  # Optimal time range
-        elif time_minutes <= 30:
-            return 0.9  # Slightly longer sessions
-        elif time_minutes <= 60:
-            return 0.8  # Long sessions
-        else:
-            return 0.7  # Very long sessions get diminishing returns
+        for upper_bound, factor in self.TIME_FACTOR_BANDS:
+            if time_minutes <= upper_bound:
+                return factor
+        return self.LONG_SESSION_TIME_FACTOR
+
+    def _calculate_time_factors(self, time_minutes: np.ndarray) -> np.ndarray:
+        """Calculate time-based scoring factors for an array of session lengths"""
+        return np.select(
+            [time_minutes <= upper_bound for upper_bound, _ in self.TIME_FACTOR_BANDS],
+            [factor for _, factor in self.TIME_FACTOR_BANDS],
+            default=self.LONG_SESSION_TIME_FACTOR
+        )
 
     def _get_game_specific_adjustment(self, game_id: str, raw_score: int) -> float:
         """Get game-specific score adjustments"""
         # This could be expanded with a database of game-specific rules
-        game_adjustments = {
-            # Example adjustments for specific games
-            "tetris": lambda score: min(2.0, score / 10000),  # Tetris scores can be very high
-            "snake": lambda score: max(0.5, score / 100),     # Snake scores are usually lower
-        }
+        game_adjustments = self.GAME_ADJUSTMENTS
 
         if game_id in game_adjustments:
             try:
-                return game_adjustments[game_id](raw_score)
+                return float(game_adjustments[game_id](raw_score))
             except:
                 return 1.0
 
         return 1.0  # Default: no adjustment
 
+    def _get_game_specific_adjustments(self, game_id: str, raw_scores: np.ndarray) -> Union[float, np.ndarray]:
+        """Get game-specific adjustments for an array of scores"""
+        if game_id in self.GAME_ADJUSTMENTS:
+            return self.GAME_ADJUSTMENTS[game_id](raw_scores)
+        return 1.0
+
     def get_score_distribution_stats(self, scores: List[float]) -> Dict[str, float]:
         """Get statistical distribution of scores"""
-        if not scores:
+        return self.get_score_distribution_stats_batch(scores)
+
+    def get_score_distribution_stats_batch(self, scores: Sequence[float]) -> Dict[str, float]:
+        """
+        Get statistical distribution of an array of scores.
+
+        One sort yields the median and quartiles (taken at the same
+        positions as before, without interpolation); mean and standard
+        deviation are computed in NumPy.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        n = scores.size
+        if n == 0:
             return {}
 
-        scores_sorted = sorted(scores)
-        n = len(scores_sorted)
+        scores_sorted = np.sort(scores)
 
         return {
-            "mean": sum(scores) / n,
-            "median": scores_sorted[n // 2] if n % 2 == 1 else (scores_sorted[n // 2 - 1] + scores_sorted[n // 2]) / 2,
-            "min": min(scores),
-            "max": max(scores),
+            "mean": float(scores.mean()),
+            "median": float(scores_sorted[n // 2] if n % 2 == 1 else (scores_sorted[n // 2 - 1] + scores_sorted[n // 2]) / 2),
+            "min": float(scores_sorted[0]),
+            "max": float(scores_sorted[-1]),
             "std_dev": self._calculate_std_dev(scores),
-            "q1": scores_sorted[n // 4],
-            "q3": scores_sorted[3 * n // 4]
+            "q1": float(scores_sorted[n // 4]),
+            "q3": float(scores_sorted[3 * n // 4])
         }
 
-    def _calculate_std_dev(self, scores: List[float]) -> float:
-        """Calculate standard deviation"""
-        if len(scores) < 2:
+    def _calculate_std_dev(self, scores: Sequence[float]) -> float:
+        """Calculate sample standard deviation"""
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.size < 2:
             return 0.0
 
-        mean = sum(scores) / len(scores)
-        variance = sum((x - mean) ** 2 for x in scores) / (len(scores) - 1)
-        return math.sqrt(variance)
\ No newline at end of file
+        return float(scores.std(ddof=1))
@@ -0,0 +1,413 @@
+import atexit
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable
+
+from ..models.game_session import GameSession
+
+
+class LocalActiveSessionBackend:
+    """
+    Per-worker session map
+
+    Only correct when a single process serves every request for a session
+    (tests, one worker, sticky routing); use a shared backend otherwise.
+    Like the Redis backend, sessions expire TTL_SECONDS after their last
+    load or update, and beyond MAX_SESSIONS the least recently used
+    sessions without pending changes are dropped.
+    """
+
+    TTL_SECONDS = 24 * 3600
+    MAX_SESSIONS = int(os.getenv('ACTIVE_SESSION_LOCAL_MAX_SESSIONS', '10000'))
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_sessions: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or self.TTL_SECONDS
+        self.max_sessions = max_sessions or self.MAX_SESSIONS
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+        self._dirty: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            document = self._live(session_id)
+            return copy.deepcopy(document) if document is not None else None
+
+    def load(self, session_id: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if self._live(session_id) is None:
+                self._documents[session_id] = copy.deepcopy(document)
+            self._touch(session_id)
+            self._prune()
+            return copy.deepcopy(self._documents[session_id])
+
+    def update(self, session_id: str, values: Dict[str, Any], mark_dirty: bool = True,
+               expected_sync_version: Optional[int] = None) -> Optional[bool]:
+        with self._lock:
+            document = self._live(session_id)
+            if document is None:
+                return None
+            if expected_sync_version is not None and document.get("sync_version") != expected_sync_version:
+                return False
+
+            document.update(copy.deepcopy(values))
+            self._touch(session_id)
+            if mark_dirty:
+                self._dirty.setdefault(session_id, set()).update(values)
+            return True
+
+    def take_dirty(self, session_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            session_ids = [session_id] if session_id is not None else list(self._dirty)
+            changes = {}
+            for dirty_id in session_ids:
+                fields = self._dirty.pop(dirty_id, None)
+                document = self._documents.get(dirty_id)
+                if fields and document is not None:
+                    changes[dirty_id] = {field: document[field] for field in fields}
+            return changes
+
+    def mark_dirty(self, session_id: str, fields: Iterable[str]):
+        with self._lock:
+            if session_id in self._documents:
+                self._dirty.setdefault(session_id, set()).update(fields)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _live(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session's document unless it expired (caller holds the lock)"""
+        document = self._documents.get(session_id)
+        if document is not None and self._expires_at.get(session_id, 0) <= time.monotonic():
+            self._drop(session_id)
+            return None
+        return document
+
+    def _touch(self, session_id: str):
+        self._expires_at[session_id] = time.monotonic() + self.ttl_seconds
+        self._documents.move_to_end(session_id)
+
+    def _prune(self):
+        """Drop least recently used sessions without pending changes over max_sessions"""
+        for session_id in list(self._documents):
+            if len(self._documents) <= self.max_sessions:
+                break
+            if session_id not in self._dirty:
+                self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        self._documents.pop(session_id, None)
+        self._expires_at.pop(session_id, None)
+        self._dirty.pop(session_id, None)
+
+
+class RedisActiveSessionBackend:
+    """
+    Session map shared by all workers, stored in Redis (requires the redis package)
+
+    Each session is a hash of JSON-encoded top-level fields; the names of
+    fields changed since the last flush are kept in a per-session set and
+    the sessions with pending changes in a global set, so any worker's
+    flusher can drain them.
+    """
+
+    KEY_PREFIX = "goodplay:active_session:"
+    DIRTY_SESSIONS_KEY = "goodplay:active_session:dirty"
+    TTL_SECONDS = 24 * 3600
+    CAS_RETRIES = 5
+
+    def __init__(self, url: str):
+        import redis
+        from bson import json_util
+
+        self.client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self._dumps = json_util.dumps
+        self._loads = json_util.loads
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.hgetall(self._key(session_id))
+        document = {field.decode(): self._loads(value) for field, value in raw.items()}
+        return document if "session_id" in document else None
+
+    def load(self, session_id: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(session_id)
+        with self.client.pipeline() as pipeline:
+            for _ in range(self.CAS_RETRIES):
+                try:
+                    # The whole hash is written in one MULTI, so readers never see it partly loaded
+                    pipeline.watch(key)
+                    if pipeline.exists(key):
+                        pipeline.unwatch()
+                        break
+
+                    pipeline.multi()
+                    pipeline.hset(key, mapping=self._encode(document))
+                    pipeline.expire(key, self.TTL_SECONDS)
+                    pipeline.execute()
+                    return document
+                except self._watch_error:
+                    continue
+        return self.get(session_id) or document
+
+    def update(self, session_id: str, values: Dict[str, Any], mark_dirty: bool = True,
+               expected_sync_version: Optional[int] = None) -> Optional[bool]:
+        key = self._key(session_id)
+        with self.client.pipeline() as pipeline:
+            for _ in range(self.CAS_RETRIES):
+                try:
+                    pipeline.watch(key)
+                    if not pipeline.exists(key):
+                        return None
+                    current_version = pipeline.hget(key, "sync_version")
+                    if expected_sync_version is not None and \
+                            self._loads(current_version) != expected_sync_version:
+                        return False
+
+                    pipeline.multi()
+                    pipeline.hset(key, mapping=self._encode(values))
+                    pipeline.expire(key, self.TTL_SECONDS)
+                    if mark_dirty:
+                        pipeline.sadd(self._dirty_key(session_id), *values.keys())
+                        pipeline.sadd(self.DIRTY_SESSIONS_KEY, session_id)
+                    pipeline.execute()
+                    return True
+                except self._watch_error:
+                    continue
+        return False
+
+    def take_dirty(self, session_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        if session_id is not None:
+            session_ids = [session_id]
+        else:
+            session_ids = [value.decode() for value in self.client.smembers(self.DIRTY_SESSIONS_KEY)]
+
+        changes = {}
+        for dirty_id in session_ids:
+            # Clear the marks before reading values: a change landing in
+            # between is re-marked and flushed again next time
+            pipeline = self.client.pipeline()
+            pipeline.smembers(self._dirty_key(dirty_id))
+            pipeline.delete(self._dirty_key(dirty_id))
+            pipeline.srem(self.DIRTY_SESSIONS_KEY, dirty_id)
+            fields = [field.decode() for field in pipeline.execute()[0]]
+            if not fields:
+                continue
+
+            values = self.client.hmget(self._key(dirty_id), fields)
+            changes[dirty_id] = {
+                field: self._loads(value) for field, value in zip(fields, values) if value is not None
+            }
+        return changes
+
+    def mark_dirty(self, session_id: str, fields: Iterable[str]):
+        pipeline = self.client.pipeline()
+        pipeline.sadd(self._dirty_key(session_id), *fields)
+        pipeline.sadd(self.DIRTY_SESSIONS_KEY, session_id)
+        pipeline.execute()
+
+    def delete(self, session_id: str):
+        pipeline = self.client.pipeline()
+        pipeline.delete(self._key(session_id), self._dirty_key(session_id))
+        pipeline.srem(self.DIRTY_SESSIONS_KEY, session_id)
+        pipeline.execute()
+
+    def _encode(self, values: Dict[str, Any]) -> Dict[str, str]:
+        return {field: self._dumps(value) for field, value in values.items()}
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def _dirty_key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}:dirty"
+
+
+class ActiveSessionStore:
+    """
+    Write-behind store for game sessions in status active or paused
+
+    Services read sessions with get() and write the fields they changed
+    with save(). With a backend configured, live sessions are served and
+    updated in the backend, and a background flusher persists the
+    coalesced changes to game_sessions every FLUSH_INTERVAL_MS; callers
+    flush explicitly on pause and before ending a session. Without one
+    (ACTIVE_SESSION_STORE_BACKEND=off, the default), reads go to MongoDB
+    and save() writes only the changed fields through.
+
+    Backends: "local" keeps sessions in this worker's memory and is only
+    safe when one process serves each session; "redis" shares them between
+    workers (ACTIVE_SESSION_STORE_URL).
+    """
+
+    BACKEND = os.getenv('ACTIVE_SESSION_STORE_BACKEND', 'off')
+    REDIS_URL = os.getenv('ACTIVE_SESSION_STORE_URL', 'redis://localhost:6379/0')
+    FLUSH_INTERVAL_MS = int(os.getenv('ACTIVE_SESSION_FLUSH_INTERVAL_MS', '2000'))
+
+    HOT_STATUSES = ("active", "paused")
+
+    def __init__(self, backend=None, session_repository=None,
+                 flush_interval_ms: Optional[int] = None):
+        """
+        Initialize ActiveSessionStore
+
+        Args:
+            backend: Session map (get/load/update/take_dirty/mark_dirty/delete); None writes through
+            session_repository: Repository used for loads and flushes
+            flush_interval_ms: Delay between background flushes
+        """
+        self.backend = backend
+        self._session_repository = session_repository
+        self.flush_interval_ms = flush_interval_ms or self.FLUSH_INTERVAL_MS
+        self.stats = {'hits': 0, 'loads': 0, 'flushed_sessions': 0}
+
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_env(cls) -> 'ActiveSessionStore':
+        """Create the store for the backend named in ACTIVE_SESSION_STORE_BACKEND"""
+        if cls.BACKEND == 'local':
+            return cls(LocalActiveSessionBackend())
+        if cls.BACKEND == 'redis':
+            return cls(RedisActiveSessionBackend(cls.REDIS_URL))
+        return cls()
+
+    @property
+    def session_repository(self):
+        """Session repository, created on first use once the database is available"""
+        if self._session_repository is None:
+            from ..repositories.game_session_repository import GameSessionRepository
+            self._session_repository = GameSessionRepository()
+        return self._session_repository
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """Get a session, loading active and paused ones into the backend"""
+        if self.backend is not None:
+            document = self.backend.get(session_id)
+            if document is not None:
+                self.stats['hits'] += 1
+                return GameSession.from_dict(document)
+
+        session = self.session_repository.get_session_by_session_id(session_id)
+        if session is None or self.backend is None or session.status not in self.HOT_STATUSES:
+            return session
+
+        self.stats['loads'] += 1
+        return GameSession.from_dict(self.backend.load(session_id, session.to_dict()))
+
+    def save(self, session: GameSession, fields: Iterable[str],
+             expected_sync_version: Optional[int] = None) -> bool:
+        """
+        Record changed fields of a session
+
+        Args:
+            session: The session holding the new values
+            fields: Names of the top-level fields that changed
+            expected_sync_version: If given, only save while the stored
+                sync_version still equals it (compare-and-swap)
+
+        Returns:
+            bool: True if saved, False on a version conflict or missing session
+        """
+        document = session.to_dict()
+        values = {field: document[field] for field in fields}
+        if not values:
+            return True
+
+        if self.backend is not None:
+            applied = self.backend.update(session.session_id, values,
+                                          expected_sync_version=expected_sync_version)
+            if applied is not None:
+                if applied:
+                    self._ensure_flusher()
+                return applied
+
+        return self.session_repository.update_session_fields(session.session_id, values, expected_sync_version)
+
+    def record_moves(self, session_id: str, moves_count: int, last_move: Optional[Dict[str, Any]]):
+        """Mirror move counters already persisted by append_session_moves"""
+        if self.backend is not None:
+            self.backend.update(session_id, {"moves_count": moves_count, "last_move": last_move},
+                                mark_dirty=False)
+
+    def flush(self, session_id: Optional[str] = None) -> int:
+        """
+        Persist pending changes of one session, or of all sessions
+
+        Returns:
+            int: Number of sessions written
+        """
+        if self.backend is None:
+            return 0
+
+        changes = self.backend.take_dirty(session_id)
+        if not changes:
+            return 0
+
+        try:
+            written = self.session_repository.flush_session_fields(changes)
+        except Exception:
+            # Keep the changes pending for the next flush
+            for dirty_id, values in changes.items():
+                self.backend.mark_dirty(dirty_id, values.keys())
+            raise
+
+        self.stats['flushed_sessions'] += written
+        return written
+
+    def take_pending(self, session_id: str) -> Dict[str, Any]:
+        """Remove and return a session's unflushed changes, for a caller writing them itself"""
+        if self.backend is None:
+            return {}
+        return self.backend.take_dirty(session_id).get(session_id, {})
+
+    def restore_pending(self, session_id: str, values: Dict[str, Any]):
+        """Mark changes taken with take_pending as unflushed again after a failed write"""
+        if self.backend is not None and values:
+            self.backend.mark_dirty(session_id, values.keys())
+
+    def evict(self, session_id: str):
+        """Flush a session and drop it, so the next read comes from MongoDB"""
+        if self.backend is None:
+            return
+
+        self.flush(session_id)
+        self.backend.delete(session_id)
+
+    def stop(self):
+        """Stop the background flusher after a final flush"""
+        self._stop_event.set()
+        self.flush()
+
+    def _ensure_flusher(self):
+        """Start the background flusher on the first buffered change"""
+        if self._flusher is not None:
+            return
+
+        with self._flusher_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="active-session-flusher",
+                                                 daemon=True)
+                self._flusher.start()
+                atexit.register(self.stop)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval_ms / 1000):
+            try:
+                self.flush()
+            except Exception as e:
+                self._logger.error(f"Failed to flush active sessions: {str(e)}")
+
+
+# Shared by every session service in this worker
+active_session_store = ActiveSessionStore.from_env()
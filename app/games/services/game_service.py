@@ -190,6 +190,7 @@ class GameService:
             # Remove game record
             if not self.game_repository.delete_game(game_id):
                 return False, "GAME_DELETION_FAILED", None
+            plugin_registry.invalidate_game(game_id)
 
             current_app.logger.info(f"Game {game_id} uninstalled successfully")
             return True, "GAME_PLUGIN_UNINSTALLED_SUCCESS", None
@@ -6,13 +6,20 @@ from ..repositories.game_session_repository import GameSessionRepository
 from ..repositories.game_repository import GameRepository
 from ..models.game_session import GameSession
 from ..core.plugin_registry import plugin_registry
+from .session_completion_worker import SessionCompletionWorker
+from .active_session_store import active_session_store
+from ..challenges.services.matchmaking_pool import matchmaking_pool
 
 class GameSessionService:
     """Service for game session management operations"""
 
+    # Largest move batch accepted by validate_moves
+    MAX_MOVES_PER_BATCH = 100
+
     def __init__(self):
         self.session_repository = GameSessionRepository()
         self.game_repository = GameRepository()
+        self.active_sessions = active_session_store
 
     def start_game_session(self, user_id: str, game_id: str,
                           session_config: Dict[str, Any] = None) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
@@ -50,7 +57,8 @@ class GameSessionService:
 
             # Create session using plugin
             try:
-                plugin_session = plugin.start_session(user_id, session_config or {})
+                with plugin_registry.measure(game.plugin_id, "start_session"):
+                    plugin_session = plugin.start_session(user_id, session_config or {})
 
                 # Create our session record
                 session = GameSession(
@@ -89,6 +97,10 @@ class GameSessionService:
         """
         End a game session.
 
+        The session is ended with one conditional update that also stores
+        its completion event; credits, achievements, impact score and team
+        contribution are handled from that event by SessionCompletionWorker.
+
         Args:
             session_id: The session ID
             reason: Reason for ending (completed, abandoned)
@@ -98,7 +110,7 @@ class GameSessionService:
         """
         try:
             # Get session
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -116,32 +128,47 @@ class GameSessionService:
             session_result = None
             if plugin:
                 try:
-                    session_result = plugin.end_session(session_id, reason)
+                    with plugin_registry.measure(game.plugin_id, "end_session"):
+                        session_result = plugin.end_session(session_id, reason)
                 except Exception as e:
                     current_app.logger.warning(f"Plugin failed to end session: {str(e)}")
 
             # Calculate credits earned
             credits_earned = session.calculate_credits_earned(game.credit_rate)
 
-            # Update session in database
+            pending = self.active_sessions.take_pending(session_id)
+            values = dict(pending)
             if reason == "completed":
-                final_score = session_result.final_score if session_result else session.score
-                achievements = session_result.achievements_unlocked if session_result else []
+                values.update({
+                    "score": session_result.final_score if session_result else session.score,
+                    "credits_earned": credits_earned,
+                    "achievements_unlocked": session_result.achievements_unlocked if session_result else []
+                })
 
-                success = self.session_repository.complete_session(
-                    session_id, final_score, credits_earned, achievements
+            # End the session, buffered changes included, and store its completion event
+            try:
+                ended_session = self.session_repository.finish_session(
+                    session_id, "completed" if reason == "completed" else "abandoned", values,
+                    SessionCompletionWorker.build_event(reason)
                 )
-            else:
-                success = self.session_repository.abandon_session(session_id)
+            except Exception:
+                self.active_sessions.restore_pending(session_id, pending)
+                raise
 
-            if not success:
+            if not ended_session:
+                self.active_sessions.restore_pending(session_id, pending)
                 return False, "SESSION_END_UPDATE_FAILED", None
 
-            # Get updated session
-            updated_session = self.session_repository.get_session_by_session_id(session_id)
+            self.active_sessions.evict(session_id)
+
+            try:
+                matchmaking_pool.record_session(ended_session.game_id, ended_session.user_id,
+                                                ended_session.created_at)
+            except Exception as e:
+                current_app.logger.warning(f"Failed to update matchmaking pool: {str(e)}")
 
             result = {
-                "session": updated_session.to_api_dict() if updated_session else session.to_api_dict(),
+                "session": ended_session.to_api_dict(),
                 "session_result": session_result.__dict__ if session_result else None
             }
 
@@ -163,7 +190,7 @@ class GameSessionService:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -185,7 +212,10 @@ class GameSessionService:
     def get_user_sessions(self, user_id: str, status: str = None,
                          page: int = 1, limit: int = 20) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
-        Get sessions for a user.
+        Get session summaries for a user.
+
+        Sessions are read with the SessionSummary projection; the full session
+        (state, moves, device info) is available from the session endpoint.
 
         Args:
             user_id: The user ID
@@ -198,7 +228,7 @@ class GameSessionService:
         """
         try:
             skip = (page - 1) * limit
-            sessions = self.session_repository.get_user_sessions(user_id, status, limit, skip)
+            sessions = self.session_repository.get_user_session_summaries(user_id, status, limit, skip)
 
             # Get total count
             filter_dict = {"user_id": user_id}
@@ -248,7 +278,7 @@ class GameSessionService:
         """
         try:
             # Get session
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -256,28 +286,30 @@ class GameSessionService:
                 return False, "SESSION_NOT_ACTIVE", None
 
             # Get plugin and validate state update
-            game = self.game_repository.get_game_by_id(session.game_id)
-            if not game:
+            game_found, plugin_id = plugin_registry.resolve_game_plugin(
+                session.game_id, self.game_repository.get_game_by_id
+            )
+            if not game_found:
                 return False, "GAME_NOT_FOUND", None
 
-            plugin = plugin_registry.get_plugin(game.plugin_id) if game.plugin_id else None
-            if plugin:
+            plugin = plugin_registry.get_plugin(plugin_id) if plugin_id else None
+            if plugin_id and plugin:
                 try:
                     # Let plugin update its internal state
-                    if not plugin.update_session_state(session_id, new_state):
+                    with plugin_registry.measure(plugin_id, "update_session_state"):
+                        accepted = plugin.update_session_state(session_id, new_state)
+                    if not accepted:
                         return False, "PLUGIN_STATE_UPDATE_REJECTED", None
                 except Exception as e:
                     current_app.logger.warning(f"Plugin state update failed: {str(e)}")
 
-            # Update in database
-            if not self.session_repository.update_session_state(session_id, new_state):
+            # Update in the active session store
+            session.update_state(new_state)
+            if not self.active_sessions.save(session, ("current_state", "updated_at")):
                 return False, "SESSION_STATE_UPDATE_FAILED", None
 
-            # Get updated session
-            updated_session = self.session_repository.get_session_by_session_id(session_id)
-
             result = {
-                "session": updated_session.to_api_dict() if updated_session else None
+                "session": session.to_api_dict()
             }
 
             current_app.logger.info(f"Updated state for session {session_id}")
@@ -300,7 +332,7 @@ class GameSessionService:
         """
         try:
             # Get session
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -308,17 +340,20 @@ class GameSessionService:
                 return False, "SESSION_NOT_ACTIVE", None
 
             # Get plugin and validate move
-            game = self.game_repository.get_game_by_id(session.game_id)
-            if not game:
+            game_found, plugin_id = plugin_registry.resolve_game_plugin(
+                session.game_id, self.game_repository.get_game_by_id
+            )
+            if not game_found:
                 return False, "GAME_NOT_FOUND", None
 
-            plugin = plugin_registry.get_plugin(game.plugin_id) if game.plugin_id else None
-            if not plugin:
+            plugin = plugin_registry.get_plugin(plugin_id) if plugin_id else None
+            if not plugin_id or not plugin:
                 return False, "GAME_PLUGIN_NOT_FOUND", None
 
             # Validate move using plugin
             try:
-                is_valid = plugin.validate_move(session_id, move)
+                with plugin_registry.measure(plugin_id, "validate_move"):
+                    is_valid = plugin.validate_move(session_id, move)
                 if not is_valid:
                     return False, "INVALID_MOVE", None
             except Exception as e:
@@ -326,13 +361,17 @@ class GameSessionService:
                 return False, "MOVE_VALIDATION_FAILED", None
 
             # Add move to session
-            if not self.session_repository.add_session_move(session_id, move):
+            appended = self.session_repository.append_session_moves(session_id, [move])
+            if not appended:
                 return False, "MOVE_RECORDING_FAILED", None
 
+            move_number = appended["moves_count"]
+            self.active_sessions.record_moves(session_id, move_number, appended["last_move"])
+
             result = {
                 "session_id": session_id,
                 "move_valid": True,
-                "move_number": len(session.moves) + 1
+                "move_number": move_number
             }
 
             current_app.logger.info(f"Validated move for session {session_id}")
@@ -342,6 +381,133 @@ class GameSessionService:
             current_app.logger.error(f"Failed to validate move for session {session_id}: {str(e)}")
             return False, "MOVE_VALIDATION_FAILED", None
 
+    def validate_moves(self, session_id: str,
+                       moves: List[Dict[str, Any]]) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Validate and record an ordered batch of moves in a game session.
+
+        The session and plugin are looked up once, the plugin checks
+        the batch with validate_moves, and the accepted moves are appended
+        in a single update.
+
+        Args:
+            session_id: The session ID
+            moves: The moves, in order
+
+        Returns:
+            Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
+        """
+        try:
+            if not moves:
+                return False, "MOVES_DATA_REQUIRED", None
+
+            if len(moves) > self.MAX_MOVES_PER_BATCH:
+                return False, "TOO_MANY_MOVES", None
+
+            session = self.active_sessions.get(session_id)
+            if not session:
+                return False, "SESSION_NOT_FOUND", None
+
+            if not session.is_active():
+                return False, "SESSION_NOT_ACTIVE", None
+
+            game_found, plugin_id = plugin_registry.resolve_game_plugin(
+                session.game_id, self.game_repository.get_game_by_id
+            )
+            if not game_found:
+                return False, "GAME_NOT_FOUND", None
+
+            plugin = plugin_registry.get_plugin(plugin_id) if plugin_id else None
+            if not plugin_id or not plugin:
+                return False, "GAME_PLUGIN_NOT_FOUND", None
+
+            try:
+                with plugin_registry.measure(plugin_id, "validate_moves"):
+                    verdicts = list(plugin.validate_moves(session_id, moves))
+            except Exception as e:
+                current_app.logger.error(f"Plugin batch move validation failed: {str(e)}")
+                return False, "MOVE_VALIDATION_FAILED", None
+
+            if len(verdicts) != len(moves):
+                current_app.logger.error(f"Plugin returned {len(verdicts)} verdicts for {len(moves)} moves")
+                return False, "MOVE_VALIDATION_FAILED", None
+
+            accepted_moves = [move for move, is_valid in zip(moves, verdicts) if is_valid]
+
+            # Number of the last move recorded before this batch
+            move_number = 0
+            if accepted_moves:
+                appended = self.session_repository.append_session_moves(session_id, accepted_moves)
+                if not appended:
+                    return False, "MOVE_RECORDING_FAILED", None
+                self.active_sessions.record_moves(session_id, appended["moves_count"], appended["last_move"])
+                move_number = appended["moves_count"] - len(accepted_moves)
+
+            results = []
+            for index, is_valid in enumerate(verdicts):
+                if is_valid:
+                    move_number += 1
+                results.append({
+                    "index": index,
+                    "move_valid": bool(is_valid),
+                    "move_number": move_number if is_valid else None
+                })
+
+            result = {
+                "session_id": session_id,
+                "accepted_count": len(accepted_moves),
+                "rejected_count": len(moves) - len(accepted_moves),
+                "moves": results
+            }
+
+            current_app.logger.info(
+                f"Validated {len(moves)} moves for session {session_id}: {len(accepted_moves)} accepted"
+            )
+            return True, "MOVES_VALIDATED_SUCCESS", result
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to validate moves for session {session_id}: {str(e)}")
+            return False, "MOVE_VALIDATION_FAILED", None
+
+    def get_session_moves(self, session_id: str, from_move: int = 1,
+                          limit: int = 100) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Get a page of a session's moves for replay.
+
+        Args:
+            session_id: The session ID
+            from_move: First move number to return (1-based)
+            limit: Maximum number of moves to return
+
+        Returns:
+            Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
+        """
+        try:
+            moves: List[Dict[str, Any]] = []
+            for move in self.session_repository.iter_session_moves(session_id, from_move):
+                if len(moves) == limit:
+                    break
+                timestamp = move.get("timestamp")
+                moves.append({
+                    **move,
+                    "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+                })
+
+            next_move = moves[-1]["move_number"] + 1 if len(moves) == limit else None
+
+            result = {
+                "session_id": session_id,
+                "moves": moves,
+                "next_move": next_move
+            }
+
+            current_app.logger.info(f"Retrieved {len(moves)} moves for session {session_id}")
+            return True, "SESSION_MOVES_RETRIEVED_SUCCESS", result
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to get moves for session {session_id}: {str(e)}")
+            return False, "SESSION_MOVES_RETRIEVAL_FAILED", None
+
     def pause_session(self, session_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
         Pause a game session.
@@ -353,16 +519,20 @@ class GameSessionService:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
             if session.status != "active":
                 return False, "SESSION_NOT_ACTIVE", None
 
-            if not self.session_repository.pause_session(session_id):
+            session.pause_session()
+            if not self.active_sessions.save(session, ("status", "paused_at", "play_duration", "updated_at")):
                 return False, "SESSION_PAUSE_FAILED", None
 
+            # A paused session may not come back; persist it now
+            self.active_sessions.flush(session_id)
+
             current_app.logger.info(f"Paused session {session_id}")
             return True, "SESSION_PAUSED_SUCCESS", None
 
@@ -381,14 +551,15 @@ class GameSessionService:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
             if session.status != "paused":
                 return False, "SESSION_NOT_PAUSED", None
 
-            if not self.session_repository.resume_session(session_id):
+            session.resume_session()
+            if not self.active_sessions.save(session, ("status", "resumed_at", "updated_at")):
                 return False, "SESSION_RESUME_FAILED", None
 
             current_app.logger.info(f"Resumed session {session_id}")
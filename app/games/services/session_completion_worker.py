@@ -0,0 +1,261 @@
+"""
+Session completion worker
+
+Delivers the completion event that GameSessionService.end_game_session
+stores on each ended session to the downstream consumers (impact score
+and leaderboards, achievements, credits, team contribution), outside the
+request thread.
+
+Usage:
+    python -m app.games.services.session_completion_worker --concurrency 2
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+from ..models.game_session import GameSession
+from ..repositories.game_session_repository import GameSessionRepository
+
+
+def _update_impact_score(session: GameSession, event: Dict[str, Any]) -> bool:
+    from app.social.leaderboards.integration.event_handlers import handle_game_session_complete
+
+    return handle_game_session_complete(session.user_id, {
+        **session.to_api_dict(),
+        "final_score": session.score or 0
+    })
+
+
+def _track_achievements(session: GameSession, event: Dict[str, Any]) -> bool:
+    if event.get("reason") != "completed":
+        return True
+
+    from app.social.achievements.services.progress_tracker import ProgressTracker
+
+    game_data = {"session_id": session.session_id, "game_id": session.game_id,
+                 "play_duration_ms": session.play_duration}
+    if session.score is not None:
+        game_data["score"] = session.score
+
+    success, _, _ = ProgressTracker().track_game_session_completion(session.user_id, game_data)
+    return success
+
+
+def _credit_wallet(session: GameSession, event: Dict[str, Any]) -> bool:
+    if event.get("reason") != "completed":
+        return True
+
+    from app.donations.services.wallet_service import WalletService
+
+    success, message, _ = WalletService().convert_session_to_credits(
+        session_data={
+            "user_id": session.user_id,
+            "session_id": session.session_id,
+            "play_duration_ms": session.play_duration,
+            "game_id": session.game_id,
+            "game_mode": (session.session_config or {}).get("game_mode", "normal")
+        },
+        user_context={"user_id": session.user_id}
+    )
+    # Sessions flagged by fraud detection are not retried
+    return success or message == "FRAUD_DETECTION_TRIGGERED"
+
+
+def _record_team_contribution(session: GameSession, event: Dict[str, Any]) -> bool:
+    if event.get("reason") != "completed":
+        return True
+
+    from app.games.teams.services.team_manager import TeamManager
+
+    success, message, _ = TeamManager().record_game_contribution(session.user_id, session.score or 0)
+    return success or message == "USER_NOT_IN_TEAM"
+
+
+class SessionCompletionWorker:
+    """
+    Pool of threads claiming completion events and fanning them out
+
+    Each consumer that handled an event is acknowledged on the session, so
+    a retried event is only delivered to the consumers that failed.
+    Claims are atomic, so any number of worker processes can run.
+    """
+
+    CONSUMERS: Dict[str, Callable[[GameSession, Dict[str, Any]], bool]] = {
+        "impact_score": _update_impact_score,
+        "achievements": _track_achievements,
+        "credits": _credit_wallet,
+        "team_contribution": _record_team_contribution
+    }
+
+    # Consumers named in new events; credits and team contribution are
+    # still driven by their own endpoints unless enabled here
+    ENABLED_CONSUMERS = [
+        name.strip() for name in os.getenv('SESSION_COMPLETION_CONSUMERS', 'impact_score,achievements').split(',')
+        if name.strip()
+    ]
+
+    # Seconds a claimed event stays locked before another worker may retry it
+    LEASE_SECONDS = 120
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY_SECONDS = 30
+
+    def __init__(self, app, concurrency: int = 2, poll_interval: float = 1.0):
+        """
+        Initialize SessionCompletionWorker
+
+        Args:
+            app: Flask application providing config, database and logger
+            concurrency: Number of consumer threads
+            poll_interval: Seconds to wait when no events are due
+        """
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.stats = {'delivered': 0, 'failed': 0}
+
+        with app.app_context():
+            self.session_repo = GameSessionRepository()
+
+    @classmethod
+    def build_event(cls, reason: str) -> Dict[str, Any]:
+        """Build the completion event stored when a session ends"""
+        return {
+            "type": "session_completed",
+            "reason": reason,
+            "pending_consumers": [name for name in cls.ENABLED_CONSUMERS if name in cls.CONSUMERS]
+        }
+
+    def run(self):
+        """Start consumer threads and block until stopped"""
+        self.app.logger.info(
+            f"Session completion worker {self.worker_id} starting with {self.concurrency} threads"
+        )
+
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._consume_loop,
+                name=f"session-completion-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        for thread in self._threads:
+            thread.join()
+
+        self.app.logger.info(f"Session completion worker {self.worker_id} stopped: {self.stats}")
+
+    def stop(self, *_args):
+        """Ask consumer threads to exit after their current event"""
+        self._stop_event.set()
+
+    def run_once(self, max_events: Optional[int] = None) -> int:
+        """
+        Process due events on the calling thread until none is left
+
+        Returns:
+            int: Number of events processed
+        """
+        processed = 0
+        with self.app.app_context():
+            while max_events is None or processed < max_events:
+                if not self._process_next():
+                    break
+                processed += 1
+        return processed
+
+    # Private methods
+
+    def _consume_loop(self):
+        with self.app.app_context():
+            while not self._stop_event.is_set():
+                try:
+                    if not self._process_next():
+                        self._stop_event.wait(self.poll_interval)
+                except Exception as e:
+                    self.app.logger.error(f"Error in session completion worker loop: {str(e)}")
+                    self._stop_event.wait(self.poll_interval)
+
+    def _process_next(self) -> bool:
+        """Claim and deliver one event; returns False when none is due"""
+        document = self.session_repo.claim_completion_event(self.worker_id, self.LEASE_SECONDS)
+        if not document:
+            return False
+
+        session = GameSession.from_dict(document)
+        event = document.get("completion_event", {})
+        failed = self._deliver(session, event, event.get("pending_consumers", []))
+
+        if not failed:
+            self.session_repo.complete_completion_event(session.session_id)
+            self._record('delivered')
+        else:
+            will_retry = self.session_repo.fail_completion_event(
+                document, f"Consumers failed: {', '.join(failed)}", self.MAX_ATTEMPTS, self.RETRY_DELAY_SECONDS
+            )
+            self._record('failed')
+            if not will_retry:
+                self.app.logger.error(
+                    f"Giving up on completion event of session {session.session_id}: {', '.join(failed)}"
+                )
+
+        return True
+
+    def _deliver(self, session: GameSession, event: Dict[str, Any], consumers: List[str]) -> List[str]:
+        """Run the pending consumers of an event; returns the ones that failed"""
+        failed = []
+        for name in consumers:
+            handler = self.CONSUMERS.get(name)
+            try:
+                handled = handler is None or handler(session, event)
+            except Exception as e:
+                self.app.logger.error(f"Completion consumer {name} failed for session {session.session_id}: {str(e)}")
+                handled = False
+
+            if handled:
+                self.session_repo.ack_completion_consumer(session.session_id, name)
+            else:
+                failed.append(name)
+        return failed
+
+    def _record(self, outcome: str):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+
+
+def main(argv=None):
+    """CLI entry point for the session completion worker"""
+    parser = argparse.ArgumentParser(description="Deliver game session completion events")
+    parser.add_argument('--concurrency', type=int, default=2, help="Number of consumer threads")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Seconds to wait when no events are due")
+    parser.add_argument('--drain', action='store_true',
+                        help="Process all due events once and exit")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    worker = SessionCompletionWorker(app, concurrency=args.concurrency, poll_interval=args.poll_interval)
+
+    if args.drain:
+        processed = worker.run_once()
+        app.logger.info(f"Drained {processed} session completion events")
+        return
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,27 @@ import logging
 
 from ..repositories.game_session_repository import GameSessionRepository
 from ..models.game_session import GameSession
+from .active_session_store import active_session_store
 
 class StateSynchronizer:
     """Service for synchronizing game session state across devices"""
 
+    # JSON-patch roots accepted in delta syncs, mapped to session fields
+    PATCH_ROOTS = {
+        "current_state": "current_state",
+        "statistics": "statistics",
+        "score": "score",
+        "play_duration_ms": "play_duration"
+    }
+    SCALAR_PATCH_ROOTS = {"score", "play_duration_ms"}
+
+    # Session fields a full sync or conflict resolution may change
+    SYNC_FIELDS = ("current_state", "device_info", "score", "play_duration", "achievements_unlocked",
+                   "statistics", "last_sync_at", "sync_version", "updated_at")
+
     def __init__(self):
         self.session_repository = GameSessionRepository()
+        self.active_sessions = active_session_store
 
     def _get_logger(self):
         """Get logger safely, handling cases where no application context exists"""
@@ -25,6 +40,10 @@ class StateSynchronizer:
         """
         Synchronize session state from a device.
 
+        When device_state carries a "patch" (JSON-patch operations on
+        current_state, statistics, score or play_duration_ms), only those
+        paths are written; see _sync_session_delta.
+
         Args:
             session_id: The session ID
             device_state: Current state from the device
@@ -33,9 +52,12 @@ class StateSynchronizer:
         Returns:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
+        if "patch" in device_state:
+            return self._sync_session_delta(session_id, device_state, device_info)
+
         try:
             # Get current session
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -65,11 +87,6 @@ class StateSynchronizer:
             if "score" in device_state and device_state["score"] is not None:
                 session.update_score(device_state["score"])
 
-            # Add any new moves
-            if "new_moves" in device_state and device_state["new_moves"]:
-                for move in device_state["new_moves"]:
-                    session.add_move(move)
-
             # Update play duration if provided
             if "play_duration_ms" in device_state:
                 session.play_duration = device_state["play_duration_ms"]
@@ -84,19 +101,21 @@ class StateSynchronizer:
                 session.update_statistics(device_state["statistics"])
 
             # Update sync info
+            base_sync_version = session.sync_version
             session.update_sync_info()
 
-            # Save to database
-            if not self.session_repository.update_session(session_id, session):
+            # Save, only if no other device synced in between
+            if not self.active_sessions.save(session, self.SYNC_FIELDS,
+                                             expected_sync_version=base_sync_version):
                 return False, "SYNC_UPDATE_FAILED", None
 
-            # Get updated session
-            updated_session = self.session_repository.get_session_by_session_id(session_id)
+            # Append any new moves to the bucketed move history
+            self._append_moves(session, device_state.get("new_moves"))
 
             result = {
-                "session": updated_session.to_api_dict() if updated_session else session.to_api_dict(),
-                "sync_version": updated_session.sync_version if updated_session else session.sync_version,
-                "last_sync_at": updated_session.last_sync_at.isoformat() if updated_session and updated_session.last_sync_at else None
+                "session": session.to_api_dict(),
+                "sync_version": session.sync_version,
+                "last_sync_at": session.last_sync_at.isoformat() if session.last_sync_at else None
             }
 
             self._get_logger().info(f"Synchronized session {session_id} from device {device_info.get('device_id', 'unknown')}")
@@ -106,6 +125,75 @@ class StateSynchronizer:
             self._get_logger().error(f"Failed to sync session {session_id}: {str(e)}")
             return False, "SESSION_SYNC_FAILED", None
 
+    def _sync_session_delta(self, session_id: str, device_state: Dict[str, Any],
+                            device_info: Dict[str, Any]) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Synchronize a device delta in a single round trip.
+
+        The patch, new moves and achievements are applied by one
+        find_one_and_update whose filter compares sync_version with the
+        version the device built the patch on ("test" operations become
+        filter conditions too). The response carries only the changed paths
+        as a JSON patch of server values. A device that is behind gets the
+        full server state, as in a full sync.
+
+        Args:
+            session_id: The session ID
+            device_state: {"sync_version", "patch", "new_moves", "new_achievements"}
+            device_info: Information about the device
+
+        Returns:
+            Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
+        """
+        try:
+            base_sync_version = device_state.get("sync_version")
+            if not isinstance(base_sync_version, int):
+                return False, "SYNC_VERSION_REQUIRED", None
+
+            now = datetime.utcnow()
+            new_moves = [{**move, "timestamp": now} for move in device_state.get("new_moves") or []]
+
+            try:
+                update, conditions, changed_paths = self._build_delta_update(device_state, device_info, new_moves)
+            except ValueError as e:
+                self._get_logger().warning(f"Rejected sync patch for session {session_id}: {str(e)}")
+                return False, "INVALID_SYNC_PATCH", None
+
+            # The delta is applied in MongoDB; persist and drop any buffered copy first
+            self.active_sessions.evict(session_id)
+
+            projection = self._projection_for(changed_paths.values())
+            document = self.session_repository.apply_sync_delta(
+                session_id, base_sync_version, update, conditions, projection
+            )
+
+            if document is None:
+                return self._delta_sync_rejected(session_id, base_sync_version)
+
+            if new_moves:
+                self.session_repository.store_counted_moves(session_id, new_moves, document["moves_count"])
+
+            patch = []
+            for pointer, field_path in changed_paths.items():
+                found, value = self._resolve_path(document, field_path)
+                if found:
+                    patch.append({"op": "replace", "path": pointer, "value": value})
+                else:
+                    patch.append({"op": "remove", "path": pointer})
+
+            result = {
+                "sync_version": document["sync_version"],
+                "last_sync_at": document["last_sync_at"].isoformat() if document.get("last_sync_at") else None,
+                "patch": patch
+            }
+
+            self._get_logger().info(f"Delta-synchronized session {session_id} from device {device_info.get('device_id', 'unknown')}")
+            return True, "SESSION_SYNC_SUCCESS", result
+
+        except Exception as e:
+            self._get_logger().error(f"Failed to delta-sync session {session_id}: {str(e)}")
+            return False, "SESSION_SYNC_FAILED", None
+
     def get_session_for_device(self, session_id: str, device_info: Dict[str, Any]) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
         Get session state optimized for a specific device.
@@ -118,7 +206,7 @@ class StateSynchronizer:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -127,7 +215,7 @@ class StateSynchronizer:
             session.update_sync_info()
 
             # Save device tracking
-            self.session_repository.update_session(session_id, session)
+            self.active_sessions.save(session, ("device_info", "last_sync_at", "sync_version", "updated_at"))
 
             result = {
                 "session": session.to_api_dict(),
@@ -156,7 +244,7 @@ class StateSynchronizer:
             Tuple[bool, str, Optional[Dict[str, Any]]]: (success, message, data)
         """
         try:
-            session = self.session_repository.get_session_by_session_id(session_id)
+            session = self.active_sessions.get(session_id)
             if not session:
                 return False, "SESSION_NOT_FOUND", None
 
@@ -177,7 +265,7 @@ class StateSynchronizer:
                     session.play_duration = device_state["play_duration_ms"]
 
                 session.update_sync_info()
-                self.session_repository.update_session(session_id, session)
+                self.active_sessions.save(session, self.SYNC_FIELDS)
 
                 result = {
                     "session": session.to_api_dict(),
@@ -245,6 +333,167 @@ class StateSynchronizer:
             self._get_logger().error(f"Failed to check sync conflicts for user {user_id}: {str(e)}")
             return False, "SYNC_CONFLICT_CHECK_FAILED", None
 
+    def _append_moves(self, session: GameSession, moves: Optional[List[Dict[str, Any]]]) -> None:
+        """Append device moves to the session's move history and mirror the new count"""
+        if not moves:
+            return
+
+        appended = self.session_repository.append_session_moves(session.session_id, moves)
+        if appended:
+            session.moves_count = appended["moves_count"]
+            session.last_move = appended["last_move"]
+            self.active_sessions.record_moves(session.session_id, session.moves_count, session.last_move)
+
+    def _build_delta_update(self, device_state: Dict[str, Any], device_info: Dict[str, Any],
+                            new_moves: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, str]]:
+        """
+        Translate a device delta into MongoDB update operators.
+
+        New moves are only counted and kept as last_move here; the caller
+        writes them to their buckets once the update allocated their numbers.
+
+        Returns:
+            Tuple of (update, conditions, changed_paths) where changed_paths
+            maps each changed JSON pointer to its dotted field path
+
+        Raises:
+            ValueError: If the patch is malformed or targets a disallowed path
+        """
+        set_fields: Dict[str, Any] = {"device_info": device_info}
+        unset_fields: Dict[str, str] = {}
+        push_fields: Dict[str, List[Any]] = {}
+        conditions: Dict[str, Any] = {}
+        changed_paths: Dict[str, str] = {}
+
+        patch = device_state.get("patch")
+        if not isinstance(patch, list):
+            raise ValueError("patch must be a list of operations")
+
+        for operation in patch:
+            op = operation.get("op") if isinstance(operation, dict) else None
+            if op not in ("add", "replace", "remove", "test"):
+                raise ValueError(f"unsupported operation {op!r}")
+
+            pointer = str(operation.get("path", ""))
+            append = op == "add" and pointer.endswith("/-")
+            if append:
+                pointer = pointer[:-2]
+
+            field_path = self._pointer_to_field(pointer, allow_root=op != "remove" and not append)
+
+            if op == "test":
+                value = operation.get("value")
+                if isinstance(value, dict):
+                    # Embedded document equality in MongoDB depends on field order
+                    raise ValueError(f"test value for {pointer} must not be an object")
+                # $eq keeps a client value from being read as a query operator
+                conditions[field_path] = {"$eq": value}
+                continue
+            elif append:
+                push_fields.setdefault(field_path, []).append(operation.get("value"))
+            elif op in ("add", "replace"):
+                if "value" not in operation:
+                    raise ValueError(f"missing value for {pointer}")
+                set_fields[field_path] = operation["value"]
+            else:
+                unset_fields[field_path] = ""
+
+            if pointer in changed_paths:
+                raise ValueError(f"path {pointer} is changed more than once")
+            changed_paths[pointer] = field_path
+
+        self._check_disjoint(changed_paths.values())
+
+        update: Dict[str, Any] = {"$set": set_fields}
+        if unset_fields:
+            update["$unset"] = unset_fields
+
+        if new_moves:
+            set_fields["last_move"] = new_moves[-1]
+            update["$inc"] = {"moves_count": len(new_moves)}
+            changed_paths["/moves_count"] = "moves_count"
+
+        if push_fields:
+            update["$push"] = {path: {"$each": values} for path, values in push_fields.items()}
+
+        new_achievements = device_state.get("new_achievements") or []
+        if new_achievements:
+            update["$addToSet"] = {"achievements_unlocked": {"$each": list(new_achievements)}}
+            changed_paths["/achievements_unlocked"] = "achievements_unlocked"
+
+        return update, conditions, changed_paths
+
+    def _pointer_to_field(self, pointer: str, allow_root: bool = False) -> str:
+        """Convert a JSON pointer on an allowed root to a dotted MongoDB path"""
+        if not pointer.startswith("/"):
+            raise ValueError(f"invalid path {pointer!r}")
+
+        segments = [segment.replace("~1", "/").replace("~0", "~") for segment in pointer[1:].split("/")]
+        root = segments[0]
+        if root not in self.PATCH_ROOTS:
+            raise ValueError(f"path {pointer} is not writable")
+        if root in self.SCALAR_PATCH_ROOTS and len(segments) > 1:
+            raise ValueError(f"{root} has no sub-paths")
+        if len(segments) == 1 and not allow_root:
+            raise ValueError(f"{root} can only be replaced as a whole")
+
+        for segment in segments[1:]:
+            if not segment or "." in segment or segment.startswith("$"):
+                raise ValueError(f"invalid path segment {segment!r}")
+
+        return ".".join([self.PATCH_ROOTS[root]] + segments[1:])
+
+    def _check_disjoint(self, field_paths) -> None:
+        """Reject paths nested in one another (MongoDB rejects them as conflicting)"""
+        ordered = sorted(field_paths)
+        for current, following in zip(ordered, ordered[1:]):
+            if following == current or following.startswith(current + "."):
+                raise ValueError(f"paths {current} and {following} overlap")
+
+    def _projection_for(self, field_paths) -> List[str]:
+        """Project changed fields, stopping at array indexes and dropping nested duplicates"""
+        paths = set()
+        for field_path in field_paths:
+            segments = []
+            for segment in field_path.split("."):
+                if segment.isdigit():
+                    break
+                segments.append(segment)
+            paths.add(".".join(segments))
+
+        return [path for path in paths
+                if not any(path.startswith(other + ".") for other in paths)]
+
+    def _resolve_path(self, document: Dict[str, Any], field_path: str) -> Tuple[bool, Any]:
+        """Read a dotted path (with array indexes) from a document"""
+        value: Any = document
+        for segment in field_path.split("."):
+            if isinstance(value, dict) and segment in value:
+                value = value[segment]
+            elif isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
+                value = value[int(segment)]
+            else:
+                return False, None
+        return True, value
+
+    def _delta_sync_rejected(self, session_id: str,
+                             device_sync_version: int) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Explain why a delta did not apply, sending server state on conflicts"""
+        session = self.session_repository.get_session_by_session_id(session_id)
+        if not session:
+            return False, "SESSION_NOT_FOUND", None
+
+        if session.is_ended():
+            return False, "SESSION_ALREADY_ENDED", None
+
+        self._get_logger().info(f"Delta sync conflict for session {session_id}: device version {device_sync_version}, server version {session.sync_version}")
+        return True, "SYNC_CONFLICT_SERVER_WINS", {
+            "session": session.to_api_dict(),
+            "conflict_resolution": "server_wins",
+            "server_sync_version": session.sync_version,
+            "device_sync_version": device_sync_version
+        }
+
     def _get_device_specific_data(self, session: GameSession, device_info: Dict[str, Any]) -> Dict[str, Any]:
         """Get device-specific optimizations for the session data"""
         device_type = device_info.get("type", "unknown")
@@ -294,20 +543,10 @@ class StateSynchronizer:
         device_achievements = set(device_state.get("new_achievements", []))
         merged_achievements = list(server_achievements.union(device_achievements))
 
-        # Merge moves (combine and sort by timestamp)
-        all_moves = server_session.moves.copy()
-        if "new_moves" in device_state:
-            all_moves.extend(device_state["new_moves"])
-
-        # Sort moves by timestamp
-        all_moves.sort(key=lambda x: x.get("timestamp", datetime.min))
-
         # Update session
         server_session.score = final_score
         server_session.play_duration = final_duration
         server_session.achievements_unlocked = merged_achievements
-        server_session.moves = all_moves
-        server_session.moves_count = len(all_moves)
 
         # Merge statistics
         if "statistics" in device_state:
@@ -320,7 +559,10 @@ class StateSynchronizer:
             server_session.current_state = device_state["current_state"]
 
         server_session.update_sync_info()
-        self.session_repository.update_session(server_session.session_id, server_session)
+        self.active_sessions.save(server_session, self.SYNC_FIELDS)
+
+        # Server moves are already stored; append the device's after them
+        self._append_moves(server_session, device_state.get("new_moves"))
 
         return {
             "session": server_session.to_api_dict(),
@@ -329,6 +571,6 @@ class StateSynchronizer:
                 "score_source": "max",
                 "duration_source": "max",
                 "achievements_merged": len(merged_achievements),
-                "moves_merged": len(all_moves)
+                "moves_merged": server_session.moves_count
             }
         }
\ No newline at end of file
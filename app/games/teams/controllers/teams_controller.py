@@ -227,9 +227,10 @@ def initialize_teams(current_user):
 @teams_bp.route('/admin/balance', methods=['POST'])
 @admin_required
 def balance_teams(current_user):
-    """Balance team members across teams (admin only)"""
+    """Balance team members across teams (admin only); ?dry_run=true only reports the plan"""
     try:
-        success, message, data = team_manager.balance_teams()
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        success, message, data = team_manager.balance_teams(dry_run=dry_run)
 
         if success:
             return success_response(message, data)
@@ -303,6 +304,21 @@ def complete_tournament(current_user, tournament_id):
     except Exception as e:
         return error_response("INTERNAL_SERVER_ERROR", status_code=500)
 
+@teams_bp.route('/admin/tournament/<tournament_id>/prizes', methods=['POST'])
+@admin_required
+def award_tournament_prizes(current_user, tournament_id):
+    """Award a completed tournament's prizes again; members already paid are skipped (admin only)"""
+    try:
+        success, message, result = tournament_engine.award_tournament_prizes(tournament_id)
+
+        if success:
+            return success_response(message, result)
+        else:
+            return error_response(message)
+
+    except Exception as e:
+        return error_response("INTERNAL_SERVER_ERROR", status_code=500)
+
 @teams_bp.route('/admin/tournament/<tournament_id>/cancel', methods=['POST'])
 @admin_required
 def cancel_tournament(current_user, tournament_id):
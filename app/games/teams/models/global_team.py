@@ -134,6 +134,18 @@ class GlobalTeam:
             self.stats["points_by_source"][source] = 0
         self.stats["points_by_source"][source] += points
 
+    def add_counter_totals(self, totals: Dict[str, Any]) -> None:
+        """Add the totals of the team's score counter shards"""
+        self.total_score += totals.get("score", 0)
+        self.stats["total_points_earned"] = self.stats.get("total_points_earned", 0) + totals.get("score", 0)
+
+        for counter in ("games_played", "individual_games", "challenges_won"):
+            self.stats[counter] = self.stats.get(counter, 0) + totals.get(counter, 0)
+
+        points_by_source = self.stats.setdefault("points_by_source", {})
+        for source, points in totals.get("points_by_source", {}).items():
+            points_by_source[source] = points_by_source.get(source, 0) + points
+
     def get_average_score_per_member(self) -> float:
         """Get average score per team member"""
         if self.current_members == 0:
@@ -19,6 +19,7 @@ class TeamTournament:
     prizes: Dict[str, Any] = field(default_factory=dict)
     current_standings: List[Dict[str, Any]] = field(default_factory=list)
     final_standings: List[str] = field(default_factory=list)  # Team IDs in final order
+    prize_recipients: Optional[Dict[str, List[str]]] = None  # Team ID -> member IDs owed prize credits, set on completion
     statistics: Dict[str, Any] = field(default_factory=dict)
     created_by: Optional[str] = None  # Admin user ID
     created_at: datetime = field(default_factory=datetime.utcnow)
@@ -42,6 +43,7 @@ class TeamTournament:
             "prizes": self.prizes,
             "current_standings": self.current_standings,
             "final_standings": self.final_standings,
+            "prize_recipients": self.prize_recipients,
             "statistics": self.statistics,
             "created_by": self.created_by,
             "created_at": self.created_at,
@@ -69,6 +71,7 @@ class TeamTournament:
             prizes=data.get("prizes", {}),
             current_standings=data.get("current_standings", []),
             final_standings=data.get("final_standings", []),
+            prize_recipients=data.get("prize_recipients"),
             statistics=data.get("statistics", {}),
             created_by=data.get("created_by"),
             created_at=data.get("created_at", datetime.utcnow()),
@@ -2,12 +2,19 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.core.repositories.base_repository import BaseRepository
 from ..models.global_team import GlobalTeam
+from .team_score_counter_repository import TeamScoreCounterRepository
 
 class GlobalTeamRepository(BaseRepository):
-    """Repository for global team operations"""
+    """
+    Repository for global team operations
+
+    Points earned since a team document was last reset live in sharded
+    score counters; teams are returned with those totals added.
+    """
 
     def __init__(self):
         super().__init__("global_teams")
+        self.score_counters = TeamScoreCounterRepository()
 
     def create_indexes(self):
         import os
@@ -31,44 +38,47 @@ class GlobalTeamRepository(BaseRepository):
     def get_team_by_id(self, team_id: str) -> Optional[GlobalTeam]:
         """Get a team by ID"""
         data = self.find_by_id(team_id)
-        return GlobalTeam.from_dict(data) if data else None
+        return self._with_scores([GlobalTeam.from_dict(data)])[0] if data else None
 
     def get_team_by_team_id(self, team_id: str) -> Optional[GlobalTeam]:
         """Get a team by team_id field"""
         data = self.find_one({"team_id": team_id})
-        return GlobalTeam.from_dict(data) if data else None
+        return self._with_scores([GlobalTeam.from_dict(data)])[0] if data else None
+
+    def get_teams_by_team_ids(self, team_ids: List[str], with_scores: bool = True) -> Dict[str, GlobalTeam]:
+        """Get several teams in one query, keyed by team_id"""
+        teams = [GlobalTeam.from_dict(data) for data in self.find_many({"team_id": {"$in": list(team_ids)}})]
+        if with_scores:
+            teams = self._with_scores(teams)
+        return {team.team_id: team for team in teams}
 
     def get_all_teams(self, active_only: bool = True) -> List[GlobalTeam]:
         """Get all teams"""
         filter_dict = {"is_active": True} if active_only else {}
-        teams_data = self.find_many(filter_dict, sort=[("total_score", -1)])
-        return [GlobalTeam.from_dict(data) for data in teams_data]
+        teams = self._with_scores([GlobalTeam.from_dict(data) for data in self.find_many(filter_dict)])
+        return sorted(teams, key=lambda team: team.total_score, reverse=True)
 
     def get_teams_by_tournament(self, tournament_id: str) -> List[GlobalTeam]:
         """Get teams participating in a tournament"""
         teams_data = self.find_many({"tournament_id": tournament_id})
-        return [GlobalTeam.from_dict(data) for data in teams_data]
+        return self._with_scores([GlobalTeam.from_dict(data) for data in teams_data])
 
     def get_team_leaderboard(self, limit: int = 10) -> List[GlobalTeam]:
-        """Get team leaderboard by total score"""
-        teams_data = self.find_many(
-            {"is_active": True},
-            limit=limit,
-            sort=[("total_score", -1)]
-        )
-        return [GlobalTeam.from_dict(data) for data in teams_data]
+        """Get team leaderboard by total score, sorted and limited in MongoDB"""
+        pipeline = self._scored_teams_pipeline({"is_active": True}) + [
+            {"$sort": {"current_score": -1, "team_id": 1}},
+            {"$limit": limit},
+            {"$project": {"counter_shards": 0, "current_score": 0}}
+        ]
+        teams = [GlobalTeam.from_dict(data) for data in self.collection.aggregate(pipeline)]
+        return self._with_scores(teams)
 
     def update_team_score(self, team_id: str, points: float, source: str = "game") -> bool:
         """Add points to a team's score"""
-        result = self.collection.update_one(
-            {"team_id": team_id},
-            {
-                "$inc": {"total_score": points},
-                "$set": {"updated_at": datetime.utcnow()},
-                "$inc": {f"stats.points_by_source.{source}": points}
-            }
+        activity_type = "challenge" if source == "challenge" else "game"
+        return self.score_counters.increment(
+            team_id, points, [TeamScoreCounterRepository.GLOBAL_SCOPE], activity_type, source
         )
-        return result.modified_count > 0
 
     def update_member_count(self, team_id: str, change: int) -> bool:
         """Update team member count"""
@@ -103,6 +113,7 @@ class GlobalTeamRepository(BaseRepository):
 
     def reset_scores(self, team_ids: List[str]) -> int:
         """Reset scores for multiple teams"""
+        self.score_counters.reset_scope(TeamScoreCounterRepository.GLOBAL_SCOPE, team_ids)
         result = self.collection.update_many(
             {"team_id": {"$in": team_ids}},
             {"$set": {
@@ -164,31 +175,27 @@ class GlobalTeamRepository(BaseRepository):
         return default_teams
 
     def get_team_statistics(self) -> Dict[str, Any]:
-        """Get overall team statistics"""
-        total_teams = self.collection.count_documents({"is_active": True})
-
-        # Get total members across all teams
-        pipeline = [
-            {"$match": {"is_active": True}},
+        """Get overall team statistics, aggregated in MongoDB"""
+        pipeline = self._scored_teams_pipeline({"is_active": True}) + [
             {"$group": {
                 "_id": None,
+                "total_teams": {"$sum": 1},
                 "total_members": {"$sum": "$current_members"},
-                "total_score": {"$sum": "$total_score"},
-                "avg_score": {"$avg": "$total_score"},
-                "max_score": {"$max": "$total_score"}
+                "total_score": {"$sum": "$current_score"},
+                "highest_team_score": {"$max": "$current_score"}
             }}
         ]
+        result = next(iter(self.collection.aggregate(pipeline)), None)
 
-        result = list(self.collection.aggregate(pipeline))
         if result:
-            stats = result[0]
+            total_teams = result["total_teams"]
             return {
                 "total_teams": total_teams,
-                "total_members": stats.get("total_members", 0),
-                "total_score": stats.get("total_score", 0),
-                "average_score_per_team": stats.get("avg_score", 0),
-                "highest_team_score": stats.get("max_score", 0),
-                "average_members_per_team": stats.get("total_members", 0) / total_teams if total_teams > 0 else 0
+                "total_members": result["total_members"],
+                "total_score": result["total_score"],
+                "average_score_per_team": result["total_score"] / total_teams,
+                "highest_team_score": result["highest_team_score"],
+                "average_members_per_team": result["total_members"] / total_teams
             }
 
         return {
@@ -198,4 +205,39 @@ class GlobalTeamRepository(BaseRepository):
             "average_score_per_team": 0,
             "highest_team_score": 0,
             "average_members_per_team": 0
-        }
\ No newline at end of file
+        }
+
+    def _scored_teams_pipeline(self, filter_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Aggregation stages adding current_score: total_score plus the global counter shards"""
+        return [
+            {"$match": filter_dict},
+            {"$lookup": {
+                "from": self.score_counters.collection_name,
+                "let": {"team_id": "$team_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [
+                        {"$eq": ["$scope", TeamScoreCounterRepository.GLOBAL_SCOPE]},
+                        {"$eq": ["$team_id", "$$team_id"]}
+                    ]}}},
+                    {"$project": {"_id": 0, "score": 1}}
+                ],
+                "as": "counter_shards"
+            }},
+            {"$addFields": {"current_score": {"$add": [
+                {"$ifNull": ["$total_score", 0]},
+                {"$sum": "$counter_shards.score"}
+            ]}}}
+        ]
+
+    def _with_scores(self, teams: List[GlobalTeam]) -> List[GlobalTeam]:
+        """Add each team's global score counter totals"""
+        if not teams:
+            return teams
+
+        totals = self.score_counters.get_scope_totals(
+            TeamScoreCounterRepository.GLOBAL_SCOPE, [team.team_id for team in teams]
+        )
+        for team in teams:
+            if team.team_id in totals:
+                team.add_counter_totals(totals[team.team_id])
+        return teams
@@ -1,5 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
 from app.core.repositories.base_repository import BaseRepository
 from ..models.team_member import TeamMember
 
@@ -217,27 +218,63 @@ class TeamMemberRepository(BaseRepository):
             "total_challenges_participated": 0
         }
 
-    def balance_teams(self, team_assignments: Dict[str, str]) -> int:
-        """Bulk reassign users to teams for balancing"""
-        operations = []
-
-        for user_id, new_team_id in team_assignments.items():
-            # Deactivate current membership
-            operations.append({
-                "updateMany": {
-                    "filter": {"user_id": user_id, "is_active": True},
-                    "update": {"$set": {"is_active": False}}
-                }
-            })
-
-            # Create new membership
-            new_member = TeamMember.create_member(user_id, new_team_id)
-            operations.append({
-                "insertOne": {"document": new_member.to_dict()}
-            })
-
-        if operations:
-            result = self.collection.bulk_write(operations)
-            return result.inserted_count
-
-        return 0
\ No newline at end of file
+    def get_team_balance_stats(self, team_ids: List[str]) -> Dict[str, Dict[str, float]]:
+        """Get active member counts and total contribution score per team"""
+        pipeline = [
+            {"$match": {"team_id": {"$in": list(team_ids)}, "is_active": True}},
+            {"$group": {
+                "_id": "$team_id",
+                "members": {"$sum": 1},
+                "score": {"$sum": "$contribution_score"}
+            }}
+        ]
+
+        stats = {team_id: {"members": 0, "score": 0.0} for team_id in team_ids}
+        for row in self.collection.aggregate(pipeline):
+            stats[row["_id"]] = {"members": row["members"], "score": row["score"]}
+        return stats
+
+    def iter_member_scores(self, team_id: str) -> Iterator[Tuple[str, float]]:
+        """Stream (user_id, contribution_score) for a team's active members"""
+        cursor = self.collection.find(
+            {"team_id": team_id, "is_active": True},
+            {"_id": 0, "user_id": 1, "contribution_score": 1}
+        ).batch_size(1000)
+
+        for data in cursor:
+            yield data["user_id"], data.get("contribution_score", 0.0)
+
+    def iter_member_ids(self, team_id: str) -> Iterator[str]:
+        """Stream the user IDs of a team's active members"""
+        cursor = self.collection.find(
+            {"team_id": team_id, "is_active": True},
+            {"_id": 0, "user_id": 1}
+        ).batch_size(1000)
+
+        for data in cursor:
+            yield data["user_id"]
+
+    def reassign_members(self, moves: Dict[str, Tuple[str, str]]) -> int:
+        """
+        Move active members between teams in one bulk write
+
+        Args:
+            moves: {user_id: (from_team_id, to_team_id)}
+
+        Returns:
+            int: Number of members moved; members that left or changed team since are skipped
+        """
+        if not moves:
+            return 0
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "team_id": from_team_id, "is_active": True},
+                {"$set": {"team_id": to_team_id, "team_role": "member", "joined_at": now}}
+            )
+            for user_id, (from_team_id, to_team_id) in moves.items()
+        ]
+
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.modified_count
@@ -0,0 +1,167 @@
+import os
+import random
+import threading
+import time
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+from pymongo import UpdateOne
+from app.core.repositories.base_repository import BaseRepository
+
+
+class TeamScoreCounterRepository(BaseRepository):
+    """
+    Sharded score counters for global teams and tournament standings
+
+    A team's score in a scope (its global total, or one tournament) is the
+    sum of its counter shards. Writes are a single upserting $inc; a team
+    writes to shard 0 until this worker sees it exceed
+    HOT_WRITES_PER_SECOND, then spreads over SHARDS random shards so
+    concurrent game ends do not queue on one document. Reads sum at most
+    SHARDS documents per team.
+    """
+
+    GLOBAL_SCOPE = "global"
+
+    SHARDS = int(os.getenv('TEAM_SCORE_SHARDS', '16'))
+    HOT_WRITES_PER_SECOND = float(os.getenv('TEAM_SCORE_HOT_WRITES_PER_SECOND', '5'))
+
+    # Standing counters incremented by each activity type
+    ACTIVITY_COUNTERS = {
+        "game": ("games_played", "individual_games"),
+        "challenge": ("challenges_won",)
+    }
+    COUNTER_FIELDS = ("score", "games_played", "individual_games", "challenges_won")
+
+    # Write rates seen by this worker: team_id -> [window start, writes in window, last rate]
+    _write_rates: Dict[str, List[float]] = {}
+    _rates_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__("team_score_counters")
+
+    def create_indexes(self):
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        from pymongo import ASCENDING
+        # Compound index for scope and team - used to sum a scope's shards
+        self.collection.create_index([("scope", ASCENDING), ("team_id", ASCENDING)])
+
+    @staticmethod
+    def tournament_scope(tournament_id: str) -> str:
+        """Counter scope of a tournament's standings"""
+        return f"tournament:{tournament_id}"
+
+    def increment(self, team_id: str, points: float, scopes: List[str],
+                  activity_type: str = "game", source: str = None) -> bool:
+        """
+        Add points and one activity to a team in several scopes in one round trip
+
+        Args:
+            team_id: Team earning the points
+            points: Points to add
+            scopes: Counter scopes to update (GLOBAL_SCOPE, tournament_scope(...))
+            activity_type: Activity counted ('game' or 'challenge')
+            source: Optional source tracked in points_by_source
+
+        Returns:
+            bool: True if every scope was updated
+        """
+        now = datetime.utcnow()
+        shard = self._pick_shard(team_id)
+
+        inc = {"score": points}
+        for field_name in self.ACTIVITY_COUNTERS.get(activity_type, ()):
+            inc[field_name] = 1
+        if source:
+            inc[f"points_by_source.{source}"] = points
+
+        operations = [
+            UpdateOne(
+                {"_id": f"{scope}:{team_id}:{shard}"},
+                {
+                    "$inc": inc,
+                    "$max": {"last_activity": now},
+                    "$setOnInsert": {"scope": scope, "team_id": team_id, "shard": shard}
+                },
+                upsert=True
+            )
+            for scope in scopes
+        ]
+
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.matched_count + result.upserted_count == len(operations)
+
+    def get_scope_totals(self, scope: str, team_ids: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Sum the shards of every team in a scope
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Counter totals keyed by team ID
+        """
+        filter_dict = {"scope": scope}
+        if team_ids is not None:
+            filter_dict["team_id"] = {"$in": list(team_ids)}
+
+        totals = {}
+        for shard in self.collection.find(filter_dict, {"scope": 0, "shard": 0}):
+            team_totals = totals.setdefault(shard["team_id"], {
+                **{field_name: 0 for field_name in self.COUNTER_FIELDS},
+                "points_by_source": {},
+                "last_activity": None
+            })
+
+            for field_name in self.COUNTER_FIELDS:
+                team_totals[field_name] += shard.get(field_name, 0)
+            for source, points in shard.get("points_by_source", {}).items():
+                team_totals["points_by_source"][source] = team_totals["points_by_source"].get(source, 0) + points
+
+            last_activity = shard.get("last_activity")
+            if last_activity and (team_totals["last_activity"] is None or last_activity > team_totals["last_activity"]):
+                team_totals["last_activity"] = last_activity
+
+        return totals
+
+    def get_standings(self, tournament_id: str, team_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get a tournament's standings from its counters, best score first
+
+        Teams without activity are listed with zero counters.
+        """
+        totals = self.get_scope_totals(self.tournament_scope(tournament_id), team_ids)
+
+        standings = []
+        for team_id in team_ids:
+            team_totals = totals.get(team_id, {})
+            last_activity = team_totals.get("last_activity")
+            standings.append({
+                "team_id": team_id,
+                **{field_name: team_totals.get(field_name, 0) for field_name in self.COUNTER_FIELDS},
+                "last_activity": last_activity.isoformat() if last_activity else None
+            })
+
+        standings.sort(key=lambda standing: standing["score"], reverse=True)
+        for position, standing in enumerate(standings, start=1):
+            standing["position"] = position
+
+        return standings
+
+    def reset_scope(self, scope: str, team_ids: Optional[List[str]] = None) -> int:
+        """Delete the counters of a scope, optionally only for some teams"""
+        filter_dict = {"scope": scope}
+        if team_ids is not None:
+            filter_dict["team_id"] = {"$in": list(team_ids)}
+        return self.collection.delete_many(filter_dict).deleted_count
+
+    def _pick_shard(self, team_id: str) -> int:
+        """Shard for the next write: 0 for quiet teams, random for hot ones"""
+        now = time.monotonic()
+        with self._rates_lock:
+            window = self._write_rates.setdefault(team_id, [now, 0, 0.0])
+            elapsed = now - window[0]
+            if elapsed >= 1.0:
+                window[0], window[1], window[2] = now, 0, window[1] / elapsed
+            window[1] += 1
+            hot = max(window[1], window[2]) > self.HOT_WRITES_PER_SECOND
+
+        return random.randrange(self.SHARDS) if hot else 0
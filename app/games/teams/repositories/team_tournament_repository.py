@@ -2,12 +2,19 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.core.repositories.base_repository import BaseRepository
 from ..models.team_tournament import TeamTournament
+from .team_score_counter_repository import TeamScoreCounterRepository
 
 class TeamTournamentRepository(BaseRepository):
-    """Repository for team tournament operations"""
+    """
+    Repository for team tournament operations
+
+    Standings of running tournaments are kept in sharded score counters;
+    current_standings holds the snapshot taken when a tournament ends.
+    """
 
     def __init__(self):
         super().__init__("team_tournaments")
+        self.score_counters = TeamScoreCounterRepository()
 
     def create_indexes(self):
         import os
@@ -81,16 +88,35 @@ class TeamTournamentRepository(BaseRepository):
         )
         return result.modified_count > 0
 
-    def complete_tournament(self, tournament_id: str, final_standings: List[str]) -> bool:
-        """Complete a tournament with final standings"""
+    def complete_tournament(self, tournament_id: str, final_standings: List[str],
+                            standings: List[Dict[str, Any]] = None,
+                            prize_recipients: Dict[str, List[str]] = None) -> bool:
+        """Complete a tournament with final standings, a snapshot of its leaderboard and its prize recipients"""
         now = datetime.utcnow()
+        update = {
+            "status": "completed",
+            "end_date": now,
+            "final_standings": final_standings,
+            "updated_at": now
+        }
+        if standings is not None:
+            update["current_standings"] = standings
+        if prize_recipients is not None:
+            update["prize_recipients"] = prize_recipients
+
         result = self.collection.update_one(
             {"tournament_id": tournament_id, "status": "active"},
+            {"$set": update}
+        )
+        return result.modified_count > 0
+
+    def record_prize_recipients(self, tournament_id: str, prize_recipients: Dict[str, List[str]]) -> bool:
+        """Record the prize recipients of a completed tournament that has none yet"""
+        result = self.collection.update_one(
+            {"tournament_id": tournament_id, "status": "completed", "prize_recipients": None},
             {"$set": {
-                "status": "completed",
-                "end_date": now,
-                "final_standings": final_standings,
-                "updated_at": now
+                "prize_recipients": prize_recipients,
+                "updated_at": datetime.utcnow()
             }}
         )
         return result.modified_count > 0
@@ -131,58 +157,8 @@ class TeamTournamentRepository(BaseRepository):
 
     def update_team_standing(self, tournament_id: str, team_id: str, points: float, activity_type: str) -> bool:
         """Update a team's standing in the tournament"""
-        now = datetime.utcnow()
-
-        # Update the specific team's standing
-        result = self.collection.update_one(
-            {
-                "tournament_id": tournament_id,
-                "status": "active",
-                "current_standings.team_id": team_id
-            },
-            {
-                "$inc": {
-                    "current_standings.$.score": points,
-                    f"current_standings.$.{activity_type}_count": 1
-                },
-                "$set": {
-                    "current_standings.$.last_activity": now.isoformat(),
-                    "updated_at": now
-                }
-            }
-        )
-
-        if result.modified_count > 0:
-            # Re-sort standings by score
-            self._resort_standings(tournament_id)
-            return True
-
-        return False
-
-    def _resort_standings(self, tournament_id: str) -> None:
-        """Resort tournament standings by score"""
-        tournament = self.get_tournament_by_tournament_id(tournament_id)
-        if not tournament:
-            return
-
-        # Sort standings by score
-        sorted_standings = sorted(
-            tournament.current_standings,
-            key=lambda x: x.get("score", 0),
-            reverse=True
-        )
-
-        # Update positions
-        for i, standing in enumerate(sorted_standings):
-            standing["position"] = i + 1
-
-        # Update in database
-        self.collection.update_one(
-            {"tournament_id": tournament_id},
-            {"$set": {
-                "current_standings": sorted_standings,
-                "updated_at": datetime.utcnow()
-            }}
+        return self.score_counters.increment(
+            team_id, points, [TeamScoreCounterRepository.tournament_scope(tournament_id)], activity_type
         )
 
     def get_tournament_leaderboard(self, tournament_id: str) -> List[Dict[str, Any]]:
@@ -191,7 +167,7 @@ class TeamTournamentRepository(BaseRepository):
         if not tournament:
             return []
 
-        return sorted(tournament.current_standings, key=lambda x: x.get("score", 0), reverse=True)
+        return self._get_standings(tournament)
 
     def initialize_tournament_standings(self, tournament_id: str, team_ids: List[str]) -> bool:
         """Initialize standings for a tournament"""
@@ -232,17 +208,19 @@ class TeamTournamentRepository(BaseRepository):
             "time_remaining_hours": tournament.get_time_remaining_hours()
         }
 
-        if tournament.current_standings:
-            total_score = sum(s.get("score", 0) for s in tournament.current_standings)
-            total_games = sum(s.get("games_played", 0) for s in tournament.current_standings)
-            total_challenges = sum(s.get("challenges_won", 0) for s in tournament.current_standings)
+        standings = self._get_standings(tournament)
+        if standings:
+            tournament.current_standings = standings
+            total_score = sum(s.get("score", 0) for s in standings)
+            total_games = sum(s.get("games_played", 0) for s in standings)
+            total_challenges = sum(s.get("challenges_won", 0) for s in standings)
 
             stats.update({
                 "total_points_awarded": total_score,
                 "total_games_played": total_games,
                 "total_challenges_completed": total_challenges,
                 "average_score_per_team": total_score / len(tournament.teams) if tournament.teams else 0,
-                "leader_score": tournament.current_standings[0].get("score", 0) if tournament.current_standings else 0,
+                "leader_score": standings[0].get("score", 0),
                 "competition_closeness": tournament._calculate_competition_closeness()
             })
 
@@ -262,16 +240,11 @@ class TeamTournamentRepository(BaseRepository):
         for tournament_data in expired_tournaments:
             tournament = TeamTournament.from_dict(tournament_data)
 
-            # Sort final standings
-            sorted_standings = sorted(
-                tournament.current_standings,
-                key=lambda x: x.get("score", 0),
-                reverse=True
-            )
-            final_standings = [s["team_id"] for s in sorted_standings]
+            standings = self._get_standings(tournament)
+            final_standings = [s["team_id"] for s in standings]
 
             # Complete the tournament
-            if self.complete_tournament(tournament.tournament_id, final_standings):
+            if self.complete_tournament(tournament.tournament_id, final_standings, standings):
                 count += 1
 
         return count
@@ -284,4 +257,11 @@ class TeamTournamentRepository(BaseRepository):
             "status": {"$in": ["completed", "cancelled"]},
             "end_date": {"$lt": cutoff_date}
         })
-        return result.deleted_count
\ No newline at end of file
+        return result.deleted_count
+
+    def _get_standings(self, tournament: TeamTournament) -> List[Dict[str, Any]]:
+        """Standings from the counters, or the snapshot of a completed tournament"""
+        if tournament.status == "completed" or not tournament.teams:
+            return sorted(tournament.current_standings, key=lambda x: x.get("score", 0), reverse=True)
+
+        return self.score_counters.get_standings(tournament.tournament_id, tournament.teams)
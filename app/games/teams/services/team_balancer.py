@@ -0,0 +1,244 @@
+import bisect
+import os
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+
+class TeamBalancer:
+    """
+    Plans the fewest member moves that balance team headcount and score
+
+    Headcount is balanced exactly with the minimum number of moves: each
+    team ends with N // T or N // T + 1 members, the extra slots going to
+    the teams that are already largest. The members moved out of each
+    surplus team are picked greedily so its remaining contribution score
+    lands near the mean, and are sent to the deficit teams that need the
+    most score per open slot.
+
+    A local search then swaps members between the highest and lowest
+    scoring teams. A swap that only redirects planned moves is always
+    taken. A swap that costs extra moves is taken only while the score
+    spread is above score_tolerance of the mean team score, and only up
+    to max_score_swaps times.
+
+    Members are read one team at a time through load_members. Only the
+    teams the plan touches are loaded, as (score, user_id) pairs.
+    """
+
+    SCORE_TOLERANCE = float(os.getenv('TEAM_BALANCE_SCORE_TOLERANCE', '0.05'))
+    MAX_SCORE_SWAPS = int(os.getenv('TEAM_BALANCE_MAX_SCORE_SWAPS', '25'))
+
+    # Upper bound on local search rounds, including swaps that cost no moves
+    MAX_SEARCH_ROUNDS = 200
+
+    def __init__(self, team_stats: Dict[str, Dict[str, float]],
+                 load_members: Callable[[str], Iterable[Tuple[str, float]]],
+                 score_tolerance: Optional[float] = None, max_score_swaps: Optional[int] = None):
+        """
+        Initialize TeamBalancer
+
+        Args:
+            team_stats: {team_id: {"members": count, "score": total contribution}}
+            load_members: Yields (user_id, contribution_score) for a team's active members
+            score_tolerance: Accepted score spread as a fraction of the mean team score
+            max_score_swaps: Most swaps that add moves to balance score
+        """
+        self._load_members = load_members
+        self.score_tolerance = self.SCORE_TOLERANCE if score_tolerance is None else score_tolerance
+        self.max_score_swaps = self.MAX_SCORE_SWAPS if max_score_swaps is None else max_score_swaps
+
+        self._before = {
+            team_id: {"members": int(stats.get("members", 0)), "score": float(stats.get("score", 0))}
+            for team_id, stats in team_stats.items()
+        }
+        self._counts = {team_id: stats["members"] for team_id, stats in self._before.items()}
+        self._scores = {team_id: stats["score"] for team_id, stats in self._before.items()}
+
+        # Sorted (score, user_id) membership of the teams loaded so far
+        self._members: Dict[str, List[Tuple[float, str]]] = {}
+        # Members planned into a team before it was loaded
+        self._incoming: Dict[str, List[Tuple[float, str]]] = {}
+        # Original team of every member the plan touched
+        self._origin: Dict[str, str] = {}
+        self._team_of: Dict[str, str] = {}
+
+        self.score_swaps = 0
+
+    def plan(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Plan the reassignments
+
+        Returns:
+            Dict[str, Tuple[str, str]]: {user_id: (from_team_id, to_team_id)}
+        """
+        if len(self._counts) < 2:
+            return {}
+
+        self._balance_headcount()
+        self._balance_scores()
+
+        return {
+            user_id: (origin, self._team_of[user_id])
+            for user_id, origin in self._origin.items()
+            if self._team_of[user_id] != origin
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get balance metrics before and after the planned moves"""
+        teams = {
+            team_id: {
+                "members_before": before["members"],
+                "members_after": self._counts[team_id],
+                "score_before": round(before["score"], 2),
+                "score_after": round(self._scores[team_id], 2)
+            }
+            for team_id, before in self._before.items()
+        }
+        before_counts = [stats["members"] for stats in self._before.values()]
+        before_scores = [stats["score"] for stats in self._before.values()]
+
+        return {
+            "teams": teams,
+            "moves": sum(1 for user_id, origin in self._origin.items() if self._team_of[user_id] != origin),
+            "score_swaps": self.score_swaps,
+            "headcount_spread_before": self._spread(before_counts),
+            "headcount_spread_after": self._spread(list(self._counts.values())),
+            "score_spread_before": round(self._spread(before_scores), 2),
+            "score_spread_after": round(self._spread(list(self._scores.values())), 2),
+            "mean_team_score": round(self._mean_score(), 2)
+        }
+
+    # Private methods
+
+    def _balance_headcount(self):
+        total = sum(self._counts.values())
+        base, extra = divmod(total, len(self._counts))
+
+        # The largest teams keep the extra slots, so they need the fewest moves
+        by_size = sorted(self._counts, key=lambda team_id: (-self._counts[team_id], team_id))
+        targets = {team_id: base + (1 if index < extra else 0) for index, team_id in enumerate(by_size)}
+
+        mean = self._mean_score()
+        movers = []
+        for team_id in by_size:
+            surplus = self._counts[team_id] - targets[team_id]
+            if surplus > 0:
+                movers.extend(self._pick_movers(team_id, surplus, self._scores[team_id] - mean))
+
+        open_slots = {
+            team_id: targets[team_id] - self._counts[team_id]
+            for team_id in by_size if targets[team_id] > self._counts[team_id]
+        }
+        for score, user_id, origin in sorted(movers, reverse=True):
+            destination = max(
+                (team_id for team_id, slots in open_slots.items() if slots > 0),
+                key=lambda team_id: (mean - self._scores[team_id]) / open_slots[team_id]
+            )
+            open_slots[destination] -= 1
+            self._place(user_id, score, origin, destination)
+
+    def _pick_movers(self, team_id: str, count: int, outflow: float) -> List[Tuple[float, str, str]]:
+        """Take count members whose scores add up close to outflow out of a team"""
+        members = self._team_members(team_id)
+        picked = []
+        # Stats may be slightly ahead of the members read
+        for remaining_slots in range(min(count, len(members)), 0, -1):
+            index = self._closest(members, outflow / remaining_slots)
+            score, user_id = members.pop(index)
+            self._counts[team_id] -= 1
+            self._scores[team_id] -= score
+            picked.append((score, user_id, team_id))
+            outflow -= score
+        return picked
+
+    def _balance_scores(self):
+        tolerance = self.score_tolerance * abs(self._mean_score())
+
+        for _ in range(self.MAX_SEARCH_ROUNDS):
+            high = max(self._scores, key=lambda team_id: (self._scores[team_id], team_id))
+            low = min(self._scores, key=lambda team_id: (self._scores[team_id], team_id))
+            gap = self._scores[high] - self._scores[low]
+            if gap <= 0:
+                return
+
+            swap = self._best_swap(high, low, gap)
+            if swap is None:
+                return
+
+            cost, _, (high_score, high_user), (low_score, low_user) = swap
+            if cost > 0:
+                if gap <= tolerance or self.score_swaps >= self.max_score_swaps:
+                    return
+                self.score_swaps += 1
+
+            self._move(high_user, high_score, high, low)
+            self._move(low_user, low_score, low, high)
+
+    def _best_swap(self, high: str, low: str, gap: float):
+        """Find the swap that narrows the gap most, preferring swaps that add no moves"""
+        high_members = self._team_members(high)
+        low_members = self._team_members(low)
+        if not high_members or not low_members:
+            return None
+
+        best = None
+        for high_member in high_members:
+            index = bisect.bisect_left(low_members, (high_member[0] - gap / 2, ""))
+            for low_member in low_members[max(0, index - 1):index + 1]:
+                difference = high_member[0] - low_member[0]
+                if not 0 < difference < gap:
+                    continue
+
+                cost = self._move_cost(high_member[1], high, low) + self._move_cost(low_member[1], low, high)
+                candidate = (cost, abs(gap - 2 * difference), high_member, low_member)
+                if best is None or candidate[:2] < best[:2]:
+                    best = candidate
+        return best
+
+    def _move_cost(self, user_id: str, from_team: str, to_team: str) -> int:
+        """Change in the number of moved members if user_id goes from from_team to to_team"""
+        origin = self._origin.get(user_id, from_team)
+        return (origin != to_team) - (origin != from_team)
+
+    def _move(self, user_id: str, score: float, from_team: str, to_team: str):
+        members = self._members[from_team]
+        members.pop(bisect.bisect_left(members, (score, user_id)))
+        self._counts[from_team] -= 1
+        self._scores[from_team] -= score
+        self._place(user_id, score, from_team, to_team)
+
+    def _place(self, user_id: str, score: float, from_team: str, to_team: str):
+        """Add a member taken out of from_team to to_team"""
+        if to_team in self._members:
+            bisect.insort(self._members[to_team], (score, user_id))
+        else:
+            self._incoming.setdefault(to_team, []).append((score, user_id))
+        self._counts[to_team] += 1
+        self._scores[to_team] += score
+
+        self._origin.setdefault(user_id, from_team)
+        self._team_of[user_id] = to_team
+
+    def _team_members(self, team_id: str) -> List[Tuple[float, str]]:
+        if team_id not in self._members:
+            members = [(float(score or 0), user_id) for user_id, score in self._load_members(team_id)]
+            members.extend(self._incoming.pop(team_id, []))
+            members.sort()
+            self._members[team_id] = members
+        return self._members[team_id]
+
+    def _mean_score(self) -> float:
+        return sum(self._scores.values()) / len(self._scores) if self._scores else 0.0
+
+    @staticmethod
+    def _closest(members: List[Tuple[float, str]], score: float) -> int:
+        """Index of the member whose score is closest to score"""
+        index = bisect.bisect_left(members, (score, ""))
+        if index == len(members):
+            return index - 1
+        if index > 0 and score - members[index - 1][0] <= members[index][0] - score:
+            return index - 1
+        return index
+
+    @staticmethod
+    def _spread(values: List[float]) -> float:
+        return max(values) - min(values) if values else 0
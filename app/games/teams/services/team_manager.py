@@ -1,22 +1,41 @@
 from typing import Tuple, Optional, Dict, Any, List
 from flask import current_app
 from datetime import datetime, timedelta
+import os
 import random
+import threading
+import time
 
 from ..repositories.global_team_repository import GlobalTeamRepository
 from ..repositories.team_member_repository import TeamMemberRepository
 from ..repositories.team_tournament_repository import TeamTournamentRepository
-from ..models.global_team import GlobalTeam
-from ..models.team_member import TeamMember
+from ..repositories.team_score_counter_repository import TeamScoreCounterRepository
 from ..models.team_tournament import TeamTournament
+from .team_balancer import TeamBalancer
 
 class TeamManager:
     """Service for managing global teams and team assignments"""
 
+    # Seconds this worker reuses the active tournament when recording contributions;
+    # clear_active_tournament_cache only reaches this worker, so others see a
+    # tournament start or end once this expires
+    ACTIVE_TOURNAMENT_TTL_SECONDS = float(os.getenv('TEAM_ACTIVE_TOURNAMENT_TTL_SECONDS', '5'))
+
+    # (loaded at, active tournament ID, its team IDs) shared by this worker
+    _active_tournament_cache: Optional[Tuple[float, Optional[str], set]] = None
+    _active_tournament_lock = threading.Lock()
+
     def __init__(self):
         self.team_repository = GlobalTeamRepository()
         self.member_repository = TeamMemberRepository()
         self.tournament_repository = TeamTournamentRepository()
+        self.score_counters = TeamScoreCounterRepository()
+
+    @classmethod
+    def clear_active_tournament_cache(cls):
+        """Forget the cached active tournament after it starts or ends"""
+        with cls._active_tournament_lock:
+            cls._active_tournament_cache = None
 
     def get_all_teams(self, active_only: bool = True) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """Get all global teams"""
@@ -187,15 +206,10 @@ class TeamManager:
             if not success:
                 return False, "FAILED_TO_RECORD_CONTRIBUTION", None
 
-            # Add to team score
-            self.team_repository.update_team_score(member.team_id, contribution_points, game_type)
-
-            # Update active tournament if exists
-            active_tournament = self.tournament_repository.get_active_tournament()
-            if active_tournament and member.team_id in active_tournament.teams:
-                self.tournament_repository.update_team_standing(
-                    active_tournament.tournament_id, member.team_id, contribution_points, "game"
-                )
+            # Add to team score and active tournament standing
+            self.score_counters.increment(
+                member.team_id, contribution_points, self._score_scopes(member.team_id), "game", game_type
+            )
 
             return True, "CONTRIBUTION_RECORDED_SUCCESSFULLY", {
                 "contribution_points": contribution_points,
@@ -231,15 +245,10 @@ class TeamManager:
             else:
                 team_points = base_points
 
-            # Add to team score
-            self.team_repository.update_team_score(member.team_id, team_points, "challenge")
-
-            # Update active tournament
-            active_tournament = self.tournament_repository.get_active_tournament()
-            if active_tournament and member.team_id in active_tournament.teams:
-                self.tournament_repository.update_team_standing(
-                    active_tournament.tournament_id, member.team_id, team_points, "challenge"
-                )
+            # Add to team score and active tournament standing
+            self.score_counters.increment(
+                member.team_id, team_points, self._score_scopes(member.team_id), "challenge", "challenge"
+            )
 
             return True, "CHALLENGE_RESULT_RECORDED", {
                 "team_points": team_points,
@@ -250,42 +259,54 @@ class TeamManager:
             current_app.logger.error(f"Failed to record challenge result: {str(e)}")
             return False, "FAILED_TO_RECORD_CHALLENGE_RESULT", None
 
-    def balance_teams(self) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
-        """Balance team members across teams"""
+    def balance_teams(self, dry_run: bool = False) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Balance team headcount and contribution score with the fewest reassignments
+
+        Args:
+            dry_run: Only plan the moves and report the resulting balance
+        """
         try:
             teams = self.team_repository.get_all_teams()
             if len(teams) < 2:
                 return False, "INSUFFICIENT_TEAMS_FOR_BALANCING", None
 
-            # Get all active members
-            all_members = []
-            for team in teams:
-                members = self.member_repository.get_team_members(team.team_id)
-                all_members.extend(members)
-
-            if not all_members:
+            team_ids = [team.team_id for team in teams]
+            team_stats = self.member_repository.get_team_balance_stats(team_ids)
+            if not any(stats["members"] for stats in team_stats.values()):
                 return False, "NO_MEMBERS_TO_BALANCE", None
 
-            # Calculate target members per team
-            target_per_team = len(all_members) // len(teams)
-
-            # Create balanced assignments
-            balanced_assignments = self._create_balanced_assignments(all_members, teams, target_per_team)
+            balancer = TeamBalancer(team_stats, self.member_repository.iter_member_scores)
+            moves = balancer.plan()
+            metrics = balancer.get_metrics()
+
+            if dry_run:
+                return True, "TEAMS_BALANCE_PLANNED", {
+                    "dry_run": True,
+                    "planned_moves": len(moves),
+                    "team_distributions": {
+                        team.name: metrics["teams"][team.team_id]["members_after"] for team in teams
+                    },
+                    "metrics": metrics
+                }
 
-            # Execute balancing
-            reassigned_count = self.member_repository.balance_teams(balanced_assignments)
+            reassigned_count = self.member_repository.reassign_members(moves)
 
-            # Update team member counts
+            # Sync member counts with the memberships actually moved
+            team_stats = self.member_repository.get_team_balance_stats(team_ids)
             for team in teams:
-                new_count = sum(1 for assignment in balanced_assignments.values() if assignment == team.team_id)
-                team.current_members = new_count
-                self.team_repository.update_member_count(team.team_id, new_count - team.current_members)
+                new_count = team_stats[team.team_id]["members"]
+                if new_count != team.current_members:
+                    self.team_repository.update_member_count(team.team_id, new_count - team.current_members)
+                    team.current_members = new_count
 
-            current_app.logger.info(f"Balanced teams: reassigned {reassigned_count} members")
+            current_app.logger.info(f"Balanced teams: reassigned {reassigned_count} of {len(moves)} planned members")
 
             return True, "TEAMS_BALANCED_SUCCESSFULLY", {
+                "dry_run": False,
                 "reassigned_members": reassigned_count,
-                "team_distributions": {team.name: team.current_members for team in teams}
+                "team_distributions": {team.name: team.current_members for team in teams},
+                "metrics": metrics
             }
 
         except Exception as e:
@@ -316,6 +337,27 @@ class TeamManager:
             current_app.logger.error(f"Failed to initialize teams: {str(e)}")
             return False, "FAILED_TO_INITIALIZE_TEAMS", None
 
+    def _score_scopes(self, team_id: str) -> List[str]:
+        """Counter scopes a team's points go to: global, plus the active tournament it plays in"""
+        scopes = [TeamScoreCounterRepository.GLOBAL_SCOPE]
+
+        with self._active_tournament_lock:
+            cached = TeamManager._active_tournament_cache
+        if cached is None or time.monotonic() - cached[0] > self.ACTIVE_TOURNAMENT_TTL_SECONDS:
+            tournament = self.tournament_repository.get_active_tournament()
+            cached = (
+                time.monotonic(),
+                tournament.tournament_id if tournament else None,
+                set(tournament.teams) if tournament else set()
+            )
+            with self._active_tournament_lock:
+                TeamManager._active_tournament_cache = cached
+
+        _, tournament_id, team_ids = cached
+        if tournament_id and team_id in team_ids:
+            scopes.append(TeamScoreCounterRepository.tournament_scope(tournament_id))
+        return scopes
+
     def _find_best_team_for_user(self, user_id: str) -> Optional[str]:
         """Find the best team for a user based on current balance"""
         teams = self.team_repository.get_all_teams()
@@ -330,20 +372,3 @@ class TeamManager:
         # Sort by member count (ascending) then by total score (ascending) for balance
         available_teams.sort(key=lambda t: (t.current_members, t.total_score))
         return available_teams[0].team_id
-
-    def _create_balanced_assignments(self, members: List[TeamMember], teams: List[GlobalTeam], target_per_team: int) -> Dict[str, str]:
-        """Create balanced team assignments"""
-        # Sort members by contribution score for fair distribution
-        sorted_members = sorted(members, key=lambda m: m.contribution_score, reverse=True)
-
-        assignments = {}
-        team_counts = {team.team_id: 0 for team in teams}
-
-        # Distribute members round-robin style
-        for i, member in enumerate(sorted_members):
-            team_index = i % len(teams)
-            target_team = teams[team_index]
-            assignments[member.user_id] = target_team.team_id
-            team_counts[target_team.team_id] += 1
-
-        return assignments
\ No newline at end of file
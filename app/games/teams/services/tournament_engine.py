@@ -7,6 +7,8 @@ from ..repositories.global_team_repository import GlobalTeamRepository
 from ..repositories.team_member_repository import TeamMemberRepository
 from ..models.team_tournament import TeamTournament
 from .team_manager import TeamManager
+from app.donations.models.transaction import SourceType
+from app.donations.services.wallet_service import WalletService
 
 class TournamentEngine:
     """Service for managing team tournaments"""
@@ -16,6 +18,7 @@ class TournamentEngine:
         self.team_repository = GlobalTeamRepository()
         self.member_repository = TeamMemberRepository()
         self.team_manager = TeamManager()
+        self.wallet_service = WalletService()
 
     def create_tournament(self, tournament_type: str, name: str = None,
                          duration_days: int = 30, team_ids: List[str] = None,
@@ -86,6 +89,7 @@ class TournamentEngine:
             # Set tournament on teams
             for team_id in tournament.teams:
                 self.team_repository.set_tournament(team_id, tournament_id)
+            TeamManager.clear_active_tournament_cache()
 
             current_app.logger.info(f"Started tournament {tournament_id}")
 
@@ -111,14 +115,20 @@ class TournamentEngine:
             # Get final standings
             leaderboard = self.tournament_repository.get_tournament_leaderboard(tournament_id)
             final_standings = [entry["team_id"] for entry in leaderboard]
+            prize_recipients = self._collect_prize_recipients(tournament, leaderboard)
 
-            # Complete tournament
-            success = self.tournament_repository.complete_tournament(tournament_id, final_standings)
+            # Complete tournament, keeping the leaderboard and prize recipients as its final snapshot
+            success = self.tournament_repository.complete_tournament(
+                tournament_id, final_standings, leaderboard, prize_recipients
+            )
             if not success:
                 return False, "FAILED_TO_COMPLETE_TOURNAMENT", None
+            TeamManager.clear_active_tournament_cache()
+            tournament.prize_recipients = prize_recipients
 
             # Award prizes
-            prizes_awarded = self._award_tournament_prizes(tournament, leaderboard)
+            prize_result = self._award_tournament_prizes(tournament, leaderboard)
+            prizes_awarded = prize_result["prizes_awarded"]
 
             # Clear tournament from teams
             for team_id in tournament.teams:
@@ -129,13 +139,44 @@ class TournamentEngine:
             return True, "TOURNAMENT_COMPLETED_SUCCESSFULLY", {
                 "tournament_id": tournament_id,
                 "final_standings": final_standings,
-                "prizes_awarded": prizes_awarded
+                "prizes_awarded": prizes_awarded,
+                "prize_credits": prize_result["credits"],
+                "prize_credits_pending": prize_result["credits_pending"]
             }
 
         except Exception as e:
             current_app.logger.error(f"Failed to complete tournament: {str(e)}")
             return False, "FAILED_TO_COMPLETE_TOURNAMENT", None
 
+    def award_tournament_prizes(self, tournament_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Award the prizes of a completed tournament again, e.g. after credits failed"""
+        try:
+            tournament = self.tournament_repository.get_tournament_by_tournament_id(tournament_id)
+            if not tournament:
+                return False, "TOURNAMENT_NOT_FOUND", None
+
+            if tournament.status != "completed":
+                return False, "TOURNAMENT_NOT_COMPLETED", None
+
+            leaderboard = self.tournament_repository.get_tournament_leaderboard(tournament_id)
+            if tournament.prize_recipients is None:
+                # Completed without a recorded snapshot (e.g. expired); the first retry records one
+                prize_recipients = self._collect_prize_recipients(tournament, leaderboard)
+                if self.tournament_repository.record_prize_recipients(tournament_id, prize_recipients):
+                    tournament.prize_recipients = prize_recipients
+                else:
+                    tournament = self.tournament_repository.get_tournament_by_tournament_id(tournament_id)
+
+            prize_result = self._award_tournament_prizes(tournament, leaderboard)
+            if prize_result["credits_pending"]:
+                return False, "FAILED_TO_AWARD_TOURNAMENT_PRIZES", prize_result
+
+            return True, "TOURNAMENT_PRIZES_AWARDED", {"tournament_id": tournament_id, **prize_result}
+
+        except Exception as e:
+            current_app.logger.error(f"Failed to award tournament prizes: {str(e)}")
+            return False, "FAILED_TO_AWARD_TOURNAMENT_PRIZES", None
+
     def get_active_tournament(self) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """Get the currently active tournament"""
         try:
@@ -165,9 +206,12 @@ class TournamentEngine:
             leaderboard = self.tournament_repository.get_tournament_leaderboard(tournament_id)
 
             # Enhance leaderboard with team details
+            teams = self.team_repository.get_teams_by_team_ids(
+                [entry["team_id"] for entry in leaderboard], with_scores=False
+            )
             enhanced_leaderboard = []
             for entry in leaderboard:
-                team = self.team_repository.get_team_by_team_id(entry["team_id"])
+                team = teams.get(entry["team_id"])
                 if team:
                     enhanced_entry = {
                         **entry,
@@ -214,6 +258,7 @@ class TournamentEngine:
             success = self.tournament_repository.cancel_tournament(tournament_id)
             if not success:
                 return False, "FAILED_TO_CANCEL_TOURNAMENT", None
+            TeamManager.clear_active_tournament_cache()
 
             # Clear tournament from teams
             for team_id in tournament.teams:
@@ -233,6 +278,8 @@ class TournamentEngine:
         """End tournaments that have expired"""
         try:
             ended_count = self.tournament_repository.end_expired_tournaments()
+            if ended_count:
+                TeamManager.clear_active_tournament_cache()
 
             current_app.logger.info(f"Ended {ended_count} expired tournaments")
 
@@ -262,45 +309,81 @@ class TournamentEngine:
         except Exception as e:
             current_app.logger.error(f"Failed to auto-assign users: {str(e)}")
 
-    def _award_tournament_prizes(self, tournament: TeamTournament, leaderboard: List[Dict[str, Any]]) -> int:
-        """Award prizes to tournament winners"""
+    @staticmethod
+    def _prize_for_position(tournament: TeamTournament, position: int) -> Optional[Dict[str, Any]]:
+        """Prize of a 1-based leaderboard position, if any"""
+        if position == 1:
+            prize_key = "1st_place"
+        elif position == 2:
+            prize_key = "2nd_place"
+        elif position == 3:
+            prize_key = "3rd_place"
+        else:
+            prize_key = "participation"
+
+        return tournament.prizes.get(prize_key)
+
+    def _collect_prize_recipients(self, tournament: TeamTournament,
+                                  leaderboard: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """Member IDs of every team whose prize carries credits"""
+        recipients = {}
+        for i, entry in enumerate(leaderboard):
+            prize = self._prize_for_position(tournament, i + 1)
+            if prize and prize.get("credits", 0) > 0:
+                recipients[entry["team_id"]] = list(self.member_repository.iter_member_ids(entry["team_id"]))
+        return recipients
+
+    def _award_tournament_prizes(self, tournament: TeamTournament, leaderboard: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Award prizes to tournament winners
+
+        Credits for the members recorded in tournament.prize_recipients go
+        to WalletService as one bulk award keyed by the tournament, so
+        running this again for the same tournament only completes what a
+        failed run left, for the same members.
+        """
         try:
             prizes_awarded = 0
+            awards = []
+            prize_recipients = tournament.prize_recipients or {}
 
             for i, entry in enumerate(leaderboard):
-                position = i + 1
                 team_id = entry["team_id"]
-
-                # Determine prize category
-                if position == 1:
-                    prize_key = "1st_place"
-                elif position == 2:
-                    prize_key = "2nd_place"
-                elif position == 3:
-                    prize_key = "3rd_place"
-                else:
-                    prize_key = "participation"
-
-                prize = tournament.prizes.get(prize_key)
+                prize = self._prize_for_position(tournament, i + 1)
                 if prize:
                     # Award achievement to team
                     achievement_id = prize.get("achievement")
                     if achievement_id:
                         self.team_repository.add_achievement(team_id, achievement_id)
 
-                    # Award credits to team members (would need credit system)
+                    # Award credits to team members
                     credits = prize.get("credits", 0)
                     if credits > 0:
-                        team_members = self.member_repository.get_team_members(team_id)
-                        for member in team_members:
-                            # This would integrate with a credit system
-                            # self.credit_service.award_credits(member.user_id, credits, f"Tournament prize: {tournament.name}")
-                            pass
+                        awards.extend(
+                            (user_id, credits, SourceType.TOURNAMENT.value)
+                            for user_id in prize_recipients.get(team_id, [])
+                        )
 
                     prizes_awarded += 1
 
-            return prizes_awarded
+            credits_result = None
+            if awards:
+                success, message, credits_result = self.wallet_service.award_credits_bulk(
+                    awards,
+                    batch_id=f"tournament:{tournament.tournament_id}",
+                    metadata={"tournament_id": tournament.tournament_id, "tournament_name": tournament.name}
+                )
+                if not success:
+                    current_app.logger.error(
+                        f"Tournament {tournament.tournament_id} prize credits not awarded ({message}); retry to complete them"
+                    )
+
+            return {
+                "prizes_awarded": prizes_awarded,
+                "credits": credits_result,
+                "credits_pending": bool(awards) and credits_result is None
+            }
 
         except Exception as e:
             current_app.logger.error(f"Failed to award prizes: {str(e)}")
-            return 0
\ No newline at end of file
+            return {"prizes_awarded": 0, "credits": None, "credits_pending": True}
@@ -24,6 +24,10 @@ def register_social_module(app):
         from .repositories.relationship_repository import RelationshipRepository
         from .leaderboards.repositories.impact_score_repository import ImpactScoreRepository
         from .leaderboards.repositories.leaderboard_repository import LeaderboardRepository
+        from .leaderboards.repositories.ranking_event_repository import RankingEventRepository
+        from .leaderboards.repositories.activity_aggregate_repository import ActivityAggregateRepository
+        from .leaderboards.repositories.friends_ranking_repository import FriendsRankingRepository
+        from .leaderboards.services.leaderboard_cache import MongoPageCacheBackend
         from .challenges.repositories.social_challenge_repository import SocialChallengeRepository
         from .challenges.repositories.challenge_participant_repository import ChallengeParticipantRepository
         from .challenges.repositories.challenge_result_repository import ChallengeResultRepository
@@ -38,6 +42,18 @@ def register_social_module(app):
         leaderboard_repo = LeaderboardRepository()
         leaderboard_repo.create_indexes()
 
+        ranking_event_repo = RankingEventRepository()
+        ranking_event_repo.create_indexes()
+
+        activity_aggregate_repo = ActivityAggregateRepository()
+        activity_aggregate_repo.create_indexes()
+
+        friends_ranking_repo = FriendsRankingRepository()
+        friends_ranking_repo.create_indexes()
+
+        leaderboard_page_cache_backend = MongoPageCacheBackend()
+        leaderboard_page_cache_backend.create_indexes()
+
         # Initialize social challenges repositories
         social_challenge_repo = SocialChallengeRepository()
         social_challenge_repo.create_indexes()
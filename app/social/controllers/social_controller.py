@@ -55,7 +55,8 @@ def accept_friend_request(current_user, relationship_id):
                 trigger_social_activity(
                     current_user.get_id(),
                     'friend_request_accepted',
-                    {'relationship_id': relationship_id}
+                    {'relationship_id': relationship_id,
+                     'event_id': f"friend_request_accepted:{relationship_id}"}
                 )
             except Exception as e:
                 # Log but don't fail the main operation
@@ -110,12 +110,20 @@ def register_routes(blueprint: Blueprint):
             per_page = min(request.args.get('per_page', 50, type=int), 100)
             user_id = str(current_user['_id'])
 
+            if_none_match = request.headers.get('If-None-Match')
+
             success, message, leaderboard_data = leaderboard_service.get_leaderboard(
-                leaderboard_type, period, user_id, page, per_page
+                leaderboard_type, period, user_id, page, per_page, if_none_match=if_none_match
             )
 
+            if success and leaderboard_data.get('not_modified'):
+                return '', 304, {'ETag': leaderboard_data['etag'], 'Cache-Control': 'private, no-cache'}
+
             if success:
-                return success_response("Leaderboard retrieved successfully", leaderboard_data)
+                response, status_code = success_response("Leaderboard retrieved successfully", leaderboard_data)
+                response.headers['ETag'] = leaderboard_data['etag']
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response, status_code
             else:
                 return error_response(message)
 
@@ -337,10 +345,21 @@ def register_routes(blueprint: Blueprint):
     def admin_recalculate_all_scores(current_admin):
         """Admin endpoint to recalculate all user impact scores"""
         try:
-            data = request.get_json()
-            batch_size = data.get('batch_size', 100) if data else 100
-
-            success, message, stats = impact_calculator.recalculate_all_scores(batch_size)
+            data = request.get_json() or {}
+            batch_size = data.get('batch_size', 100)
+
+            workers = data.get('workers')
+            max_workers = impact_calculator.MAX_RECALCULATION_WORKERS
+            if workers is not None and (
+                isinstance(workers, bool) or not isinstance(workers, int) or not 1 <= workers <= max_workers
+            ):
+                return error_response(f"workers must be an integer between 1 and {max_workers}")
+
+            success, message, stats = impact_calculator.recalculate_all_scores(
+                batch_size,
+                workers=workers,
+                resume=data.get('resume', True)
+            )
 
             if success:
                 return success_response("Impact scores recalculation completed", stats)
@@ -6,13 +6,18 @@ triggering automatic impact score recalculation and leaderboard updates.
 """
 
 from typing import Dict, Any, Optional
+from datetime import datetime
 from flask import current_app
 from ..services.ranking_engine import RankingEngine
+from ..repositories.activity_aggregate_repository import ActivityAggregateRepository
 
 
 # Initialize ranking engine for event handling
 ranking_engine = RankingEngine()
 
+# Rolling activity aggregates read by the impact calculator in incremental mode
+activity_aggregate_repo = ActivityAggregateRepository()
+
 
 def handle_game_session_complete(user_id: str, session_data: Dict[str, Any]) -> bool:
     """
@@ -38,6 +43,17 @@ def handle_game_session_complete(user_id: str, session_data: Dict[str, Any]) ->
             'session_type': session_data.get('session_type', 'normal')
         }
 
+        # Apply the session to the user's rolling aggregates, once per session
+        # and on the day it ended, so a redelivered event adds nothing
+        ended_at = session_data.get('ended_at')
+        if isinstance(ended_at, str):
+            ended_at = datetime.fromisoformat(ended_at)
+        session_id = activity_data['session_id']
+        activity_aggregate_repo.record_game_session(
+            user_id, activity_data['game_id'], activity_data['play_duration_ms'],
+            occurred_at=ended_at, event_id=f"game_session:{session_id}" if session_id else None
+        )
+
         # Trigger impact score update
         success, message = ranking_engine.trigger_user_score_update(
             user_id, 'gaming', activity_data
@@ -92,6 +108,9 @@ def handle_social_activity(user_id: str, activity_type: str, activity_data: Dict
             'timestamp': activity_data.get('timestamp')
         }
 
+        # Apply the interaction to the user's rolling aggregates (once per event_id, if given)
+        activity_aggregate_repo.record_social_activity(user_id, event_id=activity_data.get('event_id'))
+
         # Trigger impact score update
         success, message = ranking_engine.trigger_user_score_update(
             user_id, 'social', impact_activity_data
@@ -316,4 +335,34 @@ def handle_tournament_result(tournament_data: Dict[str, Any]) -> bool:
 
     except Exception as e:
         current_app.logger.error(f"Error handling tournament result: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def handle_relationship_change(user_id: str, target_user_id: str, change: str) -> bool:
+    """
+    Handle friendship changes by maintaining materialized friends leaderboards
+
+    Args:
+        user_id: User who made the change
+        target_user_id: Other user in the relationship
+        change: 'friend_added' or 'friend_removed'
+
+    Returns:
+        bool: True if the friends views were updated
+    """
+    try:
+        leaderboard_service = ranking_engine.leaderboard_service
+
+        if change == 'friend_added':
+            leaderboard_service.on_friendship_added(user_id, target_user_id)
+        elif change == 'friend_removed':
+            leaderboard_service.on_friendship_removed(user_id, target_user_id)
+        else:
+            return True
+
+        current_app.logger.debug(f"Friends leaderboards updated for {user_id} and {target_user_id} ({change})")
+        return True
+
+    except Exception as e:
+        current_app.logger.error(f"Error handling relationship change for user {user_id}: {str(e)}")
+        return False
@@ -12,7 +12,8 @@ from .event_handlers import (
     handle_achievement_unlock,
     handle_user_login,
     handle_weekly_reset,
-    handle_tournament_result
+    handle_tournament_result,
+    handle_relationship_change
 )
 
 
@@ -69,6 +70,7 @@ def register_integration_hooks():
         # Social events
         hook_manager.register_hook('social_activity', handle_social_activity)
         hook_manager.register_hook('achievement_unlock', handle_achievement_unlock)
+        hook_manager.register_hook('relationship_changed', handle_relationship_change)
 
         # Donation events
         hook_manager.register_hook('donation_complete', handle_donation_activity)
@@ -218,4 +220,23 @@ def setup_all_integrations():
 
     except Exception as e:
         current_app.logger.error(f"Error setting up event-based integrations: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+def trigger_relationship_changed(user_id: str, target_user_id: str, change: str) -> bool:
+    """
+    Trigger relationship changed event
+
+    Args:
+        user_id: User who made the change
+        target_user_id: Other user in the relationship
+        change: 'friend_added' or 'friend_removed'
+
+    Returns:
+        bool: True if all handlers succeeded
+    """
+    results = hook_manager.trigger_event('relationship_changed',
+                                        user_id=user_id,
+                                        target_user_id=target_user_id,
+                                        change=change)
+    return all(results)
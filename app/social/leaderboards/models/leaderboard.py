@@ -45,7 +45,8 @@ class Leaderboard:
                  metadata: Optional[Dict] = None,
                  _id: Optional[str] = None,
                  created_at: Optional[datetime] = None,
-                 last_updated: Optional[datetime] = None):
+                 last_updated: Optional[datetime] = None,
+                 version: int = 0):
         """
         Initialize Leaderboard
 
@@ -57,6 +58,7 @@ class Leaderboard:
             _id: MongoDB document ID
             created_at: Creation timestamp
             last_updated: Last update timestamp
+            version: Incremented on every committed change to entries or ranks
         """
         self._id = ObjectId(_id) if _id else ObjectId()
         self.leaderboard_type = leaderboard_type
@@ -64,6 +66,7 @@ class Leaderboard:
         self.entries = []
         self.created_at = created_at or datetime.utcnow()
         self.last_updated = last_updated or datetime.utcnow()
+        self.version = version
 
         # Leaderboard metadata
         self.metadata = metadata or {
@@ -161,25 +164,27 @@ class Leaderboard:
 
     def _update_metadata(self):
         """Update leaderboard metadata"""
-        if not self.entries:
-            self.metadata.update({
+        self.metadata.update(self.summarize_scores([entry.score for entry in self.entries]))
+
+    @staticmethod
+    def summarize_scores(scores: List[float]) -> Dict[str, Any]:
+        """Build participant and score metadata from entry scores"""
+        if not scores:
+            return {
                 'total_participants': 0,
                 'min_score': 0.0,
                 'max_score': 0.0,
                 'avg_score': 0.0,
                 'score_range': 0.0
-            })
-            return
-
-        scores = [entry.score for entry in self.entries]
+            }
 
-        self.metadata.update({
-            'total_participants': len(self.entries),
+        return {
+            'total_participants': len(scores),
             'min_score': min(scores),
             'max_score': max(scores),
             'avg_score': round(sum(scores) / len(scores), 2),
             'score_range': max(scores) - min(scores)
-        })
+        }
 
     def clear_entries(self):
         """Clear all entries (for period resets)"""
@@ -208,7 +213,8 @@ class Leaderboard:
             'entries': [entry.to_dict() for entry in self.entries],
             'metadata': self.metadata,
             'created_at': self.created_at,
-            'last_updated': self.last_updated
+            'last_updated': self.last_updated,
+            'version': self.version
         }
 
     @classmethod
@@ -221,12 +227,20 @@ class Leaderboard:
             metadata=data.get('metadata', {}),
             _id=str(data['_id']) if '_id' in data else None,
             created_at=data.get('created_at'),
-            last_updated=data.get('last_updated')
+            last_updated=data.get('last_updated'),
+            version=data.get('version', 0)
         )
 
     def to_response_dict(self, include_entries: bool = True,
-                        page: int = 1, per_page: int = 50) -> Dict[str, Any]:
-        """Convert to dictionary for API responses"""
+                        page: int = 1, per_page: int = 50,
+                        page_entries: Optional[List[LeaderboardEntry]] = None,
+                        total_items: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Convert to dictionary for API responses
+
+        page_entries and total_items supply an already fetched page (entries
+        stored outside the document); otherwise self.entries is paginated.
+        """
         response = {
             'id': str(self._id),
             'leaderboard_type': self.leaderboard_type,
@@ -236,9 +250,10 @@ class Leaderboard:
         }
 
         if include_entries:
-            entries = self.get_entries_paginated(page, per_page)
-            response['entries'] = [entry.to_response_dict() for entry in entries]
-            total_items = len(self.entries)
+            if page_entries is None:
+                page_entries = self.get_entries_paginated(page, per_page)
+                total_items = len(self.entries)
+            response['entries'] = [entry.to_response_dict() for entry in page_entries]
             total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
             response['pagination'] = {
                 'page': page,
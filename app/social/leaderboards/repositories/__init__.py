@@ -6,5 +6,11 @@ Data access layer for impact scores and leaderboards.
 
 from .impact_score_repository import ImpactScoreRepository
 from .leaderboard_repository import LeaderboardRepository
+from .leaderboard_entry_repository import LeaderboardEntryRepository
+from .ranking_event_repository import RankingEventRepository
+from .activity_aggregate_repository import ActivityAggregateRepository
+from .recalculation_checkpoint_repository import RecalculationCheckpointRepository
+from .friends_ranking_repository import FriendsRankingRepository
 
-__all__ = ['ImpactScoreRepository', 'LeaderboardRepository']
\ No newline at end of file
+__all__ = ['ImpactScoreRepository', 'LeaderboardRepository', 'LeaderboardEntryRepository', 'RankingEventRepository',
+           'ActivityAggregateRepository', 'RecalculationCheckpointRepository', 'FriendsRankingRepository']
@@ -0,0 +1,128 @@
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.core.repositories.base_repository import BaseRepository
+
+
+class ActivityAggregateRepository(BaseRepository):
+    """
+    Repository for per-user rolling activity aggregates
+
+    Collection: user_activity_aggregates
+
+    Each document keeps one bucket per UTC day under `days`:
+        days.<YYYY-MM-DD> = {play_ms, sessions, games[], social, events[]}
+
+    Event handlers apply deltas to the current day's bucket, so the impact
+    calculator reads a bounded document instead of re-querying history.
+    A delta with an event ID is applied once; the bucket lists the IDs.
+    Aggregates are only trusted once `seeded_at` is set by a full scan.
+    """
+
+    # Day buckets kept on the document (the longest window the calculator reads)
+    RETENTION_DAYS = 30
+
+    def __init__(self):
+        super().__init__('user_activity_aggregates')
+
+    def create_indexes(self):
+        """Create indexes for activity aggregate lookups"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        self.collection.create_index('user_id', unique=True)
+
+    def find_by_user_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Find activity aggregates for a user"""
+        return self.find_one({'user_id': ObjectId(user_id)})
+
+    def find_by_user_ids(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Find activity aggregates for several users in one query"""
+        return self.find_many({'user_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}})
+
+    def record_game_session(self, user_id: str, game_id: Optional[str],
+                            play_duration_ms: int, occurred_at: datetime = None,
+                            event_id: Optional[str] = None) -> bool:
+        """Add a completed game session to the user's daily bucket (once per event_id)"""
+        prefix = f'days.{self.day_key(occurred_at)}'
+        update = {
+            '$inc': {
+                f'{prefix}.play_ms': int(play_duration_ms or 0),
+                f'{prefix}.sessions': 1
+            }
+        }
+        if game_id:
+            update['$addToSet'] = {f'{prefix}.games': str(game_id)}
+
+        return self._apply(user_id, update, prefix, event_id)
+
+    def record_social_activity(self, user_id: str, occurred_at: datetime = None,
+                               event_id: Optional[str] = None) -> bool:
+        """Add a social interaction to the user's daily bucket (once per event_id)"""
+        prefix = f'days.{self.day_key(occurred_at)}'
+        return self._apply(user_id, {'$inc': {f'{prefix}.social': 1}}, prefix, event_id)
+
+    def seed(self, user_id: str, days: Dict[str, Dict[str, Any]]) -> bool:
+        """Replace a user's buckets with ones rebuilt from a full history scan"""
+        return self.seed_many({user_id: days}) > 0
+
+    def seed_many(self, days_by_user: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+        """Replace buckets for several users with one unordered bulk write"""
+        if not days_by_user:
+            return 0
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'user_id': ObjectId(user_id)},
+                {'$set': {'days': days, 'seeded_at': now, 'updated_at': now}},
+                upsert=True
+            )
+            for user_id, days in days_by_user.items()
+        ]
+
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.modified_count + result.upserted_count
+
+    def prune_many(self, aggregates: List[Dict[str, Any]]) -> int:
+        """Drop day buckets that fell out of the retention window"""
+        cutoff = self.day_key(datetime.utcnow() - timedelta(days=self.RETENTION_DAYS))
+        operations = []
+
+        for aggregate in aggregates:
+            expired = {f'days.{day}': '' for day in aggregate.get('days', {}) if day < cutoff}
+            if expired:
+                operations.append(UpdateOne({'_id': aggregate['_id']}, {'$unset': expired}))
+
+        if not operations:
+            return 0
+
+        return self.collection.bulk_write(operations, ordered=False).modified_count
+
+    @staticmethod
+    def day_key(moment: datetime = None) -> str:
+        """Get the bucket key for a UTC moment"""
+        return (moment or datetime.utcnow()).strftime('%Y-%m-%d')
+
+    # Private methods
+
+    def _apply(self, user_id: str, update: Dict[str, Any], prefix: str = None,
+               event_id: Optional[str] = None) -> bool:
+        if self.collection is None:
+            return False
+
+        filter_dict: Dict[str, Any] = {'user_id': ObjectId(user_id)}
+        if event_id:
+            filter_dict[f'{prefix}.events'] = {'$ne': event_id}
+            update.setdefault('$addToSet', {})[f'{prefix}.events'] = event_id
+
+        update.setdefault('$set', {})['updated_at'] = datetime.utcnow()
+        try:
+            self.collection.update_one(filter_dict, update, upsert=True)
+        except DuplicateKeyError:
+            # Event already applied: the filter missed and the upsert hit the unique user_id index
+            pass
+        return True
@@ -0,0 +1,101 @@
+from typing import List, Dict, Any
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import UpdateOne, UpdateMany
+from app.core.repositories.base_repository import BaseRepository
+from ..models.impact_score import ImpactScore
+
+
+class FriendsRankingRepository(BaseRepository):
+    """
+    Materialized friends leaderboards
+
+    Collection: friends_rankings
+
+    One row per (owner_id, member_id) holding the member's score snapshot
+    and display data. Each owner has a row for themselves (which also marks
+    the view as built) and one per accepted friend. Rows are maintained on
+    relationship changes and when a member's impact score changes, so a
+    friends leaderboard is a single indexed range read in score order.
+    """
+
+    SCORE_FIELDS = ['impact_score', 'gaming_component', 'social_component', 'donation_component']
+
+    def __init__(self):
+        super().__init__('friends_rankings')
+
+    def create_indexes(self):
+        """Create indexes for owner reads and member score fan-out"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        self.collection.create_index([('owner_id', 1), ('member_id', 1)], unique=True)
+        self.collection.create_index([('owner_id', 1), ('impact_score', -1)])
+        self.collection.create_index('member_id')
+
+    def is_built(self, owner_id: str) -> bool:
+        """Check whether an owner's view has been materialized"""
+        owner = ObjectId(owner_id)
+        return self.find_one({'owner_id': owner, 'member_id': owner}) is not None
+
+    def get_rankings(self, owner_id: str) -> List[Dict[str, Any]]:
+        """Get scored members of an owner's view, highest score first"""
+        return self.find_many(
+            {'owner_id': ObjectId(owner_id), 'impact_score': {'$type': 'number'}},
+            sort=[('impact_score', -1), ('member_id', 1)]
+        )
+
+    def rebuild(self, owner_id: str, members: List[Dict[str, Any]]) -> int:
+        """Replace an owner's view with freshly built member rows (including the owner)"""
+        owner = ObjectId(owner_id)
+        self.collection.delete_many({'owner_id': owner})
+        return self.add_members(owner_id, members)
+
+    def add_members(self, owner_id: str, members: List[Dict[str, Any]]) -> int:
+        """Insert or refresh member rows in an owner's view"""
+        if not members:
+            return 0
+
+        owner = ObjectId(owner_id)
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {'owner_id': owner, 'member_id': member['member_id']},
+                {'$set': dict(member, updated_at=now)},
+                upsert=True
+            )
+            for member in members
+        ]
+
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.modified_count + result.upserted_count
+
+    def remove_pair(self, user_id: str, other_user_id: str) -> int:
+        """Remove two users from each other's views"""
+        first, second = ObjectId(user_id), ObjectId(other_user_id)
+        return self.collection.delete_many({'$or': [
+            {'owner_id': first, 'member_id': second},
+            {'owner_id': second, 'member_id': first}
+        ]}).deleted_count
+
+    def update_member_scores(self, impact_scores: List[ImpactScore]) -> int:
+        """Fan new scores out to every view the members appear in"""
+        if not impact_scores or self.collection is None:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateMany(
+                {'member_id': impact_score.user_id},
+                {'$set': dict(self.score_snapshot(impact_score), updated_at=now)}
+            )
+            for impact_score in impact_scores
+        ]
+
+        return self.collection.bulk_write(operations, ordered=False).modified_count
+
+    @classmethod
+    def score_snapshot(cls, impact_score: ImpactScore) -> Dict[str, Any]:
+        """Get the score fields stored on member rows"""
+        return {field: getattr(impact_score, field) for field in cls.SCORE_FIELDS}
@@ -1,13 +1,36 @@
-from typing import Optional, List, Dict, Any
+import threading
+import time
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
 from app.core.repositories.base_repository import BaseRepository
 from ..models.impact_score import ImpactScore
+from .rank_index import ScoreRankIndex
+
+
+MAX_IMPACT_SCORE = (
+    ImpactScore.MAX_GAMING_SCORE * ImpactScore.GAMING_WEIGHT +
+    ImpactScore.MAX_SOCIAL_SCORE * ImpactScore.SOCIAL_WEIGHT +
+    ImpactScore.MAX_DONATION_SCORE * ImpactScore.DONATION_WEIGHT
+)
 
 
 class ImpactScoreRepository(BaseRepository):
     """Repository for impact score data access operations"""
 
+    # Seconds before the per-worker rank indexes are rebuilt to pick up
+    # writes from other workers and expire users out of the weekly window
+    RANK_INDEX_TTL_SECONDS = 300
+
+    # UpdateOne operations sent per bulk_write when materializing ranks
+    RANK_WRITE_BATCH_SIZE = 1000
+
+    # Rank indexes are shared by every repository instance in the worker
+    _global_rank_index = ScoreRankIndex(MAX_IMPACT_SCORE)
+    _weekly_rank_index = ScoreRankIndex(MAX_IMPACT_SCORE)
+    _rank_index_lock = threading.Lock()
+
     def __init__(self):
         super().__init__('user_impact_scores')
 
@@ -36,12 +59,22 @@ class ImpactScoreRepository(BaseRepository):
             ('impact_score', -1),
             ('last_calculated', -1)
         ])
+        # Score order with a stable tie-break - used when rank recalculation walks all scores
+        self.collection.create_index([
+            ('impact_score', -1),
+            ('_id', 1)
+        ])
 
     def find_by_user_id(self, user_id: str) -> Optional[ImpactScore]:
         """Find impact score by user ID"""
         data = self.find_one({'user_id': ObjectId(user_id)})
         return ImpactScore.from_dict(data) if data else None
 
+    def find_by_user_ids(self, user_ids: List[str]) -> Dict[str, ImpactScore]:
+        """Find impact scores for several users, keyed by user ID"""
+        results = self.find_many({'user_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}})
+        return {str(data['user_id']): ImpactScore.from_dict(data) for data in results}
+
     def create_impact_score(self, impact_score: ImpactScore) -> str:
         """Create new impact score record"""
         data = impact_score.to_dict()
@@ -50,10 +83,12 @@ class ImpactScoreRepository(BaseRepository):
     def update_impact_score(self, impact_score: ImpactScore) -> bool:
         """Update existing impact score"""
         data = impact_score.to_dict()
-        return self.update_one(
+        updated = self.update_one(
             {'user_id': impact_score.user_id},
             data
         )
+        self._index_score(impact_score)
+        return updated
 
     def upsert_impact_score(self, impact_score: ImpactScore) -> bool:
         """Insert or update impact score"""
@@ -65,8 +100,31 @@ class ImpactScoreRepository(BaseRepository):
             update_data,
             upsert=True
         )
+        self._index_score(impact_score)
         return result.modified_count > 0 or result.upserted_id is not None
 
+    def bulk_upsert_impact_scores(self, impact_scores: List[ImpactScore]) -> int:
+        """Insert or update several impact scores with one unordered bulk write"""
+        if not impact_scores:
+            return 0
+
+        operations = []
+        for impact_score in impact_scores:
+            data = impact_score.to_dict()
+            document_id = data.pop('_id')
+            operations.append(UpdateOne(
+                {'user_id': impact_score.user_id},
+                {'$set': data, '$setOnInsert': {'_id': document_id}},
+                upsert=True
+            ))
+
+        result = self.collection.bulk_write(operations, ordered=False)
+
+        for impact_score in impact_scores:
+            self._index_score(impact_score)
+
+        return result.modified_count + result.upserted_count
+
     def get_global_rankings(self, limit: int = 100,
                            skip: int = 0) -> List[Dict[str, Any]]:
         """Get global impact score rankings"""
@@ -133,13 +191,48 @@ class ImpactScoreRepository(BaseRepository):
 
         return list(self.collection.aggregate(pipeline))
 
-    def get_weekly_active_users(self, weeks_back: int = 1) -> List[Dict[str, Any]]:
+    def get_weekly_active_users(self, weeks_back: int = 1,
+                                limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get users active in the last N weeks with scores"""
         cutoff_date = datetime.utcnow() - timedelta(weeks=weeks_back)
 
         pipeline = [
             {'$match': {'last_calculated': {'$gte': cutoff_date}}},
-            {'$sort': {'impact_score': -1}},
+            {'$sort': {'impact_score': -1}}
+        ]
+        if limit:
+            pipeline.append({'$limit': limit})
+
+        pipeline += [
+            {
+                '$lookup': {
+                    'from': 'users',
+                    'localField': 'user_id',
+                    'foreignField': '_id',
+                    'as': 'user_profile'
+                }
+            },
+            {
+                '$project': {
+                    'user_id': 1,
+                    'impact_score': 1,
+                    'gaming_component': 1,
+                    'social_component': 1,
+                    'donation_component': 1,
+                    'last_calculated': 1,
+                    'user_profile.first_name': 1,
+                    'user_profile.social_profile.display_name': 1,
+                    'user_profile.preferences.privacy.leaderboard_participation': 1
+                }
+            }
+        ]
+
+        return list(self.collection.aggregate(pipeline))
+
+    def get_scores_changed_since(self, since: datetime) -> List[Dict[str, Any]]:
+        """Get scores recalculated after a point in time, shaped like ranking rows"""
+        pipeline = [
+            {'$match': {'last_calculated': {'$gt': since}}},
             {
                 '$lookup': {
                     'from': 'users',
@@ -155,6 +248,9 @@ class ImpactScoreRepository(BaseRepository):
                     'gaming_component': 1,
                     'social_component': 1,
                     'donation_component': 1,
+                    'gaming_details': 1,
+                    'social_details': 1,
+                    'donation_details': 1,
                     'last_calculated': 1,
                     'user_profile.first_name': 1,
                     'user_profile.social_profile.display_name': 1,
@@ -219,78 +315,67 @@ class ImpactScoreRepository(BaseRepository):
 
     def update_rankings(self) -> int:
         """Update global and weekly rankings for all users"""
-        # Update global rankings
-        global_pipeline = [
-            {'$sort': {'impact_score': -1}},
-            {
-                '$group': {
-                    '_id': None,
-                    'users': {
-                        '$push': {
-                            'user_id': '$user_id',
-                            'impact_score': '$impact_score'
-                        }
-                    }
-                }
-            }
-        ]
-
-        global_result = list(self.collection.aggregate(global_pipeline))
-        if not global_result:
-            return 0
-
-        updated_count = 0
-
-        # Update global ranks
-        for rank, user_data in enumerate(global_result[0]['users'], 1):
-            self.collection.update_one(
-                {'user_id': user_data['user_id']},
-                {'$set': {'rank_global': rank}}
-            )
-            updated_count += 1
-
-        # Update weekly rankings for active users
+        stats = self.materialize_rankings()
+        return stats['global_ranked']
+
+    def materialize_rankings(self, batch_size: int = None,
+                             server_side: bool = False) -> Dict[str, Any]:
+        """
+        Write rank_global and rank_weekly for every scored user
+
+        Args:
+            batch_size: UpdateOne operations per bulk_write (streaming mode)
+            server_side: Rank inside MongoDB with $setWindowFields + $merge
+                         instead of streaming a sorted cursor (MongoDB 5.0+)
+
+        Returns:
+            Dict with ranked counts and throughput stats
+        """
+        batch_size = batch_size or self.RANK_WRITE_BATCH_SIZE
+        start_time = time.monotonic()
         cutoff_date = datetime.utcnow() - timedelta(weeks=1)
-        weekly_pipeline = [
-            {'$match': {'last_calculated': {'$gte': cutoff_date}}},
-            {'$sort': {'impact_score': -1}},
-            {
-                '$group': {
-                    '_id': None,
-                    'users': {
-                        '$push': {
-                            'user_id': '$user_id',
-                            'impact_score': '$impact_score'
-                        }
-                    }
-                }
-            }
-        ]
+        weekly_match = {'last_calculated': {'$gte': cutoff_date}}
+
+        if server_side:
+            global_stats = self._merge_ranks({}, 'rank_global')
+            weekly_stats = self._merge_ranks(weekly_match, 'rank_weekly')
+        else:
+            global_stats = self._stream_ranks({}, 'rank_global', batch_size)
+            weekly_stats = self._stream_ranks(weekly_match, 'rank_weekly', batch_size)
 
-        weekly_result = list(self.collection.aggregate(weekly_pipeline))
-        if weekly_result:
-            for rank, user_data in enumerate(weekly_result[0]['users'], 1):
-                self.collection.update_one(
-                    {'user_id': user_data['user_id']},
-                    {'$set': {'rank_weekly': rank}}
-                )
+        duration = time.monotonic() - start_time
+        total_ranked = global_stats['ranked'] + weekly_stats['ranked']
 
-        return updated_count
+        return {
+            'mode': 'server_side' if server_side else 'streaming',
+            'global_ranked': global_stats['ranked'],
+            'weekly_ranked': weekly_stats['ranked'],
+            'modified': global_stats['modified'] + weekly_stats['modified'],
+            'batches': global_stats['batches'] + weekly_stats['batches'],
+            'duration_seconds': round(duration, 3),
+            'ranks_per_second': round(total_ranked / duration, 1) if duration > 0 else 0.0
+        }
 
     def get_stale_scores(self, hours_threshold: int = 24) -> List[str]:
         """Get user IDs with stale impact scores"""
+        if self.collection is None:
+            return []
+
         cutoff_date = datetime.utcnow() - timedelta(hours=hours_threshold)
 
-        results = self.find_many(
+        results = self.collection.find(
             {'last_calculated': {'$lt': cutoff_date}},
-            limit=None
+            {'user_id': 1, '_id': 0}
         )
 
         return [str(result['user_id']) for result in results]
 
     def delete_user_score(self, user_id: str) -> bool:
         """Delete impact score for a user"""
-        return self.delete_one({'user_id': ObjectId(user_id)})
+        deleted = self.delete_one({'user_id': ObjectId(user_id)})
+        self._global_rank_index.remove(user_id)
+        self._weekly_rank_index.remove(user_id)
+        return deleted
 
     def get_user_rank_info(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user's ranking information and percentiles"""
@@ -298,13 +383,23 @@ class ImpactScoreRepository(BaseRepository):
         if not user_score:
             return None
 
-        # Get total user count
-        total_users = self.count()
+        rank_indexes = self.get_rank_indexes()
+        if rank_indexes:
+            global_index = rank_indexes[0]
+            if user_id not in global_index:
+                # Scored by another worker since the last rebuild
+                global_index.upsert(user_id, user_score.impact_score)
 
-        # Get users with higher scores
-        higher_score_count = self.count({
-            'impact_score': {'$gt': user_score.impact_score}
-        })
+            total_users = len(global_index)
+            higher_score_count = global_index.count_higher(user_score.impact_score)
+        else:
+            # Get total user count
+            total_users = self.count()
+
+            # Get users with higher scores
+            higher_score_count = self.count({
+                'impact_score': {'$gt': user_score.impact_score}
+            })
 
         # Calculate percentile
         percentile = ((total_users - higher_score_count) / total_users * 100) if total_users > 0 else 0
@@ -316,4 +411,127 @@ class ImpactScoreRepository(BaseRepository):
             'total_users': total_users,
             'impact_score': user_score.impact_score,
             'components': user_score.get_component_breakdown()
-        }
\ No newline at end of file
+        }
+
+    def get_global_rank(self, score: float) -> int:
+        """Get the global rank a score holds among all users"""
+        rank_indexes = self.get_rank_indexes()
+        if rank_indexes:
+            return rank_indexes[0].rank(score)
+
+        return self.count({'impact_score': {'$gt': score}}) + 1
+
+    def get_weekly_rank(self, score: float) -> int:
+        """Get the rank a score holds among users active in the last week"""
+        rank_indexes = self.get_rank_indexes()
+        if rank_indexes:
+            return rank_indexes[1].rank(score)
+
+        cutoff_date = datetime.utcnow() - timedelta(weeks=1)
+        return self.count({
+            'impact_score': {'$gt': score},
+            'last_calculated': {'$gte': cutoff_date}
+        }) + 1
+
+    def get_rank_indexes(self) -> Optional[Tuple[ScoreRankIndex, ScoreRankIndex]]:
+        """
+        Get the per-worker (global, weekly) rank indexes
+
+        Rebuilds them when older than RANK_INDEX_TTL_SECONDS. Returns None
+        when no database is available, so callers fall back to count queries.
+        """
+        if self.collection is None:
+            return None
+
+        if self._global_rank_index.is_stale(self.RANK_INDEX_TTL_SECONDS):
+            with self._rank_index_lock:
+                # Another thread may have rebuilt while we waited
+                if self._global_rank_index.is_stale(self.RANK_INDEX_TTL_SECONDS):
+                    self.rebuild_rank_indexes()
+
+        return self._global_rank_index, self._weekly_rank_index
+
+    def rebuild_rank_indexes(self) -> int:
+        """Rebuild the global and weekly rank indexes from a single sorted scan"""
+        cutoff_date = datetime.utcnow() - timedelta(weeks=1)
+        global_entries = []
+        weekly_entries = []
+
+        cursor = self.collection.find(
+            {},
+            {'_id': 0, 'user_id': 1, 'impact_score': 1, 'last_calculated': 1}
+        ).sort('impact_score', -1)
+
+        for doc in cursor:
+            entry = (str(doc['user_id']), doc.get('impact_score', 0.0))
+            global_entries.append(entry)
+
+            last_calculated = doc.get('last_calculated')
+            if last_calculated and last_calculated.replace(tzinfo=None) >= cutoff_date:
+                weekly_entries.append(entry)
+
+        self._global_rank_index.rebuild(global_entries)
+        self._weekly_rank_index.rebuild(weekly_entries)
+
+        return len(global_entries)
+
+    def _stream_ranks(self, match: Dict[str, Any], rank_field: str,
+                      batch_size: int) -> Dict[str, int]:
+        """Stream a score-sorted cursor and write ranks in unordered bulk batches"""
+        cursor = self.collection.find(match, {'_id': 1}).sort(
+            [('impact_score', -1), ('_id', 1)]
+        ).batch_size(batch_size)
+
+        stats = {'ranked': 0, 'modified': 0, 'batches': 0}
+        operations = []
+
+        for rank, doc in enumerate(cursor, 1):
+            operations.append(UpdateOne({'_id': doc['_id']}, {'$set': {rank_field: rank}}))
+            stats['ranked'] = rank
+
+            if len(operations) >= batch_size:
+                stats['modified'] += self.collection.bulk_write(operations, ordered=False).modified_count
+                stats['batches'] += 1
+                operations = []
+
+        if operations:
+            stats['modified'] += self.collection.bulk_write(operations, ordered=False).modified_count
+            stats['batches'] += 1
+
+        return stats
+
+    def _merge_ranks(self, match: Dict[str, Any], rank_field: str) -> Dict[str, int]:
+        """Compute ranks with a window function and merge them back in place"""
+        pipeline = [
+            {'$match': match},
+            {
+                '$setWindowFields': {
+                    'sortBy': {'impact_score': -1, '_id': 1},
+                    'output': {rank_field: {'$documentNumber': {}}}
+                }
+            },
+            {'$project': {rank_field: 1}},
+            {
+                '$merge': {
+                    'into': self.collection_name,
+                    'on': '_id',
+                    'whenMatched': 'merge',
+                    'whenNotMatched': 'discard'
+                }
+            }
+        ]
+
+        self.collection.aggregate(pipeline, allowDiskUse=True)
+        return {'ranked': self.count(match), 'modified': 0, 'batches': 1}
+
+    def _index_score(self, impact_score: ImpactScore):
+        """Apply a score write to the rank indexes if they are loaded"""
+        if not self._global_rank_index.is_built:
+            return
+
+        user_id = str(impact_score.user_id)
+        self._global_rank_index.upsert(user_id, impact_score.impact_score)
+
+        last_calculated = impact_score.last_calculated
+        if last_calculated and last_calculated.replace(tzinfo=None) >= datetime.utcnow() - timedelta(weeks=1):
+            self._weekly_rank_index.upsert(user_id, impact_score.impact_score)
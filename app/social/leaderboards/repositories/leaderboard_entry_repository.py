@@ -0,0 +1,422 @@
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import UpdateOne, UpdateMany, DeleteOne
+from app.core.repositories.base_repository import BaseRepository
+from ..models.leaderboard_entry import LeaderboardEntry
+
+
+class LeaderboardEntryRepository(BaseRepository):
+    """
+    Repository for leaderboard entries stored one document per user
+
+    Collection: leaderboard_entries
+
+    Entries are keyed by (leaderboard_type, period, user_id) instead of
+    being embedded in the leaderboard document, so a score change touches
+    one small document and pages, positions and re-ranking are served by
+    index range scans.
+    """
+
+    # Operations sent per bulk_write when streaming entries or ranks
+    WRITE_BATCH_SIZE = 1000
+
+    def __init__(self):
+        super().__init__('leaderboard_entries')
+
+    def create_indexes(self):
+        """Create indexes for entry lookups, pages and ranking"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        self.collection.create_index([
+            ('leaderboard_type', 1),
+            ('period', 1),
+            ('user_id', 1)
+        ], unique=True)
+
+        # Ranking order (ties broken by user for a stable order)
+        self.collection.create_index([
+            ('leaderboard_type', 1),
+            ('period', 1),
+            ('score', -1),
+            ('user_id', 1)
+        ])
+
+        # Page reads by materialized rank (ties broken by user, as in get_entries_page)
+        self.collection.create_index([
+            ('leaderboard_type', 1),
+            ('period', 1),
+            ('rank', 1),
+            ('user_id', 1)
+        ])
+
+        # Positions across all leaderboards for a user
+        self.collection.create_index('user_id')
+
+    def find_entry(self, leaderboard_type: str, period: str,
+                   user_id: str) -> Optional[LeaderboardEntry]:
+        """Find a user's entry in a leaderboard"""
+        data = self.find_one(self._key(leaderboard_type, period, user_id))
+        return LeaderboardEntry.from_dict(data) if data else None
+
+    def get_entries_page(self, leaderboard_type: str, period: str,
+                         skip: int = 0, limit: int = 50) -> List[LeaderboardEntry]:
+        """Get entries in rank order using the rank index"""
+        results = self.find_many(
+            {'leaderboard_type': leaderboard_type, 'period': period},
+            limit=limit,
+            skip=skip,
+            sort=[('rank', 1), ('user_id', 1)]
+        )
+        return [LeaderboardEntry.from_dict(data) for data in results]
+
+    def get_top_scores(self, leaderboard_type: str, period: str,
+                       limit: int) -> List[Dict[str, Any]]:
+        """Get user_id and score of the highest-scoring entries"""
+        return list(self.collection.find(
+            {'leaderboard_type': leaderboard_type, 'period': period},
+            {'_id': 0, 'user_id': 1, 'score': 1}
+        ).sort([('score', -1), ('user_id', 1)]).limit(limit))
+
+    def count_entries(self, leaderboard_type: str, period: str) -> int:
+        """Count entries in a leaderboard"""
+        return self.count({'leaderboard_type': leaderboard_type, 'period': period})
+
+    def get_user_entries(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get a user's entries across all leaderboards"""
+        return self.find_many({'user_id': ObjectId(user_id)})
+
+    def upsert_entry(self, leaderboard_type: str, period: str,
+                     entry: LeaderboardEntry) -> bool:
+        """Insert or update a single entry; its rank is kept until the next re-rank"""
+        data = self._entry_document(entry)
+        data.pop('rank')
+        data.pop('created_at')
+
+        result = self.collection.update_one(
+            self._key(leaderboard_type, period, entry.user_id),
+            {
+                '$set': data,
+                '$setOnInsert': {'rank': entry.rank, 'created_at': entry.created_at}
+            },
+            upsert=True
+        )
+        return result.modified_count > 0 or result.upserted_id is not None
+
+    def replace_entries(self, leaderboard_type: str, period: str,
+                        entries: Iterable[LeaderboardEntry],
+                        batch_size: Optional[int] = None) -> int:
+        """
+        Replace a leaderboard's entries with a streamed unordered bulk upsert
+
+        Entries not written in this pass are deleted afterwards.
+
+        Returns:
+            int: Number of entries written
+        """
+        batch_size = batch_size or self.WRITE_BATCH_SIZE
+        refreshed_at = datetime.now(timezone.utc)
+        operations = []
+        written = 0
+
+        for entry in entries:
+            data = self._entry_document(entry)
+            data['refreshed_at'] = refreshed_at
+            created_at = data.pop('created_at')
+
+            operations.append(UpdateOne(
+                self._key(leaderboard_type, period, entry.user_id),
+                {'$set': data, '$setOnInsert': {'created_at': created_at}},
+                upsert=True
+            ))
+            written += 1
+
+            if len(operations) >= batch_size:
+                self.collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+        self.collection.delete_many({
+            'leaderboard_type': leaderboard_type,
+            'period': period,
+            '$or': [
+                {'refreshed_at': {'$lt': refreshed_at}},
+                {'refreshed_at': {'$exists': False}}
+            ]
+        })
+
+        return written
+
+    def apply_changes(self, leaderboard_type: str, period: str,
+                      upserts: Iterable[LeaderboardEntry],
+                      removals: Iterable[str]) -> int:
+        """
+        Write changed entries and delete evicted users in one unordered bulk
+
+        Unlike replace_entries, untouched entries are left as they are.
+
+        Returns:
+            int: Number of operations sent
+        """
+        operations = []
+        for entry in upserts:
+            data = self._entry_document(entry)
+            rank = data.pop('rank')
+            created_at = data.pop('created_at')
+
+            operations.append(UpdateOne(
+                self._key(leaderboard_type, period, entry.user_id),
+                {'$set': data, '$setOnInsert': {'rank': rank, 'created_at': created_at}},
+                upsert=True
+            ))
+
+        operations += [
+            DeleteOne(self._key(leaderboard_type, period, user_id))
+            for user_id in removals
+        ]
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+        return len(operations)
+
+    def apply_ranked_changes(self, leaderboard_type: str, period: str,
+                             upserts: Iterable[LeaderboardEntry],
+                             removals: Iterable[str]) -> int:
+        """
+        Write changed entries and evictions, shifting only the ranks they pass
+
+        The old ranks of the changed and evicted users are read at once, and
+        each changed entry is placed by counting the untouched entries ahead
+        of it on the score index. Untouched entries keep their order, so the
+        ranges between those ranks each move by one fixed amount. Deletes,
+        range shifts and entry writes then go out as one ordered bulk_write.
+        Untouched ranks are not read.
+
+        Returns:
+            int: Number of changes applied
+        """
+        upserts = sorted(upserts, key=lambda entry: (-entry.score, ObjectId(entry.user_id)))
+        removals = list(removals)
+        if not upserts and not removals:
+            return 0
+
+        board = {'leaderboard_type': leaderboard_type, 'period': period}
+        changed_ids = [ObjectId(entry.user_id) for entry in upserts]
+        departing_ids = changed_ids + [ObjectId(user_id) for user_id in removals]
+
+        departed = [
+            document['rank']
+            for document in self.collection.find(dict(board, user_id={'$in': departing_ids}), {'rank': 1})
+            if document.get('rank')
+        ]
+        # Changed entries ahead of one are the ones before it in score order
+        arrived = [
+            self._count_ahead(leaderboard_type, period, entry.score, user_id, departing_ids) + position
+            for position, (entry, user_id) in enumerate(zip(upserts, changed_ids), 1)
+        ]
+
+        operations = [DeleteOne(self._key(leaderboard_type, period, user_id)) for user_id in removals]
+
+        # Moving down ranges first from the top and up ranges from the bottom,
+        # no range filter matches an entry that was already moved
+        shifts = self._rank_shifts(departed, arrived)
+        shifts = (sorted((shift for shift in shifts if shift[2] < 0), key=lambda shift: shift[0]) +
+                  sorted((shift for shift in shifts if shift[2] > 0), key=lambda shift: shift[0], reverse=True))
+        for first, last, delta in shifts:
+            rank_range = {'$gte': first}
+            if last is not None:
+                rank_range['$lte'] = last
+            operations.append(UpdateMany(
+                dict(board, rank=rank_range, user_id={'$nin': changed_ids}),
+                {'$inc': {'rank': delta}}
+            ))
+
+        for entry, rank in zip(upserts, arrived):
+            data = self._entry_document(entry)
+            data['rank'] = rank
+            created_at = data.pop('created_at')
+            operations.append(UpdateOne(
+                self._key(leaderboard_type, period, entry.user_id),
+                {'$set': data, '$setOnInsert': {'created_at': created_at}},
+                upsert=True
+            ))
+
+        self.collection.bulk_write(operations, ordered=True)
+        return len(upserts) + len(removals)
+
+    def rerank(self, leaderboard_type: str, period: str,
+               batch_size: Optional[int] = None) -> int:
+        """
+        Re-rank entries by streaming them in score order
+
+        Only entries whose rank changed are written, in unordered bulk
+        batches, so memory stays bounded by the batch size.
+
+        Returns:
+            int: Number of entries whose rank changed
+        """
+        batch_size = batch_size or self.WRITE_BATCH_SIZE
+        cursor = self.collection.find(
+            {'leaderboard_type': leaderboard_type, 'period': period},
+            {'_id': 1, 'rank': 1}
+        ).sort([('score', -1), ('user_id', 1)]).batch_size(batch_size)
+
+        operations = []
+        changed = 0
+
+        for rank, document in enumerate(cursor, 1):
+            if document.get('rank') == rank:
+                continue
+
+            operations.append(UpdateOne({'_id': document['_id']}, {'$set': {'rank': rank}}))
+            changed += 1
+
+            if len(operations) >= batch_size:
+                self.collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+        return changed
+
+    def remove_entry(self, leaderboard_type: str, period: str, user_id: str) -> bool:
+        """Remove a user's entry from a leaderboard"""
+        return self.delete_one(self._key(leaderboard_type, period, user_id))
+
+    def remove_user(self, user_id: str,
+                    leaderboard_types: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        Remove a user's entries from all (or the given) leaderboard types
+
+        Each removal moves the entries ranked below it up one place.
+
+        Returns:
+            List[Tuple[str, str]]: (leaderboard_type, period) of every leaderboard left
+        """
+        filter_dict = {'user_id': ObjectId(user_id)}
+        if leaderboard_types is not None:
+            filter_dict['leaderboard_type'] = {'$in': leaderboard_types}
+
+        boards = [
+            (document['leaderboard_type'], document['period'])
+            for document in self.collection.find(filter_dict, {'leaderboard_type': 1, 'period': 1})
+        ]
+        for leaderboard_type, period in boards:
+            self.apply_ranked_changes(leaderboard_type, period, [], [user_id])
+
+        return boards
+
+    def clear_entries(self, leaderboard_type: str, period: str) -> int:
+        """Delete every entry of a leaderboard"""
+        return self.collection.delete_many({
+            'leaderboard_type': leaderboard_type,
+            'period': period
+        }).deleted_count
+
+    def get_score_summary(self, leaderboard_type: str, period: str) -> Optional[Dict[str, Any]]:
+        """Get participant count and score aggregates for a leaderboard"""
+        pipeline = [
+            {'$match': {'leaderboard_type': leaderboard_type, 'period': period}},
+            {
+                '$group': {
+                    '_id': None,
+                    'total_participants': {'$sum': 1},
+                    'avg_score': {'$avg': '$score'},
+                    'max_score': {'$max': '$score'},
+                    'min_score': {'$min': '$score'},
+                    'median_rank': {'$avg': '$rank'}
+                }
+            }
+        ]
+
+        result = list(self.collection.aggregate(pipeline))
+        return result[0] if result else None
+
+    def get_score_at_position(self, leaderboard_type: str, period: str,
+                              position: int) -> Optional[float]:
+        """Get the score at a 0-based position in ascending score order"""
+        cursor = self.collection.find(
+            {'leaderboard_type': leaderboard_type, 'period': period},
+            {'score': 1}
+        ).sort([('score', 1), ('user_id', -1)]).skip(position).limit(1)
+
+        for document in cursor:
+            return document['score']
+        return None
+
+    # Private methods
+
+    def _key(self, leaderboard_type: str, period: str, user_id) -> Dict[str, Any]:
+        return {
+            'leaderboard_type': leaderboard_type,
+            'period': period,
+            'user_id': ObjectId(user_id)
+        }
+
+    def _count_ahead(self, leaderboard_type: str, period: str, score: float,
+                     user_id: ObjectId, excluded: List[ObjectId]) -> int:
+        """Count entries not in excluded ranked above a score (ties go to the lower user_id)"""
+        return self.collection.count_documents({
+            'leaderboard_type': leaderboard_type,
+            'period': period,
+            'user_id': {'$nin': excluded},
+            '$or': [
+                {'score': {'$gt': score}},
+                {'score': score, 'user_id': {'$lt': user_id}}
+            ]
+        })
+
+    @staticmethod
+    def _rank_shifts(departed: List[int], arrived: List[int]) -> List[Tuple[int, Optional[int], int]]:
+        """
+        Old rank ranges of untouched entries and how far each range moves
+
+        The k-th untouched entry (counting up from rank 1, skipping departed
+        ranks) ends on the k-th rank not taken by an arriving entry.
+
+        Returns:
+            List[Tuple[int, Optional[int], int]]: (first rank, last rank or None for no end, delta)
+        """
+        def spans(ranks):
+            # (first k, last k or None, ranks before) over untouched positions k
+            bounds = [0] + sorted(set(ranks))
+            result = []
+            for i, rank in enumerate(bounds):
+                first = rank - i + 1
+                last = bounds[i + 1] - i - 1 if i + 1 < len(bounds) else None
+                if last is None or first <= last:
+                    result.append((first, last, i))
+            return result
+
+        departed_spans, arrived_spans = spans(departed), spans(arrived)
+        shifts = []
+        i = j = 0
+        while i < len(departed_spans) and j < len(arrived_spans):
+            d_first, d_last, d_before = departed_spans[i]
+            a_first, a_last, a_before = arrived_spans[j]
+            first = max(d_first, a_first)
+            ends = [end for end in (d_last, a_last) if end is not None]
+            last = min(ends) if ends else None
+
+            delta = a_before - d_before
+            if delta and (last is None or first <= last):
+                shifts.append((first + d_before, None if last is None else last + d_before, delta))
+
+            if d_last is not None and (a_last is None or d_last <= a_last):
+                i += 1
+            else:
+                j += 1
+
+        return shifts
+
+    def _entry_document(self, entry: LeaderboardEntry) -> Dict[str, Any]:
+        data = entry.to_dict()
+        data.pop('_id')
+        data['updated_at'] = datetime.now(timezone.utc)
+        return data
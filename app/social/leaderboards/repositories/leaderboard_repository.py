@@ -1,16 +1,26 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument
 from app.core.repositories.base_repository import BaseRepository
 from ..models.leaderboard import Leaderboard
 from ..models.leaderboard_entry import LeaderboardEntry
+from .leaderboard_entry_repository import LeaderboardEntryRepository
 
 
 class LeaderboardRepository(BaseRepository):
-    """Repository for leaderboard data access operations"""
+    """
+    Repository for leaderboard data access operations
+
+    Leaderboard documents hold metadata only; entries live in the
+    leaderboard_entries collection (see LeaderboardEntryRepository).
+    Every write that changes entries or ranks increments the document's
+    version, which keys the leaderboard page cache.
+    """
 
     def __init__(self):
         super().__init__('leaderboards')
+        self.entry_repo = LeaderboardEntryRepository()
 
     def create_indexes(self):
         """Create optimized indexes for leaderboard queries"""
@@ -29,14 +39,11 @@ class LeaderboardRepository(BaseRepository):
         self.collection.create_index('period')
         self.collection.create_index('last_updated')
 
-        # Entry-level indexes for efficient sorting and filtering
-        self.collection.create_index('entries.user_id')
-        self.collection.create_index([('entries.score', -1)])
-        self.collection.create_index('entries.rank')
-
         # Metadata indexes for statistics
         self.collection.create_index('metadata.total_participants')
 
+        self.entry_repo.create_indexes()
+
     def find_by_type_and_period(self, leaderboard_type: str,
                                 period: str) -> Optional[Leaderboard]:
         """Find leaderboard by type and period"""
@@ -49,30 +56,21 @@ class LeaderboardRepository(BaseRepository):
     def create_leaderboard(self, leaderboard: Leaderboard) -> str:
         """Create new leaderboard"""
         data = leaderboard.to_dict()
-        return self.create(data)
+        data.pop('entries')
+        leaderboard_id = self.create(data)
+
+        if leaderboard.entries:
+            self.entry_repo.replace_entries(leaderboard.leaderboard_type, leaderboard.period, leaderboard.entries)
+
+        return leaderboard_id
 
     def update_leaderboard(self, leaderboard: Leaderboard) -> bool:
-        """Update existing leaderboard"""
-        filter_dict = {
-            'leaderboard_type': leaderboard.leaderboard_type,
-            'period': leaderboard.period
-        }
-        return self.update_one(filter_dict, leaderboard.to_dict())
+        """Update existing leaderboard and replace its entries"""
+        return self._save_leaderboard(leaderboard, upsert=False)
 
     def upsert_leaderboard(self, leaderboard: Leaderboard) -> bool:
         """Insert or update leaderboard"""
-        filter_dict = {
-            'leaderboard_type': leaderboard.leaderboard_type,
-            'period': leaderboard.period
-        }
-        update_data = {'$set': leaderboard.to_dict()}
-
-        result = self.collection.update_one(
-            filter_dict,
-            update_data,
-            upsert=True
-        )
-        return result.modified_count > 0 or result.upserted_id is not None
+        return self._save_leaderboard(leaderboard, upsert=True)
 
     def get_all_leaderboard_types(self) -> List[str]:
         """Get all available leaderboard types"""
@@ -130,135 +128,101 @@ class LeaderboardRepository(BaseRepository):
     def add_entry_to_leaderboard(self, leaderboard_type: str, period: str,
                                 entry: LeaderboardEntry) -> bool:
         """Add or update entry in leaderboard"""
-        filter_dict = {
-            'leaderboard_type': leaderboard_type,
-            'period': period,
-            'entries.user_id': {'$ne': entry.user_id}
-        }
+        if not self.entry_repo.upsert_entry(leaderboard_type, period, entry):
+            return False
 
-        # Add new entry
-        add_result = self.collection.update_one(
-            filter_dict,
-            {
-                '$push': {'entries': entry.to_dict()},
-                '$set': {'last_updated': datetime.now(timezone.utc)}
-            }
-        )
+        self._touch(leaderboard_type, period)
+        return True
 
-        if add_result.modified_count > 0:
-            return True
+    def remove_entry_from_leaderboard(self, leaderboard_type: str,
+                                     period: str, user_id: str) -> bool:
+        """Remove entry from leaderboard"""
+        if not self.entry_repo.remove_entry(leaderboard_type, period, user_id):
+            return False
 
-        # Update existing entry
-        update_filter = {
-            'leaderboard_type': leaderboard_type,
-            'period': period,
-            'entries.user_id': entry.user_id
-        }
+        self._touch(leaderboard_type, period)
+        return True
 
-        update_result = self.collection.update_one(
-            update_filter,
-            {
-                '$set': {
-                    'entries.$.score': entry.score,
-                    'entries.$.rank': entry.rank,
-                    'entries.$.score_components': entry.score_components,
-                    'last_updated': datetime.now(timezone.utc)
-                }
-            }
-        )
+    def remove_user_from_leaderboards(self, user_id: str,
+                                      leaderboard_types: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        Remove a user's entries from all (or the given) leaderboard types
 
-        return update_result.modified_count > 0
+        Ranks below each removed entry close up, and every leaderboard left
+        gets a new version and one participant fewer.
 
-    def remove_entry_from_leaderboard(self, leaderboard_type: str,
-                                     period: str, user_id: str) -> bool:
-        """Remove entry from leaderboard"""
-        result = self.collection.update_one(
-            {
-                'leaderboard_type': leaderboard_type,
-                'period': period
-            },
-            {
-                '$pull': {'entries': {'user_id': ObjectId(user_id)}},
-                '$set': {'last_updated': datetime.now(timezone.utc)}
-            }
-        )
-        return result.modified_count > 0
+        Returns:
+            List[Tuple[str, str]]: (leaderboard_type, period) of every leaderboard left
+        """
+        boards = self.entry_repo.remove_user(user_id, leaderboard_types)
+        for leaderboard_type, period in boards:
+            self._touch(leaderboard_type, period, participants_delta=-1)
+        return boards
 
     def get_user_leaderboard_positions(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's positions across all leaderboards"""
-        pipeline = [
-            {'$unwind': '$entries'},
-            {'$match': {'entries.user_id': ObjectId(user_id)}},
-            {
-                '$project': {
-                    'leaderboard_type': 1,
-                    'period': 1,
-                    'rank': '$entries.rank',
-                    'score': '$entries.score',
-                    'total_participants': '$metadata.total_participants',
-                    'last_updated': 1
-                }
-            }
-        ]
+        entries = self.entry_repo.get_user_entries(user_id)
+        if not entries:
+            return []
+
+        boards = {
+            (board['leaderboard_type'], board['period']): board
+            for board in self.collection.find(
+                {'$or': [
+                    {'leaderboard_type': entry['leaderboard_type'], 'period': entry['period']}
+                    for entry in entries
+                ]},
+                {'leaderboard_type': 1, 'period': 1, 'metadata.total_participants': 1, 'last_updated': 1}
+            )
+        }
 
-        return list(self.collection.aggregate(pipeline))
+        positions = []
+        for entry in entries:
+            board = boards.get((entry['leaderboard_type'], entry['period']), {})
+            positions.append({
+                'leaderboard_type': entry['leaderboard_type'],
+                'period': entry['period'],
+                'rank': entry['rank'],
+                'score': entry['score'],
+                'total_participants': board.get('metadata', {}).get('total_participants'),
+                'last_updated': board.get('last_updated')
+            })
+
+        return positions
 
     def get_top_performers(self, leaderboard_type: str, period: str,
                           limit: int = 10) -> List[Dict[str, Any]]:
         """Get top performers from a specific leaderboard"""
-        pipeline = [
-            {
-                '$match': {
-                    'leaderboard_type': leaderboard_type,
-                    'period': period
-                }
-            },
-            {'$unwind': '$entries'},
-            {'$sort': {'entries.rank': 1}},
-            {'$limit': limit},
+        entries = self.entry_repo.get_entries_page(leaderboard_type, period, skip=0, limit=limit)
+        return [
             {
-                '$project': {
-                    'user_id': '$entries.user_id',
-                    'display_name': '$entries.display_name',
-                    'score': '$entries.score',
-                    'rank': '$entries.rank',
-                    'score_components': '$entries.score_components',
-                    'user_data': '$entries.user_data'
-                }
+                'user_id': entry.user_id,
+                'display_name': entry.display_name,
+                'score': entry.score,
+                'rank': entry.rank,
+                'score_components': entry.score_components,
+                'user_data': entry.user_data
             }
+            for entry in entries
         ]
 
-        return list(self.collection.aggregate(pipeline))
-
     def get_leaderboard_entries_paginated(self, leaderboard_type: str,
                                          period: str, skip: int = 0,
                                          limit: int = 50) -> Dict[str, Any]:
         """Get paginated entries from a leaderboard"""
-        pipeline = [
-            {
-                '$match': {
-                    'leaderboard_type': leaderboard_type,
-                    'period': period
-                }
-            },
-            {
-                '$project': {
-                    'entries': {
-                        '$slice': [
-                            {'$sortArray': {'input': '$entries', 'sortBy': {'rank': 1}}},
-                            skip,
-                            limit
-                        ]
-                    },
-                    'metadata': 1,
-                    'last_updated': 1,
-                    'total_entries': {'$size': '$entries'}
-                }
-            }
-        ]
-
-        result = list(self.collection.aggregate(pipeline))
-        return result[0] if result else {}
+        leaderboard = self.find_one({'leaderboard_type': leaderboard_type, 'period': period})
+        if not leaderboard:
+            return {}
+
+        entries = self.entry_repo.get_entries_page(leaderboard_type, period, skip=skip, limit=limit)
+
+        return {
+            '_id': leaderboard['_id'],
+            'entries': [entry.to_dict() for entry in entries],
+            'metadata': leaderboard.get('metadata', {}),
+            'last_updated': leaderboard.get('last_updated'),
+            'total_entries': self.entry_repo.count_entries(leaderboard_type, period)
+        }
 
     def update_leaderboard_metadata(self, leaderboard_type: str,
                                    period: str, metadata: Dict[str, Any]) -> bool:
@@ -272,7 +236,8 @@ class LeaderboardRepository(BaseRepository):
                 '$set': {
                     'metadata': metadata,
                     'last_updated': datetime.now(timezone.utc)
-                }
+                },
+                '$inc': {'version': 1}
             }
         )
         return result.modified_count > 0
@@ -280,6 +245,8 @@ class LeaderboardRepository(BaseRepository):
     def clear_leaderboard_entries(self, leaderboard_type: str,
                                  period: str) -> bool:
         """Clear all entries from a leaderboard"""
+        self.entry_repo.clear_entries(leaderboard_type, period)
+
         result = self.collection.update_one(
             {
                 'leaderboard_type': leaderboard_type,
@@ -287,14 +254,14 @@ class LeaderboardRepository(BaseRepository):
             },
             {
                 '$set': {
-                    'entries': [],
                     'metadata.total_participants': 0,
                     'metadata.min_score': 0.0,
                     'metadata.max_score': 0.0,
                     'metadata.avg_score': 0.0,
                     'metadata.score_range': 0.0,
                     'last_updated': datetime.now(timezone.utc)
-                }
+                },
+                '$inc': {'version': 1}
             }
         )
         return result.modified_count > 0
@@ -319,110 +286,102 @@ class LeaderboardRepository(BaseRepository):
     def get_leaderboard_statistics(self, leaderboard_type: str,
                                   period: str) -> Optional[Dict[str, Any]]:
         """Get detailed statistics for a leaderboard"""
-        pipeline = [
-            {
-                '$match': {
-                    'leaderboard_type': leaderboard_type,
-                    'period': period
-                }
-            },
-            {'$unwind': '$entries'},
-            {
-                '$group': {
-                    '_id': None,
-                    'total_participants': {'$sum': 1},
-                    'avg_score': {'$avg': '$entries.score'},
-                    'max_score': {'$max': '$entries.score'},
-                    'min_score': {'$min': '$entries.score'},
-                    'median_rank': {'$avg': '$entries.rank'},
-                    'score_distribution': {
-                        '$push': '$entries.score'
-                    }
-                }
-            }
-        ]
-
-        result = list(self.collection.aggregate(pipeline))
-        if not result:
+        stats = self.entry_repo.get_score_summary(leaderboard_type, period)
+        if not stats:
             return None
 
-        stats = result[0]
-
-        # Calculate percentiles
-        scores = sorted(stats['score_distribution'])
-        n = len(scores)
-
-        if n > 0:
-            stats['percentiles'] = {
-                '25th': scores[int(0.25 * n)] if n > 4 else scores[0],
-                '50th': scores[int(0.50 * n)] if n > 2 else scores[0],
-                '75th': scores[int(0.75 * n)] if n > 4 else scores[-1],
-                '90th': scores[int(0.90 * n)] if n > 10 else scores[-1]
-            }
-        else:
-            stats['percentiles'] = {}
-
-        # Remove raw score distribution from response
-        del stats['score_distribution']
+        # Percentiles are read at their positions on the score index
+        n = stats['total_participants']
+        positions = {
+            '25th': int(0.25 * n) if n > 4 else 0,
+            '50th': int(0.50 * n) if n > 2 else 0,
+            '75th': int(0.75 * n) if n > 4 else n - 1,
+            '90th': int(0.90 * n) if n > 10 else n - 1
+        }
+        stats['percentiles'] = {
+            label: self.entry_repo.get_score_at_position(leaderboard_type, period, position)
+            for label, position in positions.items()
+        }
 
         return stats
 
     def bulk_update_ranks(self, leaderboard_type: str, period: str) -> bool:
         """Bulk update ranks for all entries in a leaderboard"""
-        # Get leaderboard and sort entries by score
-        pipeline = [
-            {
-                '$match': {
-                    'leaderboard_type': leaderboard_type,
-                    'period': period
-                }
-            },
-            {'$unwind': '$entries'},
-            {'$sort': {'entries.score': -1}},
-            {
-                '$group': {
-                    '_id': {'type': '$leaderboard_type', 'period': '$period'},
-                    'entries': {
-                        '$push': {
-                            'user_id': '$entries.user_id',
-                            'score': '$entries.score',
-                            'display_name': '$entries.display_name',
-                            'user_data': '$entries.user_data',
-                            'score_components': '$entries.score_components'
-                        }
-                    }
-                }
-            }
-        ]
-
-        result = list(self.collection.aggregate(pipeline))
-        if not result:
+        if self.entry_repo.count_entries(leaderboard_type, period) == 0:
             return False
 
-        # Add ranks and prepare entries for update
-        entries = result[0]['entries']
-        for rank, entry in enumerate(entries, 1):
-            entry['rank'] = rank
-            entry['created_at'] = datetime.now(timezone.utc)
+        self.entry_repo.rerank(leaderboard_type, period)
+        self._touch(leaderboard_type, period)
+        return True
+
+    def apply_entry_changes(self, leaderboard_type: str, period: str,
+                            upserts: List[LeaderboardEntry], removals: List[str],
+                            metadata: Dict[str, Any]) -> Optional[int]:
+        """
+        Commit an incremental change set: changed entries, evictions, ranks and metadata
+
+        Ranks are shifted only across the window each change moves through.
+        If another writer committed to the same leaderboard meanwhile, the
+        shifts may have interleaved, so the ranks are recomputed once.
+
+        Returns:
+            Optional[int]: The leaderboard's new version, or None if it does not exist
+        """
+        query = {'leaderboard_type': leaderboard_type, 'period': period}
+        before = self.collection.find_one(query, {'version': 1})
+        if before is None:
+            return None
+
+        self.entry_repo.apply_ranked_changes(leaderboard_type, period, upserts, removals)
 
-        # Update leaderboard with re-ranked entries
-        update_result = self.collection.update_one(
+        saved = self.collection.find_one_and_update(
+            query,
             {
-                'leaderboard_type': leaderboard_type,
-                'period': period
+                '$set': dict(
+                    {f'metadata.{key}': value for key, value in metadata.items()},
+                    last_updated=datetime.now(timezone.utc)
+                ),
+                '$inc': {'version': 1}
             },
-            {
-                '$set': {
-                    'entries': entries,
-                    'last_updated': datetime.now(timezone.utc)
-                }
-            }
+            projection={'version': 1},
+            return_document=ReturnDocument.AFTER
         )
+        if saved is None:
+            return None
+
+        if saved['version'] != before.get('version', 0) + 1:
+            self.entry_repo.rerank(leaderboard_type, period)
+            saved = self.collection.find_one_and_update(
+                query,
+                {'$set': {'last_updated': datetime.now(timezone.utc)}, '$inc': {'version': 1}},
+                projection={'version': 1},
+                return_document=ReturnDocument.AFTER
+            )
+
+        return saved['version'] if saved else None
+
+    def migrate_embedded_entries(self) -> int:
+        """
+        Move entries still embedded in leaderboard documents to leaderboard_entries
+
+        Returns:
+            int: Number of leaderboards migrated
+        """
+        migrated = 0
 
-        return update_result.modified_count > 0
+        for data in self.collection.find({'entries': {'$exists': True}}):
+            entries = [LeaderboardEntry.from_dict(entry) for entry in data.get('entries', [])]
+            if entries:
+                self.entry_repo.replace_entries(data['leaderboard_type'], data['period'], entries)
+
+            self.collection.update_one({'_id': data['_id']}, {'$unset': {'entries': ''}})
+            migrated += 1
+
+        return migrated
 
     def delete_leaderboard(self, leaderboard_type: str, period: str) -> bool:
         """Delete a leaderboard"""
+        self.entry_repo.clear_entries(leaderboard_type, period)
         return self.delete_one({
             'leaderboard_type': leaderboard_type,
             'period': period
@@ -430,28 +389,77 @@ class LeaderboardRepository(BaseRepository):
 
     def get_cross_leaderboard_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get user's performance across all leaderboards"""
-        pipeline = [
-            {'$unwind': '$entries'},
-            {'$match': {'entries.user_id': ObjectId(user_id)}},
-            {
-                '$group': {
-                    '_id': '$entries.user_id',
-                    'leaderboards': {
-                        '$push': {
-                            'type': '$leaderboard_type',
-                            'period': '$period',
-                            'rank': '$entries.rank',
-                            'score': '$entries.score',
-                            'total_participants': '$metadata.total_participants'
-                        }
-                    },
-                    'avg_rank': {'$avg': '$entries.rank'},
-                    'best_rank': {'$min': '$entries.rank'},
-                    'total_score': {'$sum': '$entries.score'},
-                    'leaderboard_count': {'$sum': 1}
+        positions = self.get_user_leaderboard_positions(user_id)
+        if not positions:
+            return {}
+
+        ranks = [position['rank'] for position in positions]
+
+        return {
+            '_id': ObjectId(user_id),
+            'leaderboards': [
+                {
+                    'type': position['leaderboard_type'],
+                    'period': position['period'],
+                    'rank': position['rank'],
+                    'score': position['score'],
+                    'total_participants': position['total_participants']
                 }
-            }
-        ]
+                for position in positions
+            ],
+            'avg_rank': sum(ranks) / len(ranks),
+            'best_rank': min(ranks),
+            'total_score': sum(position['score'] for position in positions),
+            'leaderboard_count': len(positions)
+        }
+
+    # Private methods
+
+    def _save_leaderboard(self, leaderboard: Leaderboard, upsert: bool) -> bool:
+        data = leaderboard.to_dict()
+        data.pop('entries')
+        data.pop('_id')
+        data.pop('version')
 
-        result = list(self.collection.aggregate(pipeline))
-        return result[0] if result else {}
\ No newline at end of file
+        filter_dict = {
+            'leaderboard_type': leaderboard.leaderboard_type,
+            'period': leaderboard.period
+        }
+        if not upsert and self.collection.count_documents(filter_dict, limit=1) == 0:
+            return False
+
+        # Entries first, so the version bump below publishes a complete set
+        self.entry_repo.replace_entries(leaderboard.leaderboard_type, leaderboard.period, leaderboard.entries)
+
+        saved = self.collection.find_one_and_update(
+            filter_dict,
+            {
+                '$set': data,
+                '$setOnInsert': {'_id': leaderboard._id},
+                '$inc': {'version': 1},
+                # Drop entries embedded by earlier versions
+                '$unset': {'entries': ''}
+            },
+            projection={'version': 1},
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
+        if not saved:
+            return False
+
+        leaderboard.version = saved['version']
+        return True
+
+    def _touch(self, leaderboard_type: str, period: str, participants_delta: int = 0):
+        """Record a change to entries or ranks"""
+        increments = {'version': 1}
+        if participants_delta:
+            increments['metadata.total_participants'] = participants_delta
+
+        self.collection.update_one(
+            {'leaderboard_type': leaderboard_type, 'period': period},
+            {
+                '$set': {'last_updated': datetime.now(timezone.utc)},
+                '$inc': increments
+            }
+        )
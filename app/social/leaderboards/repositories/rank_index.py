@@ -0,0 +1,162 @@
+import math
+import threading
+import time
+from typing import Optional, Dict, Iterable, Tuple
+
+
+class ScoreRankIndex:
+    """
+    Per-worker order-statistic index over impact scores
+
+    Scores are quantized to a fixed decimal precision (impact scores are
+    already rounded to cents) and counted in a Fenwick tree, so rank,
+    percentile and k-th score lookups cost O(log n) instead of a
+    count_documents range scan over the whole collection.
+    """
+
+    def __init__(self, max_score: float, precision: int = 2):
+        """
+        Initialize ScoreRankIndex
+
+        Args:
+            max_score: Highest score that can be indexed (larger values are clamped)
+            precision: Number of decimal digits kept when bucketing scores
+        """
+        self.scale = 10 ** precision
+        self.size = int(round(max_score * self.scale)) + 1
+        self.built_at: Optional[float] = None
+
+        self._tree = [0] * (self.size + 1)
+        self._buckets: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def __contains__(self, user_id: str) -> bool:
+        return str(user_id) in self._buckets
+
+    @property
+    def is_built(self) -> bool:
+        return self.built_at is not None
+
+    def is_stale(self, ttl_seconds: float) -> bool:
+        """Check whether the index should be rebuilt from the database"""
+        return self.built_at is None or (time.monotonic() - self.built_at) > ttl_seconds
+
+    def rebuild(self, entries: Iterable[Tuple[str, float]]):
+        """
+        Replace index contents with the given (user_id, score) pairs
+
+        Builds the tree in O(n + size) from bucket counts instead of
+        n individual O(log n) insertions.
+        """
+        buckets = {}
+        tree = [0] * (self.size + 1)
+
+        for user_id, score in entries:
+            bucket = self._bucket(score)
+            buckets[str(user_id)] = bucket
+            tree[bucket + 1] += 1
+
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+
+        with self._lock:
+            self._tree = tree
+            self._buckets = buckets
+            self.built_at = time.monotonic()
+
+    def upsert(self, user_id: str, score: float):
+        """Insert a user or move them to a new score"""
+        user_id = str(user_id)
+        bucket = self._bucket(score)
+
+        with self._lock:
+            previous = self._buckets.get(user_id)
+            if previous == bucket:
+                return
+            if previous is not None:
+                self._add(previous, -1)
+            self._add(bucket, 1)
+            self._buckets[user_id] = bucket
+
+    def remove(self, user_id: str) -> bool:
+        """Remove a user from the index"""
+        with self._lock:
+            previous = self._buckets.pop(str(user_id), None)
+            if previous is None:
+                return False
+            self._add(previous, -1)
+            return True
+
+    def count_higher(self, score: float) -> int:
+        """Count indexed users with a strictly higher score"""
+        with self._lock:
+            return len(self._buckets) - self._prefix(self._bucket(score))
+
+    def rank(self, score: float) -> int:
+        """Get the 1-based rank a score would have (ties share a rank)"""
+        return self.count_higher(score) + 1
+
+    def percentile(self, score: float) -> float:
+        """Get the percentage of indexed users at or below a score"""
+        with self._lock:
+            total = len(self._buckets)
+            if total == 0:
+                return 0.0
+            higher = total - self._prefix(self._bucket(score))
+            return round((total - higher) / total * 100, 2)
+
+    def score_at_rank(self, rank: int) -> Optional[float]:
+        """Get the score held by the user at a 1-based rank (highest first)"""
+        with self._lock:
+            total = len(self._buckets)
+            if rank < 1 or rank > total:
+                return None
+
+            # Rank r from the top is the (total - r + 1)-th smallest score
+            target = total - rank + 1
+            position = 0
+            step = 1 << self.size.bit_length()
+            while step:
+                candidate = position + step
+                if candidate <= self.size and self._tree[candidate] < target:
+                    position = candidate
+                    target -= self._tree[candidate]
+                step >>= 1
+
+            return position / self.scale
+
+    def score_at_percentile(self, percentile: float) -> Optional[float]:
+        """Get the minimum score needed to reach a percentile"""
+        total = len(self._buckets)
+        if total == 0:
+            return None
+
+        percentile = min(max(percentile, 0.0), 100.0)
+        at_or_below = max(1, math.ceil(total * percentile / 100))
+        return self.score_at_rank(total - at_or_below + 1)
+
+    # Private methods
+
+    def _bucket(self, score: float) -> int:
+        bucket = int(round((score or 0.0) * self.scale))
+        return min(max(bucket, 0), self.size - 1)
+
+    def _add(self, bucket: int, delta: int):
+        i = bucket + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, bucket: int) -> int:
+        """Count users in buckets [0, bucket]"""
+        total = 0
+        i = bucket + 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
@@ -0,0 +1,142 @@
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.repositories.base_repository import BaseRepository
+
+
+class RankingEventRepository(BaseRepository):
+    """
+    Outbox of pending impact score recalculations
+
+    Holds at most one pending event per user: activity events arriving
+    while one is pending are merged into it, so a burst of sessions inside
+    the debounce window produces a single recomputation.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self):
+        super().__init__('ranking_event_outbox')
+
+    def create_indexes(self):
+        """Create indexes for outbox claiming and coalescing"""
+        import os
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        # One pending event per user, enforced for concurrent enqueues
+        self.collection.create_index(
+            'user_id',
+            unique=True,
+            partialFilterExpression={'status': self.STATUS_PENDING}
+        )
+        self.collection.create_index([('status', 1), ('available_at', 1)])
+        self.collection.create_index([('status', 1), ('locked_until', 1)])
+
+    def enqueue(self, user_id: str, activity_type: str,
+                debounce_seconds: float) -> bool:
+        """
+        Record an activity event, merging it into the user's pending event
+
+        Args:
+            user_id: User whose score needs recomputation
+            activity_type: Activity that triggered the event
+            debounce_seconds: Delay before a new event becomes claimable
+
+        Returns:
+            bool: True if the event was stored
+        """
+        if self.collection is None:
+            return False
+
+        now = datetime.utcnow()
+        update = {
+            # user_id and status are copied from the filter on insert
+            '$setOnInsert': {
+                'attempts': 0,
+                'created_at': now,
+                'available_at': now + timedelta(seconds=debounce_seconds)
+            },
+            '$addToSet': {'activity_types': activity_type},
+            '$inc': {'event_count': 1},
+            '$set': {'updated_at': now}
+        }
+        filter_dict = {'user_id': ObjectId(user_id), 'status': self.STATUS_PENDING}
+
+        try:
+            self.collection.update_one(filter_dict, update, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent enqueue inserted the pending event first
+            self.collection.update_one(filter_dict, update)
+
+        return True
+
+    def claim_next(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the oldest due event
+
+        Events whose worker lease expired (crashed worker) are claimable again.
+        """
+        now = datetime.utcnow()
+
+        return self.collection.find_one_and_update(
+            {
+                '$or': [
+                    {'status': self.STATUS_PENDING, 'available_at': {'$lte': now}},
+                    {'status': self.STATUS_PROCESSING, 'locked_until': {'$lt': now}}
+                ]
+            },
+            {
+                '$set': {
+                    'status': self.STATUS_PROCESSING,
+                    'worker_id': worker_id,
+                    'locked_until': now + timedelta(seconds=lease_seconds)
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('available_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def complete(self, event_id: ObjectId) -> bool:
+        """Remove a processed event from the outbox"""
+        return self.delete_one({'_id': event_id})
+
+    def fail(self, event: Dict[str, Any], error: str,
+             max_attempts: int, retry_delay_seconds: float) -> bool:
+        """
+        Release a failed event for retry, or park it once attempts run out
+
+        Returns:
+            bool: True if the event will be retried
+        """
+        if event.get('attempts', 0) >= max_attempts:
+            self.collection.update_one(
+                {'_id': event['_id']},
+                {'$set': {'status': self.STATUS_FAILED, 'last_error': error}}
+            )
+            return False
+
+        try:
+            self.collection.update_one(
+                {'_id': event['_id']},
+                {'$set': {
+                    'status': self.STATUS_PENDING,
+                    'last_error': error,
+                    'available_at': datetime.utcnow() + timedelta(seconds=retry_delay_seconds)
+                }}
+            )
+        except DuplicateKeyError:
+            # A newer pending event for this user already covers the retry
+            self.complete(event['_id'])
+
+        return True
+
+    def get_queue_stats(self) -> Dict[str, int]:
+        """Get event counts by status"""
+        pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+        return {row['_id']: row['count'] for row in self.collection.aggregate(pipeline)}
@@ -0,0 +1,56 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from bson import ObjectId
+from app.core.repositories.base_repository import BaseRepository
+
+
+class RecalculationCheckpointRepository(BaseRepository):
+    """
+    Progress checkpoints for full impact score recalculations
+
+    One document per run id records the highest user _id whose batch (and
+    every batch before it) has completed, so an interrupted run resumes
+    from there instead of starting over.
+    """
+
+    def __init__(self):
+        super().__init__('impact_recalculation_checkpoints')
+
+    def create_indexes(self):
+        """Checkpoints are looked up by their _id (the run id)"""
+        pass
+
+    def find_active(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Find an unfinished checkpoint for a run"""
+        return self.find_one({'_id': run_id, 'completed_at': None})
+
+    def start(self, run_id: str) -> Dict[str, Any]:
+        """Start a fresh run, discarding any previous checkpoint"""
+        checkpoint = {
+            '_id': run_id,
+            'last_user_id': None,
+            'processed': 0,
+            'errors': 0,
+            'started_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'completed_at': None
+        }
+        self.collection.replace_one({'_id': run_id}, checkpoint, upsert=True)
+        return checkpoint
+
+    def advance(self, run_id: str, last_user_id: ObjectId,
+                processed: int, errors: int) -> bool:
+        """Record that every user up to last_user_id has been processed"""
+        return self.update_one(
+            {'_id': run_id},
+            {
+                'last_user_id': last_user_id,
+                'processed': processed,
+                'errors': errors,
+                'updated_at': datetime.utcnow()
+            }
+        )
+
+    def complete(self, run_id: str) -> bool:
+        """Mark a run as finished so the next run starts from the beginning"""
+        return self.update_one({'_id': run_id}, {'completed_at': datetime.utcnow()})
@@ -0,0 +1,143 @@
+import heapq
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Iterable, List, Tuple
+
+
+class TopKIndex:
+    """
+    Per-worker bounded top-K set for one leaderboard
+
+    A min-heap keyed on score holds at most `capacity` members, so an
+    offered score is compared with the cutoff (the heap minimum) and
+    admitted or rejected in O(log K). Superseded heap items are skipped
+    lazily and compacted when they outnumber live members.
+
+    Only members and their scores are tracked. When the set was loaded from
+    a truncated ranking query, `floor` is the lowest score that query
+    returned and non-members at or below it are not admitted. When a
+    member's score drops to the cutoff (or floor), or a member is discarded
+    from a full set, users outside the set may now belong in it; the index
+    is then marked incomplete and must be reloaded from a full ranking query.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initialize TopKIndex
+
+        Args:
+            capacity: Maximum number of members (K)
+        """
+        self.capacity = capacity
+        self.version: Optional[int] = None
+        self.synced_at: Optional[datetime] = None
+        self.floor: Optional[float] = None
+        self.incomplete = False
+
+        self._heap: List[Tuple[float, str]] = []
+        self._scores: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, user_id: str) -> bool:
+        return str(user_id) in self._scores
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._scores) >= self.capacity
+
+    @property
+    def cutoff(self) -> Optional[float]:
+        """Lowest score in a full set (scores must beat it to enter)"""
+        with self._lock:
+            if not self.is_full:
+                return None
+            return self._peek()[0]
+
+    def load(self, entries: Iterable[Tuple[str, float]], version: Optional[int],
+             synced_at: Optional[datetime] = None, floor: Optional[float] = None):
+        """Replace contents with the best `capacity` of the given (user_id, score) pairs"""
+        best = heapq.nlargest(self.capacity, ((float(score), str(user_id)) for user_id, score in entries))
+
+        with self._lock:
+            self._scores = {user_id: score for score, user_id in best}
+            self._heap = [(score, user_id) for score, user_id in best]
+            heapq.heapify(self._heap)
+            self.version = version
+            self.synced_at = synced_at
+            self.floor = floor
+            self.incomplete = False
+
+    def offer(self, user_id: str, score: float) -> Tuple[bool, Optional[str]]:
+        """
+        Apply a score update
+
+        Returns:
+            Tuple of (member_changed, evicted_user_id). member_changed is True
+            when the user entered the set or a member's score changed.
+        """
+        user_id = str(user_id)
+        score = float(score)
+
+        with self._lock:
+            previous = self._scores.get(user_id)
+            if previous is not None:
+                if previous == score:
+                    return False, None
+
+                threshold = self._peek()[0] if self.is_full else self.floor
+                self._scores[user_id] = score
+                self._push(score, user_id)
+                if threshold is not None and score < previous and score <= threshold:
+                    self.incomplete = True
+                return True, None
+
+            if self.floor is not None and score <= self.floor:
+                return False, None
+
+            if not self.is_full:
+                self._scores[user_id] = score
+                self._push(score, user_id)
+                return True, None
+
+            lowest_score, lowest_user = self._peek()
+            if score <= lowest_score:
+                return False, None
+
+            del self._scores[lowest_user]
+            heapq.heappop(self._heap)
+            self._scores[user_id] = score
+            self._push(score, user_id)
+            return True, lowest_user
+
+    def discard(self, user_id: str) -> bool:
+        """Remove a member (e.g. privacy opt-out)"""
+        with self._lock:
+            if self._scores.pop(str(user_id), None) is None:
+                return False
+            if len(self._scores) == self.capacity - 1:
+                self.incomplete = True
+            return True
+
+    def scores(self) -> Dict[str, float]:
+        """Get a copy of member scores"""
+        with self._lock:
+            return dict(self._scores)
+
+    # Private methods
+
+    def _peek(self) -> Tuple[float, str]:
+        """Get the live minimum, dropping superseded heap items"""
+        while True:
+            score, user_id = self._heap[0]
+            if self._scores.get(user_id) == score:
+                return score, user_id
+            heapq.heappop(self._heap)
+
+    def _push(self, score: float, user_id: str):
+        heapq.heappush(self._heap, (score, user_id))
+        if len(self._heap) > 2 * max(len(self._scores), 1) + 16:
+            self._heap = [(member_score, member) for member, member_score in self._scores.items()]
+            heapq.heapify(self._heap)
@@ -1,4 +1,9 @@
-from typing import Dict, Any, Optional, Tuple, List
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple, List, Iterator
 from datetime import datetime, timedelta
 from flask import current_app
 from bson import ObjectId
@@ -7,6 +12,9 @@ from app.core.repositories.user_repository import UserRepository
 from app.games.repositories.game_session_repository import GameSessionRepository
 from app.social.repositories.relationship_repository import RelationshipRepository
 from ..repositories.impact_score_repository import ImpactScoreRepository
+from ..repositories.activity_aggregate_repository import ActivityAggregateRepository
+from ..repositories.recalculation_checkpoint_repository import RecalculationCheckpointRepository
+from ..repositories.friends_ranking_repository import FriendsRankingRepository
 from ..models.impact_score import ImpactScore
 
 
@@ -33,22 +41,35 @@ class ImpactCalculator:
     - Number of ONLUS supported
     - Donation frequency/consistency
     - Special event participation
+
+    Activity inputs come from per-user daily aggregates maintained by the
+    integration event handlers (incremental mode), falling back to a single
+    history scan that also seeds those aggregates.
     """
 
+    # Process pool size for recalculate_all_scores (1 runs batches inline)
+    RECALCULATION_WORKERS = int(os.getenv('IMPACT_RECALCULATION_WORKERS', '1'))
+    # Largest pool an admin request may ask for
+    MAX_RECALCULATION_WORKERS = int(os.getenv('IMPACT_RECALCULATION_MAX_WORKERS', '16'))
+
     def __init__(self):
         self.impact_score_repo = ImpactScoreRepository()
         self.user_repo = UserRepository()
         self.game_session_repo = GameSessionRepository()
         self.relationship_repo = RelationshipRepository()
+        self.activity_aggregate_repo = ActivityAggregateRepository()
+        self.checkpoint_repo = RecalculationCheckpointRepository()
+        self.friends_ranking_repo = FriendsRankingRepository()
 
-    def calculate_user_impact_score(self, user_id: str,
-                                   force_recalculate: bool = False) -> Tuple[bool, str, Optional[ImpactScore]]:
+    def calculate_user_impact_score(self, user_id: str, force_recalculate: bool = False,
+                                   incremental: bool = True) -> Tuple[bool, str, Optional[ImpactScore]]:
         """
         Calculate comprehensive impact score for a user
 
         Args:
             user_id: User ID to calculate score for
             force_recalculate: Force recalculation even if score is recent
+            incremental: Read seeded activity aggregates instead of rescanning history
 
         Returns:
             Tuple of (success, message, impact_score)
@@ -64,48 +85,35 @@ class ImpactCalculator:
             if existing_score and not force_recalculate and not existing_score.is_stale(hours=1):
                 return True, "Impact score retrieved from cache", existing_score
 
-            # Calculate each component
-            gaming_score, gaming_details = self._calculate_gaming_component(user_id)
-            social_score, social_details = self._calculate_social_component(user_id)
-            donation_score, donation_details = self._calculate_donation_component(user_id)
+            # Gather activity inputs once for all components
+            activity = self._load_activity_summaries([user_id], incremental)[user_id]
+            components = self._calculate_components(user_id, user, activity)
 
             # Create or update impact score
             if existing_score:
-                existing_score.update_component('gaming', gaming_score, gaming_details)
-                existing_score.update_component('social', social_score, social_details)
-                existing_score.update_component('donation', donation_score, donation_details)
-
-                # Add to history
-                existing_score.add_history_entry(existing_score.impact_score)
+                self._apply_components(user_id, existing_score, components)
 
                 # Update in database
                 success = self.impact_score_repo.update_impact_score(existing_score)
                 if not success:
                     return False, "Failed to update impact score", None
 
+                self.friends_ranking_repo.update_member_scores([existing_score])
+
                 current_app.logger.info(f"Updated impact score for user {user_id}: {existing_score.impact_score}")
                 return True, "Impact score updated successfully", existing_score
 
             else:
                 # Create new impact score
-                impact_score = ImpactScore(
-                    user_id=user_id,
-                    gaming_component=gaming_score,
-                    social_component=social_score,
-                    donation_component=donation_score,
-                    gaming_details=gaming_details,
-                    social_details=social_details,
-                    donation_details=donation_details
-                )
-
-                impact_score.calculate_total_score()
-                impact_score.add_history_entry(impact_score.impact_score)
+                impact_score = self._apply_components(user_id, None, components)
 
                 # Save to database
                 score_id = self.impact_score_repo.create_impact_score(impact_score)
                 if not score_id:
                     return False, "Failed to create impact score", None
 
+                self.friends_ranking_repo.update_member_scores([impact_score])
+
                 current_app.logger.info(f"Created impact score for user {user_id}: {impact_score.impact_score}")
                 return True, "Impact score calculated successfully", impact_score
 
@@ -113,7 +121,83 @@ class ImpactCalculator:
             current_app.logger.error(f"Error calculating impact score for user {user_id}: {str(e)}")
             return False, "Failed to calculate impact score", None
 
-    def _calculate_gaming_component(self, user_id: str) -> Tuple[float, Dict[str, Any]]:
+    def calculate_impact_scores(self, user_ids: List[str],
+                                incremental: bool = True) -> Dict[str, ImpactScore]:
+        """
+        Calculate and store impact scores for a batch of users
+
+        Inputs for the whole batch are fetched with a fixed number of
+        queries (users, existing scores, activity aggregates, and one
+        $facet/$group aggregation each over relationships and sessions for
+        users whose aggregates need rebuilding), and results are written
+        with one unordered bulk upsert, so cost per user does not include
+        any per-user round trips.
+
+        Args:
+            user_ids: Users to score (unknown IDs are skipped)
+            incremental: Read seeded activity aggregates instead of rescanning history
+
+        Returns:
+            Dict of user ID to the stored ImpactScore
+        """
+        if not user_ids:
+            return {}
+
+        users = {
+            str(doc['_id']): doc
+            for doc in self.user_repo.collection.find(
+                {'_id': {'$in': [ObjectId(user_id) for user_id in user_ids]}},
+                {'gaming_stats': 1, 'wallet_credits': 1}
+            )
+        }
+        if not users:
+            return {}
+
+        existing_scores = self.impact_score_repo.find_by_user_ids(list(users))
+        activities = self._load_activity_summaries(list(users), incremental)
+
+        scores = {}
+        for user_id, user in users.items():
+            components = self._calculate_components(user_id, user, activities[user_id])
+            scores[user_id] = self._apply_components(user_id, existing_scores.get(user_id), components)
+
+        self.impact_score_repo.bulk_upsert_impact_scores(list(scores.values()))
+        self.friends_ranking_repo.update_member_scores(list(scores.values()))
+        return scores
+
+    def _calculate_components(self, user_id: str, user: Dict[str, Any],
+                              activity: Dict[str, Any]) -> Dict[str, Tuple[float, Dict[str, Any]]]:
+        """Calculate the (score, details) pair of every component"""
+        return {
+            'gaming': self._calculate_gaming_component(user_id, user, activity),
+            'social': self._calculate_social_component(user_id, activity),
+            'donation': self._calculate_donation_component(user_id, user)
+        }
+
+    def _apply_components(self, user_id: str, impact_score: Optional[ImpactScore],
+                          components: Dict[str, Tuple[float, Dict[str, Any]]]) -> ImpactScore:
+        """Apply calculated components to an existing score, or build a new one"""
+        if impact_score:
+            for component, (score, details) in components.items():
+                impact_score.update_component(component, score, details)
+        else:
+            impact_score = ImpactScore(
+                user_id=user_id,
+                gaming_component=components['gaming'][0],
+                social_component=components['social'][0],
+                donation_component=components['donation'][0],
+                gaming_details=components['gaming'][1],
+                social_details=components['social'][1],
+                donation_details=components['donation'][1]
+            )
+            impact_score.calculate_total_score()
+
+        # Add to history
+        impact_score.add_history_entry(impact_score.impact_score)
+        return impact_score
+
+    def _calculate_gaming_component(self, user_id: str, user: Dict[str, Any],
+                                    activity: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
         """
         Calculate gaming activity component (30% of total score)
         Max possible score: 1000.0
@@ -125,18 +209,14 @@ class ImpactCalculator:
         - Achievement completions (25%)
         """
         try:
-            # Get user's gaming data
-            user = self.user_repo.find_by_id(user_id)
-            gaming_stats = user.get('gaming_stats', {})
-
             # Calculate sub-components
-            play_time_score = self._calculate_play_time_score(user_id)
-            variety_score = self._calculate_game_variety_score(user_id)
-            tournament_score = self._calculate_tournament_score(user_id)
+            play_time_score = self._calculate_play_time_score(activity)
+            variety_score = self._calculate_game_variety_score(activity)
+            tournament_score = self._calculate_tournament_score(user)
             achievement_score = self._calculate_achievement_score(user_id)
 
             # Calculate consistency multiplier based on recent activity
-            consistency_multiplier = self._calculate_consistency_multiplier(user_id)
+            consistency_multiplier = self._calculate_consistency_multiplier(activity)
 
             # Weighted gaming score
             base_score = (play_time_score + variety_score + tournament_score + achievement_score) / 4
@@ -157,7 +237,8 @@ class ImpactCalculator:
             current_app.logger.error(f"Error calculating gaming component for user {user_id}: {str(e)}")
             return 0.0, {}
 
-    def _calculate_social_component(self, user_id: str) -> Tuple[float, Dict[str, Any]]:
+    def _calculate_social_component(self, user_id: str,
+                                    activity: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
         """
         Calculate social engagement component (20% of total score)
         Max possible score: 500.0
@@ -170,13 +251,13 @@ class ImpactCalculator:
         """
         try:
             # Calculate sub-components
-            friends_score = self._calculate_friends_score(user_id)
+            friends_score = self._calculate_friends_score(activity)
             challenges_score = self._calculate_social_challenges_score(user_id)
             community_score = self._calculate_community_contribution_score(user_id)
             sharing_score = self._calculate_content_sharing_score(user_id)
 
             # Calculate engagement multiplier
-            engagement_multiplier = self._calculate_engagement_multiplier(user_id)
+            engagement_multiplier = self._calculate_engagement_multiplier(activity)
 
             # Weighted social score
             weighted_score = (
@@ -202,7 +283,8 @@ class ImpactCalculator:
             current_app.logger.error(f"Error calculating social component for user {user_id}: {str(e)}")
             return 0.0, {}
 
-    def _calculate_donation_component(self, user_id: str) -> Tuple[float, Dict[str, Any]]:
+    def _calculate_donation_component(self, user_id: str,
+                                      user: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
         """
         Calculate donation impact component (50% of total score)
         Max possible score: 2000.0
@@ -215,7 +297,6 @@ class ImpactCalculator:
         """
         try:
             # Get user's wallet and donation data
-            user = self.user_repo.find_by_id(user_id)
             wallet_credits = user.get('wallet_credits', {})
             total_donated = wallet_credits.get('total_donated', 0.0)
 
@@ -254,25 +335,15 @@ class ImpactCalculator:
             return 0.0, {}
 
     # Gaming sub-component calculations
-    def _calculate_play_time_score(self, user_id: str) -> float:
+    def _calculate_play_time_score(self, activity: Dict[str, Any]) -> float:
         """Calculate score based on play time consistency"""
         try:
-            # Get recent gaming sessions (last 30 days)
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            sessions = self.game_session_repo.find_user_sessions_by_date_range(
-                user_id, cutoff_date, datetime.utcnow()
-            )
-
-            if not sessions:
+            if not activity['sessions_30d']:
                 return 0.0
 
-            # Calculate total play time and consistency
-            total_minutes = sum(session.get('play_duration_ms', 0) for session in sessions) / 60000
-            unique_days = len(set(session['created_at'].date() for session in sessions))
-
-            # Score based on total time and consistency
-            time_score = min(total_minutes / 10, 200)  # Max 200 for 100+ minutes
-            consistency_bonus = min(unique_days * 10, 50)  # Max 50 for 5+ days
+            # Score based on total time and consistency over the last 30 days
+            time_score = min(activity['play_minutes_30d'] / 10, 200)  # Max 200 for 100+ minutes
+            consistency_bonus = min(activity['active_days_30d'] * 10, 50)  # Max 50 for 5+ days
 
             return time_score + consistency_bonus
 
@@ -280,33 +351,21 @@ class ImpactCalculator:
             current_app.logger.error(f"Error calculating play time score: {str(e)}")
             return 0.0
 
-    def _calculate_game_variety_score(self, user_id: str) -> float:
+    def _calculate_game_variety_score(self, activity: Dict[str, Any]) -> float:
         """Calculate score based on game variety"""
         try:
-            # Get games played in last 30 days
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            sessions = self.game_session_repo.find_user_sessions_by_date_range(
-                user_id, cutoff_date, datetime.utcnow()
-            )
-
-            if not sessions:
-                return 0.0
-
-            unique_games = len(set(session.get('game_id') for session in sessions if session.get('game_id')))
-
             # Score based on variety (max 250 for 10+ different games)
-            return min(unique_games * 25, 250)
+            return min(activity['unique_games_30d'] * 25, 250)
 
         except Exception as e:
             current_app.logger.error(f"Error calculating game variety score: {str(e)}")
             return 0.0
 
-    def _calculate_tournament_score(self, user_id: str) -> float:
+    def _calculate_tournament_score(self, user: Dict[str, Any]) -> float:
         """Calculate score based on tournament participation"""
         try:
             # This would integrate with the tournament system
             # For now, return a placeholder based on user's competitive activity
-            user = self.user_repo.find_by_id(user_id)
             gaming_stats = user.get('gaming_stats', {})
 
             # Placeholder calculation based on activity
@@ -331,18 +390,17 @@ class ImpactCalculator:
             return 0.0
 
     # Social sub-component calculations
-    def _calculate_friends_score(self, user_id: str) -> float:
+    def _calculate_friends_score(self, activity: Dict[str, Any]) -> float:
         """Calculate score based on friends and social interactions"""
         try:
-            # Get accepted friendships
-            friendships = self.relationship_repo.get_user_relationships(user_id, 'friend', 'accepted')
-            friend_count = len(friendships)
+            # Accepted friendships
+            friend_count = activity['friend_count']
 
             # Score based on friend count and engagement
             base_score = min(friend_count * 20, 300)  # Max 300 for 15+ friends
 
             # Activity bonus for recent interactions
-            recent_activity = self._get_recent_social_activity(user_id)
+            recent_activity = activity['social_events_7d']
             activity_bonus = min(recent_activity * 5, 100)
 
             return base_score + activity_bonus
@@ -429,21 +487,15 @@ class ImpactCalculator:
             return 0.0
 
     # Multiplier calculations
-    def _calculate_consistency_multiplier(self, user_id: str) -> float:
+    def _calculate_consistency_multiplier(self, activity: Dict[str, Any]) -> float:
         """Calculate multiplier based on gaming consistency"""
         try:
-            # Get gaming activity in last 7 days
-            cutoff_date = datetime.utcnow() - timedelta(days=7)
-            recent_sessions = self.game_session_repo.find_user_sessions_by_date_range(
-                user_id, cutoff_date, datetime.utcnow()
-            )
+            # Days with gaming activity in the last 7 days
+            unique_days = activity['active_days_7d']
 
-            if not recent_sessions:
+            if not unique_days:
                 return 0.8  # Penalty for inactivity
 
-            # Calculate days with activity
-            unique_days = len(set(session['created_at'].date() for session in recent_sessions))
-
             # Multiplier based on consistency (1.0 baseline, up to 1.2 bonus)
             multiplier = 1.0 + (unique_days - 1) * 0.05
             return min(multiplier, 1.2)
@@ -452,11 +504,11 @@ class ImpactCalculator:
             current_app.logger.error(f"Error calculating consistency multiplier: {str(e)}")
             return 1.0
 
-    def _calculate_engagement_multiplier(self, user_id: str) -> float:
+    def _calculate_engagement_multiplier(self, activity: Dict[str, Any]) -> float:
         """Calculate multiplier based on social engagement"""
         try:
             # Get recent social activity
-            activity_count = self._get_recent_social_activity(user_id)
+            activity_count = activity['social_events_7d']
 
             # Multiplier based on engagement
             if activity_count >= 10:
@@ -483,77 +535,274 @@ class ImpactCalculator:
             return 1.0
 
     # Helper methods
-    def _get_recent_social_activity(self, user_id: str) -> int:
-        """Get count of recent social activities"""
-        try:
-            # Count recent relationship activities, challenges, etc.
-            cutoff_date = datetime.utcnow() - timedelta(days=7)
-
-            # This would count various social activities
-            activity_count = 0
-
-            # Count recent friend requests/acceptances
-            recent_relationships = self.relationship_repo.find_many({
-                'user_id': ObjectId(user_id),
-                'updated_at': {'$gte': cutoff_date}
-            })
-            activity_count += len(recent_relationships)
-
-            return activity_count
+    def _load_activity_summaries(self, user_ids: List[str], incremental: bool) -> Dict[str, Dict[str, Any]]:
+        """
+        Get windowed activity inputs for the score components of several users
 
-        except Exception as e:
-            current_app.logger.error(f"Error getting recent social activity: {str(e)}")
-            return 0
+        Incremental mode reads seeded daily aggregates, so the cost does not
+        grow with history length. Users without seeded aggregates (or all of
+        them outside incremental mode) get their buckets rebuilt with batched
+        history aggregations, stored as the new seed.
+        """
+        summaries = {}
+        friend_counts = {}
+
+        if incremental:
+            seeded = [
+                aggregate for aggregate in self.activity_aggregate_repo.find_by_user_ids(user_ids)
+                if aggregate.get('seeded_at')
+            ]
+            self.activity_aggregate_repo.prune_many(seeded)
+            for aggregate in seeded:
+                summaries[str(aggregate['user_id'])] = aggregate.get('days', {})
+
+        now = datetime.utcnow()
+        social_stats = self.relationship_repo.get_social_stats_by_users(user_ids, now - timedelta(days=7))
+        for user_id in user_ids:
+            friend_counts[user_id] = social_stats.get(user_id, {}).get('friend_count', 0)
+
+        missing = [user_id for user_id in user_ids if user_id not in summaries]
+        if missing:
+            rebuilt = self._build_day_buckets(missing, social_stats)
+            self.activity_aggregate_repo.seed_many(rebuilt)
+            summaries.update(rebuilt)
+
+        return {
+            user_id: self._summarize_day_buckets(summaries[user_id], friend_counts[user_id])
+            for user_id in user_ids
+        }
+
+    def _build_day_buckets(self, user_ids: List[str],
+                           social_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Rebuild daily activity buckets from game sessions and relationships"""
+        now = datetime.utcnow()
+        days_by_user = {user_id: {} for user_id in user_ids}
+
+        rows = self.game_session_repo.get_daily_activity_by_users(
+            user_ids, now - timedelta(days=ActivityAggregateRepository.RETENTION_DAYS)
+        )
+        for row in rows:
+            days_by_user[row['user_id']][row['day']] = {
+                'play_ms': row['play_ms'],
+                'sessions': row['sessions'],
+                'games': row['games']
+            }
 
-    def recalculate_all_scores(self, batch_size: int = 100) -> Tuple[bool, str, Dict[str, int]]:
+        # Count recent friend requests/acceptances
+        for user_id in user_ids:
+            recent_by_day = social_stats.get(user_id, {}).get('recent_by_day', {})
+            for day, count in recent_by_day.items():
+                days_by_user[user_id].setdefault(day, {})['social'] = count
+
+        return days_by_user
+
+    def _summarize_day_buckets(self, days: Dict[str, Dict[str, Any]],
+                               friend_count: int = 0) -> Dict[str, Any]:
+        """Reduce daily buckets to the 30-day and 7-day windows used for scoring"""
+        now = datetime.utcnow()
+        day_key = ActivityAggregateRepository.day_key
+        cutoff_30d = day_key(now - timedelta(days=30))
+        cutoff_7d = day_key(now - timedelta(days=7))
+
+        summary = {
+            'sessions_30d': 0,
+            'play_minutes_30d': 0.0,
+            'active_days_30d': 0,
+            'unique_games_30d': 0,
+            'active_days_7d': 0,
+            'social_events_7d': 0,
+            'friend_count': friend_count
+        }
+        games = set()
+
+        for day, bucket in days.items():
+            if day < cutoff_30d:
+                continue
+
+            sessions = bucket.get('sessions', 0)
+            summary['sessions_30d'] += sessions
+            summary['play_minutes_30d'] += bucket.get('play_ms', 0) / 60000
+            games.update(bucket.get('games', []))
+
+            if sessions:
+                summary['active_days_30d'] += 1
+
+            if day >= cutoff_7d:
+                summary['social_events_7d'] += bucket.get('social', 0)
+                if sessions:
+                    summary['active_days_7d'] += 1
+
+        summary['unique_games_30d'] = len(games)
+        return summary
+
+    def recalculate_all_scores(self, batch_size: int = 100, workers: Optional[int] = None,
+                               resume: bool = True, run_id: str = 'full') -> Tuple[bool, str, Dict[str, Any]]:
         """
         Recalculate impact scores for all users in batches
 
+        Users are walked in _id order with projection-only range queries, so
+        the user collection is never loaded into memory. Batches run on a
+        process pool (one Flask app and Mongo client per process) when
+        workers > 1. Progress is checkpointed after each contiguous batch
+        that succeeded. After a failed batch the checkpoint stays put and
+        the run is left unfinished, so resuming it retries that batch.
+
         Args:
             batch_size: Number of users to process per batch
+            workers: Pool processes (defaults to RECALCULATION_WORKERS; 1 runs inline)
+            resume: Continue an unfinished run instead of starting over
+            run_id: Checkpoint identifier for this recalculation
 
         Returns:
             Tuple of (success, message, stats)
         """
         try:
-            # Get all users
-            all_users = self.user_repo.find_many({}, limit=None)
-            total_users = len(all_users)
-
-            if total_users == 0:
-                return True, "No users to process", {'processed': 0, 'errors': 0}
+            workers = self.RECALCULATION_WORKERS if workers is None else workers
 
-            processed = 0
-            errors = 0
+            checkpoint = self.checkpoint_repo.find_active(run_id) if resume else None
+            if checkpoint:
+                current_app.logger.info(
+                    f"Resuming score recalculation '{run_id}' after user {checkpoint['last_user_id']}"
+                )
+            else:
+                checkpoint = self.checkpoint_repo.start(run_id)
+
+            progress = {
+                'run_id': run_id,
+                'total_users': self.user_repo.count(),
+                'processed': checkpoint['processed'],
+                'errors': checkpoint['errors'],
+                'resumed_from': str(checkpoint['last_user_id']) if checkpoint['last_user_id'] else None,
+                'started': time.monotonic(),
+                'batches': 0,
+                'failed_batches': 0
+            }
 
-            # Process in batches
-            for i in range(0, total_users, batch_size):
-                batch = all_users[i:i + batch_size]
+            if progress['total_users'] == 0:
+                return True, "No users to process", {'processed': 0, 'errors': 0}
 
-                for user in batch:
-                    success, message, score = self.calculate_user_impact_score(
-                        str(user['_id']),
-                        force_recalculate=True
-                    )
+            batches = self._iter_user_id_batches(checkpoint['last_user_id'], batch_size)
 
-                    if success:
-                        processed += 1
-                    else:
-                        errors += 1
-                        current_app.logger.warning(f"Failed to calculate score for user {user['_id']}: {message}")
+            if workers <= 1:
+                for batch in batches:
+                    try:
+                        processed, errors = self._recalculate_batch([str(user_id) for user_id in batch])
+                    except Exception as e:
+                        self._record_failed_batch(progress, batch, e)
+                        continue
+                    self._record_batch_progress(progress, batch[-1], processed, errors)
+            else:
+                self._recalculate_batches_in_pool(batches, workers, progress)
 
-                # Log progress
-                current_app.logger.info(f"Processed batch {i//batch_size + 1}: {processed}/{total_users} users")
+            if not progress['failed_batches']:
+                self.checkpoint_repo.complete(run_id)
 
+            duration = time.monotonic() - progress['started']
             stats = {
-                'total_users': total_users,
-                'processed': processed,
-                'errors': errors
+                'total_users': progress['total_users'],
+                'processed': progress['processed'],
+                'errors': progress['errors'],
+                'failed_batches': progress['failed_batches'],
+                'resumed_from': progress['resumed_from'],
+                'workers': max(workers, 1),
+                'duration_seconds': round(duration, 2),
+                'users_per_second': round(progress['processed'] / duration, 1) if duration > 0 else 0.0
             }
 
-            message = f"Recalculated scores for {processed}/{total_users} users"
+            message = f"Recalculated scores for {progress['processed']}/{progress['total_users']} users"
+            if progress['failed_batches']:
+                message += f"; {progress['failed_batches']} batches failed, resume run '{run_id}' to retry them"
             return True, message, stats
 
         except Exception as e:
             current_app.logger.error(f"Error in batch recalculation: {str(e)}")
-            return False, "Batch recalculation failed", {'processed': 0, 'errors': 0}
\ No newline at end of file
+            return False, "Batch recalculation failed", {'processed': 0, 'errors': 0}
+
+    def _iter_user_id_batches(self, after_id: Optional[ObjectId], batch_size: int) -> Iterator[List[ObjectId]]:
+        """Yield user _id batches in ascending order using keyset pagination"""
+        while True:
+            query = {'_id': {'$gt': after_id}} if after_id else {}
+            cursor = self.user_repo.collection.find(query, {'_id': 1}).sort('_id', 1).limit(batch_size)
+            batch = [doc['_id'] for doc in cursor]
+
+            if not batch:
+                return
+
+            yield batch
+            after_id = batch[-1]
+
+    def _recalculate_batch(self, user_ids: List[str]) -> Tuple[int, int]:
+        """Recalculate a batch of users, returning (processed, errors); raises if the batch failed"""
+        # Full rescan also reseeds activity aggregates, correcting drift
+        scores = self.calculate_impact_scores(user_ids, incremental=False)
+        return len(scores), len(user_ids) - len(scores)
+
+    def _recalculate_batches_in_pool(self, batches: Iterator[List[ObjectId]], workers: int,
+                                     progress: Dict[str, Any]):
+        """Fan batches out over a process pool, checkpointing in submission order"""
+        # Spawned (not forked) processes so no MongoClient crosses a fork
+        context = multiprocessing.get_context('spawn')
+        max_in_flight = workers * 2
+        in_flight = deque()
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_recalculation_worker) as pool:
+            for batch in batches:
+                future = pool.submit(_recalculate_user_batch, [str(user_id) for user_id in batch])
+                in_flight.append((batch, future))
+
+                if len(in_flight) >= max_in_flight:
+                    self._collect_pool_batch(in_flight.popleft(), progress)
+
+            while in_flight:
+                self._collect_pool_batch(in_flight.popleft(), progress)
+
+    def _collect_pool_batch(self, submitted: Tuple[List[ObjectId], Future], progress: Dict[str, Any]):
+        batch, future = submitted
+        try:
+            processed, errors = future.result()
+        except Exception as e:
+            self._record_failed_batch(progress, batch, e)
+            return
+
+        self._record_batch_progress(progress, batch[-1], processed, errors)
+
+    def _record_failed_batch(self, progress: Dict[str, Any], batch: List[ObjectId], error: Exception):
+        current_app.logger.error(f"Recalculation batch ending at user {batch[-1]} failed: {str(error)}")
+        progress['failed_batches'] += 1
+        self._record_batch_progress(progress, batch[-1], 0, len(batch))
+
+    def _record_batch_progress(self, progress: Dict[str, Any], last_user_id: ObjectId,
+                               processed: int, errors: int):
+        progress['processed'] += processed
+        progress['errors'] += errors
+        progress['batches'] += 1
+
+        # The checkpoint only covers batches that all succeeded
+        if not progress['failed_batches']:
+            self.checkpoint_repo.advance(progress['run_id'], last_user_id, progress['processed'], progress['errors'])
+
+        elapsed = time.monotonic() - progress['started']
+        done = progress['processed'] + progress['errors']
+        rate = done / elapsed if elapsed > 0 else 0.0
+        current_app.logger.info(
+            f"Processed batch {progress['batches']}: {done}/{progress['total_users']} users "
+            f"({progress['errors']} errors, {rate:.1f} users/s)"
+        )
+
+
+# Process pool entry points for ImpactCalculator.recalculate_all_scores
+
+_worker_app = None
+
+
+def _init_recalculation_worker():
+    """Create a Flask app, and with it a dedicated MongoClient, per pool process"""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app()
+
+
+def _recalculate_user_batch(user_ids: List[str]) -> Tuple[int, int]:
+    with _worker_app.app_context():
+        return ImpactCalculator()._recalculate_batch(user_ids)
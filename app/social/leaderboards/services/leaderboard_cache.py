@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from app.core.repositories.base_repository import BaseRepository
+
+
+class LocalPageCacheBackend:
+    """Per-worker LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MongoPageCacheBackend(BaseRepository):
+    """
+    Shared page store for all workers
+
+    Collection: leaderboard_page_cache
+
+    Documents expire through a TTL index; keys embed the leaderboard
+    version, so superseded pages are never read again.
+    """
+
+    def __init__(self):
+        super().__init__('leaderboard_page_cache')
+
+    def create_indexes(self):
+        """Create TTL index for cached pages"""
+        if self.collection is None or os.getenv('TESTING') == 'true':
+            return
+
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        document = self.find_one({'_id': key, 'expires_at': {'$gt': datetime.now(timezone.utc)}})
+        return document['value'] if document else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: float):
+        self.collection.replace_one(
+            {'_id': key},
+            {'_id': key, 'value': value, 'expires_at': datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)},
+            upsert=True
+        )
+
+
+class LeaderboardPageCache:
+    """
+    Read-through cache for rendered leaderboard pages
+
+    Pages are keyed by (type, period, version, page, per_page). The
+    version is bumped by LeaderboardRepository in the same write that
+    commits new entries or ranks, so a committed update is never served
+    from cache. Lookups go to the per-worker LRU first, then to the
+    optional shared backend (LEADERBOARD_PAGE_CACHE_BACKEND=mongo).
+    """
+
+    MAX_ENTRIES = int(os.getenv('LEADERBOARD_PAGE_CACHE_SIZE', '512'))
+    TTL_SECONDS = int(os.getenv('LEADERBOARD_PAGE_CACHE_TTL', '300'))
+    SHARED_BACKEND = os.getenv('LEADERBOARD_PAGE_CACHE_BACKEND', 'local')
+
+    def __init__(self, shared_backend=None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        """
+        Initialize LeaderboardPageCache
+
+        Args:
+            shared_backend: Optional store shared between workers (get/set interface)
+            max_entries: Pages kept in the per-worker LRU
+            ttl_seconds: Lifetime of a cached page
+        """
+        self.local = LocalPageCacheBackend(max_entries or self.MAX_ENTRIES)
+        self._shared = shared_backend
+        self._shared_resolved = shared_backend is not None
+        self.ttl_seconds = ttl_seconds or self.TTL_SECONDS
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def shared(self):
+        """Shared backend, created on first use once the database is available"""
+        if not self._shared_resolved and self.SHARED_BACKEND == 'mongo':
+            backend = MongoPageCacheBackend()
+            if backend.collection is not None:
+                self._shared = backend
+                self._shared_resolved = True
+        return self._shared
+
+    @staticmethod
+    def page_key(leaderboard_type: str, period: str, version: int,
+                 page: int, per_page: int) -> str:
+        """Build the cache key for a leaderboard page (pages are the same for every viewer)"""
+        return f"{leaderboard_type}:{period}:v{version}:{page}:{per_page}"
+
+    @staticmethod
+    def compute_etag(value: Any) -> str:
+        """Build a weak ETag from a JSON-serializable value"""
+        payload = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+        return f'W/"{hashlib.sha1(payload).hexdigest()[:20]}"'
+
+    @staticmethod
+    def etag_matches(etag: str, if_none_match: str) -> bool:
+        """Check an If-None-Match header against an ETag with weak comparison"""
+        if if_none_match.strip() == '*':
+            return True
+        opaque = etag[2:] if etag.startswith('W/') else etag
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if (tag[2:] if tag.startswith('W/') else tag) == opaque:
+                return True
+        return False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached page ({'data', 'etag'}) from the local or shared store"""
+        value = self.local.get(key)
+        if value is not None:
+            self.stats['local_hits'] += 1
+            return value
+
+        shared = self.shared
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                self.stats['shared_hits'] += 1
+                self.local.set(key, value, self.ttl_seconds)
+                return value
+
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a rendered page and return it with its ETag"""
+        value = {'data': data, 'etag': self.compute_etag(data)}
+        self.local.set(key, value, self.ttl_seconds)
+        shared = self.shared
+        if shared is not None:
+            shared.set(key, value, self.ttl_seconds)
+        return value
+
+    def invalidate(self, leaderboard_type: str, period: str) -> int:
+        """Evict this worker's pages for a leaderboard (other workers miss on the new version)"""
+        return self.local.delete_prefix(f"{leaderboard_type}:{period}:")
+
+
+# Shared by every LeaderboardService in this worker
+leaderboard_page_cache = LeaderboardPageCache()
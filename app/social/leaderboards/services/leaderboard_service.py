@@ -1,14 +1,20 @@
+import os
+import threading
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime, timedelta
 from flask import current_app
+from bson import ObjectId
 
 from app.core.repositories.user_repository import UserRepository
 from app.social.repositories.relationship_repository import RelationshipRepository
 from ..repositories.leaderboard_repository import LeaderboardRepository
 from ..repositories.impact_score_repository import ImpactScoreRepository
+from ..repositories.friends_ranking_repository import FriendsRankingRepository
+from ..repositories.top_k_index import TopKIndex
 from ..models.leaderboard import Leaderboard
 from ..models.leaderboard_entry import LeaderboardEntry
 from .impact_calculator import ImpactCalculator
+from .leaderboard_cache import leaderboard_page_cache
 
 
 class LeaderboardService:
@@ -22,28 +28,54 @@ class LeaderboardService:
     - Pagination and ranking display
     """
 
+    # Entries kept per leaderboard
+    TOP_K = int(os.getenv('LEADERBOARD_TOP_K', '1000'))
+
+    # Score each leaderboard type ranks by
+    SCORE_FIELDS = {
+        Leaderboard.GLOBAL_IMPACT: 'impact_score',
+        Leaderboard.GAMING_MASTERS: 'gaming_component',
+        Leaderboard.SOCIAL_CHAMPIONS: 'social_component',
+        Leaderboard.DONATION_HEROES: 'donation_component',
+        Leaderboard.WEEKLY_WARRIORS: 'impact_score'
+    }
+
+    # Top-K indexes per (type, period), shared by every service in this worker
+    _top_k_indexes: Dict[Tuple[str, str], TopKIndex] = {}
+    _top_k_lock = threading.RLock()
+
     def __init__(self):
         self.leaderboard_repo = LeaderboardRepository()
         self.impact_score_repo = ImpactScoreRepository()
         self.user_repo = UserRepository()
         self.relationship_repo = RelationshipRepository()
+        self.friends_ranking_repo = FriendsRankingRepository()
         self.impact_calculator = ImpactCalculator()
+        self.page_cache = leaderboard_page_cache
 
     def get_leaderboard(self, leaderboard_type: str, period: str,
                        user_id: Optional[str] = None,
-                       page: int = 1, per_page: int = 50) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+                       page: int = 1, per_page: int = 50,
+                       if_none_match: Optional[str] = None) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
         Get leaderboard data with pagination
 
+        The shared page (entries, pagination, metadata) is served from the
+        page cache for the leaderboard's current version; only the
+        requesting user's position is read per request.
+
         Args:
             leaderboard_type: Type of leaderboard to retrieve
             period: Time period (daily, weekly, monthly, all_time)
             user_id: Optional user ID for personalized data
             page: Page number for pagination
             per_page: Entries per page
+            if_none_match: If-None-Match header the client sent
 
         Returns:
-            Tuple of (success, message, leaderboard_data)
+            Tuple of (success, message, leaderboard_data); leaderboard_data
+            carries an 'etag', and only that plus 'not_modified' when
+            if_none_match still matches
         """
         try:
             # Validate parameters
@@ -72,12 +104,37 @@ class LeaderboardService:
             if user_id:
                 user_position = self._get_user_position(leaderboard, user_id)
 
-            # Get leaderboard response
-            response_data = leaderboard.to_response_dict(
-                include_entries=True,
-                page=page,
-                per_page=per_page
+            cache_key = self.page_cache.page_key(
+                leaderboard_type, period, leaderboard.version, page, per_page
             )
+            cached_page = self.page_cache.get(cache_key)
+
+            if cached_page is None:
+                # Read the requested page from the entries index
+                entry_repo = self.leaderboard_repo.entry_repo
+                page_entries = entry_repo.get_entries_page(
+                    leaderboard_type, period, skip=(page - 1) * per_page, limit=per_page
+                )
+
+                page_data = leaderboard.to_response_dict(
+                    include_entries=True,
+                    page=page,
+                    per_page=per_page,
+                    page_entries=page_entries,
+                    total_items=entry_repo.count_entries(leaderboard_type, period)
+                )
+                cached_page = self.page_cache.set(cache_key, page_data)
+
+            etag = cached_page['etag']
+            if user_position:
+                etag = self.page_cache.compute_etag([etag, user_position])
+
+            if if_none_match and self.page_cache.etag_matches(etag, if_none_match):
+                return True, "Leaderboard not modified", {'etag': etag, 'not_modified': True}
+
+            # Copy so per-user data never leaks into the cached page
+            response_data = dict(cached_page['data'])
+            response_data['etag'] = etag
 
             # Add user position data
             if user_position:
@@ -94,6 +151,9 @@ class LeaderboardService:
         """
         Get leaderboard showing user and their friends
 
+        Reads the user's materialized friends view (built on first access,
+        then kept current by relationship and score changes).
+
         Args:
             user_id: User ID to get friends for
             page: Page number for pagination
@@ -103,12 +163,10 @@ class LeaderboardService:
             Tuple of (success, message, leaderboard_data)
         """
         try:
-            # Get user's friends
-            friendships = self.relationship_repo.get_user_relationships(user_id, 'friend', 'accepted')
-            friend_ids = [str(rel.target_user_id) for rel in friendships]
+            if not self.friends_ranking_repo.is_built(user_id):
+                self.rebuild_friends_rankings(user_id)
 
-            # Get impact scores for user and friends
-            friends_rankings = self.impact_score_repo.get_friends_rankings(user_id, friend_ids)
+            friends_rankings = self.friends_ranking_repo.get_rankings(user_id)
 
             if not friends_rankings:
                 return True, "No friends data available", {
@@ -121,21 +179,16 @@ class LeaderboardService:
             # Create leaderboard entries
             entries = []
             for rank, ranking in enumerate(friends_rankings, 1):
-                user_profile = ranking.get('user_profile', [{}])[0]
-                display_name = user_profile.get('social_profile', {}).get('display_name')
-                if not display_name:
-                    display_name = user_profile.get('first_name', 'Unknown User')
-
                 entry = LeaderboardEntry(
-                    user_id=str(ranking['user_id']),
+                    user_id=str(ranking['member_id']),
                     score=ranking['impact_score'],
                     rank=rank,
-                    display_name=display_name,
+                    display_name=ranking['display_name'],
                     user_data={
                         'avatar_url': None,
                         'level': 1,
                         'badge_count': 0,
-                        'join_date': user_profile.get('created_at')
+                        'join_date': ranking.get('join_date')
                     },
                     score_components={
                         'gaming': ranking.get('gaming_component', 0),
@@ -163,6 +216,32 @@ class LeaderboardService:
             current_app.logger.error(f"Error getting friends leaderboard for user {user_id}: {str(e)}")
             return False, "Failed to retrieve friends leaderboard", None
 
+    def rebuild_friends_rankings(self, user_id: str) -> int:
+        """Materialize a user's friends view from relationships and impact scores"""
+        friendships = self.relationship_repo.get_user_friends(user_id)
+        member_ids = [user_id] + [
+            str(rel.target_user_id) if str(rel.user_id) == user_id else str(rel.user_id)
+            for rel in friendships
+        ]
+
+        return self.friends_ranking_repo.rebuild(user_id, self._build_friend_members(member_ids))
+
+    def on_friendship_added(self, user_id: str, friend_user_id: str):
+        """Add two new friends to each other's materialized views"""
+        members = {
+            str(member['member_id']): member
+            for member in self._build_friend_members([user_id, friend_user_id])
+        }
+
+        for owner_id, member_id in ((user_id, friend_user_id), (friend_user_id, user_id)):
+            # Unbuilt views pick the friendship up when first materialized
+            if self.friends_ranking_repo.is_built(owner_id):
+                self.friends_ranking_repo.add_members(owner_id, [members[member_id]])
+
+    def on_friendship_removed(self, user_id: str, friend_user_id: str):
+        """Remove former friends from each other's materialized views"""
+        self.friends_ranking_repo.remove_pair(user_id, friend_user_id)
+
     def get_user_leaderboard_summary(self, user_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """
         Get user's positions across all leaderboards
@@ -315,8 +394,70 @@ class LeaderboardService:
             return False, "Failed to refresh leaderboards", {'refreshed': 0, 'errors': 0}
 
     def _update_leaderboard_data(self, leaderboard: Leaderboard) -> bool:
-        """Update leaderboard with current data"""
+        """
+        Update leaderboard with current data
+
+        When this worker holds a valid top-K index for the leaderboard, only
+        scores recalculated since the last refresh are read and only entries
+        crossing the cutoff are written. Otherwise (or for activity-windowed
+        leaderboards, whose membership expires with time) the top K are
+        rebuilt from a ranking query.
+        """
+        key = (leaderboard.leaderboard_type, leaderboard.period)
+        index = self._top_k_indexes.get(key)
+
+        if (index is not None and not index.incomplete and index.synced_at is not None
+                and index.version == leaderboard.version
+                and not self._is_activity_windowed(*key)):
+            try:
+                synced_at = datetime.utcnow()
+                rows = self.impact_score_repo.get_scores_changed_since(index.synced_at)
+                if self._apply_top_k_rows(key[0], key[1], index, rows) is None:
+                    return False
+                index.synced_at = synced_at
+
+                if not index.incomplete:
+                    return True
+
+            except Exception as e:
+                current_app.logger.error(f"Error applying leaderboard changes: {str(e)}")
+                return False
+
+        return self._rebuild_leaderboard_data(leaderboard)
+
+    def apply_score_updates(self, rankings: List[Dict[str, Any]],
+                            score_fields: Optional[List[str]] = None) -> int:
+        """
+        Offer recalculated scores to the top-K indexes held by this worker
+
+        Args:
+            rankings: Score rows shaped like ranking query results
+            score_fields: Only leaderboards ranked by these fields are offered
+                the rows (every score-ranked leaderboard when None)
+
+        Returns:
+            int: Number of leaderboards changed
+        """
+        changed = 0
+        for leaderboard_type, score_field in self.SCORE_FIELDS.items():
+            if score_fields is not None and score_field not in score_fields:
+                continue
+
+            for period in Leaderboard.VALID_PERIODS:
+                try:
+                    index = self._get_top_k_index(leaderboard_type, period)
+                    if index is not None and self._apply_top_k_rows(leaderboard_type, period, index, rankings):
+                        changed += 1
+                except Exception as e:
+                    current_app.logger.error(f"Error applying scores to {leaderboard_type}_{period}: {str(e)}")
+
+        return changed
+
+    def _rebuild_leaderboard_data(self, leaderboard: Leaderboard) -> bool:
+        """Rebuild a leaderboard's top K from a ranking query and reload its index"""
         try:
+            synced_at = datetime.utcnow()
+
             # Clear existing entries
             leaderboard.clear_entries()
 
@@ -334,64 +475,185 @@ class LeaderboardService:
             else:
                 return False
 
-            # Add entries to leaderboard
-            for rank, ranking in enumerate(rankings, 1):
-                # Check privacy settings
-                user_profile = ranking.get('user_profile', [{}])[0]
-                privacy_settings = user_profile.get('preferences', {}).get('privacy', {})
+            # Build entries (skipping users who opted out), then rank them once
+            entries = [
+                self._build_entry(ranking, leaderboard.leaderboard_type, rank)
+                for rank, ranking in enumerate(rankings, 1)
+                if self._participates(ranking)
+            ]
 
-                if not privacy_settings.get('leaderboard_participation', True):
-                    continue  # Skip users who opted out
+            entries.sort(key=lambda entry: entry.score, reverse=True)
+            for rank, entry in enumerate(entries, 1):
+                entry.update_rank(rank)
 
-                display_name = user_profile.get('social_profile', {}).get('display_name')
-                if not display_name:
-                    display_name = user_profile.get('first_name', 'Unknown User')
+            leaderboard.entries = entries
+            leaderboard._update_metadata()
+            leaderboard.last_updated = datetime.utcnow()
 
-                entry = LeaderboardEntry(
-                    user_id=str(ranking['user_id']),
-                    score=ranking.get('impact_score', ranking.get('score', 0)),
-                    rank=rank,
-                    display_name=display_name,
-                    user_data={
-                        'avatar_url': None,
-                        'level': 1,
-                        'badge_count': 0,
-                        'join_date': user_profile.get('created_at')
-                    },
-                    score_components=self._get_score_components(ranking, leaderboard.leaderboard_type)
-                )
+            # Update leaderboard in database
+            success = self.leaderboard_repo.update_leaderboard(leaderboard)
+            if success:
+                self.page_cache.invalidate(leaderboard.leaderboard_type, leaderboard.period)
 
-                leaderboard.add_entry(entry)
+                # Users below a truncated query's last row were never seen
+                score_field = self.SCORE_FIELDS[leaderboard.leaderboard_type]
+                floor = (rankings[-1].get(score_field) or 0) if len(rankings) >= self.TOP_K else None
 
-            # Update leaderboard in database
-            return self.leaderboard_repo.update_leaderboard(leaderboard)
+                index = TopKIndex(self.TOP_K)
+                index.load(((entry.user_id, entry.score) for entry in entries),
+                           leaderboard.version, synced_at=synced_at, floor=floor)
+                with self._top_k_lock:
+                    self._top_k_indexes[(leaderboard.leaderboard_type, leaderboard.period)] = index
+
+            return success
 
         except Exception as e:
             current_app.logger.error(f"Error updating leaderboard data: {str(e)}")
             return False
 
+    def _get_top_k_index(self, leaderboard_type: str, period: str) -> Optional[TopKIndex]:
+        """Get this worker's top-K index, seeding it from stored entries if needed"""
+        key = (leaderboard_type, period)
+        with self._top_k_lock:
+            index = self._top_k_indexes.get(key)
+        if index is not None and not index.incomplete:
+            return index
+
+        leaderboard = self.leaderboard_repo.find_by_type_and_period(leaderboard_type, period)
+        if not leaderboard:
+            return None
+
+        # Without a sync time the next scheduled refresh rebuilds it fully
+        index = TopKIndex(self.TOP_K)
+        index.load(
+            ((str(row['user_id']), row['score'])
+             for row in self.leaderboard_repo.entry_repo.get_top_scores(leaderboard_type, period, self.TOP_K)),
+            leaderboard.version
+        )
+        with self._top_k_lock:
+            self._top_k_indexes[key] = index
+        return index
+
+    def _apply_top_k_rows(self, leaderboard_type: str, period: str,
+                          index: TopKIndex, rankings: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Offer score rows to a top-K index and write only the entries that changed
+
+        The lock is held only while the in-memory index changes; the entry
+        writes run outside it so updates to other leaderboards are not queued
+        behind this one's Mongo round trips.
+
+        Returns:
+            Optional[int]: Number of entries written or removed, None if the
+            leaderboard no longer exists
+        """
+        score_field = self.SCORE_FIELDS[leaderboard_type]
+        changed = {}
+        removals = set()
+
+        with self._top_k_lock:
+            for ranking in rankings:
+                user_id = str(ranking['user_id'])
+
+                if not self._participates(ranking):
+                    if index.discard(user_id):
+                        changed.pop(user_id, None)
+                        removals.add(user_id)
+                    continue
+
+                member_changed, evicted = index.offer(user_id, ranking.get(score_field) or 0)
+                if member_changed:
+                    changed[user_id] = ranking
+                    removals.discard(user_id)
+                if evicted:
+                    changed.pop(evicted, None)
+                    removals.add(evicted)
+
+            if not changed and not removals:
+                return 0
+
+            size = len(index)
+            expected_version = index.version
+            metadata = Leaderboard.summarize_scores(list(index.scores().values()))
+
+        upserts = [
+            self._build_entry(ranking, leaderboard_type, rank=size)
+            for ranking in changed.values()
+        ]
+
+        version = self.leaderboard_repo.apply_entry_changes(
+            leaderboard_type, period, upserts, list(removals), metadata
+        )
+
+        with self._top_k_lock:
+            if version is None:
+                self._top_k_indexes.pop((leaderboard_type, period), None)
+                return None
+
+            # Another writer committed in between; its changes are not in this index
+            if expected_version is not None and version != expected_version + 1:
+                index.incomplete = True
+            index.version = max(version, index.version or 0)
+
+        self.page_cache.invalidate(leaderboard_type, period)
+        return len(upserts) + len(removals)
+
+    def _is_activity_windowed(self, leaderboard_type: str, period: str) -> bool:
+        """Check whether membership depends on recent activity (not just score)"""
+        return (leaderboard_type == Leaderboard.WEEKLY_WARRIORS or
+                (leaderboard_type == Leaderboard.GLOBAL_IMPACT and period == 'weekly'))
+
+    def _participates(self, ranking: Dict[str, Any]) -> bool:
+        """Check a ranking row's leaderboard participation setting"""
+        user_profile = (ranking.get('user_profile') or [{}])[0]
+        privacy_settings = user_profile.get('preferences', {}).get('privacy', {})
+        return privacy_settings.get('leaderboard_participation', True)
+
+    def _build_entry(self, ranking: Dict[str, Any], leaderboard_type: str,
+                     rank: int) -> LeaderboardEntry:
+        """Build a leaderboard entry from a ranking row"""
+        user_profile = (ranking.get('user_profile') or [{}])[0]
+
+        display_name = user_profile.get('social_profile', {}).get('display_name')
+        if not display_name:
+            display_name = user_profile.get('first_name', 'Unknown User')
+
+        return LeaderboardEntry(
+            user_id=str(ranking['user_id']),
+            score=ranking.get(self.SCORE_FIELDS[leaderboard_type]) or 0,
+            rank=rank,
+            display_name=display_name,
+            user_data={
+                'avatar_url': None,
+                'level': 1,
+                'badge_count': 0,
+                'join_date': user_profile.get('created_at')
+            },
+            score_components=self._get_score_components(ranking, leaderboard_type)
+        )
+
     def _get_global_impact_rankings(self, period: str) -> List[Dict[str, Any]]:
         """Get rankings for global impact leaderboard"""
         if period == 'weekly':
-            return self.impact_score_repo.get_weekly_active_users(weeks_back=1)
+            return self.impact_score_repo.get_weekly_active_users(weeks_back=1, limit=self.TOP_K)
         else:
-            return self.impact_score_repo.get_global_rankings(limit=1000)
+            return self.impact_score_repo.get_global_rankings(limit=self.TOP_K)
 
     def _get_gaming_masters_rankings(self, period: str) -> List[Dict[str, Any]]:
         """Get rankings for gaming masters leaderboard"""
-        return self.impact_score_repo.get_component_rankings('gaming', limit=1000)
+        return self.impact_score_repo.get_component_rankings('gaming', limit=self.TOP_K)
 
     def _get_social_champions_rankings(self, period: str) -> List[Dict[str, Any]]:
         """Get rankings for social champions leaderboard"""
-        return self.impact_score_repo.get_component_rankings('social', limit=1000)
+        return self.impact_score_repo.get_component_rankings('social', limit=self.TOP_K)
 
     def _get_donation_heroes_rankings(self, period: str) -> List[Dict[str, Any]]:
         """Get rankings for donation heroes leaderboard"""
-        return self.impact_score_repo.get_component_rankings('donation', limit=1000)
+        return self.impact_score_repo.get_component_rankings('donation', limit=self.TOP_K)
 
     def _get_weekly_warriors_rankings(self) -> List[Dict[str, Any]]:
         """Get rankings for weekly warriors leaderboard"""
-        return self.impact_score_repo.get_weekly_active_users(weeks_back=1)
+        return self.impact_score_repo.get_weekly_active_users(weeks_back=1, limit=self.TOP_K)
 
     def _get_score_components(self, ranking: Dict[str, Any],
                              leaderboard_type: str) -> Dict[str, Any]:
@@ -413,13 +675,49 @@ class LeaderboardService:
 
         return components
 
+    def _build_friend_members(self, member_ids: List[str]) -> List[Dict[str, Any]]:
+        """Build friends view rows (score snapshot and display data) for several users"""
+        scores = self.impact_score_repo.find_by_user_ids(member_ids)
+        profiles = {
+            str(profile['_id']): profile
+            for profile in self.user_repo.collection.find(
+                {'_id': {'$in': [ObjectId(member_id) for member_id in member_ids]}},
+                {'first_name': 1, 'social_profile.display_name': 1, 'created_at': 1}
+            )
+        }
+
+        members = []
+        for member_id in member_ids:
+            profile = profiles.get(member_id, {})
+            display_name = profile.get('social_profile', {}).get('display_name')
+            if not display_name:
+                display_name = profile.get('first_name', 'Unknown User')
+
+            impact_score = scores.get(member_id)
+            snapshot = (
+                FriendsRankingRepository.score_snapshot(impact_score) if impact_score
+                else dict.fromkeys(FriendsRankingRepository.SCORE_FIELDS)
+            )
+
+            members.append(dict(
+                snapshot,
+                member_id=ObjectId(member_id),
+                display_name=display_name,
+                join_date=profile.get('created_at')
+            ))
+
+        return members
+
     def _get_user_position(self, leaderboard: Leaderboard, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user's position in leaderboard"""
-        entry = leaderboard.get_entry_by_user_id(user_id)
+        entry = self.leaderboard_repo.entry_repo.find_entry(
+            leaderboard.leaderboard_type, leaderboard.period, user_id
+        )
         if not entry:
             return None
 
-        percentile = leaderboard.get_user_percentile(user_id)
+        total = leaderboard.metadata.get('total_participants', 0)
+        percentile = round((total - entry.rank + 1) / total * 100, 2) if total else None
 
         return {
             'rank': entry.rank,
@@ -432,11 +730,14 @@ class LeaderboardService:
     def _remove_user_from_all_leaderboards(self, user_id: str):
         """Remove user from all leaderboards (privacy opt-out)"""
         try:
-            for leaderboard_type in Leaderboard.VALID_TYPES:
-                for period in Leaderboard.VALID_PERIODS:
-                    self.leaderboard_repo.remove_entry_from_leaderboard(
-                        leaderboard_type, period, user_id
-                    )
+            boards = self.leaderboard_repo.remove_user_from_leaderboards(user_id)
+
+            with self._top_k_lock:
+                for index in self._top_k_indexes.values():
+                    index.discard(user_id)
+
+            for leaderboard_type, period in boards:
+                self.page_cache.invalidate(leaderboard_type, period)
 
             current_app.logger.info(f"Removed user {user_id} from all leaderboards")
 
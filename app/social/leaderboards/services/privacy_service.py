@@ -5,6 +5,7 @@ from bson import ObjectId
 from app.core.repositories.user_repository import UserRepository
 from ..repositories.impact_score_repository import ImpactScoreRepository
 from ..repositories.leaderboard_repository import LeaderboardRepository
+from .leaderboard_cache import leaderboard_page_cache
 from ..models.leaderboard import Leaderboard
 
 
@@ -351,12 +352,7 @@ class PrivacyService:
         """Remove user from all leaderboards"""
         removed_count = 0
         try:
-            for leaderboard_type in Leaderboard.VALID_TYPES:
-                for period in Leaderboard.VALID_PERIODS:
-                    if self.leaderboard_repo.remove_entry_from_leaderboard(
-                        leaderboard_type, period, user_id
-                    ):
-                        removed_count += 1
+            removed_count = self._invalidate_pages(self.leaderboard_repo.remove_user_from_leaderboards(user_id))
         except Exception as e:
             current_app.logger.error(f"Error removing user {user_id} from leaderboards: {str(e)}")
 
@@ -369,17 +365,20 @@ class PrivacyService:
             # Remove from public leaderboards (not friends leaderboard)
             public_types = [t for t in Leaderboard.VALID_TYPES if t != Leaderboard.FRIENDS_CIRCLE]
 
-            for leaderboard_type in public_types:
-                for period in Leaderboard.VALID_PERIODS:
-                    if self.leaderboard_repo.remove_entry_from_leaderboard(
-                        leaderboard_type, period, user_id
-                    ):
-                        removed_count += 1
+            removed_count = self._invalidate_pages(
+                self.leaderboard_repo.remove_user_from_leaderboards(user_id, public_types)
+            )
         except Exception as e:
             current_app.logger.error(f"Error removing user {user_id} from public leaderboards: {str(e)}")
 
         return removed_count
 
+    def _invalidate_pages(self, boards: List[Tuple[str, str]]) -> int:
+        """Evict this worker's cached pages of the leaderboards a user left"""
+        for leaderboard_type, period in boards:
+            leaderboard_page_cache.invalidate(leaderboard_type, period)
+        return len(boards)
+
     def _add_user_to_relevant_leaderboards(self, user_id: str):
         """Add user back to relevant leaderboards when opting in"""
         try:
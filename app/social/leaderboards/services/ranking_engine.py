@@ -1,11 +1,12 @@
 from typing import Dict, Any, Optional, Tuple, List
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from flask import current_app
 import threading
 import time
 
 from ..repositories.impact_score_repository import ImpactScoreRepository
 from ..repositories.leaderboard_repository import LeaderboardRepository
+from ..repositories.ranking_event_repository import RankingEventRepository
 from .impact_calculator import ImpactCalculator
 from .leaderboard_service import LeaderboardService
 
@@ -21,8 +22,15 @@ class RankingEngine:
     - Performance optimization for large datasets
     """
 
+    # Events for the same user within this window are coalesced into one update
+    SCORE_UPDATE_DEBOUNCE_SECONDS = 10
+
+    # Users recalculated per calculate_impact_scores call during scheduled updates
+    STALE_SCORE_BATCH_SIZE = 200
+
     def __init__(self):
         self.impact_score_repo = ImpactScoreRepository()
+        self.ranking_event_repo = RankingEventRepository()
         self.leaderboard_repo = LeaderboardRepository()
         self.impact_calculator = ImpactCalculator()
         self.leaderboard_service = LeaderboardService()
@@ -35,7 +43,10 @@ class RankingEngine:
     def trigger_user_score_update(self, user_id: str, activity_type: str,
                                  activity_data: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
         """
-        Trigger real-time score update for user based on activity
+        Trigger score update for user based on activity
+
+        The recalculation is queued in the ranking outbox and performed by
+        the ranking worker; it only runs inline when no outbox is available.
 
         Args:
             user_id: User ID who performed the activity
@@ -48,6 +59,30 @@ class RankingEngine:
         try:
             current_app.logger.info(f"Triggering score update for user {user_id}, activity: {activity_type}")
 
+            if self._queue_leaderboard_updates(user_id, activity_type):
+                return True, "Score update queued"
+
+            return self.process_user_score_update(user_id, [activity_type])
+
+        except Exception as e:
+            current_app.logger.error(f"Error triggering score update for user {user_id}: {str(e)}")
+            return False, "Failed to trigger score update"
+
+    def process_user_score_update(self, user_id: str,
+                                  activity_types: Optional[List[str]] = None) -> Tuple[bool, str]:
+        """
+        Recalculate a user's impact score and refresh their rankings
+
+        Args:
+            user_id: User ID to recalculate
+            activity_types: Activity types coalesced into this update
+
+        Returns:
+            Tuple of (success, message)
+        """
+        try:
+            previous = self.impact_score_repo.find_by_user_id(user_id)
+
             # Update impact score
             success, message, impact_score = self.impact_calculator.calculate_user_impact_score(
                 user_id, force_recalculate=True
@@ -56,21 +91,33 @@ class RankingEngine:
             if not success:
                 return False, f"Failed to update impact score: {message}"
 
-            # Update relevant leaderboards asynchronously
-            self._queue_leaderboard_updates(user_id, impact_score, activity_type)
-
-            return True, "Score update triggered successfully"
+            # Update user's ranking positions on the leaderboards whose score changed
+            changed_fields = None
+            if previous is not None and impact_score is not None:
+                changed_fields = [
+                    field_name for field_name in set(self.leaderboard_service.SCORE_FIELDS.values())
+                    if getattr(previous, field_name) != getattr(impact_score, field_name)
+                ]
+            self.update_user_rankings(user_id, changed_fields)
+
+            current_app.logger.debug(
+                f"Processed score update for user {user_id} (activities: {', '.join(activity_types or [])})"
+            )
+            return True, "Score update processed successfully"
 
         except Exception as e:
-            current_app.logger.error(f"Error triggering score update for user {user_id}: {str(e)}")
-            return False, "Failed to trigger score update"
+            current_app.logger.error(f"Error processing score update for user {user_id}: {str(e)}")
+            return False, "Failed to process score update"
 
-    def update_user_rankings(self, user_id: str) -> Tuple[bool, str, Dict[str, int]]:
+    def update_user_rankings(self, user_id: str,
+                             changed_fields: Optional[List[str]] = None) -> Tuple[bool, str, Dict[str, int]]:
         """
         Update user's positions across all leaderboards
 
         Args:
             user_id: User ID to update rankings for
+            changed_fields: Score fields that changed; only leaderboards ranked
+                by them are updated (all of them when None)
 
         Returns:
             Tuple of (success, message, ranking_updates)
@@ -99,7 +146,7 @@ class RankingEngine:
             self.impact_score_repo.update_impact_score(impact_score)
 
             # Update leaderboard entries
-            self._update_user_leaderboard_entries(user_id, impact_score)
+            self._update_user_leaderboard_entries(user_id, impact_score, changed_fields)
 
             return True, "User rankings updated successfully", updates
 
@@ -107,10 +154,13 @@ class RankingEngine:
             current_app.logger.error(f"Error updating rankings for user {user_id}: {str(e)}")
             return False, "Failed to update user rankings", {}
 
-    def run_scheduled_updates(self) -> Tuple[bool, str, Dict[str, Any]]:
+    def run_scheduled_updates(self, server_side_ranking: bool = False) -> Tuple[bool, str, Dict[str, Any]]:
         """
         Run scheduled batch updates for all rankings
 
+        Args:
+            server_side_ranking: Materialize ranks with $setWindowFields + $merge
+
         Returns:
             Tuple of (success, message, update_stats)
         """
@@ -118,8 +168,21 @@ class RankingEngine:
             current_app.logger.info("Starting scheduled ranking updates")
             start_time = datetime.now(timezone.utc)
 
+            # Refresh stale impact scores a batch at a time
+            stale_user_ids = self.impact_score_repo.get_stale_scores(hours_threshold=24)
+            stale_refreshed = 0
+
+            for offset in range(0, len(stale_user_ids), self.STALE_SCORE_BATCH_SIZE):
+                batch = stale_user_ids[offset:offset + self.STALE_SCORE_BATCH_SIZE]
+                stale_refreshed += len(self.impact_calculator.calculate_impact_scores(batch))
+
             # Update all impact score rankings
-            ranking_updates = self.impact_score_repo.update_rankings()
+            ranking_stats = self.impact_score_repo.materialize_rankings(server_side=server_side_ranking)
+            ranking_updates = ranking_stats['global_ranked']
+            current_app.logger.info(
+                f"Materialized {ranking_stats['global_ranked']} global and {ranking_stats['weekly_ranked']} weekly "
+                f"ranks in {ranking_stats['duration_seconds']}s ({ranking_stats['ranks_per_second']} ranks/s)"
+            )
 
             # Refresh stale leaderboards
             stale_leaderboards = self.leaderboard_repo.get_stale_leaderboards(hours_threshold=1)
@@ -141,6 +204,8 @@ class RankingEngine:
 
             stats = {
                 'ranking_updates': ranking_updates,
+                'ranking_stats': ranking_stats,
+                'stale_scores_refreshed': stale_refreshed,
                 'leaderboard_updates': leaderboard_updates,
                 'execution_time_seconds': execution_time,
                 'timestamp': start_time.isoformat()
@@ -314,29 +379,26 @@ class RankingEngine:
             except Exception as e:
                 current_app.logger.error(f"Error in background update worker: {str(e)}")
 
-    def _queue_leaderboard_updates(self, user_id: str, impact_score, activity_type: str):
-        """Queue leaderboard updates for user (async processing)"""
+    def _queue_leaderboard_updates(self, user_id: str, activity_type: str) -> bool:
+        """Queue score and leaderboard updates for user in the ranking outbox"""
         try:
-            # This would typically use a task queue like Celery
-            # For now, we'll do direct updates for critical leaderboards
-
-            # Update user's ranking positions
-            self.update_user_rankings(user_id)
+            queued = self.ranking_event_repo.enqueue(
+                user_id, activity_type, self.SCORE_UPDATE_DEBOUNCE_SECONDS
+            )
 
-            current_app.logger.debug(f"Queued leaderboard updates for user {user_id}")
+            if queued:
+                current_app.logger.debug(f"Queued leaderboard updates for user {user_id}")
+            return queued
 
         except Exception as e:
             current_app.logger.error(f"Error queuing leaderboard updates: {str(e)}")
+            return False
 
     def _calculate_global_rank(self, user_id: str, user_score: float) -> Optional[int]:
         """Calculate user's global rank"""
         try:
-            # Count users with higher scores
-            higher_score_count = self.impact_score_repo.count({
-                'impact_score': {'$gt': user_score}
-            })
-
-            return higher_score_count + 1
+            # O(log n) lookup against the worker's rank index
+            return self.impact_score_repo.get_global_rank(user_score)
 
         except Exception as e:
             current_app.logger.error(f"Error calculating global rank for user {user_id}: {str(e)}")
@@ -345,60 +407,38 @@ class RankingEngine:
     def _calculate_weekly_rank(self, user_id: str, user_score: float) -> Optional[int]:
         """Calculate user's weekly rank"""
         try:
-            # Get active users from last week
-            cutoff_date = datetime.now(timezone.utc) - timedelta(weeks=1)
-
-            # Count active users with higher scores
-            higher_score_count = self.impact_score_repo.count({
-                'impact_score': {'$gt': user_score},
-                'last_calculated': {'$gte': cutoff_date}
-            })
-
-            return higher_score_count + 1
+            # Ranked among users active in the last week
+            return self.impact_score_repo.get_weekly_rank(user_score)
 
         except Exception as e:
             current_app.logger.error(f"Error calculating weekly rank for user {user_id}: {str(e)}")
             return None
 
-    def _update_user_leaderboard_entries(self, user_id: str, impact_score):
-        """Update user's entries in all relevant leaderboards"""
-        try:
-            from ..models.leaderboard import Leaderboard
-            from ..models.leaderboard_entry import LeaderboardEntry
+    def _update_user_leaderboard_entries(self, user_id: str, impact_score,
+                                         changed_fields: Optional[List[str]] = None):
+        """Offer a user's new scores to the top-K of the leaderboards ranked by changed_fields"""
+        if changed_fields is not None and not changed_fields:
+            return
 
-            # Get user data for display
-            user = self.impact_score_repo.user_repo.find_by_id(user_id)
+        try:
+            # Get user data for display and privacy settings
+            user = self.leaderboard_service.user_repo.find_by_id(user_id)
             if not user:
                 return
 
-            display_name = user.get('social_profile', {}).get('display_name')
-            if not display_name:
-                display_name = user.get('first_name', 'Unknown User')
-
-            # Create leaderboard entry
-            entry = LeaderboardEntry(
-                user_id=user_id,
-                score=impact_score.impact_score,
-                rank=1,  # Will be recalculated
-                display_name=display_name,
-                score_components={
-                    'gaming': impact_score.gaming_component,
-                    'social': impact_score.social_component,
-                    'donation': impact_score.donation_component
-                }
-            )
-
-            # Update relevant leaderboards
-            relevant_types = [
-                Leaderboard.GLOBAL_IMPACT,
-                Leaderboard.WEEKLY_WARRIORS
-            ]
+            ranking = {
+                'user_id': user_id,
+                'impact_score': impact_score.impact_score,
+                'gaming_component': impact_score.gaming_component,
+                'social_component': impact_score.social_component,
+                'donation_component': impact_score.donation_component,
+                'gaming_details': impact_score.gaming_details,
+                'social_details': impact_score.social_details,
+                'donation_details': impact_score.donation_details,
+                'user_profile': [user]
+            }
 
-            for leaderboard_type in relevant_types:
-                for period in Leaderboard.VALID_PERIODS:
-                    self.leaderboard_repo.add_entry_to_leaderboard(
-                        leaderboard_type, period, entry
-                    )
+            self.leaderboard_service.apply_score_updates([ranking], changed_fields)
 
         except Exception as e:
             current_app.logger.error(f"Error updating leaderboard entries for user {user_id}: {str(e)}")
@@ -450,9 +490,8 @@ class RankingEngine:
     def _optimize_leaderboard_storage(self) -> int:
         """Optimize leaderboard data storage"""
         try:
-            # This would optimize leaderboard storage
-            # Implementation depends on specific optimization strategies
-            return 0  # Placeholder
+            # Move entries embedded by earlier versions to leaderboard_entries
+            return self.leaderboard_repo.migrate_embedded_entries()
 
         except Exception as e:
             current_app.logger.error(f"Error optimizing leaderboard storage: {str(e)}")
@@ -0,0 +1,165 @@
+"""
+Ranking outbox worker
+
+Drains the ranking event outbox filled by RankingEngine.trigger_user_score_update
+and performs the impact score recalculation outside the request thread.
+
+Usage:
+    python -m app.social.leaderboards.services.ranking_worker --concurrency 4
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+from typing import Dict, Any, Optional
+
+from ..repositories.ranking_event_repository import RankingEventRepository
+from .ranking_engine import RankingEngine
+
+
+class RankingEventWorker:
+    """
+    Pool of threads claiming and processing ranking outbox events
+
+    Claims are atomic, so any number of worker processes can run against
+    the same outbox.
+    """
+
+    # Seconds a claimed event stays locked before another worker may retry it
+    LEASE_SECONDS = 120
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY_SECONDS = 30
+
+    def __init__(self, app, concurrency: int = 4, poll_interval: float = 1.0):
+        """
+        Initialize RankingEventWorker
+
+        Args:
+            app: Flask application providing config, database and logger
+            concurrency: Number of consumer threads
+            poll_interval: Seconds to wait when the outbox has no due events
+        """
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.stats = {'processed': 0, 'failed': 0, 'coalesced_events': 0}
+
+        with app.app_context():
+            self.event_repo = RankingEventRepository()
+            self.ranking_engine = RankingEngine()
+
+    def run(self):
+        """Start consumer threads and block until stopped"""
+        self.app.logger.info(
+            f"Ranking worker {self.worker_id} starting with {self.concurrency} threads"
+        )
+
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._consume_loop,
+                name=f"ranking-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        for thread in self._threads:
+            thread.join()
+
+        self.app.logger.info(f"Ranking worker {self.worker_id} stopped: {self.stats}")
+
+    def stop(self, *_args):
+        """Ask consumer threads to exit after their current event"""
+        self._stop_event.set()
+
+    def run_once(self, max_events: Optional[int] = None) -> int:
+        """
+        Process due events on the calling thread until the outbox is drained
+
+        Returns:
+            int: Number of events processed
+        """
+        processed = 0
+        with self.app.app_context():
+            while max_events is None or processed < max_events:
+                if not self._process_next():
+                    break
+                processed += 1
+        return processed
+
+    # Private methods
+
+    def _consume_loop(self):
+        with self.app.app_context():
+            while not self._stop_event.is_set():
+                try:
+                    if not self._process_next():
+                        self._stop_event.wait(self.poll_interval)
+                except Exception as e:
+                    self.app.logger.error(f"Error in ranking worker loop: {str(e)}")
+                    self._stop_event.wait(self.poll_interval)
+
+    def _process_next(self) -> bool:
+        """Claim and process one event; returns False when none is due"""
+        event = self.event_repo.claim_next(self.worker_id, self.LEASE_SECONDS)
+        if not event:
+            return False
+
+        user_id = str(event['user_id'])
+        success, message = self.ranking_engine.process_user_score_update(
+            user_id, event.get('activity_types', [])
+        )
+
+        if success:
+            self.event_repo.complete(event['_id'])
+            self._record('processed', event)
+        else:
+            will_retry = self.event_repo.fail(
+                event, message, self.MAX_ATTEMPTS, self.RETRY_DELAY_SECONDS
+            )
+            self._record('failed', event)
+            if not will_retry:
+                self.app.logger.error(f"Giving up on score update for user {user_id}: {message}")
+
+        return True
+
+    def _record(self, outcome: str, event: Dict[str, Any]):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+            self.stats['coalesced_events'] += event.get('event_count', 1)
+
+
+def main(argv=None):
+    """CLI entry point for the ranking worker"""
+    parser = argparse.ArgumentParser(description="Process queued impact score and ranking updates")
+    parser.add_argument('--concurrency', type=int, default=4, help="Number of consumer threads")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Seconds to wait when no events are due")
+    parser.add_argument('--drain', action='store_true',
+                        help="Process all due events once and exit")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    worker = RankingEventWorker(app, concurrency=args.concurrency, poll_interval=args.poll_interval)
+
+    if args.drain:
+        processed = worker.run_once()
+        app.logger.info(f"Drained {processed} ranking events")
+        return
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
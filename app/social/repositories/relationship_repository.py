@@ -1,4 +1,5 @@
 from typing import Optional, List, Dict, Any
+from datetime import datetime
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
 from app.core.repositories.base_repository import BaseRepository
@@ -217,6 +218,64 @@ class RelationshipRepository(BaseRepository):
 
         return self.count(filter_dict)
 
+    def get_social_stats_by_users(self, user_ids: List[str], since: datetime) -> Dict[str, Dict[str, Any]]:
+        """
+        Get friend counts and recent daily relationship activity for several users
+
+        Runs a single aggregation whose $facet branches group accepted
+        friendships from both sides and relationships updated since `since`
+        by user and UTC day.
+
+        Returns:
+            Dict keyed by user ID: {'friend_count': int, 'recent_by_day': {day: count}}
+        """
+        if not user_ids:
+            return {}
+
+        object_ids = [ObjectId(user_id) for user_id in user_ids]
+        accepted_friend = {
+            "relationship_type": UserRelationship.FRIEND,
+            "status": UserRelationship.ACCEPTED
+        }
+
+        pipeline = [
+            {"$match": {"$or": [
+                {"user_id": {"$in": object_ids}},
+                {"target_user_id": {"$in": object_ids}}
+            ]}},
+            {"$facet": {
+                "friends_as_user": [
+                    {"$match": dict(accepted_friend, user_id={"$in": object_ids})},
+                    {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+                ],
+                "friends_as_target": [
+                    {"$match": dict(accepted_friend, target_user_id={"$in": object_ids})},
+                    {"$group": {"_id": "$target_user_id", "count": {"$sum": 1}}}
+                ],
+                "recent": [
+                    {"$match": {"user_id": {"$in": object_ids}, "updated_at": {"$gte": since}}},
+                    {"$group": {
+                        "_id": {
+                            "user_id": "$user_id",
+                            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$updated_at"}}
+                        },
+                        "count": {"$sum": 1}
+                    }}
+                ]
+            }}
+        ]
+
+        stats = {str(user_id): {'friend_count': 0, 'recent_by_day': {}} for user_id in object_ids}
+        result = next(iter(self.collection.aggregate(pipeline)), {})
+
+        for row in result.get("friends_as_user", []) + result.get("friends_as_target", []):
+            stats[str(row["_id"])]['friend_count'] += row["count"]
+
+        for row in result.get("recent", []):
+            stats[str(row["_id"]["user_id"])]['recent_by_day'][row["_id"]["day"]] = row["count"]
+
+        return stats
+
     def get_pending_requests_count(self, user_id: str) -> int:
         """Get count of pending friend requests for user"""
         filter_dict = {
@@ -117,6 +117,9 @@ class RelationshipService:
             # Update friends count for both users
             self._update_friends_count(str(relationship.user_id))
             self._update_friends_count(str(relationship.target_user_id))
+            self._notify_relationship_change(
+                str(relationship.user_id), str(relationship.target_user_id), 'friend_added'
+            )
 
             current_app.logger.info(f"Friend request {relationship_id} accepted successfully")
 
@@ -209,6 +212,7 @@ class RelationshipService:
             # Update friends count for both users
             self._update_friends_count(user_id)
             self._update_friends_count(friend_user_id)
+            self._notify_relationship_change(user_id, friend_user_id, 'friend_removed')
 
             current_app.logger.info(f"Friendship between {user_id} and {friend_user_id} removed")
 
@@ -252,6 +256,7 @@ class RelationshipService:
                 # Update friends count
                 self._update_friends_count(user_id)
                 self._update_friends_count(target_user_id)
+                self._notify_relationship_change(user_id, target_user_id, 'friend_removed')
 
             # Create block relationship
             relationship = UserRelationship(
@@ -548,4 +553,12 @@ class RelationshipService:
             friends_count = self.relationship_repository.get_friends_count(user_id)
             self.user_repository.update_social_profile(user_id, {"friends_count": friends_count})
         except Exception as e:
-            current_app.logger.error(f"Error updating friends count for user {user_id}: {str(e)}")
\ No newline at end of file
+            current_app.logger.error(f"Error updating friends count for user {user_id}: {str(e)}")
+
+    def _notify_relationship_change(self, user_id: str, target_user_id: str, change: str):
+        """Notify leaderboard integration hooks of a friendship change"""
+        try:
+            from app.social.leaderboards.integration.hooks import trigger_relationship_changed
+            trigger_relationship_changed(user_id, target_user_id, change)
+        except Exception as e:
+            current_app.logger.error(f"Error notifying relationship change for user {user_id}: {str(e)}")
@@ -200,6 +200,10 @@ def test_utils():
 # Register all Factory-Boy factories with pytest-factoryboy
 def pytest_configure(config):
     """Configure pytest with Factory-Boy integration"""
+    config.addinivalue_line(
+        "markers", "performance: benchmark tests, run only with RUN_PERFORMANCE_TESTS=true"
+    )
+
     # Import and register all factories for pytest-factoryboy
     try:
         import pytest_factoryboy
@@ -245,6 +249,17 @@ def pytest_configure(config):
         pass
 
 
+def pytest_collection_modifyitems(config, items):
+    """Skip performance benchmarks unless RUN_PERFORMANCE_TESTS=true"""
+    if os.getenv('RUN_PERFORMANCE_TESTS', 'false').lower() == 'true':
+        return
+
+    skip_performance = pytest.mark.skip(reason="set RUN_PERFORMANCE_TESTS=true to run benchmarks")
+    for item in items:
+        if item.get_closest_marker("performance"):
+            item.add_marker(skip_performance)
+
+
 # Direct factory fixtures for manual usage
 @pytest.fixture
 def user_factory():
@@ -7,14 +7,19 @@ with BaseGameTest for comprehensive challenges system testing.
 import os
 import sys
 from bson import ObjectId
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tests.core.base_game_test import BaseGameTest
+from tests.core.base_service_test import ServiceTestMixin
 from app.games.challenges.services.challenge_service import ChallengeService
 from app.games.challenges.repositories.challenge_repository import ChallengeRepository
+from app.games.challenges.services.matchmaking_pool import GamePlayerPool, MatchmakingPool
+from app.games.challenges.services.matchmaking_service import MatchmakingService
+from app.games.challenges.services.matchmaking_worker import MatchmakingWorker
 
 
 class TestChallengeSystemGOO35(BaseGameTest):
@@ -233,4 +238,197 @@ class TestChallengeRepositoryGOO35(BaseGameTest):
         self.assertIsNotNone(challenge_data['created_at'])
         self.assertEqual(challenge_data['metadata']['time_limit'], 300)
         self.assertEqual(challenge_data['metadata']['rounds'], 3)
-        self.assertEqual(challenge_data['metadata']['difficulty_modifier'], 1.2)
\ No newline at end of file
+        self.assertEqual(challenge_data['metadata']['difficulty_modifier'], 1.2)
+
+
+class TestMatchmakingOpponentSearch(BaseGameTest):
+    """Test opponent search over the per-game rating pool"""
+    service_class = MatchmakingService
+    repository_dependencies = ['matchmaking_pool']
+
+    def setUp(self):
+        super().setUp()
+        self.mock_session_repository = MagicMock()
+        self.mock_participant_repository = MagicMock()
+        self.pool = MatchmakingPool(session_repository=self.mock_session_repository,
+                                    participant_repository=self.mock_participant_repository)
+
+    def _seed_players(self, players, totals):
+        """Serve the recent players of a game and their challenge totals to the pool"""
+        self.mock_session_repository.get_recent_players_by_game.return_value = players
+        self.mock_participant_repository.get_users_challenge_totals.side_effect = (
+            lambda user_ids, days_back: {user_id: totals[user_id] for user_id in user_ids if user_id in totals}
+        )
+
+    @staticmethod
+    def _totals(average, completed=1, won=0):
+        return {'total_challenges': completed, 'completed_challenges': completed, 'won_challenges': won,
+                'score_total': average * completed, 'scored_challenges': completed}
+
+    def test_opponents_are_nearest_ratings_within_range(self):
+        played_at = datetime.utcnow() - timedelta(hours=1)
+        self._seed_players(
+            {'me': played_at, 'close': played_at, 'closer': played_at, 'far': played_at},
+            {'me': self._totals(50), 'close': self._totals(80), 'closer': self._totals(40, won=1),
+             'far': self._totals(500)}
+        )
+
+        opponents = self.pool.find_opponents('me', 'g1', skill_range=100, limit=10)
+
+        assert [opponent['user_id'] for opponent in opponents] == ['closer', 'close']
+        assert opponents[0]['skill_difference'] == 10
+        assert opponents[0]['win_rate'] == 100
+        assert opponents[0]['last_played'] == played_at.isoformat()
+
+    def test_unbounded_range_returns_each_player_once(self):
+        played_at = datetime.utcnow() - timedelta(hours=1)
+        pool = GamePlayerPool()
+        pool.rebuild({'a': (10, played_at), 'b': (20, played_at), 'c': (40, played_at)})
+
+        found = pool.nearest(15, 10, float('inf'), set(), played_at - timedelta(days=1))
+
+        assert found == ['a', 'b', 'c']
+
+    def test_pool_is_built_once_with_batched_stats(self):
+        played_at = datetime.utcnow() - timedelta(hours=1)
+        self._seed_players({'me': played_at, 'opponent': played_at},
+                           {'me': self._totals(50), 'opponent': self._totals(60)})
+
+        self.pool.find_opponents('me', 'g1')
+        self.pool.find_opponents('me', 'g1')
+
+        assert self.mock_session_repository.get_recent_players_by_game.call_count == 1
+        assert self.mock_participant_repository.get_users_challenge_totals.call_count == 1
+        self.mock_participant_repository.get_user_challenge_stats.assert_not_called()
+
+    def test_recorded_results_move_players_in_the_pool(self):
+        played_at = datetime.utcnow() - timedelta(hours=1)
+        self._seed_players({'me': played_at, 'opponent': played_at},
+                           {'me': self._totals(50), 'opponent': self._totals(60), 'newcomer': self._totals(55)})
+        self.pool.find_opponents('me', 'g1')
+
+        self.pool.record_session('g1', 'newcomer')
+        self.pool.record_challenge_result('opponent', 260)
+
+        opponents = self.pool.find_opponents('me', 'g1', skill_range=100)
+        assert [opponent['user_id'] for opponent in opponents] == ['newcomer']
+
+    def test_service_delegates_to_pool(self):
+        self.service.matchmaking_pool.find_opponents.return_value = [{'user_id': 'opponent'}]
+
+        opponents = self.service._find_potential_opponents('me', 'g1')
+
+        assert opponents == [{'user_id': 'opponent'}]
+        self.service.matchmaking_pool.find_opponents.assert_called_once_with('me', 'g1', 100, 10)
+
+
+class TestQuickMatchQueue(ServiceTestMixin, BaseGameTest):
+    """Test the quick match ticket queue and its pairing tick"""
+    service_class = MatchmakingService
+    repository_dependencies = ['game_repository', 'matchmaking_pool', 'ticket_repository']
+
+    def setUp(self):
+        super().setUp()
+        self.service.ticket_repository.STATUS_WAITING = 'waiting'
+        self.service.ticket_repository.STATUS_PAIRING = 'pairing'
+        self.worker = MatchmakingWorker(self.app)
+        self.setup_service_mocks(self.worker, ['ticket_repo', 'challenge_service'])
+
+    @staticmethod
+    def _ticket(user_id, rating, waited_seconds, now):
+        return {'_id': ObjectId(), 'user_id': user_id, 'game_id': 'g1', 'rating': rating,
+                'enqueued_at': now - timedelta(seconds=waited_seconds)}
+
+    def test_pairs_nearest_ratings_inside_both_windows(self):
+        now = datetime.utcnow()
+        tickets = [
+            self._ticket('a', 100, 0, now),
+            self._ticket('b', 120, 0, now),
+            self._ticket('c', 135, 0, now),
+            self._ticket('d', 900, 0, now)
+        ]
+
+        pairs = MatchmakingWorker.pair_tickets(tickets, now)
+
+        assert [(a['user_id'], b['user_id']) for a, b in pairs] == [('a', 'b')]
+
+    def test_window_widens_with_wait(self):
+        now = datetime.utcnow()
+        gap = MatchmakingWorker.BASE_WINDOW + 10 * MatchmakingWorker.WINDOW_GROWTH_PER_SECOND
+        fresh = [self._ticket('a', 0, 0, now), self._ticket('b', gap, 0, now)]
+        waited = [self._ticket('a', 0, 11, now), self._ticket('b', gap, 11, now)]
+
+        assert MatchmakingWorker.pair_tickets(fresh, now) == []
+        assert len(MatchmakingWorker.pair_tickets(waited, now)) == 1
+
+    def test_longest_waiting_ticket_picks_first(self):
+        now = datetime.utcnow()
+        tickets = [
+            self._ticket('newer', 100, 1, now),
+            self._ticket('middle', 110, 1, now),
+            self._ticket('oldest', 118, 30, now)
+        ]
+
+        pairs = MatchmakingWorker.pair_tickets(tickets, now)
+
+        assert [(a['user_id'], b['user_id']) for a, b in pairs] == [('oldest', 'middle')]
+
+    def test_find_quick_match_queues_a_ticket(self):
+        self.service.game_repository.get_game_by_id.return_value = MagicMock(is_active=True, max_players=2)
+        self.service.matchmaking_pool.get_user_rating.return_value = 42
+        now = datetime.utcnow()
+        self.service.ticket_repository.enqueue.return_value = {
+            **self._ticket('me', 42, 0, now), 'status': 'waiting', 'expires_at': now
+        }
+
+        success, message, data = self.service.find_quick_match('me', 'g1')
+
+        assert success and message == "QUICK_MATCH_QUEUED"
+        assert data['ticket']['status'] == 'waiting'
+        self.service.ticket_repository.enqueue.assert_called_once_with(
+            'me', 'g1', 42, self.service.TICKET_TTL_SECONDS
+        )
+
+    def test_ticket_of_another_user_is_not_found(self):
+        self.service.ticket_repository.get_ticket.return_value = {'user_id': 'someone-else', 'status': 'waiting'}
+
+        success, message, _ = self.service.get_quick_match_ticket('me', str(ObjectId()))
+
+        assert not success and message == "MATCHMAKING_TICKET_NOT_FOUND"
+
+    def test_queued_ticket_answers_at_once_with_a_retry_hint(self):
+        now = datetime.utcnow()
+        self.service.ticket_repository.get_ticket.return_value = {
+            '_id': ObjectId(), 'user_id': 'me', 'game_id': 'g1', 'status': 'waiting', 'rating': 1000,
+            'enqueued_at': now, 'expires_at': now
+        }
+
+        success, _, data = self.service.get_quick_match_ticket('me', str(ObjectId()))
+
+        assert success
+        assert data['retry_after_seconds'] == MatchmakingWorker.TICK_SECONDS
+        self.service.ticket_repository.get_ticket.assert_called_once()
+
+    def test_pair_creates_accepted_challenge(self):
+        self.worker.ticket_repo.claim_for_pairing.return_value = True
+        self.worker.challenge_service.create_1v1_challenge.return_value = (
+            True, "CHALLENGE_CREATED_SUCCESSFULLY", {"challenge_id": "c1"}
+        )
+        now = datetime.utcnow()
+        ticket, opponent_ticket = self._ticket('a', 100, 5, now), self._ticket('b', 110, 1, now)
+
+        assert self.worker._create_match('g1', ticket, opponent_ticket)
+
+        self.worker.challenge_service.accept_challenge_invitation.assert_called_once_with('b', 'c1')
+        self.worker.ticket_repo.mark_matched.assert_any_call(ticket['_id'], 'c1', 'b')
+        self.worker.ticket_repo.mark_matched.assert_any_call(opponent_ticket['_id'], 'c1', 'a')
+
+    def test_pair_is_released_when_opponent_left_the_queue(self):
+        self.worker.ticket_repo.claim_for_pairing.side_effect = [True, False]
+        now = datetime.utcnow()
+        ticket, opponent_ticket = self._ticket('a', 100, 5, now), self._ticket('b', 110, 1, now)
+
+        assert not self.worker._create_match('g1', ticket, opponent_ticket)
+
+        self.worker.ticket_repo.release.assert_called_once_with(ticket['_id'])
+        self.worker.challenge_service.create_1v1_challenge.assert_not_called()
@@ -6,6 +6,7 @@ import pytest
 import os
 from unittest.mock import MagicMock, patch
 from datetime import datetime, timezone, timedelta
+from pymongo.errors import BulkWriteError
 
 # Set testing environment before importing app modules
 os.environ['TESTING'] = 'true'
@@ -13,6 +14,7 @@ os.environ['TESTING'] = 'true'
 from app.donations.models.wallet import Wallet
 from app.donations.models.transaction import Transaction, TransactionType, TransactionStatus, SourceType
 from app.donations.models.conversion_rate import ConversionRate, MultiplierType
+from app.donations.repositories.wallet_repository import WalletRepository
 from app.donations.services.credit_calculation_service import CreditCalculationService
 from app.donations.services.wallet_service import WalletService
 from app.donations.services.batch_processing_service import BatchProcessingService
@@ -22,6 +24,7 @@ from app.donations.services.tax_compliance_service import TaxComplianceService
 from app.donations.services.compliance_service import ComplianceService
 from app.donations.services.reconciliation_service import ReconciliationService
 from app.donations.services.financial_analytics_service import FinancialAnalyticsService
+from tests.core.base_donation_test import BaseDonationTest
 
 
 class TestWalletModel:
@@ -503,6 +506,79 @@ class TestWalletService:
         assert result is None
 
 
+class TestWalletCreditBatches(BaseDonationTest):
+    """Test bulk credit awards against mocked wallet and transaction repositories."""
+    service_class = WalletService
+    repository_dependencies = ['wallet_repo', 'transaction_repo']
+
+    def test_award_credits_bulk_success(self):
+        """Test bulk credit award writes one batch of transactions and wallet increments."""
+        self.service.wallet_repo.apply_credit_batch.return_value = (2, 0)
+        self.service.transaction_repo.find_pending_transaction_ids.return_value = [
+            "tournament:t1:user_1", "tournament:t1:user_2"
+        ]
+
+        success, message, result = self.service.award_credits_bulk(
+            [("user_1", 10.0, "tournament"), ("user_2", 5.0, "tournament"),
+             ("user_1", 2.5, "tournament"), ("user_3", 0, "tournament")],
+            batch_id="tournament:t1",
+            metadata={"tournament_id": "t1"}
+        )
+
+        assert success is True
+        assert message == "CREDITS_AWARDED_SUCCESS"
+        assert result['users_credited'] == 2
+        assert result['total_amount'] == 17.5
+
+        transactions = self.service.transaction_repo.insert_transactions_idempotent.call_args[0][0]
+        assert [t.transaction_id for t in transactions] == ["tournament:t1:user_1", "tournament:t1:user_2"]
+        assert transactions[0].amount == 12.5
+        assert transactions[0].metadata['batch_id'] == "tournament:t1"
+        self.service.wallet_repo.apply_credit_batch.assert_called_once_with(
+            {"user_1": 12.5, "user_2": 5.0}, "tournament:t1"
+        )
+        self.service.transaction_repo.complete_transactions.assert_called_once_with(
+            ["tournament:t1:user_1", "tournament:t1:user_2"]
+        )
+        self.service.wallet_repo.release_credit_batch.assert_called_once_with(
+            ["user_1", "user_2"], "tournament:t1"
+        )
+
+    def test_award_credits_bulk_retry_skips_credited_wallets(self):
+        """Test retrying a credit batch only credits users whose transaction is still pending."""
+        self.service.wallet_repo.apply_credit_batch.return_value = (1, 0)
+        self.service.transaction_repo.find_pending_transaction_ids.return_value = ["tournament:t1:user_2"]
+
+        success, message, result = self.service.award_credits_bulk(
+            [("user_1", 10.0, "tournament"), ("user_2", 5.0, "tournament")],
+            batch_id="tournament:t1"
+        )
+
+        assert success is True
+        assert result['users_credited'] == 1
+        assert result['users_already_credited'] == 1
+        self.service.wallet_repo.apply_credit_batch.assert_called_once_with({"user_2": 5.0}, "tournament:t1")
+        self.service.transaction_repo.complete_transactions.assert_called_once_with(["tournament:t1:user_2"])
+
+    def test_apply_credit_batch_counts_already_applied_wallets(self):
+        """Test duplicate key upserts of a retried batch are counted, not raised."""
+        repo = WalletRepository()
+        repo.collection = MagicMock()
+        repo.collection.bulk_write.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 11000}],
+            'nModified': 1,
+            'nUpserted': 1
+        })
+
+        credited, already_credited = repo.apply_credit_batch(
+            {"user_1": 10.0, "user_2": 5.0, "user_3": 1.0}, "tournament:t1"
+        )
+
+        assert (credited, already_credited) == (2, 1)
+        operations = repo.collection.bulk_write.call_args[0][0]
+        assert len(operations) == 3
+
+
 class TestIntegration:
     """Integration tests for the complete donations system."""
 
@@ -6,8 +6,13 @@ with BaseGameTest for comprehensive games system testing.
 """
 import os
 import sys
+import time
+import pytest
 from bson import ObjectId
 from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,6 +20,22 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from tests.core.base_game_test import BaseGameTest
 from app.games.services.game_service import GameService
 from app.games.repositories.game_repository import GameRepository
+from app.games.repositories.game_session_repository import GameSessionRepository
+from app.games.repositories.session_move_repository import SessionMoveRepository
+from app.games.models.game_session import GameSession
+from app.games.models.session_summary import SessionSummary
+from app.games.core.game_plugin import GamePlugin, GameSession as PluginGameSession
+from app.games.core.plugin_registry import PluginRegistry
+from app.games.core.plugin_sandbox import (
+    FRAME_HEADER, PluginBusy, PluginCallTimeout, PluginProcessPool, PluginWorkerCrashed,
+    decode_frame, encode_frame, write_frame
+)
+from app.games.services.active_session_store import (
+    ActiveSessionStore, LocalActiveSessionBackend, RedisActiveSessionBackend
+)
+from app.games.services.game_session_service import GameSessionService
+from app.games.services.session_completion_worker import SessionCompletionWorker
+from app.games.services.state_synchronizer import StateSynchronizer
 
 
 class TestGameSystemGOO35(BaseGameTest):
@@ -103,4 +124,646 @@ class TestGameRepositoryGOO35(BaseGameTest):
 
         self.assertEqual(puzzle_game['category'], 'puzzle')
         self.assertEqual(arcade_game['category'], 'arcade')
-        self.assertNotEqual(puzzle_game['category'], arcade_game['category'])
\ No newline at end of file
+        self.assertNotEqual(puzzle_game['category'], arcade_game['category'])
+
+
+class TestDeltaStateSync(BaseGameTest):
+    """Test JSON-patch session sync with a sync_version compare-and-swap"""
+    service_class = StateSynchronizer
+    repository_dependencies = ['session_repository']
+
+    def test_patch_is_applied_in_one_update_and_returns_changed_paths(self):
+        synced_at = datetime(2024, 1, 1, 12, 0)
+        self.service.session_repository.apply_sync_delta.return_value = {
+            'sync_version': 5,
+            'last_sync_at': synced_at,
+            'current_state': {'level': 3, 'board': [0, 1, 2]},
+            'score': 120,
+            'moves_count': 8
+        }
+        device_state = {
+            'sync_version': 4,
+            'patch': [
+                {'op': 'test', 'path': '/current_state/level', 'value': 2},
+                {'op': 'replace', 'path': '/current_state/level', 'value': 3},
+                {'op': 'replace', 'path': '/current_state/board/2', 'value': 2},
+                {'op': 'remove', 'path': '/current_state/hint'},
+                {'op': 'replace', 'path': '/score', 'value': 120}
+            ],
+            'new_moves': [{'action': 'click'}]
+        }
+
+        success, message, result = self.service.sync_session_state('session-1', device_state, {'device_id': 'd1'})
+
+        assert success is True and message == "SESSION_SYNC_SUCCESS"
+        session_id, version, update, conditions, projection = \
+            self.service.session_repository.apply_sync_delta.call_args.args
+        assert (session_id, version) == ('session-1', 4)
+        assert conditions == {'current_state.level': {'$eq': 2}}
+        assert update['$set']['current_state.level'] == 3
+        assert update['$set']['current_state.board.2'] == 2
+        assert update['$unset'] == {'current_state.hint': ''}
+        assert update['$inc'] == {'moves_count': 1}
+        assert sorted(projection) == ['current_state.board', 'current_state.hint',
+                                      'current_state.level', 'moves_count', 'score']
+        self.service.session_repository.get_session_by_session_id.assert_not_called()
+
+        assert result['sync_version'] == 5
+        assert result['last_sync_at'] == synced_at.isoformat()
+        assert {'op': 'replace', 'path': '/current_state/board/2', 'value': 2} in result['patch']
+        assert {'op': 'remove', 'path': '/current_state/hint'} in result['patch']
+        assert {'op': 'replace', 'path': '/moves_count', 'value': 8} in result['patch']
+        assert 'moves' not in update.get('$push', {})
+        assert update['$set']['last_move']['action'] == 'click'
+        session_id, moves, moves_count = self.service.session_repository.store_counted_moves.call_args.args
+        assert (session_id, moves_count) == ('session-1', 8)
+        assert [move['action'] for move in moves] == ['click']
+
+    def test_object_test_values_are_rejected(self):
+        device_state = {
+            'sync_version': 4,
+            'patch': [{'op': 'test', 'path': '/current_state/level', 'value': {'$ne': None}}]
+        }
+
+        success, message, result = self.service.sync_session_state('session-1', device_state, {'device_id': 'd1'})
+
+        assert (success, message, result) == (False, "INVALID_SYNC_PATCH", None)
+        self.service.session_repository.apply_sync_delta.assert_not_called()
+
+    def test_stale_version_gets_server_state(self):
+        self.service.session_repository.apply_sync_delta.return_value = None
+        self.service.session_repository.get_session_by_session_id.return_value = GameSession(
+            user_id='u1', game_id='g1', sync_version=7
+        )
+
+        success, message, result = self.service.sync_session_state(
+            'session-1', {'sync_version': 6, 'patch': [{'op': 'replace', 'path': '/score', 'value': 1}]}, {}
+        )
+
+        assert success is True and message == "SYNC_CONFLICT_SERVER_WINS"
+        assert result['server_sync_version'] == 7
+        assert result['session']['sync_version'] == 7
+
+    def test_invalid_patches_are_rejected_before_writing(self):
+        invalid_patches = [
+            [{'op': 'replace', 'path': '/status', 'value': 'completed'}],
+            [{'op': 'remove', 'path': '/current_state'}],
+            [{'op': 'replace', 'path': '/current_state/$where', 'value': 1}],
+            [{'op': 'move', 'from': '/score', 'path': '/statistics/score'}],
+            [{'op': 'replace', 'path': '/current_state', 'value': {}},
+             {'op': 'replace', 'path': '/current_state/level', 'value': 1}]
+        ]
+
+        for patch_ops in invalid_patches:
+            success, message, _ = self.service.sync_session_state(
+                'session-1', {'sync_version': 1, 'patch': patch_ops}, {}
+            )
+            assert (success, message) == (False, "INVALID_SYNC_PATCH")
+
+        self.service.session_repository.apply_sync_delta.assert_not_called()
+
+
+class TestBucketedSessionMoves(BaseGameTest):
+    """Test session moves stored in fixed-size session_moves buckets"""
+    service_class = SessionMoveRepository
+    repository_dependencies = ['collection']
+
+    def setUp(self):
+        super().setUp()
+        self.service.BUCKET_SIZE = 3
+
+    def test_moves_are_pushed_to_the_buckets_of_their_numbers(self):
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.service._get_current_time = lambda: now
+
+        written = self.service.append_moves('session-1', [{'step': step} for step in range(4)], first_move_number=3)
+
+        def bucket_update(bucket, moves):
+            return UpdateOne(
+                {'session_id': 'session-1', 'bucket': bucket},
+                {
+                    '$push': {'moves': {'$each': moves}},
+                    '$inc': {'count': len(moves)},
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {'created_at': now}
+                },
+                upsert=True
+            )
+
+        collection = self.service.collection
+        assert written == 4
+        assert collection.bulk_write.call_args.kwargs == {'ordered': False}
+        assert collection.bulk_write.call_args.args[0] == [
+            bucket_update(0, [{'step': 0, 'move_number': 3}]),
+            bucket_update(1, [{'step': 1, 'move_number': 4}, {'step': 2, 'move_number': 5},
+                              {'step': 3, 'move_number': 6}])
+        ]
+
+    def test_iter_moves_streams_in_order_from_a_move(self):
+        cursor = self.service.collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([
+            {'moves': [{'move_number': 6}, {'move_number': 4}, {'move_number': 5}]},
+            {'moves': [{'move_number': 7}]}
+        ])
+
+        moves = list(self.service.iter_moves('session-1', from_move=5))
+
+        assert [move['move_number'] for move in moves] == [5, 6, 7]
+        assert self.service.collection.find.call_args.args[0] == {'session_id': 'session-1', 'bucket': {'$gte': 1}}
+
+    def test_session_document_carries_only_count_and_last_move(self):
+        session = GameSession(user_id='u1', game_id='g1')
+        session.add_move({'guess': 1})
+        session.add_move({'guess': 2})
+
+        data = session.to_dict()
+        assert 'moves' not in data
+        assert data['moves_count'] == 2
+        assert data['last_move']['move_number'] == 2
+        assert session.to_api_dict()['last_move']['timestamp'] == data['last_move']['timestamp'].isoformat()
+        assert GameSession.from_dict(data).last_move == data['last_move']
+
+
+class TestGameSessionRepositoryWrites(BaseGameTest):
+    """Test move allocation and write-behind updates in GameSessionRepository"""
+    service_class = GameSessionRepository
+    repository_dependencies = ['collection', 'move_repo']
+
+    def test_appending_allocates_numbers_from_moves_count(self):
+        collection = self.service.collection
+        collection.find_one_and_update.return_value = {'moves_count': 12}
+
+        result = self.service.append_session_moves('session-1', [{'guess': 1}, {'guess': 2}])
+
+        filter_dict, update = collection.find_one_and_update.call_args.args
+        assert filter_dict == {'session_id': 'session-1'}
+        assert update['$inc'] == {'moves_count': 2}
+        assert 'last_move' not in update['$set']
+        session_id, moves, first_move_number = self.service.move_repo.append_moves.call_args.args
+        assert (session_id, first_move_number) == ('session-1', 11)
+        assert [move['guess'] for move in moves] == [1, 2]
+        publish_filter, publish = collection.update_one.call_args.args
+        assert publish_filter == {'session_id': 'session-1', 'moves_count': 12}
+        assert publish['$set']['last_move']['guess'] == 2
+        assert result['moves_count'] == 12
+        collection.find_one.assert_not_called()
+
+    def test_failed_bucket_write_marks_the_allocated_range(self):
+        collection = self.service.collection
+        collection.find_one_and_update.return_value = {'moves_count': 12}
+        self.service.move_repo.append_moves.side_effect = PyMongoError('write failed')
+
+        with pytest.raises(PyMongoError):
+            self.service.append_session_moves('session-1', [{'guess': 1}, {'guess': 2}])
+
+        collection.update_one.assert_called_once()
+        marker_filter, marker = collection.update_one.call_args.args
+        assert marker_filter == {'session_id': 'session-1'}
+        assert marker['$push']['unstored_move_ranges']['from'] == 11
+        assert marker['$push']['unstored_move_ranges']['to'] == 12
+
+    def test_missing_session_records_no_move(self):
+        self.service.collection.find_one_and_update.return_value = None
+
+        assert self.service.add_session_move('missing', {'guess': 1}) is None
+        self.service.move_repo.append_moves.assert_not_called()
+
+    def test_write_behind_never_matches_ended_sessions(self):
+        collection = self.service.collection
+        collection.update_one.return_value = MagicMock(matched_count=0)
+
+        assert self.service.update_session_fields('s1', {'score': 4}) is False
+        self.service.flush_session_fields({'s2': {'score': 5}})
+
+        live = {'$in': ['active', 'paused']}
+        assert collection.update_one.call_args.args[0] == {'session_id': 's1', 'status': live}
+        assert collection.bulk_write.call_args.args[0][0] == UpdateOne(
+            {'session_id': 's2', 'status': live}, {'$set': {'score': 5}}
+        )
+
+
+class TestBatchedMoveIngestion(BaseGameTest):
+    """Test batch move validation through GamePlugin.validate_moves"""
+    service_class = GameSessionService
+    repository_dependencies = ['session_repository', 'game_repository']
+
+    def setUp(self):
+        super().setUp()
+        self.service.active_sessions = ActiveSessionStore(session_repository=self.service.session_repository)
+        self.service.session_repository.get_session_by_session_id.return_value = GameSession(
+            user_id='u1', game_id='g1', moves_count=4
+        )
+        self.service.game_repository.get_game_by_id.return_value = MagicMock(plugin_id='number_guess')
+
+    def test_default_hook_validates_each_move(self):
+        plugin = MagicMock()
+        plugin.validate_move.side_effect = lambda session_id, move: move['guess'] > 0
+
+        assert GamePlugin.validate_moves(plugin, 's1', [{'guess': 1}, {'guess': -1}]) == [True, False]
+
+    def test_accepted_moves_are_appended_in_one_update(self):
+        plugin = MagicMock()
+        plugin.validate_moves.return_value = [True, False, True]
+        self.service.session_repository.append_session_moves.return_value = {'moves_count': 6, 'last_move': {}}
+        moves = [{'guess': 1}, {'guess': 'x'}, {'guess': 3}]
+
+        with patch('app.games.services.game_session_service.plugin_registry') as registry:
+            registry.resolve_game_plugin.return_value = (True, 'number_guess')
+            registry.get_plugin.return_value = plugin
+            success, message, result = self.service.validate_moves('s1', moves)
+
+        assert (success, message) == (True, "MOVES_VALIDATED_SUCCESS")
+        plugin.validate_moves.assert_called_once_with('s1', moves)
+        plugin.validate_move.assert_not_called()
+        self.service.session_repository.append_session_moves.assert_called_once_with(
+            's1', [{'guess': 1}, {'guess': 3}]
+        )
+        self.service.session_repository.get_session_by_session_id.assert_called_once()
+        assert (result['accepted_count'], result['rejected_count']) == (2, 1)
+        assert [(move['move_valid'], move['move_number']) for move in result['moves']] == [
+            (True, 5), (False, None), (True, 6)
+        ]
+
+    def test_batch_without_accepted_moves_writes_nothing(self):
+        plugin = MagicMock()
+        plugin.validate_moves.return_value = [False]
+
+        with patch('app.games.services.game_session_service.plugin_registry') as registry:
+            registry.resolve_game_plugin.return_value = (True, 'number_guess')
+            registry.get_plugin.return_value = plugin
+            success, _, result = self.service.validate_moves('s1', [{'guess': 0}])
+            too_many = self.service.validate_moves('s1', [{'guess': 1}] * (self.service.MAX_MOVES_PER_BATCH + 1))
+
+        assert success is True and result['accepted_count'] == 0
+        self.service.session_repository.append_session_moves.assert_not_called()
+        assert too_many == (False, "TOO_MANY_MOVES", None)
+
+    def test_user_session_list_reads_summaries(self):
+        self.service.game_repository.get_game_by_id.return_value = None
+        self.service.session_repository.get_user_session_summaries.return_value = [
+            SessionSummary(session_id='s1', user_id='u1', game_id='g1', created_at=None, score=5)
+        ]
+        self.service.session_repository.count.return_value = 1
+
+        success, _, data = self.service.get_user_sessions('u1', 'completed', page=2, limit=10)
+
+        assert success is True
+        self.service.session_repository.get_user_session_summaries.assert_called_once_with('u1', 'completed', 10, 10)
+        self.service.session_repository.get_user_sessions.assert_not_called()
+        assert data['sessions'][0]['score'] == 5
+        assert 'current_state' not in data['sessions'][0]
+
+
+class TestSessionSummaries(BaseGameTest):
+    """Test projected SessionSummary read paths"""
+    service_class = GameSessionRepository
+    repository_dependencies = ['collection']
+
+    def test_summaries_are_read_with_a_scalar_projection(self):
+        created_at = datetime(2024, 3, 1, 9, 30)
+        cursor = self.service.collection.find.return_value.sort.return_value
+        cursor.limit.return_value = cursor
+        cursor.__iter__.return_value = iter([{
+            'session_id': 's1', 'user_id': 'u1', 'game_id': 'g1',
+            'created_at': created_at, 'updated_at': created_at, 'play_duration': 1500,
+            'score': 40, 'status': 'completed'
+        }])
+
+        summaries = self.service.get_recent_session_summaries_by_game('g1', days=7, limit=100)
+
+        filter_dict, projection = self.service.collection.find.call_args.args
+        assert filter_dict['game_id'] == 'g1'
+        assert projection == SessionSummary.PROJECTION
+        assert not any(field in projection for field in ('current_state', 'device_info', 'moves'))
+        assert (summaries[0].user_id, summaries[0].play_duration, summaries[0].score) == ('u1', 1500, 40)
+        assert summaries[0].to_api_dict()['created_at'] == created_at.isoformat()
+        assert summaries[0].to_api_dict()['updated_at'] == created_at.isoformat()
+
+    def test_summary_has_no_instance_dict(self):
+        summary = SessionSummary.from_dict({'session_id': 's1', 'user_id': 'u1', 'game_id': 'g1'})
+
+        assert not hasattr(summary, '__dict__')
+        assert (summary.play_duration, summary.status) == (0, 'active')
+
+
+class TestActiveSessionStore(BaseGameTest):
+    """Test the write-behind store for active and paused sessions"""
+
+    def setUp(self):
+        super().setUp()
+        self.mock_session_repository = MagicMock()
+        self.store = ActiveSessionStore(LocalActiveSessionBackend(), session_repository=self.mock_session_repository,
+                                        flush_interval_ms=60000)
+        self.mock_session_repository.get_session_by_session_id.return_value = self.create_game_session()
+
+    def create_game_session(self, **kwargs):
+        """Create the GameSession model the store loads for s1"""
+        return GameSession(user_id='u1', game_id='g1', session_id='s1', **kwargs)
+
+    def test_updates_are_applied_in_memory_and_flushed_coalesced(self):
+        repository = self.mock_session_repository
+
+        for level in (1, 2, 3):
+            session = self.store.get('s1')
+            session.update_state({'level': level})
+            assert self.store.save(session, ('current_state', 'updated_at')) is True
+
+        assert repository.get_session_by_session_id.call_count == 1
+        repository.update_session_fields.assert_not_called()
+        assert self.store.get('s1').current_state == {'level': 3}
+
+        assert self.store.flush() == repository.flush_session_fields.return_value
+        changes = repository.flush_session_fields.call_args.args[0]
+        assert list(changes) == ['s1']
+        assert changes['s1']['current_state'] == {'level': 3}
+        assert set(changes['s1']) == {'current_state', 'updated_at'}
+
+        repository.flush_session_fields.reset_mock()
+        assert self.store.flush() == 0
+        repository.flush_session_fields.assert_not_called()
+
+    def test_stale_sync_version_is_rejected(self):
+        self.mock_session_repository.get_session_by_session_id.return_value = self.create_game_session(sync_version=3)
+
+        session = self.store.get('s1')
+        session.update_sync_info()
+        assert self.store.save(session, ('sync_version',), expected_sync_version=3) is True
+        assert self.store.save(session, ('sync_version',), expected_sync_version=3) is False
+
+    def test_ended_sessions_are_not_buffered(self):
+        self.mock_session_repository.get_session_by_session_id.return_value = self.create_game_session(
+            status='completed'
+        )
+
+        session = self.store.get('s1')
+        session.update_score(10)
+        self.store.save(session, ('score',))
+
+        self.mock_session_repository.update_session_fields.assert_called_once_with('s1', {'score': 10}, None)
+        assert len(self.store.backend) == 0
+
+    def test_evict_flushes_before_dropping(self):
+        session = self.store.get('s1')
+        session.pause_session()
+        self.store.save(session, ('status', 'paused_at'))
+        self.store.evict('s1')
+
+        assert self.mock_session_repository.flush_session_fields.call_args.args[0]['s1']['status'] == 'paused'
+        assert len(self.store.backend) == 0
+
+    def test_failed_flush_keeps_changes_pending(self):
+        repository = self.mock_session_repository
+        session = self.store.get('s1')
+        session.update_score(5)
+        self.store.save(session, ('score',))
+        repository.flush_session_fields.side_effect = RuntimeError('down')
+
+        try:
+            self.store.flush()
+        except RuntimeError:
+            pass
+
+        repository.flush_session_fields.side_effect = None
+        self.store.flush()
+        assert repository.flush_session_fields.call_args.args[0] == {'s1': {'score': 5}}
+
+    def test_local_sessions_expire_and_are_bounded(self):
+        backend = LocalActiveSessionBackend(max_sessions=2)
+        backend.load('s1', {'session_id': 's1'})
+        backend.update('s1', {'score': 1})
+        backend.load('s2', {'session_id': 's2'})
+        backend.load('s3', {'session_id': 's3'})
+
+        # s1 has pending changes, so the least recently used clean session goes
+        assert backend.get('s2') is None
+        assert backend.get('s1')['score'] == 1
+
+        backend.ttl_seconds = -1
+        backend.update('s3', {'score': 2})
+        assert backend.get('s3') is None
+        assert len(backend) == 1
+
+    def test_redis_load_writes_the_whole_hash_in_one_transaction(self):
+        backend = RedisActiveSessionBackend.__new__(RedisActiveSessionBackend)
+        backend.client = MagicMock()
+        backend._watch_error = RuntimeError
+        backend._dumps = repr
+        pipeline = backend.client.pipeline.return_value.__enter__.return_value
+        pipeline.exists.return_value = 0
+
+        document = {'session_id': 's1', 'score': 3}
+        assert backend.load('s1', document) is document
+
+        pipeline.multi.assert_called_once()
+        pipeline.hset.assert_called_once_with(backend._key('s1'), mapping={'session_id': "'s1'", 'score': '3'})
+        pipeline.execute.assert_called_once()
+        backend.client.hsetnx.assert_not_called()
+
+    def test_without_backend_only_changed_fields_are_written(self):
+        store = ActiveSessionStore(session_repository=self.mock_session_repository)
+        session = self.create_game_session(sync_version=2)
+        session.update_state({'level': 9})
+
+        store.save(session, ('current_state',), expected_sync_version=2)
+
+        self.mock_session_repository.update_session_fields.assert_called_once_with(
+            's1', {'current_state': {'level': 9}}, 2
+        )
+        assert store.flush() == 0
+
+
+class TestPluginRegistryWarmPath(BaseGameTest):
+    """Test the cached game -> plugin mapping and plugin latency histograms"""
+    service_class = PluginRegistry
+
+    def setUp(self):
+        super().setUp()
+        self.service._plugins['number_guess'] = MagicMock()
+        self.load_game = MagicMock(return_value=MagicMock(plugin_id='number_guess'))
+
+    def test_mapping_is_cached_after_first_lookup(self):
+        assert self.service.resolve_game_plugin('g1', self.load_game) == (True, 'number_guess')
+        assert self.service.resolve_game_plugin('g1', self.load_game) == (True, 'number_guess')
+        self.load_game.assert_called_once_with('g1')
+
+    def test_unregister_and_invalidate_drop_cached_mapping(self):
+        self.service._plugin_metadata['number_guess'] = {}
+        self.service.resolve_game_plugin('g1', self.load_game)
+
+        self.service.unregister_plugin('number_guess')
+        assert self.service.resolve_game_plugin('g1', self.load_game) == (True, 'number_guess')
+
+        self.service.invalidate_game('g1')
+        self.load_game.return_value = None
+        assert self.service.resolve_game_plugin('g1', self.load_game) == (False, None)
+        assert self.load_game.call_count == 3
+
+    def test_unregistered_plugin_mapping_is_not_cached(self):
+        self.load_game.return_value.plugin_id = 'not_installed'
+
+        self.service.resolve_game_plugin('g1', self.load_game)
+        self.service.resolve_game_plugin('g1', self.load_game)
+
+        assert self.load_game.call_count == 2
+
+    def test_measure_records_latency_even_on_error(self):
+        with self.service.measure('number_guess', 'validate_move'):
+            pass
+        try:
+            with self.service.measure('number_guess', 'validate_move'):
+                raise ValueError('bad move')
+        except ValueError:
+            pass
+
+        histogram = self.service.get_plugin_latency('number_guess')['number_guess']['validate_move']
+        assert histogram['count'] == 2
+        assert histogram['p50_ms'] == 1.0
+        assert sum(histogram['buckets'].values()) == 2
+
+
+class TestPluginSandbox:
+    """Test out-of-process plugin execution"""
+
+    def test_frames_round_trip_plugin_dataclasses(self):
+        session = PluginGameSession(session_id='s1', user_id='u1', game_id='g1', status='active',
+                                    current_state={'level': 2}, started_at=datetime(2024, 1, 1, 12, 0))
+        frame = encode_frame({'id': 1, 'ok': True, 'result': session})
+
+        (size,) = FRAME_HEADER.unpack(frame[:FRAME_HEADER.size])
+        assert size == len(frame) - FRAME_HEADER.size
+        assert decode_frame(frame[FRAME_HEADER.size:])['result'] == session
+
+    def test_unsupported_values_are_rejected(self):
+        with pytest.raises(TypeError):
+            encode_frame({'id': 1, 'args': [object()]})
+
+    def test_write_to_stalled_worker_times_out(self):
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)
+        try:
+            # Nobody drains the pipe, so the frame cannot fit in its buffer
+            frame = encode_frame({'id': 1, 'args': ['x' * (4 * 1024 * 1024)]})
+            started = time.monotonic()
+            with pytest.raises(PluginCallTimeout):
+                write_frame(write_fd, frame, time.monotonic() + 0.2)
+            assert time.monotonic() - started < 2
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_pool_runs_plugin_in_worker_and_respawns_after_crash(self):
+        pool = PluginProcessPool('app.games.plugins.example_game.main', workers=1, call_timeout_ms=10000)
+        try:
+            assert pool.start()['info']['name'] == 'Number Guessing Game'
+            session = pool.call('start_session', 'u1', {})
+            assert pool.call('validate_move', session.session_id, {'guess': 50},
+                             session_id=session.session_id) is True
+
+            # A call reaching a dead worker fails at once while it respawns in the background
+            pool._processes[0].kill()
+            started = time.monotonic()
+            with pytest.raises(PluginWorkerCrashed):
+                pool.call('get_rules')
+            assert time.monotonic() - started < 1
+
+            deadline = time.monotonic() + 10
+            while pool.get_stats()['restarts'] == 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            pool.call('get_rules')
+
+            stats = pool.get_stats()
+            assert (stats['restarts'], stats['live_workers'], stats['tracked_sessions']) == (1, 1, 0)
+            assert stats['unavailable'] == 1
+        finally:
+            pool.stop()
+
+    def test_idle_session_affinity_is_forgotten(self):
+        pool = PluginProcessPool('app.games.plugins.example_game.main', workers=2)
+        pool.MAX_TRACKED_SESSIONS = 2
+        for session_id in ('s1', 's2', 's3'):
+            pool._track_session(session_id, 1)
+
+        assert list(pool._affinity) == ['s2', 's3']
+        assert pool._worker_for('s2') == 1
+
+        pool.MAX_TRACKED_SESSIONS = 10
+        pool.AFFINITY_TTL_S = 60
+        pool._affinity['s3'] = (1, time.monotonic() - 120)
+        pool._track_session('s4', 0)
+        assert list(pool._affinity) == ['s2', 's4']
+
+    def test_busy_plugin_rejects_calls(self):
+        pool = PluginProcessPool('app.games.plugins.example_game.main', max_concurrency=1, call_timeout_ms=50)
+        pool._slots.acquire()
+
+        with pytest.raises(PluginBusy):
+            pool.call('get_rules')
+        assert pool.stats['rejected'] == 1
+
+
+class TestSessionCompletionPipeline(BaseGameTest):
+    """Test single-update session completion and completion event fan-out"""
+    service_class = GameSessionService
+    repository_dependencies = ['session_repository', 'game_repository']
+
+    def setUp(self):
+        super().setUp()
+        self.service.active_sessions = ActiveSessionStore(LocalActiveSessionBackend(),
+                                                          session_repository=self.service.session_repository)
+        self.service.session_repository.get_session_by_session_id.return_value = GameSession(
+            user_id='u1', game_id='g1', session_id='s1', score=7
+        )
+        self.service.game_repository.get_game_by_id.return_value = MagicMock(plugin_id=None, credit_rate=1.0)
+
+    def test_end_writes_buffered_changes_and_event_in_one_update(self):
+        session = self.service.active_sessions.get('s1')
+        session.update_state({'level': 4})
+        self.service.active_sessions.save(session, ('current_state',))
+        self.service.session_repository.finish_session.return_value = GameSession(
+            user_id='u1', game_id='g1', session_id='s1', status='completed', score=7
+        )
+
+        with patch('app.games.services.game_session_service.plugin_registry'):
+            success, message, result = self.service.end_game_session('s1', 'completed')
+
+        assert (success, message) == (True, "GAME_SESSION_ENDED_SUCCESS")
+        session_id, status, values, event = self.service.session_repository.finish_session.call_args.args
+        assert (session_id, status) == ('s1', 'completed')
+        assert values['current_state'] == {'level': 4} and values['score'] == 7
+        assert event['type'] == 'session_completed' and event['pending_consumers']
+        assert result['session']['status'] == 'completed'
+        self.service.session_repository.get_session_by_session_id.assert_called_once()
+        self.service.session_repository.flush_session_fields.assert_not_called()
+        assert len(self.service.active_sessions.backend) == 0
+
+    def test_failed_end_keeps_buffered_changes(self):
+        session = self.service.active_sessions.get('s1')
+        session.update_state({'level': 4})
+        self.service.active_sessions.save(session, ('current_state',))
+        self.service.session_repository.finish_session.return_value = None
+
+        with patch('app.games.services.game_session_service.plugin_registry'):
+            result = self.service.end_game_session('s1', 'abandoned')
+
+        assert result == (False, "SESSION_END_UPDATE_FAILED", None)
+        assert self.service.active_sessions.take_pending('s1') == {'current_state': {'level': 4}}
+
+    def test_worker_retries_only_failed_consumers(self):
+        with patch('app.games.services.session_completion_worker.GameSessionRepository') as repository_class:
+            worker = SessionCompletionWorker(MagicMock())
+        repository = repository_class.return_value
+        repository.claim_completion_event.return_value = {
+            'session_id': 's1', 'user_id': 'u1', 'game_id': 'g1', 'status': 'completed',
+            'completion_event': {'reason': 'completed', 'attempts': 1,
+                                 'pending_consumers': ['impact_score', 'achievements']}
+        }
+        consumers = {'impact_score': MagicMock(return_value=True),
+                     'achievements': MagicMock(side_effect=RuntimeError('down'))}
+
+        with patch.object(SessionCompletionWorker, 'CONSUMERS', consumers):
+            assert worker._process_next() is True
+
+        repository.ack_completion_consumer.assert_called_once_with('s1', 'impact_score')
+        repository.complete_completion_event.assert_not_called()
+        repository.fail_completion_event.assert_called_once()
+        assert worker.stats == {'delivered': 0, 'failed': 1}
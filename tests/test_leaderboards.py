@@ -11,12 +11,30 @@ import os
 import sys
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock
+from pymongo.errors import DuplicateKeyError
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tests.core.base_social_test import BaseSocialTest
+from tests.core.base_service_test import ServiceTestMixin
+from app.social.leaderboards.models.impact_score import ImpactScore
+from app.social.leaderboards.models.leaderboard import Leaderboard
+from app.social.leaderboards.models.leaderboard_entry import LeaderboardEntry
+from app.social.leaderboards.repositories.activity_aggregate_repository import ActivityAggregateRepository
+from app.social.leaderboards.repositories.friends_ranking_repository import FriendsRankingRepository
+from app.social.leaderboards.repositories.impact_score_repository import ImpactScoreRepository
+from app.social.leaderboards.repositories.leaderboard_entry_repository import LeaderboardEntryRepository
+from app.social.leaderboards.repositories.leaderboard_repository import LeaderboardRepository
+from app.social.leaderboards.repositories.rank_index import ScoreRankIndex
+from app.social.leaderboards.repositories.ranking_event_repository import RankingEventRepository
+from app.social.leaderboards.repositories.top_k_index import TopKIndex
+from app.social.leaderboards.services.impact_calculator import ImpactCalculator
+from app.social.leaderboards.services.leaderboard_cache import LeaderboardPageCache
 from app.social.leaderboards.services.leaderboard_service import LeaderboardService
+from app.social.leaderboards.services.ranking_engine import RankingEngine
+from app.social.leaderboards.services.ranking_worker import RankingEventWorker
 
 
 class TestImpactScoreSystem(BaseSocialTest):
@@ -271,4 +289,688 @@ class TestImpactScoreSystem(BaseSocialTest):
             total_expected_points += achievement_data['points']
 
         # Verify total points calculation
-        self.assertGreater(total_expected_points, 0)
\ No newline at end of file
+        self.assertGreater(total_expected_points, 0)
+
+
+class TestScoreRankIndex:
+    """Test the per-worker Fenwick rank index used by ImpactScoreRepository"""
+
+    def _build_index(self, scores):
+        index = ScoreRankIndex(max_score=1400.0)
+        index.rebuild((f"user_{i}", score) for i, score in enumerate(scores))
+        return index
+
+    def test_rank_matches_count_of_higher_scores(self):
+        scores = [1500.0, 1200.0, 800.0, 800.0, 400.0, 0.0, 12.34]
+        index = self._build_index(scores)
+
+        for score in scores:
+            clamped = min(score, 1400.0)
+            expected = sum(1 for other in scores if min(other, 1400.0) > clamped) + 1
+            assert index.rank(score) == expected
+
+        assert len(index) == len(scores)
+        assert index.rank(2000.0) == 1
+
+    def test_incremental_upsert_and_remove(self):
+        index = self._build_index([100.0, 200.0, 300.0])
+
+        index.upsert('user_0', 350.0)
+        assert index.rank(350.0) == 1
+        assert index.rank(300.0) == 2
+
+        index.upsert('new_user', 250.0)
+        assert len(index) == 4
+        assert index.count_higher(250.0) == 2
+
+        assert index.remove('user_2') is True
+        assert index.remove('user_2') is False
+        assert index.rank(200.0) == 3
+        assert len(index) == 3
+
+    def test_percentile_queries(self):
+        index = self._build_index([float(score) for score in range(1, 101)])
+
+        assert index.percentile(50.0) == 50.0
+        assert index.percentile(100.0) == 100.0
+        assert index.score_at_rank(1) == 100.0
+        assert index.score_at_rank(100) == 1.0
+        assert index.score_at_rank(101) is None
+        assert index.score_at_percentile(90) == 90.0
+
+    def test_staleness(self):
+        index = ScoreRankIndex(max_score=10.0)
+        assert index.is_stale(300)
+
+        index.rebuild([])
+        assert not index.is_stale(300)
+        assert index.percentile(5.0) == 0.0
+
+
+class TestRankMaterialization(BaseSocialTest):
+    """Test streamed bulk rank writes in ImpactScoreRepository"""
+    service_class = ImpactScoreRepository
+    repository_dependencies = ['collection']
+
+    def setUp(self):
+        super().setUp()
+        self.service.collection.bulk_write.return_value.modified_count = 2
+
+    def test_stream_ranks_batches_unordered_writes(self):
+        ids = [ObjectId() for _ in range(5)]
+        collection = self.service.collection
+        collection.find.return_value.sort.return_value.batch_size.return_value = iter(
+            [{'_id': doc_id} for doc_id in ids]
+        )
+
+        stats = self.service._stream_ranks({}, 'rank_global', batch_size=2)
+
+        assert stats == {'ranked': 5, 'modified': 6, 'batches': 3}
+        calls = collection.bulk_write.call_args_list
+        assert [len(call.args[0]) for call in calls] == [2, 2, 1]
+        assert all(call.kwargs['ordered'] is False for call in calls)
+
+        last_operation = calls[-1].args[0][0]
+        assert last_operation._filter == {'_id': ids[-1]}
+        assert last_operation._doc == {'$set': {'rank_global': 5}}
+
+    def test_server_side_mode_merges_window_ranks(self):
+        self.service.collection.count_documents.return_value = 42
+
+        stats = self.service._merge_ranks({}, 'rank_weekly')
+
+        pipeline = self.service.collection.aggregate.call_args.args[0]
+        assert '$setWindowFields' in pipeline[1]
+        assert pipeline[-1]['$merge']['into'] == 'user_impact_scores'
+        assert stats['ranked'] == 42
+
+
+class TestRankingEventOutbox(ServiceTestMixin, BaseSocialTest):
+    """Test coalesced score updates through the ranking outbox"""
+    service_class = RankingEngine
+    repository_dependencies = ['ranking_event_repo', 'impact_calculator']
+
+    def setUp(self):
+        super().setUp()
+        self.worker = RankingEventWorker(self.app, concurrency=1)
+        self.setup_service_mocks(self.worker, ['event_repo', 'ranking_engine'])
+
+    def test_enqueue_merges_into_pending_event(self):
+        repo = RankingEventRepository()
+        self.setup_service_mocks(repo, ['collection'])
+        user_id = str(ObjectId())
+
+        assert repo.enqueue(user_id, 'gaming', debounce_seconds=10) is True
+
+        filter_dict, update = repo.collection.update_one.call_args.args
+        assert filter_dict == {'user_id': ObjectId(user_id), 'status': 'pending'}
+        assert update['$inc'] == {'event_count': 1}
+        assert update['$addToSet'] == {'activity_types': 'gaming'}
+        assert 'available_at' in update['$setOnInsert']
+        assert repo.collection.update_one.call_args.kwargs['upsert'] is True
+
+    def test_trigger_queues_instead_of_recalculating(self):
+        self.service.ranking_event_repo.enqueue.return_value = True
+
+        success, message = self.service.trigger_user_score_update(str(ObjectId()), 'gaming')
+
+        assert success is True
+        assert message == "Score update queued"
+        self.service.impact_calculator.calculate_user_impact_score.assert_not_called()
+
+    def test_worker_processes_and_completes_events(self):
+        event = {'_id': ObjectId(), 'user_id': ObjectId(), 'activity_types': ['gaming'], 'event_count': 50}
+        self.worker.event_repo.claim_next.side_effect = [event, None]
+        self.worker.ranking_engine.process_user_score_update.return_value = (True, "ok")
+
+        assert self.worker.run_once() == 1
+        self.worker.ranking_engine.process_user_score_update.assert_called_once_with(
+            str(event['user_id']), ['gaming']
+        )
+        self.worker.event_repo.complete.assert_called_once_with(event['_id'])
+        assert self.worker.stats == {'processed': 1, 'failed': 0, 'coalesced_events': 50}
+
+    def test_worker_releases_failed_events_for_retry(self):
+        event = {'_id': ObjectId(), 'user_id': ObjectId(), 'attempts': 1}
+        self.worker.event_repo.claim_next.side_effect = [event, None]
+        self.worker.ranking_engine.process_user_score_update.return_value = (False, "boom")
+
+        self.worker.run_once()
+
+        self.worker.event_repo.complete.assert_not_called()
+        self.worker.event_repo.fail.assert_called_once_with(
+            event, "boom", self.worker.MAX_ATTEMPTS, self.worker.RETRY_DELAY_SECONDS
+        )
+
+
+class TestIncrementalImpactInputs(ServiceTestMixin, BaseSocialTest):
+    """Test impact score inputs built from rolling activity aggregates"""
+    service_class = ImpactCalculator
+    repository_dependencies = ['activity_aggregate_repo', 'game_session_repo', 'relationship_repo',
+                               'user_repo', 'impact_score_repo']
+
+    def test_seeded_aggregates_skip_history_scan(self):
+        calculator = self.service
+        user_id = ObjectId()
+        today = ActivityAggregateRepository.day_key()
+        old_day = ActivityAggregateRepository.day_key(datetime.utcnow() - timedelta(days=20))
+        expired_day = ActivityAggregateRepository.day_key(datetime.utcnow() - timedelta(days=45))
+        calculator.activity_aggregate_repo.find_by_user_ids.return_value = [{
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'seeded_at': datetime.utcnow(),
+            'days': {
+                today: {'play_ms': 600000, 'sessions': 2, 'games': ['a', 'b'], 'social': 3},
+                old_day: {'play_ms': 1200000, 'sessions': 1, 'games': ['b', 'c'], 'social': 4},
+                expired_day: {'play_ms': 9999999, 'sessions': 5, 'games': ['z']}
+            }
+        }]
+        calculator.relationship_repo.get_social_stats_by_users.return_value = {
+            str(user_id): {'friend_count': 4, 'recent_by_day': {}}
+        }
+
+        activity = calculator._load_activity_summaries([str(user_id)], incremental=True)[str(user_id)]
+
+        calculator.game_session_repo.get_daily_activity_by_users.assert_not_called()
+        calculator.activity_aggregate_repo.seed_many.assert_not_called()
+        assert activity['sessions_30d'] == 3
+        assert activity['play_minutes_30d'] == 30.0
+        assert activity['active_days_30d'] == 2
+        assert activity['unique_games_30d'] == 3
+        assert activity['active_days_7d'] == 1
+        assert activity['social_events_7d'] == 3
+        assert activity['friend_count'] == 4
+
+    def test_unseeded_users_are_rebuilt_in_one_batch_and_seeded(self):
+        calculator = self.service
+        seeded_id, unseeded_id, idle_id = str(ObjectId()), str(ObjectId()), str(ObjectId())
+        today = ActivityAggregateRepository.day_key()
+        calculator.activity_aggregate_repo.find_by_user_ids.return_value = [
+            {'_id': ObjectId(), 'user_id': ObjectId(seeded_id), 'seeded_at': datetime.utcnow(), 'days': {}},
+            {'_id': ObjectId(), 'user_id': ObjectId(unseeded_id), 'days': {}}
+        ]
+        calculator.game_session_repo.get_daily_activity_by_users.return_value = [
+            {'user_id': unseeded_id, 'day': today, 'play_ms': 180000, 'sessions': 2, 'games': ['g1']}
+        ]
+        calculator.relationship_repo.get_social_stats_by_users.return_value = {
+            unseeded_id: {'friend_count': 1, 'recent_by_day': {today: 1}}
+        }
+
+        activities = calculator._load_activity_summaries([seeded_id, unseeded_id, idle_id], incremental=True)
+
+        rebuilt_for = calculator.game_session_repo.get_daily_activity_by_users.call_args.args[0]
+        assert rebuilt_for == [unseeded_id, idle_id]
+        seeded = calculator.activity_aggregate_repo.seed_many.call_args.args[0]
+        assert seeded[unseeded_id][today] == {'play_ms': 180000, 'sessions': 2, 'games': ['g1'], 'social': 1}
+        assert seeded[idle_id] == {}
+
+        activity = activities[unseeded_id]
+        assert activity['play_minutes_30d'] == 3.0
+        assert activity['unique_games_30d'] == 1
+        assert activity['social_events_7d'] == 1
+        assert activities[idle_id]['sessions_30d'] == 0
+
+        assert calculator._calculate_consistency_multiplier(activity) == 1.0
+        assert calculator._calculate_game_variety_score(activity) == 25
+        assert calculator._calculate_friends_score(activity) == 25
+
+    def test_redelivered_session_is_applied_to_aggregates_once(self):
+        repo = ActivityAggregateRepository()
+        self.setup_service_mocks(repo, ['collection'])
+        user_id = str(ObjectId())
+        ended_at = datetime(2026, 3, 1, 23, 59)
+
+        repo.record_game_session(user_id, 'g1', 60000, occurred_at=ended_at, event_id='game_session:s1')
+
+        filter_dict, update = repo.collection.update_one.call_args.args
+        assert filter_dict == {'user_id': ObjectId(user_id), 'days.2026-03-01.events': {'$ne': 'game_session:s1'}}
+        assert update['$addToSet'] == {'days.2026-03-01.games': 'g1', 'days.2026-03-01.events': 'game_session:s1'}
+        assert update['$inc'] == {'days.2026-03-01.play_ms': 60000, 'days.2026-03-01.sessions': 1}
+
+        # The retry's filter misses and its upsert collides with the existing document
+        repo.collection.update_one.side_effect = DuplicateKeyError('E11000')
+        assert repo.record_game_session(user_id, 'g1', 60000, occurred_at=ended_at, event_id='game_session:s1') is True
+
+    def test_batch_scores_use_fixed_query_count(self):
+        calculator = self.service
+        user_ids = [str(ObjectId()) for _ in range(3)]
+        calculator.user_repo.collection.find.return_value = [
+            {'_id': ObjectId(user_id), 'gaming_stats': {'games_played': 10}} for user_id in user_ids
+        ]
+        calculator.impact_score_repo.find_by_user_ids.return_value = {}
+        calculator.activity_aggregate_repo.find_by_user_ids.return_value = []
+        calculator.game_session_repo.get_daily_activity_by_users.return_value = []
+        calculator.relationship_repo.get_social_stats_by_users.return_value = {}
+
+        scores = calculator.calculate_impact_scores(user_ids)
+
+        assert sorted(scores) == sorted(user_ids)
+        assert calculator.user_repo.collection.find.call_count == 1
+        assert calculator.game_session_repo.get_daily_activity_by_users.call_count == 1
+        assert calculator.relationship_repo.get_social_stats_by_users.call_count == 1
+        written = calculator.impact_score_repo.bulk_upsert_impact_scores.call_args.args[0]
+        assert len(written) == 3
+        assert all(score.gaming_details['tournament_score'] == 20 for score in written)
+
+
+class TestStreamedScoreRecalculation(BaseSocialTest):
+    """Test keyset-streamed, checkpointed full score recalculation"""
+    service_class = ImpactCalculator
+    repository_dependencies = ['user_repo', 'checkpoint_repo']
+
+    def _stream_users(self, user_ids):
+        """Serve user_ids in _id order to the keyset walk and record the batches scored"""
+        def find(query, projection):
+            after = query.get('_id', {}).get('$gt')
+            remaining = [{'_id': user_id} for user_id in user_ids if after is None or user_id > after]
+            cursor = MagicMock()
+            cursor.sort.return_value.limit.side_effect = lambda n: remaining[:n]
+            return cursor
+
+        self.service.user_repo.count.return_value = len(user_ids)
+        self.service.user_repo.collection.find.side_effect = find
+        self.service.calculate_impact_scores = MagicMock(
+            side_effect=lambda ids, incremental: {user_id: None for user_id in ids}
+        )
+
+    def test_walks_id_ranges_and_checkpoints_each_batch(self):
+        calculator = self.service
+        user_ids = sorted(ObjectId() for _ in range(5))
+        self._stream_users(user_ids)
+        calculator.checkpoint_repo.find_active.return_value = None
+        calculator.checkpoint_repo.start.return_value = {'last_user_id': None, 'processed': 0, 'errors': 0}
+
+        success, message, stats = calculator.recalculate_all_scores(batch_size=2, workers=1)
+
+        assert success is True
+        assert stats['processed'] == 5
+        assert [call.args[1] for call in calculator.checkpoint_repo.advance.call_args_list] == [
+            user_ids[1], user_ids[3], user_ids[4]
+        ]
+        calculator.checkpoint_repo.complete.assert_called_once_with('full')
+
+    def test_resumes_after_checkpoint(self):
+        calculator = self.service
+        user_ids = sorted(ObjectId() for _ in range(5))
+        self._stream_users(user_ids)
+        calculator.checkpoint_repo.find_active.return_value = {
+            'last_user_id': user_ids[2], 'processed': 3, 'errors': 0
+        }
+
+        success, message, stats = calculator.recalculate_all_scores(batch_size=10, workers=1)
+
+        recalculated = [call.args[0] for call in calculator.calculate_impact_scores.call_args_list]
+        assert recalculated == [[str(user_ids[3]), str(user_ids[4])]]
+        assert stats['processed'] == 5
+        assert stats['resumed_from'] == str(user_ids[2])
+        calculator.checkpoint_repo.start.assert_not_called()
+
+    def test_failed_batch_holds_back_the_checkpoint(self):
+        calculator = self.service
+        user_ids = sorted(ObjectId() for _ in range(6))
+        self._stream_users(user_ids)
+        calculator.checkpoint_repo.find_active.return_value = None
+        calculator.checkpoint_repo.start.return_value = {'last_user_id': None, 'processed': 0, 'errors': 0}
+
+        def calculate(ids, incremental):
+            if str(user_ids[2]) in ids:
+                raise RuntimeError("database unavailable")
+            return {user_id: None for user_id in ids}
+        calculator.calculate_impact_scores.side_effect = calculate
+
+        success, message, stats = calculator.recalculate_all_scores(batch_size=2, workers=1)
+
+        assert stats['processed'] == 4
+        assert stats['failed_batches'] == 1
+        # Only the batch before the failure is checkpointed, and the run stays resumable
+        assert [call.args[1] for call in calculator.checkpoint_repo.advance.call_args_list] == [user_ids[1]]
+        calculator.checkpoint_repo.complete.assert_not_called()
+
+
+class TestLeaderboardEntryCollection(BaseSocialTest):
+    """Test leaderboard entries stored as documents in leaderboard_entries"""
+    service_class = LeaderboardRepository
+    repository_dependencies = ['collection']
+
+    def setUp(self):
+        super().setUp()
+        self.service.entry_repo.collection = MagicMock()
+        self.entries = self.service.entry_repo.collection
+
+    def _entry(self, score):
+        return LeaderboardEntry(user_id=str(ObjectId()), score=score, rank=1, display_name="Player")
+
+    def test_rerank_streams_and_writes_only_changed_ranks(self):
+        documents = [
+            {'_id': ObjectId(), 'rank': 1},
+            {'_id': ObjectId(), 'rank': 3},
+            {'_id': ObjectId(), 'rank': 2},
+            {'_id': ObjectId(), 'rank': 4}
+        ]
+        self.entries.count_documents.return_value = len(documents)
+        self.entries.find.return_value.sort.return_value.batch_size.return_value = iter(documents)
+
+        assert self.service.bulk_update_ranks('global_impact', 'weekly') is True
+
+        sort = self.entries.find.return_value.sort.call_args.args[0]
+        assert sort == [('score', -1), ('user_id', 1)]
+        operations = self.entries.bulk_write.call_args.args[0]
+        assert [operation._doc for operation in operations] == [{'$set': {'rank': 2}}, {'$set': {'rank': 3}}]
+        assert self.entries.bulk_write.call_args.kwargs['ordered'] is False
+
+    def test_entry_changes_shift_only_the_ranks_passed_in_one_bulk(self):
+        self.service.collection.find_one.return_value = {'version': 4}
+        self.service.collection.find_one_and_update.return_value = {'version': 5}
+        evicted = str(ObjectId())
+        moved = self._entry(90.0)
+        self.entries.find.return_value = [{'rank': 8}, {'rank': 6}]
+        self.entries.count_documents.return_value = 1
+
+        version = self.service.apply_entry_changes('global_impact', 'weekly', [moved], [evicted], {})
+
+        assert version == 5
+        self.entries.update_many.assert_not_called()
+        operations = self.entries.bulk_write.call_args.args[0]
+        assert self.entries.bulk_write.call_args.kwargs['ordered'] is True
+        assert operations[0]._filter['user_id'] == ObjectId(evicted)
+        # 2..5 move down one behind the moved entry, 7 takes its old place, 9+ close the evicted gap
+        shifts = [(operation._filter['rank'], operation._doc) for operation in operations[1:-1]]
+        assert shifts == [
+            ({'$gte': 9}, {'$inc': {'rank': -1}}),
+            ({'$gte': 2, '$lte': 5}, {'$inc': {'rank': 1}})
+        ]
+        assert operations[-1]._doc['$set']['rank'] == 2
+
+    def test_rank_shifts_keep_untouched_entries_in_order(self):
+        ranks = list(range(1, 11))
+        departed, arrived = [3, 8], [1, 5, 6]
+        shifts = LeaderboardEntryRepository._rank_shifts(departed, arrived)
+
+        untouched = [rank for rank in ranks if rank not in departed]
+        moved = []
+        for rank in untouched:
+            delta = next((d for first, last, d in shifts if first <= rank and (last is None or rank <= last)), 0)
+            moved.append(rank + delta)
+        free = [rank for rank in range(1, 12) if rank not in arrived]
+        assert moved == free[:len(untouched)]
+
+    def test_entry_changes_rerank_after_a_concurrent_commit(self):
+        self.service.collection.find_one.return_value = {'version': 4}
+        self.service.collection.find_one_and_update.side_effect = [{'version': 6}, {'version': 7}]
+        self.entries.find_one.return_value = None
+        self.entries.count_documents.return_value = 0
+        self.entries.find.return_value.sort.return_value.batch_size.return_value = iter([])
+
+        version = self.service.apply_entry_changes('global_impact', 'weekly', [self._entry(10.0)], [], {})
+
+        assert version == 7
+        self.entries.find.return_value.sort.assert_called_once()
+
+    def test_removing_a_user_closes_rank_gaps_and_bumps_versions(self):
+        user_id = str(ObjectId())
+        self.entries.find.side_effect = [
+            [{'leaderboard_type': 'global_impact', 'period': 'weekly'},
+             {'leaderboard_type': 'donation_heroes', 'period': 'all_time'}],
+            [{'rank': 3}],
+            [{'rank': 7}]
+        ]
+
+        boards = self.service.remove_user_from_leaderboards(user_id)
+
+        assert boards == [('global_impact', 'weekly'), ('donation_heroes', 'all_time')]
+        self.entries.delete_many.assert_not_called()
+        shifts = [
+            (call.args[0][1]._filter['period'], call.args[0][1]._filter['rank'], call.args[0][1]._doc)
+            for call in self.entries.bulk_write.call_args_list
+        ]
+        assert shifts == [('weekly', {'$gte': 4}, {'$inc': {'rank': -1}}),
+                          ('all_time', {'$gte': 8}, {'$inc': {'rank': -1}})]
+        touches = self.service.collection.update_one.call_args_list
+        assert [call.args[0]['leaderboard_type'] for call in touches] == ['global_impact', 'donation_heroes']
+        assert touches[0].args[1]['$inc'] == {'version': 1, 'metadata.total_participants': -1}
+
+    def test_update_leaderboard_writes_entries_outside_document(self):
+        self.service.collection.count_documents.return_value = 1
+        self.service.collection.find_one_and_update.return_value = {'version': 7}
+        leaderboard = Leaderboard('global_impact', 'all_time')
+        leaderboard.entries = [self._entry(score) for score in (30.0, 20.0, 10.0)]
+        self.service.entry_repo.WRITE_BATCH_SIZE = 2
+
+        assert self.service.update_leaderboard(leaderboard) is True
+
+        update = self.service.collection.find_one_and_update.call_args.args[1]
+        assert 'entries' not in update['$set']
+        assert update['$unset'] == {'entries': ''}
+        assert update['$inc'] == {'version': 1}
+        assert leaderboard.version == 7
+        batches = self.entries.bulk_write.call_args_list
+        assert [len(call.args[0]) for call in batches] == [2, 1]
+        stale_filter = self.entries.delete_many.call_args.args[0]
+        assert stale_filter['leaderboard_type'] == 'global_impact'
+        assert '$or' in stale_filter
+
+    def test_user_positions_join_leaderboard_metadata(self):
+        user_id = ObjectId()
+        self.entries.find.return_value = [
+            {'leaderboard_type': 'global_impact', 'period': 'weekly', 'user_id': user_id, 'rank': 3, 'score': 50.0}
+        ]
+        self.service.collection.find.return_value = [
+            {'leaderboard_type': 'global_impact', 'period': 'weekly', 'metadata': {'total_participants': 10}}
+        ]
+
+        positions = self.service.get_user_leaderboard_positions(str(user_id))
+
+        self.entries.find.assert_called_once_with({'user_id': user_id})
+        assert positions[0]['rank'] == 3
+        assert positions[0]['total_participants'] == 10
+
+
+class TestLeaderboardPageCache(BaseSocialTest):
+    """Test the versioned read-through cache for leaderboard pages"""
+    service_class = LeaderboardService
+    repository_dependencies = ['leaderboard_repo']
+
+    def setUp(self):
+        super().setUp()
+        self.service.page_cache = LeaderboardPageCache(max_entries=8, ttl_seconds=60)
+        self.leaderboard = Leaderboard('global_impact', 'all_time', version=3)
+        entry_repo = self.service.leaderboard_repo.entry_repo
+        self.service.leaderboard_repo.find_by_type_and_period.return_value = self.leaderboard
+        entry_repo.get_entries_page.return_value = []
+        entry_repo.count_entries.return_value = 0
+        entry_repo.find_entry.return_value = None
+
+    def test_second_read_is_served_from_cache(self):
+        _, _, first = self.service.get_leaderboard('global_impact', 'all_time', str(ObjectId()))
+        _, _, second = self.service.get_leaderboard('global_impact', 'all_time', str(ObjectId()))
+
+        assert self.service.leaderboard_repo.entry_repo.get_entries_page.call_count == 1
+        assert self.service.page_cache.stats['local_hits'] == 1
+        assert first['etag'] == second['etag']
+
+    def test_version_bump_misses_and_matching_etag_is_not_modified(self):
+        _, _, first = self.service.get_leaderboard('global_impact', 'all_time')
+        success, message, data = self.service.get_leaderboard(
+            'global_impact', 'all_time', if_none_match=f'"other", {first["etag"][2:]}'
+        )
+        assert success is True
+        assert data == {'etag': first['etag'], 'not_modified': True}
+
+        self.leaderboard.version += 1
+        self.leaderboard.metadata['total_participants'] = 5
+        _, _, refreshed = self.service.get_leaderboard(
+            'global_impact', 'all_time', if_none_match=first['etag']
+        )
+
+        assert self.service.leaderboard_repo.entry_repo.get_entries_page.call_count == 2
+        assert refreshed is not None
+
+    def test_local_lru_evicts_oldest_and_invalidates_by_leaderboard(self):
+        cache = LeaderboardPageCache(max_entries=2, ttl_seconds=60)
+        cache.set('global_impact:weekly:v1:1:50', {'page': 1})
+        cache.set('global_impact:weekly:v1:2:50', {'page': 2})
+        cache.get('global_impact:weekly:v1:1:50')
+        cache.set('gaming_masters:weekly:v1:1:50', {'page': 1})
+
+        assert cache.get('global_impact:weekly:v1:2:50') is None
+        assert cache.invalidate('global_impact', 'weekly') == 1
+        assert cache.get('gaming_masters:weekly:v1:1:50') is not None
+
+
+class TestFriendsRankingView(ServiceTestMixin, BaseSocialTest):
+    """Test the materialized per-user friends leaderboard"""
+    service_class = LeaderboardService
+    repository_dependencies = ['friends_ranking_repo', 'impact_score_repo', 'relationship_repo', 'user_repo']
+
+    def test_built_view_is_read_without_rebuilding(self):
+        user_id, friend_id = ObjectId(), ObjectId()
+        self.service.friends_ranking_repo.is_built.return_value = True
+        self.service.friends_ranking_repo.get_rankings.return_value = [
+            {'member_id': friend_id, 'impact_score': 80.0, 'display_name': 'Friend'},
+            {'member_id': user_id, 'impact_score': 40.0, 'display_name': 'Me'}
+        ]
+
+        success, _, data = self.service.get_friends_leaderboard(str(user_id))
+
+        assert success is True
+        self.service.relationship_repo.get_user_friends.assert_not_called()
+        self.service.impact_score_repo.get_friends_rankings.assert_not_called()
+        assert [entry['display_name'] for entry in data['entries']] == ['Friend', 'Me']
+        assert data['entries'][0]['rank'] == 1
+
+    def test_unbuilt_view_is_materialized_from_both_relationship_sides(self):
+        user_id, requester_id, target_id = str(ObjectId()), str(ObjectId()), str(ObjectId())
+        self.service.friends_ranking_repo.is_built.return_value = False
+        self.service.friends_ranking_repo.get_rankings.return_value = []
+        self.service.relationship_repo.get_user_friends.return_value = [
+            MagicMock(user_id=ObjectId(requester_id), target_user_id=ObjectId(user_id)),
+            MagicMock(user_id=ObjectId(user_id), target_user_id=ObjectId(target_id))
+        ]
+        self.service.impact_score_repo.find_by_user_ids.return_value = {}
+        self.service.user_repo.collection.find.return_value = []
+
+        self.service.get_friends_leaderboard(user_id)
+
+        owner, members = self.service.friends_ranking_repo.rebuild.call_args.args
+        assert owner == user_id
+        assert [str(member['member_id']) for member in members] == [user_id, requester_id, target_id]
+        assert members[0]['impact_score'] is None
+
+    def test_new_friendship_only_updates_built_views(self):
+        user_id, friend_id = str(ObjectId()), str(ObjectId())
+        self.service.friends_ranking_repo.is_built.side_effect = lambda owner: owner == user_id
+        self.service.impact_score_repo.find_by_user_ids.return_value = {}
+        self.service.user_repo.collection.find.return_value = []
+
+        self.service.on_friendship_added(user_id, friend_id)
+
+        self.service.friends_ranking_repo.add_members.assert_called_once()
+        owner, members = self.service.friends_ranking_repo.add_members.call_args.args
+        assert owner == user_id
+        assert str(members[0]['member_id']) == friend_id
+
+    def test_score_changes_fan_out_to_every_view(self):
+        repo = FriendsRankingRepository()
+        self.setup_service_mocks(repo, ['collection'])
+        score = ImpactScore(user_id=str(ObjectId()), impact_score=123.0)
+
+        repo.update_member_scores([score])
+
+        operation = repo.collection.bulk_write.call_args.args[0][0]
+        assert operation._filter == {'member_id': score.user_id}
+        assert operation._doc['$set']['impact_score'] == 123.0
+
+
+class TestTopKLeaderboardRefresh(BaseSocialTest):
+    """Test bounded top-K maintenance of leaderboard entries"""
+    service_class = LeaderboardService
+    repository_dependencies = ['leaderboard_repo', 'impact_score_repo']
+    external_dependencies = ['page_cache']
+
+    USERS = {name: str(ObjectId()) for name in 'abcxy'}
+
+    def setUp(self):
+        super().setUp()
+        self.service._top_k_indexes = {}
+
+    def _load_top_k(self, leaderboard_type='global_impact', period='all_time', capacity=3):
+        """Seed the service's top-K index of a board with users a, b and c"""
+        index = TopKIndex(capacity)
+        index.load([(self.USERS['a'], 30.0), (self.USERS['b'], 20.0), (self.USERS['c'], 10.0)],
+                   version=4, synced_at=datetime.utcnow())
+        self.service._top_k_indexes[(leaderboard_type, period)] = index
+        return Leaderboard(leaderboard_type, period, version=4), index
+
+    def _row(self, user_id, score, participates=True):
+        return {
+            'user_id': self.USERS[user_id],
+            'impact_score': score,
+            'user_profile': [{'first_name': user_id, 'preferences': {'privacy': {'leaderboard_participation': participates}}}]
+        }
+
+    def test_index_admits_above_cutoff_and_flags_drops(self):
+        index = TopKIndex(3)
+        index.load([('a', 30.0), ('b', 20.0), ('c', 10.0), ('d', 5.0)], version=1)
+        assert len(index) == 3 and index.cutoff == 10.0
+
+        assert index.offer('e', 8.0) == (False, None)
+        assert index.offer('e', 25.0) == (True, 'c')
+        assert index.cutoff == 20.0
+        assert index.offer('a', 30.0) == (False, None)
+
+        assert index.offer('a', 15.0) == (True, None)
+        assert index.incomplete is True
+
+    def test_refresh_writes_only_entries_crossing_the_cutoff(self):
+        leaderboard, index = self._load_top_k()
+        self.service.leaderboard_repo.apply_entry_changes.return_value = 5
+        self.service.impact_score_repo.get_scores_changed_since.return_value = [
+            self._row('x', 5.0),
+            self._row('y', 25.0),
+            self._row('b', 20.0)
+        ]
+
+        assert self.service._update_leaderboard_data(leaderboard) is True
+
+        upserts, removals, metadata = self.service.leaderboard_repo.apply_entry_changes.call_args.args[2:]
+        assert [entry.display_name for entry in upserts] == ['y']
+        assert removals == [self.USERS['c']]
+        assert metadata['total_participants'] == 3 and metadata['min_score'] == 20.0
+        assert index.version == 5
+        self.service.leaderboard_repo.update_leaderboard.assert_not_called()
+        self.service.page_cache.invalidate.assert_called_once_with('global_impact', 'all_time')
+
+    def test_opt_out_falls_back_to_rebuild(self):
+        leaderboard, _ = self._load_top_k()
+        self.service.leaderboard_repo.apply_entry_changes.return_value = 5
+        self.service.impact_score_repo.get_scores_changed_since.return_value = [
+            self._row('a', 30.0, participates=False)
+        ]
+        self.service.impact_score_repo.get_global_rankings.return_value = [self._row('b', 20.0)]
+        self.service.leaderboard_repo.update_leaderboard.return_value = True
+
+        assert self.service._update_leaderboard_data(leaderboard) is True
+
+        assert self.service.leaderboard_repo.apply_entry_changes.call_args.args[3] == [self.USERS['a']]
+        self.service.leaderboard_repo.update_leaderboard.assert_called_once()
+        assert self.service._top_k_indexes[('global_impact', 'all_time')].scores() == {self.USERS['b']: 20.0}
+
+    def test_windowed_boards_are_rebuilt(self):
+        weekly, _ = self._load_top_k('weekly_warriors', 'weekly')
+        self.service.impact_score_repo.get_weekly_active_users.return_value = []
+        self.service.leaderboard_repo.update_leaderboard.return_value = True
+
+        assert self.service._update_leaderboard_data(weekly) is True
+
+        self.service.impact_score_repo.get_scores_changed_since.assert_not_called()
+        self.service.impact_score_repo.get_weekly_active_users.assert_called_once_with(
+            weeks_back=1, limit=LeaderboardService.TOP_K
+        )
+
+    def test_score_updates_only_reach_boards_ranked_by_changed_fields(self):
+        self.service._get_top_k_index = MagicMock(return_value=None)
+
+        self.service.apply_score_updates([self._row('a', 35.0)], ['gaming_component'])
+
+        boards = {call.args for call in self.service._get_top_k_index.call_args_list}
+        assert boards == {('gaming_masters', period) for period in Leaderboard.VALID_PERIODS}
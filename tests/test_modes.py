@@ -4,14 +4,27 @@ Tests for game mode management, scheduling, and mode transitions
 """
 import os
 import sys
+import threading
 from bson import ObjectId
+from dataclasses import replace
 from datetime import datetime, timezone, timedelta
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tests.core.base_game_test import BaseGameTest
+from app.games.modes.models.mode_schedule import ModeSchedule
+from app.games.modes.repositories.mode_schedule_repository import ModeScheduleRepository
 from app.games.modes.services.mode_manager import ModeManager
+from app.games.modes.services.scheduler import ModeScheduler
+
+
+def make_schedule(mode_name, minutes_from_now):
+    """Build a one-time activation schedule relative to now"""
+    return ModeSchedule(
+        mode_name=mode_name, schedule_type='one_time', action='activate',
+        scheduled_at=datetime.utcnow() + timedelta(minutes=minutes_from_now)
+    )
 
 
 class TestGameModeSystem(BaseGameTest):
@@ -307,4 +320,120 @@ class TestGameModeSystem(BaseGameTest):
         }
 
         self.assertIn(game['_id'], mode_integration['supported_games'])
-        self.assertIn(str(game['_id']), mode_integration['game_specific_rules'])
\ No newline at end of file
+        self.assertIn(str(game['_id']), mode_integration['game_specific_rules'])
+
+
+class TestModeScheduler(BaseGameTest):
+    """Test the next-fire heap and the leader lease of ModeScheduler"""
+    service_class = ModeScheduler
+    repository_dependencies = ['schedule_repository', 'mode_repository', 'lease_repository']
+
+    def setUp(self):
+        super().setUp()
+        self.schedules = []
+        executed = set()
+        self.service.worker_id = 'host:1'
+        self.service.schedule_repository.schedules_changed = threading.Event()
+        self.service.schedule_repository.get_schedules_due_before.side_effect = lambda until: [
+            schedule for schedule in self.schedules if schedule.schedule_id not in executed
+        ]
+        self.service.schedule_repository.execute_schedule.side_effect = executed.add
+        self.service.schedule_repository.claim_schedule.side_effect = lambda schedule_id, *args, **kwargs: next(
+            schedule for schedule in self.schedules if schedule.schedule_id == schedule_id
+        )
+        self.service.mode_repository.get_next_expiry.return_value = None
+        self.service.mode_repository.activate_mode.return_value = True
+        self.service.lease_repository.acquire.return_value = {'_id': 'mode_scheduler', 'schedule_version': 0}
+        self.service.lease_repository.get_lease.return_value = None
+
+    def test_due_schedules_fire_in_time_order(self):
+        later = make_schedule('late', -1)
+        earlier = make_schedule('early', -2)
+        future = make_schedule('future', 10)
+        self.schedules.extend([later, future, earlier])
+
+        timeout = self.service.tick()
+
+        claimed = [call[0][0] for call in self.service.schedule_repository.claim_schedule.call_args_list]
+        assert claimed == [earlier.schedule_id, later.schedule_id]
+        assert self.service.schedule_repository.execute_schedule.call_count == 2
+        # Sleeps until the next lease renewal, which comes before the future schedule
+        assert 0 < timeout <= self.service.LEASE_SECONDS / 3
+
+    def test_follower_runs_nothing(self):
+        self.schedules.append(make_schedule('due', -1))
+        self.service.lease_repository.acquire.return_value = None
+
+        self.service.tick()
+
+        assert self.service.get_scheduler_status()['is_leader'] is False
+        self.service.schedule_repository.get_schedules_due_before.assert_not_called()
+        self.service.schedule_repository.claim_schedule.assert_not_called()
+
+    def test_claimed_schedule_is_retried_later(self):
+        schedule = make_schedule('due', -1)
+        self.schedules.append(schedule)
+        self.service.schedule_repository.claim_schedule.side_effect = None
+        self.service.schedule_repository.claim_schedule.return_value = None
+
+        self.service.tick()
+
+        self.service.mode_repository.activate_mode.assert_not_called()
+        fire_at, _, key, _ = self.service._heap[0]
+        assert key == schedule.schedule_id
+        assert fire_at > datetime.utcnow() + timedelta(seconds=self.service.RETRY_SECONDS - 5)
+
+    def test_claimed_document_runs_instead_of_the_heap_snapshot(self):
+        schedule = make_schedule('due', -1)
+        self.schedules.append(schedule)
+        edited = replace(schedule, mode_config_override={'duration_hours': 2, 'max_players': 8})
+        self.service.schedule_repository.claim_schedule.side_effect = None
+        self.service.schedule_repository.claim_schedule.return_value = edited
+
+        self.service.tick()
+
+        self.service.mode_repository.update_mode_config.assert_called_once_with(
+            'due', {'duration_hours': 2, 'max_players': 8}
+        )
+        assert self.service.schedule_repository.claim_schedule.call_args[1] == {'due_only': True}
+
+    def test_changes_reload_the_heap(self):
+        due_before = self.service.schedule_repository.get_schedules_due_before
+
+        self.service.tick()
+        assert due_before.call_count == 1
+
+        # Renewing an unchanged lease does not query schedules
+        self.service._renew_at = datetime.utcnow()
+        self.service.tick()
+        assert due_before.call_count == 1
+
+        # A change in this process
+        self.service.schedule_repository.schedules_changed.set()
+        self.service.tick()
+        assert due_before.call_count == 2
+
+        # A change in another process, seen on the lease
+        self.service.lease_repository.acquire.return_value = {'_id': 'mode_scheduler', 'schedule_version': 1}
+        self.service._renew_at = datetime.utcnow()
+        self.service.tick()
+        assert due_before.call_count == 3
+
+
+class TestModeScheduleClaims(BaseGameTest):
+    """Test the conditional claim of a mode schedule"""
+    service_class = ModeScheduleRepository
+    repository_dependencies = ['collection']
+
+    def test_claim_only_matches_due_schedules(self):
+        schedule = make_schedule('due', -1)
+        self.service.collection.find_one_and_update.return_value = schedule.to_dict()
+
+        claimed = self.service.claim_schedule(schedule.schedule_id, 'host:1', 60)
+
+        assert claimed.schedule_id == schedule.schedule_id
+        claim_filter = self.service.collection.find_one_and_update.call_args[0][0]
+        assert claim_filter['scheduled_at']['$lte'] <= datetime.utcnow()
+
+        self.service.claim_schedule(schedule.schedule_id, 'host:1', 60, due_only=False)
+        assert 'scheduled_at' not in self.service.collection.find_one_and_update.call_args[0][0]
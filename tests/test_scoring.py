@@ -3,9 +3,13 @@ Test module for universal scoring functionality
 Tests for score normalization, ELO ratings, and scoring algorithms
 """
 import os
+import random
 import sys
+import numpy as np
+import pytest
 from bson import ObjectId
 from datetime import datetime, timezone
+from flask import Flask
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -278,4 +282,123 @@ class TestUniversalScoringSystem(BaseGameTest):
             elif case['raw_score'] < 0:
                 self.assertGreaterEqual(case['result'], 0)
             elif case['raw_score'] == float('inf'):
-                self.assertLessEqual(case['result'], case['expected_max'])
\ No newline at end of file
+                self.assertLessEqual(case['result'], case['expected_max'])
+
+
+def _loop_percentile_rank(user_score, all_scores):
+    """Per-user percentile rank as computed before the batch API"""
+    scores_below = sum(1 for score in all_scores if score < user_score)
+    return round(scores_below / len(all_scores) * 100, 2)
+
+
+def _loop_distribution_stats(scores):
+    """Distribution stats as computed before the batch API"""
+    scores_sorted = sorted(scores)
+    n = len(scores_sorted)
+    mean = sum(scores) / n
+    return {
+        "mean": mean,
+        "median": scores_sorted[n // 2] if n % 2 == 1 else (scores_sorted[n // 2 - 1] + scores_sorted[n // 2]) / 2,
+        "min": min(scores),
+        "max": max(scores),
+        "std_dev": (sum((x - mean) ** 2 for x in scores) / (n - 1)) ** 0.5,
+        "q1": scores_sorted[n // 4],
+        "q3": scores_sorted[3 * n // 4]
+    }
+
+
+class TestUniversalScorerBatch(BaseGameTest):
+    """Test the NumPy batch scoring API against the per-score methods"""
+    service_class = UniversalScorer
+
+    def test_batch_normalization_matches_single_scores(self):
+        raw_scores = [0, 1, 50, 999, 12000, 250000]
+        session_times = [30, 200, 600, 1500, 3000, 7200]
+
+        for game_id in (None, "tetris", "snake"):
+            batch = self.service.normalize_scores_batch("action", raw_scores, "hard", session_times, game_id)
+            single = [self.service.normalize_score("action", raw, "hard", seconds, game_id)
+                      for raw, seconds in zip(raw_scores, session_times)]
+            np.testing.assert_allclose(batch, single)
+
+        shared_time = self.service.normalize_scores_batch("puzzle", raw_scores, "easy", 600)
+        assert shared_time.shape == (len(raw_scores),)
+
+    def test_batch_percentiles_match_single_scores(self):
+        all_scores = [random.randint(0, 100) for _ in range(500)]
+        user_scores = [-1, 0, 50, 50.5, 100, 101]
+
+        ranks = self.service.get_percentile_ranks_batch(user_scores, all_scores)
+
+        assert list(ranks) == [_loop_percentile_rank(score, all_scores) for score in user_scores]
+        assert list(self.service.get_percentile_ranks_batch([10, 20], [])) == [50.0, 50.0]
+        assert self.service.get_percentile_rank(50, all_scores) == _loop_percentile_rank(50, all_scores)
+
+    def test_batch_distribution_stats_match_loop(self):
+        for n in (2, 7, 1000):
+            scores = [random.uniform(0, 1000) for _ in range(n)]
+            assert self.service.get_score_distribution_stats_batch(scores) == pytest.approx(_loop_distribution_stats(scores))
+
+        single = self.service.get_score_distribution_stats_batch([42.0])
+        assert single["std_dev"] == 0.0 and single["median"] == single["q1"] == single["q3"] == 42.0
+        assert self.service.get_score_distribution_stats_batch([]) == {}
+
+
+class TestUniversalScorerBatchBenchmarks:
+    """
+    Benchmarks of the batch API at production sizes
+
+    Skipped unless RUN_PERFORMANCE_TESTS=true. Timings are recorded by
+    pytest-benchmark rather than asserted; the tests check that the batch
+    results still match the per-score loops at these sizes.
+    """
+
+    @pytest.mark.performance
+    def test_percentile_batch(self, benchmark):
+        scorer = UniversalScorer()
+        all_scores = [random.uniform(0, 1000) for _ in range(10000)]
+        user_scores = all_scores[:500]
+
+        ranks = benchmark(scorer.get_percentile_ranks_batch, user_scores, all_scores)
+
+        assert list(ranks) == [_loop_percentile_rank(score, all_scores) for score in user_scores]
+
+    @pytest.mark.performance
+    def test_normalization_batch(self, benchmark):
+        scorer = UniversalScorer()
+        raw_scores = [random.randint(0, 100000) for _ in range(100000)]
+        session_times = [random.randint(10, 5000) for _ in range(100000)]
+
+        with Flask(__name__).app_context():
+            batch = benchmark(scorer.normalize_scores_batch, "arcade", raw_scores, "medium", session_times, "tetris")
+            single = [scorer.normalize_score("arcade", raw, "medium", seconds, "tetris")
+                      for raw, seconds in zip(raw_scores, session_times)]
+
+        np.testing.assert_allclose(batch, single)
+
+    @pytest.mark.performance
+    def test_distribution_stats_batch(self, benchmark):
+        scorer = UniversalScorer()
+        scores = [random.uniform(0, 1000) for _ in range(200000)]
+
+        stats = benchmark(scorer.get_score_distribution_stats_batch, scores)
+
+        assert stats == pytest.approx(_loop_distribution_stats(scores))
+
+    @pytest.mark.performance
+    def test_one_million_results_in_one_call(self, benchmark):
+        rng = np.random.default_rng(7)
+        scorer = UniversalScorer()
+        raw_scores = rng.integers(0, 100000, size=1_000_000)
+        session_times = rng.integers(10, 5000, size=1_000_000)
+
+        def score_tournament():
+            normalized = scorer.normalize_scores_batch("strategy", raw_scores, "expert", session_times)
+            return (normalized,
+                    scorer.get_percentile_ranks_batch(normalized, normalized),
+                    scorer.get_score_distribution_stats_batch(normalized))
+
+        normalized, percentiles, stats = benchmark.pedantic(score_tournament, rounds=3)
+
+        assert normalized.shape == percentiles.shape == (1_000_000,)
+        assert stats["min"] <= stats["median"] <= stats["max"]
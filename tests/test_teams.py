@@ -3,15 +3,25 @@ Test module for teams functionality
 Tests for global team system, team management, and tournaments
 """
 import os
+import random
 import sys
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tests.core.base_game_test import BaseGameTest
+from tests.core.base_service_test import ServiceTestMixin
+from app.games.teams.models.global_team import GlobalTeam
+from app.games.teams.models.team_member import TeamMember
+from app.games.teams.models.team_tournament import TeamTournament
+from app.games.teams.repositories.global_team_repository import GlobalTeamRepository
+from app.games.teams.repositories.team_score_counter_repository import TeamScoreCounterRepository
+from app.games.teams.services.team_balancer import TeamBalancer
 from app.games.teams.services.team_manager import TeamManager
+from app.games.teams.services.tournament_engine import TournamentEngine
 
 
 class TestGlobalTeamSystem(BaseGameTest):
@@ -304,4 +314,304 @@ class TestGlobalTeamSystem(BaseGameTest):
             stats['contribution_distribution']['middle_50_percent'] +
             stats['contribution_distribution']['bottom_40_percent']
         )
-        self.assertAlmostEqual(contribution_sum, 1.0, places=2)
\ No newline at end of file
+        self.assertAlmostEqual(contribution_sum, 1.0, places=2)
+
+
+class TestTeamScoreCounters(BaseGameTest):
+    """Test sharded team score counters and the standings built from them"""
+    service_class = TeamScoreCounterRepository
+    repository_dependencies = ['collection']
+
+    def setUp(self):
+        super().setUp()
+        self.service._write_rates = {}
+
+    def test_quiet_team_writes_shard_zero(self):
+        shards = {self.service._pick_shard('team_fire') for _ in range(int(self.service.HOT_WRITES_PER_SECOND))}
+
+        assert shards == {0}
+
+    def test_hot_team_spreads_over_shards(self):
+        shards = [self.service._pick_shard('team_fire') for _ in range(200)]
+
+        assert len(set(shards)) > 1
+        assert all(0 <= shard < self.service.SHARDS for shard in shards)
+
+    def test_increment_updates_all_scopes_in_one_bulk_write(self):
+        self.service.collection.bulk_write.return_value = MagicMock(matched_count=1, upserted_count=1)
+        scopes = [self.service.GLOBAL_SCOPE, self.service.tournament_scope('t1')]
+
+        assert self.service.increment('team_fire', 12.5, scopes, 'game', 'individual') is True
+
+        self.service.collection.bulk_write.assert_called_once()
+        operations = self.service.collection.bulk_write.call_args[0][0]
+        assert len(operations) == 2
+
+    def test_scope_totals_sum_shards(self):
+        now = datetime.utcnow()
+        self.service.collection.find.return_value = [
+            {'team_id': 'team_fire', 'score': 10, 'games_played': 1, 'points_by_source': {'individual': 10},
+             'last_activity': now - timedelta(minutes=5)},
+            {'team_id': 'team_fire', 'score': 5.5, 'games_played': 2, 'points_by_source': {'individual': 5.5},
+             'last_activity': now},
+            {'team_id': 'team_ice', 'score': 3, 'challenges_won': 1, 'points_by_source': {'challenge': 3},
+             'last_activity': now}
+        ]
+
+        totals = self.service.get_scope_totals(self.service.GLOBAL_SCOPE)
+
+        assert totals['team_fire']['score'] == 15.5
+        assert totals['team_fire']['games_played'] == 3
+        assert totals['team_fire']['points_by_source'] == {'individual': 15.5}
+        assert totals['team_fire']['last_activity'] == now
+        assert totals['team_ice']['challenges_won'] == 1
+
+    def test_standings_rank_by_score_and_include_idle_teams(self):
+        self.service.collection.find.return_value = [
+            {'team_id': 'team_ice', 'score': 40, 'games_played': 4, 'last_activity': datetime.utcnow()},
+            {'team_id': 'team_fire', 'score': 25, 'games_played': 2, 'last_activity': datetime.utcnow()}
+        ]
+
+        standings = self.service.get_standings('t1', ['team_fire', 'team_ice', 'team_earth'])
+
+        assert [s['team_id'] for s in standings] == ['team_ice', 'team_fire', 'team_earth']
+        assert [s['position'] for s in standings] == [1, 2, 3]
+        assert standings[2]['score'] == 0 and standings[2]['last_activity'] is None
+
+
+class TestGlobalTeamAggregates(ServiceTestMixin, BaseGameTest):
+    """Test team leaderboard and statistics aggregation in Mongo"""
+    service_class = GlobalTeamRepository
+    repository_dependencies = ['collection']
+
+    def setUp(self):
+        super().setUp()
+        self.setup_service_mocks(self.service.score_counters, ['collection'])
+        self.service.score_counters._write_rates = {}
+
+    def test_team_leaderboard_is_sorted_and_limited_in_mongo(self):
+        self.service.collection.aggregate.return_value = iter([
+            {'team_id': 'team_ice', 'name': 'Ice', 'total_score': 10.0}
+        ])
+        self.service.score_counters.collection.find.return_value = [{'team_id': 'team_ice', 'score': 30}]
+
+        teams = self.service.get_team_leaderboard(limit=1)
+
+        pipeline = self.service.collection.aggregate.call_args.args[0]
+        stages = [next(iter(stage)) for stage in pipeline]
+        assert stages == ['$match', '$lookup', '$addFields', '$sort', '$limit', '$project']
+        assert pipeline[3]['$sort'] == {'current_score': -1, 'team_id': 1}
+        assert pipeline[4]['$limit'] == 1
+        # Only the returned teams have their counter totals loaded
+        assert self.service.score_counters.collection.find.call_args.args[0]['team_id'] == {'$in': ['team_ice']}
+        assert [(team.team_id, team.total_score) for team in teams] == [('team_ice', 40.0)]
+
+    def test_team_statistics_are_aggregated_in_mongo(self):
+        self.service.collection.aggregate.return_value = iter([
+            {'_id': None, 'total_teams': 2, 'total_members': 6, 'total_score': 50.0, 'highest_team_score': 40.0}
+        ])
+
+        stats = self.service.get_team_statistics()
+
+        self.service.collection.find.assert_not_called()
+        assert stats['average_score_per_team'] == 25.0
+        assert stats['highest_team_score'] == 40.0
+        assert stats['average_members_per_team'] == 3
+
+
+class TestTeamGameContributions(BaseGameTest):
+    """Test game contributions are written to the team score counters"""
+    service_class = TeamManager
+    repository_dependencies = ['member_repository', 'tournament_repository', 'score_counters']
+
+    def setUp(self):
+        super().setUp()
+        TeamManager.clear_active_tournament_cache()
+        self.addCleanup(TeamManager.clear_active_tournament_cache)
+
+    def test_game_contribution_is_one_counter_write(self):
+        self.service.member_repository.get_user_team.return_value = TeamMember(user_id='user1', team_id='team_fire')
+        self.service.member_repository.add_game_played.return_value = True
+        self.service.tournament_repository.get_active_tournament.return_value = TeamTournament(
+            name='Season', tournament_id='t1', status='active', teams=['team_fire', 'team_ice']
+        )
+
+        for _ in range(3):
+            success, message, data = self.service.record_game_contribution('user1', 500)
+
+        assert success is True
+        assert data['contribution_points'] == 50
+        assert self.service.score_counters.increment.call_count == 3
+        self.service.score_counters.increment.assert_called_with(
+            'team_fire', 50, ['global', 'tournament:t1'], 'game', 'individual'
+        )
+        # The active tournament is looked up once per TTL, not per game
+        self.service.tournament_repository.get_active_tournament.assert_called_once()
+
+
+class TestTeamBalancer(BaseGameTest):
+    """Test the minimal-move team balancing plan"""
+    service_class = TeamManager
+    repository_dependencies = ['team_repository', 'member_repository']
+
+    @staticmethod
+    def _balancer(rosters, **kwargs):
+        stats = {
+            team_id: {"members": len(members), "score": sum(score for _, score in members)}
+            for team_id, members in rosters.items()
+        }
+        loaded = []
+
+        def load_members(team_id):
+            loaded.append(team_id)
+            return iter(rosters[team_id])
+
+        return TeamBalancer(stats, load_members, **kwargs), loaded
+
+    @staticmethod
+    def _rosters(sizes, seed=7):
+        rng = random.Random(seed)
+        return {
+            team_id: [(f"{team_id}_{i}", rng.uniform(0, 1000)) for i in range(size)]
+            for team_id, size in sizes.items()
+        }
+
+    def test_balanced_teams_need_no_moves(self):
+        rosters = {
+            'fire': [('a', 100), ('b', 50)],
+            'ice': [('c', 90), ('d', 60)]
+        }
+        balancer, loaded = self._balancer(rosters)
+
+        assert balancer.plan() == {}
+        assert loaded == []
+
+    def test_headcount_uses_minimum_moves(self):
+        rosters = self._rosters({'fire': 40, 'ice': 25, 'earth': 20, 'storm': 15})
+        balancer, _ = self._balancer(rosters, max_score_swaps=0)
+
+        moves = balancer.plan()
+        metrics = balancer.get_metrics()
+
+        # 100 members over 4 teams: fire and ice give up 15 + 0, earth and storm take 5 + 10
+        assert len(moves) == 15
+        assert metrics['headcount_spread_after'] == 0
+        assert all(from_team == 'fire' for from_team, _ in moves.values())
+
+    def test_score_spread_shrinks_with_few_extra_moves(self):
+        rosters = self._rosters({'fire': 30, 'ice': 30, 'earth': 30})
+        rosters['fire'] = [(user_id, score + 500) for user_id, score in rosters['fire']]
+        balancer, _ = self._balancer(rosters, score_tolerance=0.01, max_score_swaps=10)
+
+        moves = balancer.plan()
+        metrics = balancer.get_metrics()
+
+        assert metrics['headcount_spread_after'] == 0
+        assert metrics['score_spread_after'] < metrics['score_spread_before'] * 0.1
+        assert len(moves) <= 2 * balancer.score_swaps
+        # Round-robin reassignment would move about two thirds of the 90 members
+        assert len(moves) < 30
+
+    def test_planned_moves_match_metrics(self):
+        rosters = self._rosters({'fire': 33, 'ice': 12, 'earth': 21})
+        balancer, _ = self._balancer(rosters)
+
+        moves = balancer.plan()
+        metrics = balancer.get_metrics()
+
+        final = {team_id: {user_id for user_id, _ in members} for team_id, members in rosters.items()}
+        for user_id, (from_team, to_team) in moves.items():
+            assert from_team != to_team
+            final[from_team].remove(user_id)
+            final[to_team].add(user_id)
+        scores = {user_id: score for members in rosters.values() for user_id, score in members}
+
+        assert metrics['moves'] == len(moves)
+        for team_id, members in final.items():
+            assert metrics['teams'][team_id]['members_after'] == len(members)
+            assert metrics['teams'][team_id]['score_after'] == round(sum(scores[u] for u in members), 2)
+
+    def test_dry_run_does_not_reassign(self):
+        self.service.team_repository.get_all_teams.return_value = [
+            GlobalTeam(team_id='fire', name='Fire'), GlobalTeam(team_id='ice', name='Ice')
+        ]
+        self.service.member_repository.get_team_balance_stats.return_value = {
+            'fire': {'members': 3, 'score': 60}, 'ice': {'members': 1, 'score': 5}
+        }
+        self.service.member_repository.iter_member_scores.side_effect = lambda team_id: iter(
+            [('a', 10), ('b', 20), ('c', 30)] if team_id == 'fire' else [('d', 5)]
+        )
+
+        success, message, data = self.service.balance_teams(dry_run=True)
+
+        assert success is True
+        assert message == "TEAMS_BALANCE_PLANNED"
+        assert data['planned_moves'] == 1
+        assert data['team_distributions'] == {'Fire': 2, 'Ice': 2}
+        self.service.member_repository.reassign_members.assert_not_called()
+
+
+class TestTournamentPrizes(BaseGameTest):
+    """Test tournament prize credits go to WalletService in one bulk award"""
+    service_class = TournamentEngine
+    repository_dependencies = ['team_repository', 'member_repository', 'tournament_repository']
+    external_dependencies = ['wallet_service']
+
+    def test_prize_credits_are_one_idempotent_batch(self):
+        self.service.wallet_service.award_credits_bulk.return_value = (
+            True, "CREDITS_AWARDED_SUCCESS", {'users_credited': 3}
+        )
+        tournament = TeamTournament(
+            name='Season', tournament_id='t1', status='completed',
+            prizes={'1st_place': {'credits': 50, 'achievement': 'champions'}, '2nd_place': {'credits': 20}},
+            prize_recipients={'fire': ['u1', 'u2'], 'ice': ['u3']}
+        )
+        leaderboard = [{'team_id': 'fire'}, {'team_id': 'ice'}, {'team_id': 'earth'}]
+
+        result = self.service._award_tournament_prizes(tournament, leaderboard)
+
+        assert result['prizes_awarded'] == 2
+        assert result['credits_pending'] is False
+        self.service.team_repository.add_achievement.assert_called_once_with('fire', 'champions')
+        self.service.wallet_service.award_credits_bulk.assert_called_once()
+        awards = self.service.wallet_service.award_credits_bulk.call_args[0][0]
+        assert awards == [('u1', 50, 'tournament'), ('u2', 50, 'tournament'), ('u3', 20, 'tournament')]
+        assert self.service.wallet_service.award_credits_bulk.call_args[1]['batch_id'] == 'tournament:t1'
+        self.service.member_repository.iter_member_ids.assert_not_called()
+
+    def test_completion_records_prize_recipients_for_retries(self):
+        members = {'fire': ['u1', 'u2'], 'ice': ['u3']}
+        self.service.member_repository.iter_member_ids.side_effect = lambda team_id: iter(list(members[team_id]))
+        self.service.wallet_service.award_credits_bulk.return_value = (False, "CREDITS_AWARD_ERROR", None)
+        self.service.tournament_repository.get_tournament_leaderboard.return_value = [
+            {'team_id': 'fire'}, {'team_id': 'ice'}
+        ]
+        tournament = TeamTournament(
+            name='Season', tournament_id='t1', status='active', teams=['fire', 'ice'],
+            prizes={'1st_place': {'credits': 50}}
+        )
+        self.service.tournament_repository.get_tournament_by_tournament_id.return_value = tournament
+
+        with patch.object(TeamManager, 'clear_active_tournament_cache'):
+            success, message, data = self.service.complete_tournament('t1')
+        assert success is True
+        assert data['prize_credits_pending'] is True
+        assert self.service.tournament_repository.complete_tournament.call_args[0][3] == {'fire': ['u1', 'u2']}
+
+        # Membership changes before the retry; the recorded members are paid
+        members['fire'] = ['u2', 'u9']
+        self.service.wallet_service.award_credits_bulk.return_value = (
+            True, "CREDITS_AWARDED_SUCCESS", {'users_credited': 1}
+        )
+        completed = TeamTournament(
+            name='Season', tournament_id='t1', status='completed', teams=['fire', 'ice'],
+            prizes={'1st_place': {'credits': 50}}, prize_recipients={'fire': ['u1', 'u2']}
+        )
+        self.service.tournament_repository.get_tournament_by_tournament_id.return_value = completed
+
+        success, message, data = self.service.award_tournament_prizes('t1')
+
+        assert success is True
+        awards = self.service.wallet_service.award_credits_bulk.call_args[0][0]
+        assert awards == [('u1', 50, 'tournament'), ('u2', 50, 'tournament')]
+        self.service.tournament_repository.record_prize_recipients.assert_not_called()